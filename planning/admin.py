@@ -5,11 +5,11 @@ from django.http import JsonResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.utils.decorators import method_decorator
 from .models import Patient, Vehicle, UserProfile, TimeSlot, Configuration, Location
-from .models_extended import CSVImportLog, PlanningSession, PlanningAction, NotificationSettings, MobileAppNotification
+from .models_extended import CSVImportLog, PlanningSession, PlanningAction, NotificationSettings, MobileAppNotification, WizardStateEntry
 from .widgets import ColorPickerWidget
 from .models import CSVParserConfig
 from .models import PlanningConstraint
-from .models import GoogleMapsConfig, GoogleMapsAPILog
+from .models import GoogleMapsConfig, GoogleMapsAPILog, GeocodeCacheEntry, TravelTimeCacheEntry, DailyPlanningStats
 
 # Register your models here.
 
@@ -270,7 +270,7 @@ class LocationAdmin(admin.ModelAdmin):
 # Import extended admin classes
 from .admin_extended import (
     CSVImportLogAdmin, PlanningSessionAdmin, PlanningActionAdmin,
-    NotificationSettingsAdmin, MobileAppNotificationAdmin
+    NotificationSettingsAdmin, MobileAppNotificationAdmin, PlanningJobAdmin
 )
 
 @admin.register(CSVParserConfig)
@@ -410,3 +410,52 @@ class GoogleMapsAPILogAdmin(admin.ModelAdmin):
         # Implementeer export functionaliteit
         self.message_user(request, 'API statistieken export functionaliteit komt binnenkort')
     export_api_stats.short_description = "Export API statistieken"
+
+
+@admin.register(GeocodeCacheEntry)
+class GeocodeCacheEntryAdmin(admin.ModelAdmin):
+    """Admin interface voor de persistente geocoding cache"""
+    
+    list_display = ['address_key', 'latitude', 'longitude', 'provider', 'confidence', 'hit_count', 'expires_at']
+    list_filter = ['provider']
+    search_fields = ['address_key', 'address']
+    readonly_fields = ['address_key', 'hit_count', 'created_at', 'updated_at']
+    
+    actions = ['expire_entries']
+    
+    def expire_entries(self, request, queryset):
+        """Laat geselecteerde adressen opnieuw geocoden"""
+        count = queryset.delete()[0]
+        self.message_user(request, f'{count} cache regels verwijderd')
+    expire_entries.short_description = "Verwijder uit cache (opnieuw geocoden)"
+
+
+@admin.register(TravelTimeCacheEntry)
+class TravelTimeCacheEntryAdmin(admin.ModelAdmin):
+    """Admin interface voor de persistente reistijd cache"""
+    
+    list_display = ['origin_cell', 'destination_cell', 'hour_bucket', 'distance_meters', 'duration_seconds', 'hit_count', 'last_used_at']
+    list_filter = ['hour_bucket', 'source']
+    search_fields = ['origin_cell', 'destination_cell']
+    readonly_fields = ['hit_count', 'last_used_at', 'created_at']
+
+
+@admin.register(DailyPlanningStats)
+class DailyPlanningStatsAdmin(admin.ModelAdmin):
+    """Admin interface voor de statistieken rollup (alleen lezen, zie backfill_planning_stats)"""
+    
+    list_display = ['date', 'vehicle', 'patient_count', 'wheelchair_count', 'failed_geocoding_count', 'dirty', 'updated_at']
+    list_filter = ['dirty', 'vehicle']
+    date_hierarchy = 'date'
+    readonly_fields = ['date', 'vehicle', 'patient_count', 'wheelchair_count', 'failed_geocoding_count', 'updated_at']
+
+
+@admin.register(WizardStateEntry)
+class WizardStateEntryAdmin(admin.ModelAdmin):
+    """Admin interface voor de server-side wizard state (zie purge_wizard_state)"""
+    
+    list_display = ['state_id', 'section', 'size', 'updated_at']
+    list_filter = ['section']
+    search_fields = ['state_id']
+    exclude = ['payload']
+    readonly_fields = ['state_id', 'section', 'size', 'updated_at']
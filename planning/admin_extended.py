@@ -4,7 +4,7 @@ from django.urls import reverse
 from django.utils.safestring import mark_safe
 from .models_extended import (
     CSVImportLog, PlanningSession, PlanningAction, 
-    NotificationSettings, MobileAppNotification
+    NotificationSettings, MobileAppNotification, PlanningJob
 )
 
 
@@ -140,3 +140,39 @@ class MobileAppNotificationAdmin(admin.ModelAdmin):
     
     def get_queryset(self, request):
         return super().get_queryset(request).select_related('vehicle', 'driver', 'planning_session')
+
+
+@admin.register(PlanningJob)
+class PlanningJobAdmin(admin.ModelAdmin):
+    list_display = ['id', 'job_type', 'status', 'created_by', 'progress_current', 'progress_total', 'progress_message', 'created_at', 'finished_at']
+    list_filter = ['status', 'job_type', 'created_at']
+    search_fields = ['progress_message', 'error', 'worker_id']
+    readonly_fields = ['created_at', 'started_at', 'heartbeat_at', 'finished_at', 'worker_id', 'events', 'result', 'session_updates']
+    ordering = ['-created_at']
+    
+    fieldsets = (
+        ('Job Details', {
+            'fields': ('job_type', 'status', 'created_by', 'session_key', 'error')
+        }),
+        ('Voortgang', {
+            'fields': ('progress_current', 'progress_total', 'progress_message', 'events')
+        }),
+        ('Resultaat', {
+            'fields': ('result', 'session_updates', 'session_applied'),
+            'classes': ('collapse',)
+        }),
+        ('Worker', {
+            'fields': ('worker_id', 'created_at', 'started_at', 'heartbeat_at', 'finished_at')
+        }),
+    )
+    
+    actions = ['requeue_jobs']
+    
+    def requeue_jobs(self, request, queryset):
+        """Zet mislukte of vastgelopen jobs opnieuw in de wachtrij"""
+        count = queryset.exclude(status='completed').update(
+            status='queued', worker_id='', error='', events=[], progress_current=0,
+            started_at=None, heartbeat_at=None, finished_at=None
+        )
+        self.message_user(request, f'{count} jobs opnieuw in de wachtrij gezet')
+    requeue_jobs.short_description = "Opnieuw in de wachtrij zetten"
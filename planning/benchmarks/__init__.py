@@ -0,0 +1,13 @@
+"""
+Benchmarks voor de planning pipeline
+
+    python manage.py run_benchmarks --sizes 50,200,500,2000 --output benchmarks.json
+
+Elke run maakt een eigen test database aan met synthetische data (zie
+generator.py), zodat echte planningen niet aangeraakt worden. Het JSON
+resultaat bevat de commit, zodat runs over commits heen te vergelijken zijn.
+"""
+from .generator import SyntheticDataset, generate_dataset
+from .runner import BENCHMARKS, BenchmarkRunner
+
+__all__ = ['BENCHMARKS', 'BenchmarkRunner', 'SyntheticDataset', 'generate_dataset']
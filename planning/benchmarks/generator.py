@@ -0,0 +1,202 @@
+"""
+Synthetische vloot, tijdblokken en patiënten
+Deterministisch (vaste seed): dezelfde grootte levert bij elke run dezelfde
+adressen, coördinaten en tijden, zodat timings over commits vergelijkbaar zijn.
+
+Patiënten liggen normaal verdeeld rond het home depot (Location), met een
+staart naar de buitenrand van het werkgebied zoals bij echte ritten.
+"""
+import math
+import random
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+from django.db import transaction
+from django.utils import timezone
+
+from planning.models import DailyPlanningStats, Location, Patient, TimeSlot, Vehicle
+from planning.services.dashboard import DashboardSnapshot
+
+DEPOT = ('Reha Zentrum Bonn', 'Godesberger Allee 1, 53175 Bonn', 50.7100, 7.1300)
+
+PLAATSEN = [
+    ('53111', 'Bonn'), ('53173', 'Bonn'), ('53225', 'Bonn'), ('53757', 'Sankt Augustin'),
+    ('53840', 'Troisdorf'), ('53332', 'Bornheim'), ('53340', 'Meckenheim'), ('53604', 'Bad Honnef'),
+    ('53721', 'Siegburg'), ('50667', 'Köln'), ('53359', 'Rheinbach'), ('53489', 'Sinzig'),
+]
+STRATEN = ['Hauptstraße', 'Bahnhofstraße', 'Kirchweg', 'Gartenstraße', 'Schulstraße', 'Lindenallee',
+           'Rheinufer', 'Bergstraße', 'Mühlenweg', 'Am Markt', 'Waldstraße', 'Königstraße']
+ACHTERNAMEN = ['Müller', 'Schmidt', 'Schneider', 'Fischer', 'Weber', 'Meyer', 'Wagner', 'Becker',
+               'Schulz', 'Hoffmann', 'Koch', 'Richter', 'Klein', 'Wolf', 'Neumann', 'Schwarz']
+VOORNAMEN = ['Anna', 'Peter', 'Maria', 'Klaus', 'Ursula', 'Hans', 'Monika', 'Jürgen', 'Petra', 'Wolfgang']
+
+# Halen blokken vanaf 07:30, Brengen blokken vanaf 12:00, elk 30 minuten uit elkaar
+HALEN_START = time(7, 30)
+BRENGEN_START = time(12, 0)
+BLOCK_MINUTES = 30
+
+
+class SyntheticPatient:
+    """Eén gegenereerde patiënt, los van de database (voor CSV/SLK bestanden)"""
+
+    def __init__(self, index, rng, depot, day, spread_km):
+        self.patient_id = f"B{100000 + index}"
+        self.achternaam = rng.choice(ACHTERNAMEN)
+        self.voornaam = rng.choice(VOORNAMEN)
+        self.naam = f"{self.voornaam} {self.achternaam} {index}"
+        self.postcode, self.plaats = rng.choice(PLAATSEN)
+        self.straat = f"{rng.choice(STRATEN)} {index % 200 + 1}"
+        self.telefoon = f"0228{rng.randint(100000, 999999)}"
+
+        # Afstand tot het depot: normaal verdeeld, richting uniform
+        distance_km = min(abs(rng.gauss(0, spread_km / 2)), spread_km * 2)
+        bearing = rng.uniform(0, 2 * math.pi)
+        lat, lon = depot
+        self.latitude = lat + (distance_km / 111.0) * math.cos(bearing)
+        self.longitude = lon + (distance_km / (111.0 * math.cos(math.radians(lat)))) * math.sin(bearing)
+
+        start_minutes = 7 * 60 + 30 + rng.randrange(0, 4 * 60, 5)
+        duration = rng.choice([60, 90, 120, 150, 180, 240])
+        start = datetime.combine(day, time()) + timedelta(minutes=start_minutes)
+        self.ophaal_tijd = timezone.make_aware(start)
+        self.eind_behandel_tijd = timezone.make_aware(start + timedelta(minutes=duration))
+        self.rolstoel = rng.random() < 0.15
+
+    def csv_row(self, day):
+        return [
+            self.patient_id, self.achternaam, f"{self.voornaam} {self.naam.rsplit(' ', 1)[-1]}",
+            self.straat, self.postcode, self.plaats, self.telefoon, day.strftime('%d.%m.%Y'),
+            timezone.localtime(self.ophaal_tijd).strftime('%H:%M'),
+            timezone.localtime(self.eind_behandel_tijd).strftime('%H:%M'),
+        ]
+
+
+CSV_HEADER = ['Kundennummer', 'Nachname', 'Vorname', 'Straße', 'PLZ', 'Ort', 'Telefon', 'Datum', 'Erster Termin', 'Letzter Termin']
+
+
+class SyntheticDataset:
+    """
+    Gegenereerde planning dag
+
+        dataset = generate_dataset(patients=500, vehicles=12, timeslots=8)
+        dataset.csv_lines(), dataset.slk_lines(), dataset.save()
+    """
+
+    def __init__(self, patients=100, vehicles=None, timeslots=8, seed=42, day=None, spread_km=25):
+        self.size = patients
+        self.vehicle_count = vehicles or max(2, patients // 40)
+        self.timeslot_count = timeslots
+        self.seed = seed
+        self.day = day or timezone.localdate()
+        self.depot = (DEPOT[2], DEPOT[3])
+        rng = random.Random(seed)
+        self.patients = [SyntheticPatient(i, rng, self.depot, self.day, spread_km) for i in range(patients)]
+
+    # ------------------------------------------------------------------
+    # Bestanden
+    # ------------------------------------------------------------------
+
+    def csv_lines(self, delimiter=';'):
+        yield f"Fahrdliste {self.day.strftime('%d.%m.%Y')}"
+        yield delimiter.join(CSV_HEADER)
+        for patient in self.patients:
+            yield delimiter.join(patient.csv_row(self.day))
+
+    def csv_bytes(self, delimiter=';'):
+        return ('\r\n'.join(self.csv_lines(delimiter)) + '\r\n').encode('cp1252', errors='replace')
+
+    def slk_lines(self):
+        """Zelfde tabel als SYLK (Excel export), één C record per cel"""
+        yield 'ID;PWXL;N;E'
+        rows = [[f"Fahrdliste {self.day.strftime('%d.%m.%Y')}"], CSV_HEADER]
+        rows.extend(patient.csv_row(self.day) for patient in self.patients)
+        for y, row in enumerate(rows, start=1):
+            for x, value in enumerate(row, start=1):
+                escaped = str(value).replace(';', ';;')
+                yield f'C;Y{y};X{x};K"{escaped}"'
+        yield 'E'
+
+    def slk_bytes(self):
+        return ('\r\n'.join(self.slk_lines()) + '\r\n').encode('cp1252', errors='replace')
+
+    # ------------------------------------------------------------------
+    # Database
+    # ------------------------------------------------------------------
+
+    @transaction.atomic
+    def save(self, geocoded=True):
+        """
+        Depot, voertuigen, tijdblokken en patiënten in de database zetten
+        Bestaande patiënten, voertuigen en tijdblokken worden eerst verwijderd
+        (alleen bedoeld voor de benchmark database).
+        """
+        Patient.objects.all().delete()
+        Vehicle.objects.all().delete()
+        TimeSlot.objects.all().delete()
+
+        name, address, lat, lon = DEPOT
+        Location.objects.update_or_create(
+            location_type='home', is_default=True,
+            defaults={'name': name, 'address': address, 'is_active': True,
+                      'latitude': Decimal(str(lat)), 'longitude': Decimal(str(lon))},
+        )
+
+        Vehicle.objects.bulk_create([
+            Vehicle(
+                referentie=f"BENCH-{i + 1:03d}",
+                kenteken=f"BN-RM {100 + i}",
+                merk_model='VW Crafter',
+                aantal_zitplaatsen=7,
+                speciale_zitplaatsen=2 if i % 3 == 0 else 0,
+                km_kosten_per_km=Decimal('0.29'),
+                maximale_rit_tijd=3600,
+                status='beschikbaar',
+            )
+            for i in range(self.vehicle_count)
+        ])
+
+        timeslots = []
+        per_type = max(1, self.timeslot_count // 2)
+        for tijdblok_type, start in (('halen', HALEN_START), ('brengen', BRENGEN_START)):
+            for i in range(per_type):
+                moment = (datetime.combine(self.day, start) + timedelta(minutes=i * BLOCK_MINUTES)).time()
+                timeslots.append(TimeSlot(
+                    naam=f"{tijdblok_type.capitalize()} {moment.strftime('%H:%M')}",
+                    tijdblok_type=tijdblok_type,
+                    aankomst_tijd=moment,
+                    actief=True,
+                    default_selected=True,
+                ))
+        TimeSlot.objects.bulk_create(timeslots)
+
+        Patient.objects.bulk_create([
+            Patient(
+                naam=patient.naam,
+                telefoonnummer=patient.telefoon,
+                straat=patient.straat,
+                postcode=patient.postcode,
+                plaats=patient.plaats,
+                latitude=patient.latitude if geocoded else None,
+                longitude=patient.longitude if geocoded else None,
+                geocoding_status='success' if geocoded else 'pending',
+                ophaal_tijd=patient.ophaal_tijd,
+                eind_behandel_tijd=patient.eind_behandel_tijd,
+                bestemming=name,
+                rolstoel=patient.rolstoel,
+                status='nieuw',
+                natural_key=Patient.make_natural_key(patient.naam, patient.straat, patient.postcode, patient.plaats),
+            )
+            for patient in self.patients
+        ], batch_size=500)
+        # bulk_create stuurt geen signals
+        DailyPlanningStats.mark_dirty({self.day})
+        DashboardSnapshot.invalidate()
+        return self
+
+
+def generate_dataset(patients=100, vehicles=None, timeslots=8, seed=42, day=None, save=False):
+    """Maak een SyntheticDataset en zet hem optioneel direct in de database"""
+    dataset = SyntheticDataset(patients=patients, vehicles=vehicles, timeslots=timeslots, seed=seed, day=day)
+    if save:
+        dataset.save()
+    return dataset
@@ -0,0 +1,285 @@
+"""
+Benchmark cases en runner
+Elke case krijgt een BenchmarkContext (dataset, stub servers, test client) en
+geeft optioneel extra metrics terug. `setup` draait voor elke herhaling en telt
+niet mee in de tijd; queries worden per herhaling geteld.
+"""
+import contextlib
+import io
+import logging
+import platform
+import statistics
+import subprocess
+import time
+from pathlib import Path
+
+import django
+from django.conf import settings
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from planning.models import GeocodeCacheEntry, Patient, TimeSlot, Vehicle
+from planning.services.dashboard import DashboardSnapshot
+from .generator import generate_dataset
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SIZES = (50, 200, 500, 2000)
+
+# name -> (functie, setup)
+BENCHMARKS = {}
+
+
+def benchmark(name, setup=None):
+    def register(func):
+        BENCHMARKS[name] = (func, setup)
+        return func
+    return register
+
+
+class BenchmarkContext:
+    """Gedeelde objecten voor alle cases van één dataset grootte"""
+
+    def __init__(self, dataset):
+        self.dataset = dataset
+        self._stub = None
+        self._client = None
+
+    @property
+    def stub(self):
+        if self._stub is None:
+            from planning.services.geocoding_stub import GeocodingStubServer
+            self._stub = GeocodingStubServer().start()
+        return self._stub
+
+    @property
+    def client(self):
+        if self._client is None:
+            from django.contrib.auth.models import User
+            from django.test import Client
+            user, _ = User.objects.get_or_create(username='benchmark', defaults={'is_staff': True, 'is_superuser': True})
+            self._client = Client()
+            self._client.force_login(user)
+        return self._client
+
+    def patients(self):
+        return Patient.objects.filter(ophaal_tijd__date=self.dataset.day)
+
+    def close(self):
+        if self._stub is not None:
+            self._stub.stop()
+            self._stub = None
+
+
+# ----------------------------------------------------------------------
+# Setup stappen
+# ----------------------------------------------------------------------
+
+def assign_timeslots(context):
+    from planning.services.timeslot_index import TimeslotIndex
+    index = TimeslotIndex.for_active()
+    index.save(index.assign(context.patients(), skip_assigned=False))
+
+
+def forget_coordinates(context):
+    context.patients().update(latitude=None, longitude=None, geocoding_status='pending')
+    GeocodeCacheEntry.objects.all().delete()
+
+
+def invalidate_dashboard(context):
+    DashboardSnapshot.invalidate()
+
+
+# ----------------------------------------------------------------------
+# Cases
+# ----------------------------------------------------------------------
+
+def _ingest(data, filename):
+    from planning.ingest import IngestPipeline
+    result = IngestPipeline(io.BytesIO(data), filename=filename, keep_rows=0).run()
+    return {'rows': result.row_count, 'valid': len(result.valid_records),
+            'stages': {timing['stage']: timing['seconds'] for timing in result.timings}}
+
+
+@benchmark('parse_csv')
+def parse_csv(context):
+    return _ingest(context.dataset.csv_bytes(), 'benchmark.csv')
+
+
+@benchmark('parse_slk')
+def parse_slk(context):
+    return _ingest(context.dataset.slk_bytes(), 'benchmark.slk')
+
+
+@benchmark('assign_timeslots')
+def timeslot_assignment(context):
+    from planning.services.timeslot_index import TimeslotIndex
+    index = TimeslotIndex.for_active()
+    assignments = index.assign(context.patients(), skip_assigned=False)
+    index.save(assignments)
+    return {'assigned': len(assignments)}
+
+
+@benchmark('geocode_stub', setup=forget_coordinates)
+def geocode_stub(context):
+    from planning.services.bulk_geocoding import BulkGeocoder, NominatimProvider
+    provider = NominatimProvider(base_url=context.stub.nominatim_url, rate=1000, max_concurrency=8)
+    geocoded, failed = BulkGeocoder(providers=[provider]).geocode_patients(list(context.patients()))
+    return {'geocoded': geocoded, 'failed': failed}
+
+
+@benchmark('plan_simple_routes', setup=assign_timeslots)
+def plan_simple_routes(context):
+    from planning.services.simple_router import SimpleRouteService
+    patients = context.patients().select_related('halen_tijdblok', 'bringen_tijdblok')
+    routes = SimpleRouteService().plan_simple_routes(Vehicle.objects.filter(status='beschikbaar'), patients)
+    return {'routes': len(routes)}
+
+
+@benchmark('google_fallback', setup=assign_timeslots)
+def google_fallback(context):
+    from planning.services.google_maps import GoogleMapsService
+    timeslot_assignments = {}
+    for patient in context.patients().select_related('halen_tijdblok'):
+        if patient.halen_tijdblok_id:
+            timeslot_assignments.setdefault(patient.halen_tijdblok_id, []).append(patient)
+    # Direct de fallback: een geconfigureerde API key mag hier geen echte calls doen
+    routes = GoogleMapsService()._fallback_optimization(timeslot_assignments, list(Vehicle.objects.all()))
+    return {'routes': sum(timeslot['vehicle_count'] for timeslot in routes.values())}
+
+
+def _get(context, url):
+    response = context.client.get(url)
+    if response.status_code != 200:
+        raise RuntimeError(f"{url} gaf HTTP {response.status_code}")
+    return {'bytes': len(response.content)}
+
+
+@benchmark('dashboard_view', setup=invalidate_dashboard)
+def dashboard_view(context):
+    return _get(context, '/dashboard/')
+
+
+@benchmark('statistics_view', setup=invalidate_dashboard)
+def statistics_view(context):
+    return _get(context, '/statistics/')
+
+
+# ----------------------------------------------------------------------
+# Runner
+# ----------------------------------------------------------------------
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=settings.BASE_DIR,
+            capture_output=True, text=True, timeout=5,
+        ).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+class BenchmarkRunner:
+    """
+    Draai benchmarks voor meerdere dataset groottes
+
+        runner = BenchmarkRunner(sizes=[50, 500], repeat=3)
+        report = runner.run()
+        runner.write(report, 'benchmarks.json')
+
+    Verwacht een lege (test) database: generate_dataset().save() verwijdert
+    bestaande patiënten, voertuigen en tijdblokken.
+    """
+
+    def __init__(self, sizes=DEFAULT_SIZES, repeat=3, only=None, seed=42, quiet=True):
+        self.sizes = list(sizes)
+        self.repeat = repeat
+        self.names = [name for name in BENCHMARKS if not only or name in only]
+        self.seed = seed
+        self.quiet = quiet
+
+    @contextlib.contextmanager
+    def _silenced(self):
+        """Views en services printen en loggen veel; de tijd telt mee, de uitvoer niet"""
+        if not self.quiet:
+            yield
+            return
+        logging.disable(logging.WARNING)
+        try:
+            with contextlib.redirect_stdout(io.StringIO()):
+                yield
+        finally:
+            logging.disable(logging.NOTSET)
+
+    def _measure(self, context, name):
+        func, setup = BENCHMARKS[name]
+        runs, queries, metrics = [], [], {}
+        for _ in range(self.repeat):
+            if setup:
+                setup(context)
+            with CaptureQueriesContext(connection) as captured:
+                started = time.perf_counter()
+                metrics = func(context) or {}
+                runs.append(time.perf_counter() - started)
+            queries.append(len(captured))
+        return {
+            'benchmark': name,
+            'size': context.dataset.size,
+            'vehicles': context.dataset.vehicle_count,
+            'timeslots': TimeSlot.objects.count(),
+            'runs': [round(seconds, 5) for seconds in runs],
+            'min_seconds': round(min(runs), 5),
+            'median_seconds': round(statistics.median(runs), 5),
+            'queries': max(queries),
+            'metrics': metrics,
+        }
+
+    def run(self, progress=None):
+        report = {
+            'meta': {
+                'commit': git_commit(),
+                'started_at': timezone.now().isoformat(),
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'database': connection.vendor,
+                'repeat': self.repeat,
+                'seed': self.seed,
+                'sizes': self.sizes,
+            },
+            'results': [],
+        }
+        for size in self.sizes:
+            dataset = generate_dataset(patients=size, seed=self.seed)
+            dataset.save()
+            context = BenchmarkContext(dataset)
+            try:
+                for name in self.names:
+                    with self._silenced():
+                        result = self._measure(context, name)
+                    report['results'].append(result)
+                    if progress:
+                        progress(result)
+            finally:
+                context.close()
+        return report
+
+    @staticmethod
+    def write(report, path):
+        import json
+        Path(path).write_text(json.dumps(report, indent=2, default=str), encoding='utf-8')
+
+
+def compare(previous, current):
+    """
+    Vergelijk twee rapporten: (benchmark, size, oud, nieuw, factor) per gedeelde case
+    factor > 1 betekent langzamer dan de vorige run
+    """
+    old = {(row['benchmark'], row['size']): row for row in previous.get('results', [])}
+    rows = []
+    for row in current.get('results', []):
+        before = old.get((row['benchmark'], row['size']))
+        if before and before['median_seconds']:
+            rows.append((row['benchmark'], row['size'], before['median_seconds'], row['median_seconds'],
+                         round(row['median_seconds'] / before['median_seconds'], 2)))
+    return rows
@@ -1,13 +1,13 @@
 """
 Cache Manager voor patiënten data om geocoding te hergebruiken
 """
-import hashlib
-import json
-from datetime import datetime, timedelta
+import logging
+from datetime import datetime
 from django.core.cache import cache
-from django.conf import settings
 from .models import Patient
 
+logger = logging.getLogger(__name__)
+
 class PatientCacheManager:
     """
     Slimme cache manager voor patiënten data
@@ -17,13 +17,27 @@ class PatientCacheManager:
     CACHE_PREFIX = "patient_cache"
     CACHE_TTL = 30 * 24 * 60 * 60  # 30 dagen in seconden
     
+    # Vaste Meditec kolommen voor aanroepen zonder detectie resultaat
+    LEGACY_MAPPING = {
+        'patient_id': 1,
+        'achternaam': 2,
+        'voornaam': 3,
+        'adres': 6,
+        'plaats': 8,
+        'postcode': 9,
+        'telefoon1': 10,
+        'telefoon2': 11,
+        'start_tijd': 19,
+        'eind_tijd': 20,
+    }
+    
     @staticmethod
     def generate_patient_hash(naam, straat, postcode, plaats):
         """
         Genereer unieke hash voor patiënt op basis van naam + adres
+        Zelfde waarde als Patient.natural_key
         """
-        patient_data = f"{naam.lower()}|{straat.lower()}|{postcode.lower()}|{plaats.lower()}"
-        return hashlib.md5(patient_data.encode('utf-8')).hexdigest()
+        return Patient.make_natural_key(naam, straat, postcode, plaats)
     
     @staticmethod
     def get_cache_key(patient_hash):
@@ -60,47 +74,21 @@ class PatientCacheManager:
                                        ophaal_tijd, eind_behandel_tijd, 
                                        bestemming="Routemeister Transport"):
         """
-        Haal patiënt op uit cache of maak nieuwe aan
-        Behoudt geocoding en andere data
+        Haal patiënt op via de natural_key of maak nieuwe aan
+        Behoudt geocoding en andere data. Voor een heel bestand: bulk_update_patients_from_csv.
         """
-        # Genereer hash voor patiënt
         patient_hash = PatientCacheManager.generate_patient_hash(naam, straat, postcode, plaats)
+        existing_patient = Patient.objects.filter(natural_key=patient_hash).order_by('-id').first()
         
-        # Probeer uit cache te halen
-        cached_data = PatientCacheManager.get_cached_patient(patient_hash)
-        
-        if cached_data:
-            # Patiënt gevonden in cache - update alleen tijden
-            print(f"🔄 Patiënt gevonden in cache: {naam}")
-            
-            try:
-                # Zoek bestaande patiënt in database
-                existing_patient = Patient.objects.get(
-                    naam=naam,
-                    straat=straat,
-                    postcode=postcode,
-                    plaats=plaats
-                )
-                
-                # Update alleen de tijden
-                existing_patient.ophaal_tijd = ophaal_tijd
-                existing_patient.eind_behandel_tijd = eind_behandel_tijd
-                existing_patient.telefoonnummer = telefoon
-                existing_patient.bestemming = bestemming
-                existing_patient.save()
-                
-                print(f"   ✅ Tijden bijgewerkt voor bestaande patiënt")
-                return existing_patient, False  # False = niet nieuw aangemaakt
-                
-            except Patient.DoesNotExist:
-                # Patiënt bestaat niet meer in database, maak nieuwe aan
-                print(f"   ⚠️  Patiënt niet meer in database, maak nieuwe aan")
-                pass
+        if existing_patient:
+            # Update alleen de tijden
+            existing_patient.ophaal_tijd = ophaal_tijd
+            existing_patient.eind_behandel_tijd = eind_behandel_tijd
+            existing_patient.telefoonnummer = telefoon
+            existing_patient.bestemming = bestemming
+            existing_patient.save(update_fields=['ophaal_tijd', 'eind_behandel_tijd', 'telefoonnummer', 'bestemming', 'bijgewerkt_op'])
+            return existing_patient, False  # False = niet nieuw aangemaakt
         
-        # Patiënt niet in cache of niet gevonden - maak nieuwe aan
-        print(f"🆕 Nieuwe patiënt: {naam}")
-        
-        # Maak nieuwe patiënt aan
         new_patient = Patient.objects.create(
             naam=naam,
             straat=straat,
@@ -112,121 +100,37 @@ class PatientCacheManager:
             bestemming=bestemming,
             status='nieuw'
         )
-        
-        # Cache de nieuwe patiënt data
-        cache_data = {
-            'id': new_patient.id,
-            'naam': naam,
-            'straat': straat,
-            'postcode': postcode,
-            'plaats': plaats,
-            'telefoonnummer': telefoon,
-            'created_at': datetime.now().isoformat(),
-            'cached': True
-        }
-        
-        PatientCacheManager.cache_patient(patient_hash, cache_data)
-        
-        # Start geocoding voor nieuwe patiënt
-        print(f"   🗺️  Start geocoding voor nieuwe patiënt...")
-        # Hier zou je de geocoding logica kunnen toevoegen
-        
         return new_patient, True  # True = nieuw aangemaakt
     
     @staticmethod
     def bulk_update_patients_from_csv(csv_data, detection_result):
         """
-        Bulk update patiënten uit CSV met caching
+        Bulk upsert van patiënten uit CSV rijen
+        Natural keys voor het hele bestand, één lookup query en bulk_create/bulk_update
+        in één transactie (zie planning/ingest/persist.py).
         """
-        mappings = detection_result.get('mappings', {})
-        patients_created = 0
-        patients_updated = 0
-        patients_cached = 0
+        from .ingest.persist import save_patient_records
+        from .ingest.records import RowMapper
         
-        print(f"🚀 Start bulk update met caching voor {len(csv_data)} rijen")
+        mappings = detection_result.get('mappings') or PatientCacheManager.LEGACY_MAPPING
+        mapper = RowMapper(mappings, default_date=datetime.now().date())
         
+        records = []
         for row_index, row in enumerate(csv_data):
-            try:
-                if not row.get('data'):
-                    continue
-                
-                data = row['data']
-                
-                # Extraheer patiënt informatie (gebruik hardcoded kolom mapping zoals in views.py)
-                patient_id = data[1]          # Kolom B
-                achternaam = data[2]          # Kolom C
-                voornaam = data[3]            # Kolom D
-                straat = data[6]              # Kolom G
-                plaats = data[8]              # Kolom I
-                postcode = data[9]            # Kolom J
-                telefoon1 = data[10]          # Kolom K
-                telefoon2 = data[11]          # Kolom L
-                ophaal_tijd = data[19] if len(data) > 19 else "0800"   # Kolom 19 (ophaal tijd)
-                eind_behandel_tijd = data[20] if len(data) > 20 else "1600"  # Kolom 20 (eind tijd)
-                
-                # Skip lege rijen
-                if not patient_id or not voornaam:
-                    continue
-                
-                telefoon = telefoon1 if telefoon1 else telefoon2
-                
-                # Combineer voor- en achternaam
-                volledige_naam = f"{voornaam} {achternaam}".strip()
-                
-                if not volledige_naam or not ophaal_tijd:
-                    continue
-                
-                # Parse tijden
-                start_uur, start_minuut = PatientCacheManager.parse_time_string(ophaal_tijd, "08", "00")
-                eind_uur, eind_minuut = PatientCacheManager.parse_time_string(eind_behandel_tijd, "16", "00")
-                
-                # Maak datetime objecten
-                today = datetime.now().date()
-                ophaal_datetime = datetime(
-                    year=today.year,
-                    month=today.month,
-                    day=today.day,
-                    hour=int(start_uur),
-                    minute=int(start_minuut)
-                )
-                
-                eind_datetime = datetime(
-                    year=today.year,
-                    month=today.month,
-                    day=today.day,
-                    hour=int(eind_uur),
-                    minute=int(eind_minuut)
-                )
-                
-                # Gebruik cache manager
-                patient, is_new = PatientCacheManager.get_or_create_patient_with_cache(
-                    volledige_naam, straat, postcode, plaats, telefoon,
-                    ophaal_datetime, eind_datetime
-                )
-                
-                if is_new:
-                    patients_created += 1
-                else:
-                    patients_updated += 1
-                
-                # Controleer of patiënt uit cache kwam
-                patient_hash = PatientCacheManager.generate_patient_hash(volledige_naam, straat, postcode, plaats)
-                if PatientCacheManager.is_patient_cached(patient_hash):
-                    patients_cached += 1
-                
-            except Exception as e:
-                print(f"❌ Fout bij rij {row_index + 1}: {e}")
+            if not row.get('data'):
                 continue
+            record = mapper.map({'data': row['data'], 'line_number': row.get('row_index', row_index) + 1})
+            if record.validate():
+                records.append(record)
         
-        print(f"🎯 Bulk update voltooid!")
-        print(f"✅ Nieuwe patiënten: {patients_created}")
-        print(f"🔄 Bijgewerkte patiënten: {patients_updated}")
-        print(f"💾 Uit cache: {patients_cached}")
+        saved = save_patient_records(records)
+        logger.info(f"Bulk update: {saved['created']} nieuw, {saved['updated']} bijgewerkt uit {len(csv_data)} rijen")
         
         return {
-            'created': patients_created,
-            'updated': patients_updated,
-            'cached': patients_cached
+            'created': saved['created'],
+            'updated': saved['updated'],
+            # Bestaande patiënten waarvan geocoding en overige data hergebruikt is
+            'cached': saved['updated']
         }
     
     @staticmethod
@@ -0,0 +1,13 @@
+"""
+Import van patiënt bestanden (CSV en SLK)
+
+    from planning.ingest import IngestPipeline
+
+    result = IngestPipeline(uploaded_file).run(persist=True)
+    result.records, result.validation_result(), result.timing_report()
+"""
+from .detection import detect_format
+from .pipeline import IngestPipeline, IngestResult
+from .records import PatientRecord
+
+__all__ = ['IngestPipeline', 'IngestResult', 'PatientRecord', 'detect_format']
@@ -0,0 +1,94 @@
+"""
+Decoderen van geüploade bestanden
+De eerste regels worden gebufferd om de charset te bepalen; daarna wordt het
+bestand in dezelfde doorgang regel voor regel gedecodeerd.
+"""
+import codecs
+import logging
+from itertools import chain
+
+logger = logging.getLogger(__name__)
+
+SNIFF_BYTES = 64 * 1024
+
+# Meditec en Excel exports zijn utf-8 of Windows-1252
+FALLBACK_ENCODING = 'cp1252'
+
+
+def sniff_encoding(head):
+    """
+    Charset van een bestand op basis van de eerste bytes
+
+    Returns:
+        'utf-8-sig', 'utf-8' of FALLBACK_ENCODING
+    """
+    if head.startswith(codecs.BOM_UTF8):
+        return 'utf-8-sig'
+    decoder = codecs.getincrementaldecoder('utf-8')()
+    try:
+        # final=False: een afgekapt multibyte teken aan het eind is geen fout
+        decoder.decode(head, final=False)
+    except UnicodeDecodeError:
+        return FALLBACK_ENCODING
+    return 'utf-8'
+
+
+def _decode(line, encoding):
+    try:
+        return line.decode(encoding)
+    except UnicodeDecodeError:
+        # Losse afwijkende regel (bijv. ongeldig cp1252 byte): latin-1 kan alles decoderen
+        return line.decode('latin-1')
+
+
+class DecodedLines:
+    """
+    Iterator over de gedecodeerde regels van een bestand
+
+        lines = DecodedLines(uploaded_file)
+        lines.encoding      # bepaald bij het aanmaken
+        lines.head          # gebufferde eerste regels (str), voor sniffing
+        for line in lines: ...
+
+    Args:
+        source: file-achtig object of iterable van bytes regels
+        keep_text: bewaar de volledige tekst (voor het import log)
+    """
+
+    def __init__(self, source, keep_text=False):
+        if hasattr(source, 'seek'):
+            source.seek(0)
+        self._lines = iter(source)
+        self._buffer = []
+        size = 0
+        for line in self._lines:
+            self._buffer.append(line)
+            size += len(line)
+            if size >= SNIFF_BYTES:
+                break
+
+        raw_head = b''.join(line for line in self._buffer if isinstance(line, bytes))
+        self.encoding = sniff_encoding(raw_head) if raw_head else 'utf-8'
+        self.head = [self._to_text(line, first=(i == 0)) for i, line in enumerate(self._buffer)]
+        self.line_count = 0
+        self._text = [] if keep_text else None
+
+    def _to_text(self, line, first=False):
+        if isinstance(line, str):
+            return line
+        if first and self.encoding == 'utf-8-sig':
+            return _decode(line, 'utf-8-sig')
+        return _decode(line, 'utf-8' if self.encoding == 'utf-8-sig' else self.encoding)
+
+    def __iter__(self):
+        rest = (self._to_text(line) for line in self._lines)
+        for line in chain(self.head, rest):
+            self.line_count += 1
+            if self._text is not None:
+                self._text.append(line)
+            yield line
+
+    @property
+    def text(self):
+        """Volledige tekst (alleen met keep_text=True, na het doorlopen)"""
+        return ''.join(self._text) if self._text is not None else ''
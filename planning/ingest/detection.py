@@ -0,0 +1,133 @@
+"""
+Formaat detectie tegen CSVParserConfig
+Volgorde:
+    1. actieve config waarvan het bestandsnaam patroon past (hoogste prioriteit)
+    2. kolomkoppen van het bestand, vertaald via HEADER_FIELDS
+    3. standaard positie mapping voor bestanden zonder kolomkoppen
+De config met de hoogste test_detectie() score levert in geval 2 en 3 de naam.
+"""
+import logging
+import re
+
+from planning.models import CSVParserConfig
+
+logger = logging.getLogger(__name__)
+
+# Kolomkop (lowercase, zonder spaties rondom) -> veld
+HEADER_FIELDS = {
+    'patient_id': ('patient_id', 'patiënt id', 'patient id', 'patientnummer', 'fallnummer', 'kunde', 'kundennummer', 'id'),
+    'achternaam': ('achternaam', 'nachname', 'name'),
+    'voornaam': ('voornaam', 'vorname'),
+    'naam': ('naam', 'volledige naam'),
+    'adres': ('adres', 'straat', 'strasse', 'straße', 'address', 'street'),
+    'postcode': ('postcode', 'plz', 'zip'),
+    'plaats': ('plaats', 'ort', 'stadt', 'woonplaats', 'city'),
+    'telefoon1': ('telefoon', 'telefoon1', 'telefon', 'phone'),
+    'telefoon2': ('telefoon2', 'mobiel', 'mobil', 'handy'),
+    'datum': ('datum', 'afspraak datum', 'termin datum', 'date'),
+    'start_tijd': ('start_tijd', 'start tijd', 'ophaal_tijd', 'ophaaltijd', 'erster termin', 'start zeit', 'eerste behandeling'),
+    'eind_tijd': ('eind_tijd', 'eind tijd', 'letzter termin', 'ende zeit', 'laatste behandeling'),
+}
+_HEADER_LOOKUP = {alias: field for field, aliases in HEADER_FIELDS.items() for alias in aliases}
+
+# Bestanden zonder kolomkoppen en zonder passende config
+DEFAULT_MAPPING = {
+    'patient_id': 0,
+    'naam': 1,
+    'voornaam': 2,
+    'adres': 3,
+    'plaats': 4,
+    'postcode': 5,
+    'telefoon1': 7,
+    'telefoon2': 8,
+    'datum': 9,
+    'start_tijd': 10,
+    'eind_tijd': 11,
+}
+
+
+def mapping_from_header(header_row):
+    """Veld -> kolom index voor herkende kolomkoppen (eerste treffer per veld)"""
+    mappings = {}
+    for index, column in enumerate(header_row):
+        field = _HEADER_LOOKUP.get(str(column).strip().lower())
+        if field and field not in mappings:
+            mappings[field] = index
+    return mappings
+
+
+def mapping_warnings(mappings):
+    warnings = []
+    if 'patient_id' not in mappings:
+        warnings.append('Patient ID kolom niet geconfigureerd')
+    if 'naam' not in mappings and 'achternaam' not in mappings:
+        warnings.append('Naam kolom niet geconfigureerd')
+    if 'start_tijd' not in mappings and 'ophaal_tijd' not in mappings:
+        warnings.append('Tijd kolom niet geconfigureerd')
+    return warnings
+
+
+def _filename_matches(config, filename):
+    try:
+        return bool(re.search(config.bestandsnaam_patroon, filename, re.IGNORECASE))
+    except re.error:
+        logger.warning(f"Ongeldig bestandsnaam patroon in parser config '{config.naam}'")
+        return False
+
+
+def detect_format(filename, header_row=None, configs=None):
+    """
+    Bepaal formaat en kolom mapping
+
+    Args:
+        filename: naam van het geüploade bestand
+        header_row: kolomkoppen (of None)
+        configs: actieve CSVParserConfig objecten (standaard uit de database)
+
+    Returns:
+        dict met detected_format, confidence, warnings, suggestions, config_id
+        en mappings (zelfde vorm als de oude auto_detect_csv_mapping_simple)
+    """
+    filename = filename or ''
+    if configs is None:
+        configs = list(CSVParserConfig.objects.filter(actief=True).order_by('-prioriteit'))
+
+    for config in configs:
+        if config.bestandsnaam_patroon and _filename_matches(config, filename):
+            mappings = config.get_kolom_mapping()
+            return {
+                'detected_format': config.naam,
+                'confidence': 90,
+                'warnings': mapping_warnings(mappings),
+                'suggestions': [],
+                'config_id': config.id,
+                'mappings': mappings,
+            }
+
+    # Geen bestandsnaam match: naam van de best passende config op kolomkoppen
+    best_config, best_score = None, 0
+    for config in configs:
+        score = config.test_detectie(filename, header_row or [])
+        if score > best_score:
+            best_config, best_score = config, score
+
+    suggestions = []
+    if header_row:
+        mappings = mapping_from_header(header_row)
+        confidence = min(100, 20 + 10 * len(mappings))
+        warnings = mapping_warnings(mappings)
+    else:
+        mappings = dict(DEFAULT_MAPPING)
+        confidence = 70
+        warnings = ['Geen headers gevonden, gebruik standaard kolom mapping']
+    if best_config is None:
+        suggestions.append('Maak een parser configuratie aan voor dit bestandsformaat')
+
+    return {
+        'detected_format': best_config.naam if best_config else 'Generic CSV',
+        'confidence': confidence,
+        'warnings': warnings,
+        'suggestions': suggestions,
+        'config_id': None,
+        'mappings': mappings,
+    }
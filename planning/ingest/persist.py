@@ -0,0 +1,117 @@
+"""
+Bulk opslag van geïmporteerde patiënten
+Bestaande patiënten (zelfde naam en adres, via de geïndexeerde natural_key)
+worden hergebruikt zodat geocoding en andere gegevens behouden blijven; alleen
+tijden en telefoon worden bijgewerkt.
+
+Queries per import, los van het aantal rijen: één natural_key__in lookup
+(per 500 sleutels), bulk_create, bulk_update en de statistieken markering.
+Met replace_existing komen daar één pk lookup en een delete per 500 pks bij.
+"""
+import logging
+
+from django.db import transaction
+
+from planning.models import DailyPlanningStats, Patient
+from planning.services.dashboard import DashboardSnapshot
+from .records import DEFAULT_BESTEMMING
+
+logger = logging.getLogger(__name__)
+
+UPDATE_FIELDS = ['ophaal_tijd', 'eind_behandel_tijd', 'telefoonnummer', 'bestemming']
+
+# SQLite staat maximaal 999 parameters per query toe
+LOOKUP_BATCH = 500
+
+
+def save_patient_records(records, bestemming=DEFAULT_BESTEMMING, replace_existing=False, batch_size=500):
+    """
+    Sla geldige records op met één lookup query, bulk_create en bulk_update
+
+    Args:
+        replace_existing: verwijder patiënten op de dagen uit het bestand die niet
+                          meer in het bestand staan (een nieuwe dagplanning vervangt
+                          de oude; patiënten die blijven houden hun geocoding)
+
+    Returns:
+        {'created': n, 'updated': n, 'deleted': n}
+    """
+    records = [record for record in records if record.is_valid]
+    if not records:
+        return {'created': 0, 'updated': 0, 'deleted': 0}
+
+    dates = {record.datum for record in records}
+    with transaction.atomic():
+        same_day = set()
+        if replace_existing:
+            same_day = set(Patient.objects.filter(ophaal_tijd__date__in=dates).values_list('pk', flat=True))
+        saved, kept, dirty_dates = _upsert(records, bestemming, batch_size)
+        deleted = _delete_without_signals(same_day - kept)
+        # bulk operaties sturen geen signals: rollup en dashboard één keer bijwerken
+        DailyPlanningStats.mark_dirty(dirty_dates | dates)
+    DashboardSnapshot.invalidate()
+
+    saved['deleted'] = deleted
+    logger.info(f"Import opgeslagen: {saved['created']} nieuw, {saved['updated']} bijgewerkt, {deleted} vervangen")
+    return saved
+
+
+def _delete_without_signals(pks):
+    """
+    Verwijder patiënten per batch zonder post_delete signals per rij
+    (niets verwijst naar Patient, dus er is geen cascade nodig)
+    """
+    pks = sorted(pks)
+    deleted = 0
+    for start in range(0, len(pks), LOOKUP_BATCH):
+        queryset = Patient.objects.filter(pk__in=pks[start:start + LOOKUP_BATCH])
+        deleted += queryset._raw_delete(queryset.db)
+    return deleted
+
+
+def existing_by_natural_key(keys):
+    """natural_key -> Patient; bij dubbele patiënten wint de meest recente"""
+    keys = list(keys)
+    existing = {}
+    for start in range(0, len(keys), LOOKUP_BATCH):
+        chunk = keys[start:start + LOOKUP_BATCH]
+        for patient in Patient.objects.filter(natural_key__in=chunk).order_by('id'):
+            existing[patient.natural_key] = patient
+    return existing
+
+
+def _upsert(records, bestemming, batch_size):
+    keyed = [
+        (Patient.make_natural_key(record.naam, record.straat, record.postcode, record.plaats), record)
+        for record in records
+    ]
+    existing = existing_by_natural_key({key for key, _ in keyed})
+
+    to_create, to_update = [], {}
+    dirty_dates = set()
+    for key, record in keyed:
+        patient = existing.get(key)
+        if patient is None:
+            patient = Patient(
+                naam=record.naam,
+                straat=record.straat,
+                postcode=record.postcode,
+                plaats=record.plaats,
+                natural_key=key,
+                status='nieuw',
+            )
+            to_create.append(patient)
+            existing[key] = patient
+        elif patient.pk is not None and patient.pk not in to_update:
+            dirty_dates.add(DailyPlanningStats.date_for(patient.ophaal_tijd))
+            to_update[patient.pk] = patient
+
+        patient.telefoonnummer = record.telefoon
+        patient.ophaal_tijd = record.ophaal_tijd
+        patient.eind_behandel_tijd = record.eind_behandel_tijd
+        patient.bestemming = bestemming
+        dirty_dates.add(record.datum)
+
+    Patient.objects.bulk_create(to_create, batch_size=batch_size)
+    Patient.objects.bulk_update(list(to_update.values()), UPDATE_FIELDS, batch_size=batch_size)
+    return {'created': len(to_create), 'updated': len(to_update)}, set(to_update), dirty_dates
@@ -0,0 +1,212 @@
+"""
+Eén doorgang import pipeline
+decode -> parse (CSV/SLK) -> detect -> map -> validate -> persist
+
+Het bestand wordt precies één keer gelezen: rijen stromen door de stappen en
+alleen de kolomkoppen worden vooruit gelezen om het formaat te bepalen.
+Per stap wordt de (exclusieve) tijd bijgehouden voor het timing rapport.
+"""
+import logging
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from itertools import chain
+
+from django.utils import timezone
+
+from .decoding import DecodedLines
+from .detection import detect_format
+from .persist import save_patient_records
+from .reader import iter_table_rows
+from .records import RowMapper, date_from_filename, date_from_text
+
+logger = logging.getLogger(__name__)
+
+STAGES = ('decode', 'parse', 'detect', 'map', 'validate', 'persist')
+
+# Maximaal aantal meldingen in het validatie resultaat (wordt in de sessie bewaard)
+MAX_MESSAGES = 50
+
+
+class StageClock:
+    """
+    Exclusieve tijd per stap, ook als stappen als generators in elkaar grijpen
+
+        with clock.stage('map'): ...
+        for row in clock.iterate('parse', rows): ...
+    """
+
+    def __init__(self):
+        self.seconds = defaultdict(float)
+        self.items = defaultdict(int)
+        self._stack = []
+        self._mark = time.perf_counter()
+
+    def _switch(self):
+        now = time.perf_counter()
+        if self._stack:
+            self.seconds[self._stack[-1]] += now - self._mark
+        self._mark = now
+
+    @contextmanager
+    def stage(self, name, items=0):
+        self._switch()
+        self._stack.append(name)
+        try:
+            yield
+        finally:
+            self._switch()
+            self._stack.pop()
+            self.items[name] += items
+
+    def iterate(self, name, iterable):
+        iterator = iter(iterable)
+        while True:
+            with self.stage(name):
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    return
+            self.items[name] += 1
+            yield item
+
+    def report(self):
+        return [
+            {'stage': name, 'seconds': round(self.seconds[name], 4), 'items': self.items[name]}
+            for name in STAGES if name in self.seconds
+        ]
+
+
+class IngestResult:
+    """Uitkomst van een import run"""
+
+    def __init__(self, filename):
+        self.filename = filename
+        self.source_format = None
+        self.delimiter = None
+        self.encoding = None
+        self.detection = {}
+        self.default_date = None
+        self.rows = []
+        self.row_count = 0
+        self.records = []
+        self.saved = {'created': 0, 'updated': 0, 'deleted': 0}
+        self.timings = []
+        self.text = ''
+
+    @property
+    def valid_records(self):
+        return [record for record in self.records if record.is_valid]
+
+    @property
+    def dates(self):
+        return sorted({record.datum for record in self.valid_records if record.datum})
+
+    def validation_result(self):
+        """Zelfde vorm als de oude validate_csv_data_simple"""
+        mappings = self.detection.get('mappings', {})
+        errors, warnings = [], []
+        if not self.records:
+            errors.append("Geen data gevonden in bestand")
+        if 'achternaam' not in mappings and 'naam' not in mappings:
+            errors.append("Vereiste kolom 'achternaam' of 'naam' niet gevonden")
+        if 'start_tijd' not in mappings and 'ophaal_tijd' not in mappings:
+            errors.append("Vereiste kolom 'start_tijd' of 'ophaal_tijd' niet gevonden")
+        for record in self.records:
+            errors.extend(f"Rij {record.line_number}: {message}" for message in record.errors)
+            warnings.extend(f"Rij {record.line_number}: {message}" for message in record.warnings)
+        return {
+            'errors': errors[:MAX_MESSAGES],
+            'warnings': warnings[:MAX_MESSAGES],
+            'total_rows': self.row_count,
+            'valid_rows': len(self.valid_records),
+        }
+
+    def timing_report(self):
+        total = sum(timing['seconds'] for timing in self.timings)
+        parts = [f"{timing['stage']} {timing['seconds'] * 1000:.1f}ms ({timing['items']})" for timing in self.timings]
+        return f"{self.filename}: {total * 1000:.1f}ms - " + ', '.join(parts)
+
+
+class IngestPipeline:
+    """
+    Import van een CSV of SLK bestand
+
+        result = IngestPipeline(uploaded_file).run()              # alleen inlezen
+        result = IngestPipeline(uploaded_file).run(persist=True)  # en opslaan
+        result.saved                                               # {'created', 'updated', 'deleted'}
+
+    Args:
+        source: UploadedFile, geopend bestand (binair) of iterable van regels
+        filename: standaard source.name
+        default_date: datum voor rijen zonder datum kolom; anders de datum uit
+                      de titel regels, uit de bestandsnaam of vandaag
+        keep_rows: aantal ruwe rijen bewaren voor preview (None = alles)
+        keep_text: volledige tekst bewaren (import log)
+    """
+
+    def __init__(self, source, filename=None, default_date=None, keep_rows=10, keep_text=False):
+        self.source = source
+        self.filename = filename or getattr(source, 'name', '') or ''
+        self.default_date = default_date
+        self.keep_rows = keep_rows
+        self.keep_text = keep_text
+
+    def _keep(self, result, row):
+        if self.keep_rows is None or len(result.rows) < self.keep_rows:
+            result.rows.append(row)
+
+    def run(self, persist=False, replace_existing=False, bestemming=None):
+        clock = StageClock()
+        result = IngestResult(self.filename)
+
+        with clock.stage('decode'):
+            lines = DecodedLines(self.source, keep_text=self.keep_text)
+        result.encoding = lines.encoding
+
+        result.source_format, result.delimiter, rows = iter_table_rows(
+            clock.iterate('decode', lines), lines.head, self.filename
+        )
+        rows = clock.iterate('parse', rows)
+
+        # Vooruit lezen tot de eerste data rij: titel en kolomkoppen
+        preamble, first_data = [], None
+        for row in rows:
+            if row['type'] == 'data':
+                first_data = row
+                break
+            preamble.append(row)
+
+        header_row = next((row['data'] for row in preamble if row['type'] == 'header'), None)
+        with clock.stage('detect'):
+            result.detection = detect_format(self.filename, header_row)
+        title_text = ' '.join(' '.join(row['data']) for row in preamble if row['type'] == 'title')
+        result.default_date = (
+            self.default_date
+            or date_from_text(title_text)
+            or date_from_filename(self.filename)
+            or timezone.localdate()
+        )
+        mapper = RowMapper(result.detection['mappings'], result.default_date)
+
+        for row in preamble:
+            self._keep(result, row)
+        data_rows = chain([first_data], rows) if first_data else ()
+        for row in data_rows:
+            self._keep(result, row)
+            result.row_count += 1
+            with clock.stage('map', items=1):
+                record = mapper.map(row)
+            with clock.stage('validate', items=1):
+                record.validate()
+            result.records.append(record)
+
+        if persist:
+            kwargs = {'bestemming': bestemming} if bestemming else {}
+            with clock.stage('persist', items=len(result.valid_records)):
+                result.saved = save_patient_records(result.records, replace_existing=replace_existing, **kwargs)
+
+        result.timings = clock.report()
+        result.text = lines.text
+        logger.info(f"Import {result.timing_report()}")
+        return result
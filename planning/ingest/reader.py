@@ -0,0 +1,91 @@
+"""
+Rijen uit CSV en SLK bestanden
+Beide formaten leveren dezelfde rij dicts op als de oude wizard parsers:
+{'type': 'title' | 'header' | 'data', 'data': [cellen], 'line_number': n}
+"""
+import csv
+import logging
+
+from planning.services.sylk import iter_sylk_rows
+
+logger = logging.getLogger(__name__)
+
+DELIMITERS = (';', ',', '\t')
+
+# Kolomkoppen waaraan een kop regel te herkennen is, ook als er cijfers in andere koppen staan
+HEADER_WORDS = {'patient', 'patient_id', 'naam', 'achternaam', 'voornaam', 'adres', 'name', 'vorname', 'nachname', 'strasse', 'straße'}
+
+
+def is_sylk(filename, head):
+    """SLK bestand op basis van extensie of de ID record in de eerste regel"""
+    if filename and filename.lower().endswith('.slk'):
+        return True
+    first = next((line for line in head if line.strip()), '')
+    return first.startswith('ID;P')
+
+
+def sniff_delimiter(head):
+    """
+    Scheidingsteken op basis van de eerste niet-lege regel
+
+    Bij gelijke aantallen wint ';' (Meditec exports).
+    """
+    first = next((line for line in head if line.strip()), '')
+    counts = {delimiter: first.count(delimiter) for delimiter in DELIMITERS}
+    best = max(DELIMITERS, key=lambda delimiter: counts[delimiter])
+    return best if counts[best] else ';'
+
+
+def iter_csv_rows(lines, delimiter):
+    """(regel nummer, cellen) voor niet-lege CSV regels"""
+    for line_number, cells in enumerate(csv.reader(lines, delimiter=delimiter), 1):
+        if any(cell.strip() for cell in cells):
+            yield line_number, cells
+
+
+def _looks_like_header(cells):
+    filled = [cell.strip() for cell in cells if cell.strip()]
+    if len(filled) < 3:
+        return False
+    if any(cell.lower() in HEADER_WORDS for cell in filled):
+        return True
+    return not any(char.isdigit() for cell in filled for char in cell)
+
+
+def classify_rows(rows):
+    """
+    Markeer titel, kolomkop en data rijen
+
+    Korte regels vóór de kolomkoppen (rapport titel, datum) worden 'title';
+    de eerste regel die op kolomkoppen lijkt wordt 'header'. Zodra er een
+    data rij langs is gekomen is alles data.
+    """
+    in_preamble = True
+    for line_number, cells in rows:
+        row_type = 'data'
+        if in_preamble:
+            if _looks_like_header(cells):
+                row_type = 'header'
+                in_preamble = False
+            elif sum(1 for cell in cells if cell.strip()) < 3:
+                row_type = 'title'
+            else:
+                in_preamble = False
+        yield {'type': row_type, 'data': cells, 'line_number': line_number}
+
+
+def iter_table_rows(lines, head, filename=''):
+    """
+    Geclassificeerde rijen uit gedecodeerde regels
+
+    Args:
+        lines: iterable van tekst regels
+        head: de eerste regels (DecodedLines.head) voor formaat en scheidingsteken
+
+    Returns:
+        (bron formaat, scheidingsteken of None, generator van rij dicts)
+    """
+    if is_sylk(filename, head):
+        return 'slk', None, classify_rows(iter_sylk_rows(lines))
+    delimiter = sniff_delimiter(head)
+    return 'csv', delimiter, classify_rows(iter_csv_rows(lines, delimiter))
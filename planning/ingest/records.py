@@ -0,0 +1,223 @@
+"""
+Getypeerde patiënt records uit ruwe rijen, inclusief validatie
+"""
+import logging
+import re
+from datetime import date, datetime, time
+
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BESTEMMING = 'Routemeister Transport'
+
+_DATE_FORMATS = ('%d-%m-%Y', '%d.%m.%Y', '%d/%m/%Y', '%Y-%m-%d', '%d-%m-%y', '%d.%m.%y')
+_DATE_IN_TEXT = re.compile(r'\b(\d{1,2})[.\-/](\d{1,2})[.\-/](\d{4})\b')
+# routemeister_24092025.csv (DDMMYYYY) en fahrdlist20250922.slk (YYYYMMDD)
+_DATE_IN_FILENAME = re.compile(r'(?<!\d)(\d{8})(?!\d)')
+
+
+def parse_time(value):
+    """
+    Tijd uit "845", "0845", "8:45", "08:45" of "08:45:00"
+
+    Returns:
+        time of None als de waarde leeg of ongeldig is
+    """
+    value = str(value or '').strip()
+    if not value:
+        return None
+    parts = value.split(':')
+    try:
+        if len(parts) == 1:
+            if not value.isdigit() or len(value) not in (3, 4):
+                return None
+            hour, minute = int(value[:-2]), int(value[-2:])
+        else:
+            hour, minute = int(parts[0]), int(parts[1])
+        return time(hour, minute)
+    except ValueError:
+        return None
+
+
+def parse_date(value):
+    value = str(value or '').strip()
+    if not value:
+        return None
+    for fmt in _DATE_FORMATS:
+        try:
+            return datetime.strptime(value, fmt).date()
+        except ValueError:
+            continue
+    return None
+
+
+def date_from_text(text):
+    """Eerste DD.MM.YYYY datum in een titel regel"""
+    match = _DATE_IN_TEXT.search(text or '')
+    if not match:
+        return None
+    day, month, year = (int(part) for part in match.groups())
+    try:
+        return date(year, month, day)
+    except ValueError:
+        return None
+
+
+def date_from_filename(filename):
+    match = _DATE_IN_FILENAME.search(filename or '')
+    if not match:
+        return None
+    digits = match.group(1)
+    for fmt in ('%d%m%Y', '%Y%m%d'):
+        try:
+            return datetime.strptime(digits, fmt).date()
+        except ValueError:
+            continue
+    return None
+
+
+class PatientRecord:
+    """
+    Eén patiënt uit een import bestand
+
+    Tijden en datum zijn geparsed; errors bevat blokkerende fouten (record
+    wordt niet opgeslagen), warnings alleen meldingen.
+    """
+
+    def __init__(self, line_number, patient_id='', achternaam='', voornaam='', naam='',
+                 straat='', postcode='', plaats='', telefoon='', datum=None,
+                 start_tijd=None, eind_tijd=None, raw_start='', raw_eind=''):
+        self.line_number = line_number
+        self.patient_id = patient_id
+        self.achternaam = achternaam
+        self.voornaam = voornaam
+        self.naam = naam or f"{voornaam} {achternaam}".strip()
+        self.straat = straat
+        self.postcode = postcode
+        self.plaats = plaats
+        self.telefoon = telefoon
+        self.datum = datum
+        self.start_tijd = start_tijd
+        self.eind_tijd = eind_tijd
+        self.raw_start = raw_start
+        self.raw_eind = raw_eind
+        self.errors = []
+        self.warnings = []
+
+    @property
+    def is_valid(self):
+        return not self.errors
+
+    def _aware(self, moment):
+        if moment is None or self.datum is None:
+            return None
+        return timezone.make_aware(datetime.combine(self.datum, moment))
+
+    @property
+    def ophaal_tijd(self):
+        return self._aware(self.start_tijd)
+
+    @property
+    def eind_behandel_tijd(self):
+        return self._aware(self.eind_tijd)
+
+    def validate(self):
+        """Vul errors en warnings; geeft is_valid terug"""
+        if not self.naam:
+            self.errors.append("Naam ontbreekt")
+        if not self.straat:
+            self.errors.append("Adres ontbreekt")
+        if not self.plaats and not self.postcode:
+            self.errors.append("Plaats en postcode ontbreken")
+        if self.start_tijd is None:
+            if self.raw_start:
+                self.errors.append(f"Ongeldige eerste behandeling tijd: '{self.raw_start}'")
+            else:
+                self.errors.append("Eerste behandeling tijd ontbreekt")
+        if self.eind_tijd is None and self.raw_eind:
+            self.errors.append(f"Ongeldige laatste behandeling tijd: '{self.raw_eind}'")
+        if self.start_tijd and self.eind_tijd and self.eind_tijd < self.start_tijd:
+            self.warnings.append("Laatste behandeling eindigt voor de eerste begint")
+        if not self.patient_id:
+            self.warnings.append("Leeg patiënt ID")
+        if not self.telefoon:
+            self.warnings.append("Telefoonnummer ontbreekt")
+        if self.datum is None:
+            self.errors.append("Afspraak datum ontbreekt")
+        return self.is_valid
+
+    def as_dict(self):
+        return {
+            'line_number': self.line_number,
+            'patient_id': self.patient_id,
+            'naam': self.naam,
+            'straat': self.straat,
+            'postcode': self.postcode,
+            'plaats': self.plaats,
+            'telefoon': self.telefoon,
+            'datum': self.datum.isoformat() if self.datum else None,
+            'start_tijd': self.start_tijd.strftime('%H:%M') if self.start_tijd else None,
+            'eind_tijd': self.eind_tijd.strftime('%H:%M') if self.eind_tijd else None,
+            'errors': self.errors,
+            'warnings': self.warnings,
+        }
+
+
+class RowMapper:
+    """
+    Zet ruwe data rijen om naar PatientRecords met een kolom mapping
+
+    Args:
+        mappings: veld -> kolom index (CSVParserConfig.kolom_mapping vorm)
+        default_date: datum voor rijen zonder (geldige) datum kolom
+    """
+
+    def __init__(self, mappings, default_date=None):
+        self.mappings = {field: int(index) for field, index in (mappings or {}).items()
+                         if str(index).lstrip('-').isdigit()}
+        self.default_date = default_date
+
+    def _cell(self, cells, *fields):
+        for field in fields:
+            index = self.mappings.get(field)
+            if index is not None and 0 <= index < len(cells):
+                value = str(cells[index]).strip()
+                if value:
+                    return value
+        return ''
+
+    def _phone(self, cells):
+        # Een 'telefoon' kolom kan ook een landcode bevatten ("D"): alleen waarden met cijfers
+        for field in ('telefoon1', 'telefoon', 'telefoon2'):
+            value = self._cell(cells, field)
+            if any(char.isdigit() for char in value):
+                return value
+        return ''
+
+    def map(self, row):
+        cells = row['data']
+        raw_start = self._cell(cells, 'start_tijd', 'ophaal_tijd')
+        raw_eind = self._cell(cells, 'eind_tijd', 'eind_behandel_tijd')
+        voornaam = self._cell(cells, 'voornaam')
+        if 'achternaam' in self.mappings or voornaam:
+            # 'naam' naast een voornaam kolom is de achternaam
+            achternaam, naam = self._cell(cells, 'achternaam', 'naam'), ''
+        else:
+            achternaam, naam = '', self._cell(cells, 'naam')
+        return PatientRecord(
+            line_number=row.get('line_number'),
+            patient_id=self._cell(cells, 'patient_id'),
+            achternaam=achternaam,
+            voornaam=voornaam,
+            naam=naam,
+            straat=self._cell(cells, 'adres', 'straat'),
+            postcode=self._cell(cells, 'postcode'),
+            plaats=self._cell(cells, 'plaats'),
+            telefoon=self._phone(cells),
+            datum=parse_date(self._cell(cells, 'datum')) or self.default_date,
+            start_tijd=parse_time(raw_start),
+            eind_tijd=parse_time(raw_eind),
+            raw_start=raw_start,
+            raw_eind=raw_eind,
+        )
@@ -0,0 +1,267 @@
+"""
+Request instrumentatie
+Per request: aantal SQL queries, SQL tijd, dubbele queries (N+1), externe HTTP
+calls (Google, Nominatim, OptaPlanner) en totale tijd. De laatste requests staan
+in een ring buffer in het geheugen (per proces), te bekijken via
+/instrumentatie/ en /api/instrumentatie/ (alleen staff).
+
+    MIDDLEWARE = [..., 'planning.instrumentation.InstrumentationMiddleware']
+
+    INSTRUMENTATION = {
+        'buffer_size': 500,
+        'duplicate_threshold': 5,
+        'budgets': {'dashboard': {'queries': 20, 'ms': 300}},
+    }
+
+Budgetten gelden per url naam (of 'module.view'); overschrijding wordt als
+warning gelogd en in de buffer gemarkeerd. `'*'` is het budget voor alle views.
+"""
+import logging
+import threading
+import time
+from collections import Counter, deque
+from urllib.parse import urlsplit
+
+import requests
+from django.conf import settings
+from django.db import connections
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'enabled': True,
+    'buffer_size': 500,
+    'duplicate_threshold': 5,   # Zelfde query vaker dan dit = verdacht (N+1)
+    'budgets': {},
+    'exclude_paths': ['/static/', '/media/', '/favicon.ico', '/instrumentatie/', '/api/instrumentatie/'],
+}
+
+_local = threading.local()
+
+
+def get_config():
+    config = dict(DEFAULTS)
+    config.update(getattr(settings, 'INSTRUMENTATION', {}))
+    return config
+
+
+def current_profile():
+    """Profiel van de request in deze thread (None buiten een request)"""
+    return getattr(_local, 'profile', None)
+
+
+def classify_host(url):
+    host = urlsplit(url).hostname or ''
+    optaplanner_host = urlsplit(getattr(settings, 'OPTAPLANNER_URL', '')).hostname
+    if host.endswith('googleapis.com') or host.endswith('google.com'):
+        return 'google'
+    if 'nominatim' in host:
+        return 'nominatim'
+    if optaplanner_host and host == optaplanner_host:
+        return 'optaplanner'
+    return host or 'other'
+
+
+class RequestProfile:
+    """Metingen van één request"""
+
+    def __init__(self, method, path):
+        self.method = method
+        self.path = path
+        self.view = None
+        self.status = None
+        self.started_at = timezone.now()
+        self.queries = 0
+        self.sql_seconds = 0.0
+        self.statements = Counter()
+        self.http_calls = Counter()
+        self.http_seconds = 0.0
+        self.wall_seconds = 0.0
+        self.over_budget = []
+
+    def record_query(self, sql, seconds):
+        self.queries += 1
+        self.sql_seconds += seconds
+        self.statements[sql] += 1
+
+    def record_http(self, service, seconds):
+        self.http_calls[service] += 1
+        self.http_seconds += seconds
+
+    def duplicates(self, threshold):
+        return [
+            {'sql': sql[:300], 'count': count}
+            for sql, count in self.statements.most_common(5) if count > threshold
+        ]
+
+    def as_dict(self, threshold):
+        return {
+            'method': self.method,
+            'path': self.path,
+            'view': self.view,
+            'status': self.status,
+            'started_at': self.started_at.isoformat(),
+            'wall_ms': round(self.wall_seconds * 1000, 1),
+            'queries': self.queries,
+            'sql_ms': round(self.sql_seconds * 1000, 1),
+            'duplicate_queries': self.duplicates(threshold),
+            'http_calls': dict(self.http_calls),
+            'http_ms': round(self.http_seconds * 1000, 1),
+            'over_budget': self.over_budget,
+        }
+
+
+class RequestLog:
+    """Thread-safe ring buffer met de laatste request profielen"""
+
+    def __init__(self, size):
+        self._entries = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def add(self, entry):
+        with self._lock:
+            self._entries.append(entry)
+
+    def entries(self, view=None, limit=None):
+        with self._lock:
+            entries = list(self._entries)
+        if view:
+            entries = [entry for entry in entries if entry['view'] == view]
+        entries.reverse()
+        return entries[:limit] if limit else entries
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def summary(self):
+        """Per view: aantal requests, gemiddelde en p95 van tijd en queries"""
+        per_view = {}
+        for entry in self.entries():
+            per_view.setdefault(entry['view'] or entry['path'], []).append(entry)
+
+        def p95(values):
+            values = sorted(values)
+            return values[min(len(values) - 1, int(len(values) * 0.95))]
+
+        summary = []
+        for view, entries in per_view.items():
+            wall = [entry['wall_ms'] for entry in entries]
+            queries = [entry['queries'] for entry in entries]
+            summary.append({
+                'view': view,
+                'requests': len(entries),
+                'avg_ms': round(sum(wall) / len(wall), 1),
+                'p95_ms': p95(wall),
+                'avg_queries': round(sum(queries) / len(queries), 1),
+                'max_queries': max(queries),
+                'http_calls': sum(sum(entry['http_calls'].values()) for entry in entries),
+                'over_budget': sum(1 for entry in entries if entry['over_budget']),
+            })
+        summary.sort(key=lambda row: row['p95_ms'], reverse=True)
+        return summary
+
+
+request_log = RequestLog(get_config()['buffer_size'])
+
+
+def _query_wrapper(execute, sql, params, many, context):
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        profile = current_profile()
+        if profile is not None:
+            profile.record_query(sql, time.perf_counter() - started)
+
+
+_original_send = requests.Session.send
+
+
+def _instrumented_send(session, request, **kwargs):
+    profile = current_profile()
+    if profile is None:
+        return _original_send(session, request, **kwargs)
+    started = time.perf_counter()
+    try:
+        return _original_send(session, request, **kwargs)
+    finally:
+        profile.record_http(classify_host(request.url), time.perf_counter() - started)
+
+
+def install_http_hook():
+    """Alle requests.get/post lopen via Session.send; één keer per proces patchen"""
+    if requests.Session.send is not _instrumented_send:
+        requests.Session.send = _instrumented_send
+
+
+def check_budget(profile, budgets):
+    budget = budgets.get(profile.view) or budgets.get('*')
+    if not budget:
+        return []
+    exceeded = []
+    if 'queries' in budget and profile.queries > budget['queries']:
+        exceeded.append(f"queries {profile.queries} > {budget['queries']}")
+    if 'ms' in budget and profile.wall_seconds * 1000 > budget['ms']:
+        exceeded.append(f"tijd {profile.wall_seconds * 1000:.0f}ms > {budget['ms']}ms")
+    if 'http' in budget and sum(profile.http_calls.values()) > budget['http']:
+        exceeded.append(f"http calls {sum(profile.http_calls.values())} > {budget['http']}")
+    return exceeded
+
+
+class InstrumentationMiddleware:
+    """Meet elke request en bewaar het profiel in request_log"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.config = get_config()
+        if self.config['enabled']:
+            install_http_hook()
+
+    def _excluded(self, path):
+        return any(path.startswith(prefix) for prefix in self.config['exclude_paths'])
+
+    def __call__(self, request):
+        if not self.config['enabled'] or self._excluded(request.path):
+            return self.get_response(request)
+
+        profile = RequestProfile(request.method, request.path)
+        _local.profile = profile
+        started = time.perf_counter()
+        try:
+            with _wrap_connections():
+                response = self.get_response(request)
+        finally:
+            _local.profile = None
+        profile.wall_seconds = time.perf_counter() - started
+        profile.status = response.status_code
+        self._finish(request, profile)
+        return response
+
+    def _finish(self, request, profile):
+        match = getattr(request, 'resolver_match', None)
+        if match is not None:
+            profile.view = match.url_name or match._func_path
+
+        threshold = self.config['duplicate_threshold']
+        profile.over_budget = check_budget(profile, self.config['budgets'])
+        if profile.over_budget:
+            logger.warning(f"Budget overschreden voor {profile.view} ({profile.path}): {', '.join(profile.over_budget)}")
+        duplicates = profile.duplicates(threshold)
+        if duplicates:
+            logger.info(f"Mogelijke N+1 in {profile.view}: {duplicates[0]['count']}x {duplicates[0]['sql'][:120]}")
+        request_log.add(profile.as_dict(threshold))
+
+
+class _wrap_connections:
+    """execute_wrapper op alle database connecties van deze thread"""
+
+    def __enter__(self):
+        self._contexts = [connection.execute_wrapper(_query_wrapper) for connection in connections.all()]
+        for context in self._contexts:
+            context.__enter__()
+
+    def __exit__(self, *exc_info):
+        for context in reversed(self._contexts):
+            context.__exit__(*exc_info)
@@ -0,0 +1,64 @@
+"""
+Management command om de DailyPlanningStats rollup (opnieuw) op te bouwen
+"""
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Max, Min
+
+from planning.models import DailyPlanningStats, Patient
+
+
+class Command(BaseCommand):
+    help = 'Bouw de dagelijkse planning statistieken rollup op uit de patiënten tabel'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--start',
+            type=date.fromisoformat,
+            help='Eerste dag (YYYY-MM-DD), standaard de oudste ophaal datum',
+        )
+        parser.add_argument(
+            '--end',
+            type=date.fromisoformat,
+            help='Laatste dag (YYYY-MM-DD), standaard de nieuwste ophaal datum',
+        )
+        parser.add_argument(
+            '--chunk-days',
+            type=int,
+            default=31,
+            help='Aantal dagen per GROUP BY query',
+        )
+        parser.add_argument(
+            '--dirty-only',
+            action='store_true',
+            help='Alleen gewijzigde (dirty) dagen herberekenen',
+        )
+
+    def handle(self, *args, **options):
+        if options['dirty_only']:
+            rows = DailyPlanningStats.refresh_dirty()
+            self.stdout.write(self.style.SUCCESS(f'✅ Gewijzigde dagen herberekend ({rows} rijen)'))
+            return
+
+        bounds = Patient.objects.aggregate(first=Min('ophaal_tijd'), last=Max('ophaal_tijd'))
+        start = options['start'] or DailyPlanningStats.date_for(bounds['first'])
+        end = options['end'] or DailyPlanningStats.date_for(bounds['last'])
+        if not start or not end:
+            self.stdout.write(self.style.WARNING('Geen patiënten gevonden, niets te doen.'))
+            return
+        if start > end:
+            raise CommandError('--start ligt na --end')
+
+        chunk = max(1, options['chunk_days'])
+        total_rows = 0
+        day = start
+        while day <= end:
+            chunk_end = min(end, day + timedelta(days=chunk - 1))
+            dates = [day + timedelta(days=offset) for offset in range((chunk_end - day).days + 1)]
+            rows = DailyPlanningStats.refresh_dates(dates)
+            total_rows += rows
+            self.stdout.write(f"📊 {day} t/m {chunk_end}: {rows} rijen")
+            day = chunk_end + timedelta(days=1)
+
+        self.stdout.write(self.style.SUCCESS(f'✅ Rollup opgebouwd: {total_rows} rijen van {start} t/m {end}'))
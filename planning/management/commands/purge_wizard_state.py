@@ -0,0 +1,21 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from planning.models_extended import WizardStateEntry
+
+
+class Command(BaseCommand):
+    help = 'Verwijder wizard state die langer dan --days dagen niet gebruikt is'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=2,
+            help='Bewaar state die in de laatste N dagen is bijgewerkt (standaard 2)',
+        )
+
+    def handle(self, *args, **options):
+        deleted = WizardStateEntry.purge_older_than(timedelta(days=options['days']))
+        self.stdout.write(self.style.SUCCESS(f'✅ {deleted} wizard state regels verwijderd'))
@@ -0,0 +1,32 @@
+"""
+Management command om het reistijd profiel opnieuw te leren uit de reistijd cache
+"""
+from django.core.management.base import BaseCommand
+
+from planning.services.travel_profile import ROAD_CLASSES, rebuild_travel_profile
+
+
+class Command(BaseCommand):
+    help = 'Leer de snelheden per vertrek uur en wegklasse opnieuw uit de gecachte Google reistijden'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--hours',
+            default='6-19',
+            help='Uren om te tonen als bereik (standaard 6-19)',
+        )
+
+    def handle(self, *args, **options):
+        profile = rebuild_travel_profile()
+        if not profile.samples:
+            self.stdout.write(self.style.WARNING('Geen gecachte ritten gevonden, standaard profiel gebruikt.'))
+
+        first, _, last = options['hours'].partition('-')
+        hours = range(int(first), int(last or first) + 1)
+        self.stdout.write('uur   ' + ''.join(f'{road_class:>10}' for road_class in ROAD_CLASSES))
+        self.stdout.write('-     ' + ''.join(f'{profile.base[road_class]:>10.1f}' for road_class in ROAD_CLASSES))
+        for hour in hours:
+            speeds = ''.join(f'{profile.hourly[road_class][hour]:>10.1f}' for road_class in ROAD_CLASSES)
+            self.stdout.write(f'{hour:02d}:00 {speeds}')
+
+        self.stdout.write(self.style.SUCCESS(f'✅ Reistijd profiel geleerd uit {profile.samples} ritten (km/u hemelsbreed)'))
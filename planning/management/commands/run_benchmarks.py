@@ -0,0 +1,88 @@
+"""
+Management command voor de planning benchmarks (zie planning/benchmarks)
+
+    python manage.py run_benchmarks --sizes 50,200,500,2000 --output benchmarks.json
+    python manage.py run_benchmarks --only parse_csv,plan_simple_routes --compare vorige.json
+
+Draait standaard in een aparte test database, de echte data blijft onaangeroerd.
+"""
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from planning.benchmarks import BENCHMARKS, BenchmarkRunner
+from planning.benchmarks.runner import DEFAULT_SIZES, compare
+
+
+def _int_list(value):
+    try:
+        return [int(part) for part in value.split(',') if part.strip()]
+    except ValueError:
+        raise CommandError(f"Ongeldige lijst van getallen: {value}")
+
+
+class Command(BaseCommand):
+    help = 'Meet parse, toewijzing, geocoding, route planning en dashboard tijden voor synthetische datasets'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes',
+            type=_int_list,
+            default=list(DEFAULT_SIZES),
+            help='Aantallen patiënten, komma gescheiden (standaard 50,200,500,2000)',
+        )
+        parser.add_argument('--repeat', type=int, default=3, help='Herhalingen per case (mediaan en minimum)')
+        parser.add_argument('--only', help=f"Alleen deze cases: {', '.join(BENCHMARKS)}")
+        parser.add_argument('--seed', type=int, default=42, help='Seed voor de synthetische data')
+        parser.add_argument('--output', help='JSON rapport wegschrijven naar dit pad')
+        parser.add_argument('--compare', help='Vorig JSON rapport om mee te vergelijken')
+        parser.add_argument(
+            '--current-db',
+            action='store_true',
+            help='Gebruik de geconfigureerde database in plaats van een test database (verwijdert patiënten!)',
+        )
+
+    def handle(self, *args, **options):
+        only = [name.strip() for name in options['only'].split(',')] if options['only'] else None
+        unknown = set(only or []) - set(BENCHMARKS)
+        if unknown:
+            raise CommandError(f"Onbekende benchmark(s): {', '.join(sorted(unknown))}")
+
+        previous = None
+        if options['compare']:
+            with open(options['compare'], encoding='utf-8') as f:
+                previous = json.load(f)
+
+        runner = BenchmarkRunner(sizes=options['sizes'], repeat=options['repeat'], only=only, seed=options['seed'])
+        self.stdout.write(f"{'benchmark':<20} {'size':>6} {'median s':>10} {'min s':>10} {'queries':>8}")
+
+        def progress(result):
+            self.stdout.write(
+                f"{result['benchmark']:<20} {result['size']:>6} {result['median_seconds']:>10.4f} "
+                f"{result['min_seconds']:>10.4f} {result['queries']:>8}"
+            )
+
+        if options['current_db']:
+            report = runner.run(progress=progress)
+        else:
+            from django.test.runner import DiscoverRunner
+            from django.test.utils import setup_test_environment, teardown_test_environment
+
+            setup_test_environment()
+            test_runner = DiscoverRunner(verbosity=0, interactive=False)
+            old_config = test_runner.setup_databases()
+            try:
+                report = runner.run(progress=progress)
+            finally:
+                test_runner.teardown_databases(old_config)
+                teardown_test_environment()
+
+        if options['output']:
+            BenchmarkRunner.write(report, options['output'])
+            self.stdout.write(self.style.SUCCESS(f"✅ Rapport opgeslagen in {options['output']}"))
+
+        if previous:
+            self.stdout.write(f"\nVergelijking met {previous.get('meta', {}).get('commit') or options['compare']}:")
+            for name, size, before, after, factor in compare(previous, report):
+                style = self.style.ERROR if factor > 1.2 else self.style.SUCCESS if factor < 0.8 else str
+                self.stdout.write(style(f"{name:<20} {size:>6} {before:>10.4f} -> {after:>10.4f}  x{factor}"))
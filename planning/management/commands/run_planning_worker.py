@@ -0,0 +1,50 @@
+"""
+Management command voor de planning job worker
+Voert PlanningJobs (OptaPlanner, wizard routes) op de achtergrond uit, zodat de
+web workers niet blijven wachten op lange planningen.
+"""
+import signal
+
+from django.core.management.base import BaseCommand
+
+from planning.services.planning_jobs import PlanningJobWorker
+
+
+class Command(BaseCommand):
+    help = 'Start de worker die planning jobs uit de wachtrij uitvoert'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--concurrency',
+            type=int,
+            default=None,
+            help='Aantal jobs tegelijk (standaard settings.PLANNING_JOBS concurrency)',
+        )
+        parser.add_argument(
+            '--poll-interval',
+            type=float,
+            default=None,
+            help='Seconden tussen wachtrij checks',
+        )
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Verwerk de huidige wachtrij en stop daarna',
+        )
+
+    def handle(self, *args, **options):
+        worker = PlanningJobWorker(
+            concurrency=options['concurrency'],
+            poll_interval=options['poll_interval'],
+        )
+
+        def shutdown(signum, frame):
+            self.stdout.write(self.style.WARNING('⏹️ Worker stopt na de lopende jobs...'))
+            worker.stop()
+
+        signal.signal(signal.SIGINT, shutdown)
+        signal.signal(signal.SIGTERM, shutdown)
+
+        self.stdout.write(f"🚀 Planning worker {worker.worker_id} gestart ({worker.concurrency} parallel)")
+        worker.run(once=options['once'])
+        self.stdout.write(self.style.SUCCESS('✅ Planning worker gestopt'))
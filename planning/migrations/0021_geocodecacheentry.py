@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-17 18:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('planning', '0020_googlemapsconfig_googlemapsapilog'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GeocodeCacheEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('address_key', models.CharField(help_text='Genormaliseerd adres (cache sleutel)', max_length=255, unique=True)),
+                ('address', models.TextField(blank=True, help_text='Oorspronkelijk adres van de eerste lookup')),
+                ('latitude', models.FloatField(blank=True, help_text='GPS Breedtegraad (leeg = niet gevonden)', null=True)),
+                ('longitude', models.FloatField(blank=True, help_text='GPS Lengtegraad (leeg = niet gevonden)', null=True)),
+                ('provider', models.CharField(blank=True, choices=[('nominatim', 'OpenStreetMap Nominatim'), ('google', 'Google Maps'), ('manual', 'Handmatig')], help_text='Geocoding provider', max_length=20)),
+                ('confidence', models.FloatField(blank=True, help_text='Betrouwbaarheid van het resultaat (0-1)', null=True)),
+                ('hit_count', models.IntegerField(default=0, help_text='Aantal keer uit de cache gehaald')),
+                ('expires_at', models.DateTimeField(db_index=True, help_text='Na dit moment opnieuw geocoden')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Geocode Cache',
+                'verbose_name_plural': 'Geocode Cache',
+                'ordering': ['address_key'],
+            },
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-17 18:07
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('planning', '0021_geocodecacheentry'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TravelTimeCacheEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('origin_cell', models.CharField(help_text='Afgeronde origin coördinaten (lat,lng)', max_length=100)),
+                ('destination_cell', models.CharField(help_text='Afgeronde bestemming coördinaten (lat,lng)', max_length=100)),
+                ('hour_bucket', models.SmallIntegerField(default=-1, help_text='Vertrek uur bucket (-1 = tijdsonafhankelijk)')),
+                ('distance_meters', models.IntegerField(help_text='Afstand in meters')),
+                ('duration_seconds', models.IntegerField(help_text='Reistijd in seconden')),
+                ('source', models.CharField(default='google', help_text='Bron van de reistijd', max_length=20)),
+                ('hit_count', models.IntegerField(default=0, help_text='Aantal keer uit de cache gehaald')),
+                ('last_used_at', models.DateTimeField(db_index=True, default=django.utils.timezone.now, help_text='Voor LRU eviction')),
+                ('expires_at', models.DateTimeField(db_index=True, help_text='Na dit moment opnieuw ophalen')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'Reistijd Cache',
+                'verbose_name_plural': 'Reistijd Cache',
+                'unique_together': {('origin_cell', 'destination_cell', 'hour_bucket')},
+            },
+        ),
+    ]
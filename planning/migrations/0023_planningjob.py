@@ -0,0 +1,45 @@
+# Generated by Django 5.2.18 on 2026-10-17 18:11
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('planning', '0022_traveltimecacheentry'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PlanningJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('job_type', models.CharField(choices=[('optaplanner', 'OptaPlanner planning'), ('wizard_routes', 'Wizard route generatie'), ('google_maps_routes', 'Google Maps route optimalisatie')], help_text='Soort planning job', max_length=30)),
+                ('status', models.CharField(choices=[('queued', 'In wachtrij'), ('running', 'Bezig'), ('completed', 'Voltooid'), ('failed', 'Mislukt')], db_index=True, default='queued', max_length=20)),
+                ('session_key', models.CharField(blank=True, help_text='Django sessie van de aanvrager', max_length=40)),
+                ('payload', models.JSONField(blank=True, default=dict, help_text='Request gegevens en sessie snapshot')),
+                ('result', models.JSONField(blank=True, help_text='JSON response van de planning', null=True)),
+                ('session_updates', models.JSONField(blank=True, default=dict, help_text='Sessie wijzigingen voor de aanvrager')),
+                ('session_applied', models.BooleanField(default=False, help_text='Sessie wijzigingen zijn teruggeschreven')),
+                ('error', models.TextField(blank=True)),
+                ('progress_current', models.IntegerField(default=0)),
+                ('progress_total', models.IntegerField(default=0)),
+                ('progress_message', models.CharField(blank=True, max_length=255)),
+                ('events', models.JSONField(blank=True, default=list, help_text='Voortgang events (per tijdblok)')),
+                ('worker_id', models.CharField(blank=True, max_length=100)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('heartbeat_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('created_by', models.ForeignKey(blank=True, help_text='Gebruiker die de job startte', null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Planning Job',
+                'verbose_name_plural': 'Planning Jobs',
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
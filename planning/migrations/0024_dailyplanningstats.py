@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-17 18:16
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('planning', '0023_planningjob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyPlanningStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(db_index=True, help_text='Ophaal datum')),
+                ('patient_count', models.IntegerField(default=0)),
+                ('wheelchair_count', models.IntegerField(default=0)),
+                ('failed_geocoding_count', models.IntegerField(default=0)),
+                ('dirty', models.BooleanField(db_index=True, default=False, help_text='Dag moet opnieuw berekend worden')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('vehicle', models.ForeignKey(blank=True, help_text='Toegewezen voertuig (leeg = niet toegewezen)', null=True, on_delete=django.db.models.deletion.CASCADE, related_name='daily_stats', to='planning.vehicle')),
+            ],
+            options={
+                'verbose_name': 'Dagelijkse Planning Statistiek',
+                'verbose_name_plural': 'Dagelijkse Planning Statistieken',
+                'ordering': ['date'],
+            },
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.18 on 2026-10-17 18:25
+
+import hashlib
+
+from django.db import migrations, models
+
+
+def fill_natural_keys(apps, schema_editor):
+    """Zelfde hash als Patient.make_natural_key"""
+    Patient = apps.get_model('planning', 'Patient')
+    batch = []
+    for patient in Patient.objects.only('id', 'naam', 'straat', 'postcode', 'plaats').iterator(chunk_size=1000):
+        patient_data = '|'.join(
+            str(value or '').strip().lower()
+            for value in (patient.naam, patient.straat, patient.postcode, patient.plaats)
+        )
+        patient.natural_key = hashlib.md5(patient_data.encode('utf-8')).hexdigest()
+        batch.append(patient)
+        if len(batch) >= 1000:
+            Patient.objects.bulk_update(batch, ['natural_key'])
+            batch = []
+    if batch:
+        Patient.objects.bulk_update(batch, ['natural_key'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('planning', '0024_dailyplanningstats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='patient',
+            name='natural_key',
+            field=models.CharField(blank=True, db_index=True, editable=False, help_text='Hash van naam + adres; herkent bestaande patiënten bij een import', max_length=32),
+        ),
+        migrations.RunPython(fill_natural_keys, migrations.RunPython.noop),
+    ]
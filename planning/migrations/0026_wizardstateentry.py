@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-17 18:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('planning', '0025_patient_natural_key'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WizardStateEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('state_id', models.UUIDField(db_index=True, help_text='Id uit de sessie (wizard_state_id)')),
+                ('section', models.CharField(help_text='Onderdeel, bijv. wizard_upload_data', max_length=50)),
+                ('payload', models.BinaryField(help_text='zlib gecomprimeerde JSON')),
+                ('size', models.PositiveIntegerField(default=0, help_text='Ongecomprimeerde grootte in bytes')),
+                ('updated_at', models.DateTimeField(auto_now=True, db_index=True)),
+            ],
+            options={
+                'verbose_name': 'Wizard State',
+                'verbose_name_plural': 'Wizard States',
+                'unique_together': {('state_id', 'section')},
+            },
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.2.18 on 2026-10-17 21:04
+
+from django.core.management import call_command
+from django.db import migrations
+
+
+def create_cache_table(apps, schema_editor):
+    """Tabel voor de DatabaseCache uit settings.CACHES (slaat bestaande tabellen over)"""
+    call_command('createcachetable', database=schema_editor.connection.alias, verbosity=0)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('planning', '0026_wizardstateentry'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_cache_table, migrations.RunPython.noop),
+    ]
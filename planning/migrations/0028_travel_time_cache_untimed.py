@@ -0,0 +1,38 @@
+# Generated by Django 5.2.18 on 2026-10-17 21:30
+
+from django.db import migrations
+
+
+def move_to_untimed_bucket(apps, schema_editor):
+    """
+    Bestaande regels zijn reistijden zonder verkeer, opgeslagen onder het uur van de
+    API call. Per celpaar blijft de meest recent gebruikte over, in bucket -1.
+    """
+    TravelTimeCacheEntry = apps.get_model('planning', 'TravelTimeCacheEntry')
+    seen = set(TravelTimeCacheEntry.objects.filter(hour_bucket=-1).values_list('origin_cell', 'destination_cell'))
+    move, delete = [], []
+    rows = TravelTimeCacheEntry.objects.filter(hour_bucket__gte=0).order_by('-last_used_at').values_list(
+        'pk', 'origin_cell', 'destination_cell'
+    )
+    for pk, origin_cell, destination_cell in rows.iterator(chunk_size=2000):
+        key = (origin_cell, destination_cell)
+        if key in seen:
+            delete.append(pk)
+        else:
+            seen.add(key)
+            move.append(pk)
+    for start in range(0, len(delete), 500):
+        TravelTimeCacheEntry.objects.filter(pk__in=delete[start:start + 500]).delete()
+    for start in range(0, len(move), 500):
+        TravelTimeCacheEntry.objects.filter(pk__in=move[start:start + 500]).update(hour_bucket=-1)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('planning', '0027_cache_table'),
+    ]
+
+    operations = [
+        migrations.RunPython(move_to_untimed_bucket, migrations.RunPython.noop),
+    ]
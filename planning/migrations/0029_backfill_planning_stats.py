@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-17 21:55
+
+from django.db import migrations
+
+
+def mark_existing_dates_dirty(apps, schema_editor):
+    """
+    Zonder backfill toont de statistiek pagina geen historie: refresh_dirty() rekent
+    alleen dagen die als dirty gemarkeerd zijn. Elke bestaande ophaal datum krijgt
+    een dirty placeholder, zoals DailyPlanningStats.mark_dirty.
+    """
+    Patient = apps.get_model('planning', 'Patient')
+    DailyPlanningStats = apps.get_model('planning', 'DailyPlanningStats')
+    dates = set(
+        Patient.objects.filter(ophaal_tijd__isnull=False)
+        .values_list('ophaal_tijd__date', flat=True).distinct()
+    )
+    marked = set(DailyPlanningStats.objects.values_list('date', flat=True).distinct())
+    DailyPlanningStats.objects.filter(dirty=False).update(dirty=True)
+    DailyPlanningStats.objects.bulk_create(
+        [DailyPlanningStats(date=date, dirty=True) for date in sorted(dates - marked) if date],
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('planning', '0028_travel_time_cache_untimed'),
+    ]
+
+    operations = [
+        migrations.RunPython(mark_existing_dates_dirty, migrations.RunPython.noop),
+    ]
@@ -1,10 +1,12 @@
 from django.db import models
 from django.contrib.auth.models import User
 from datetime import time
+import hashlib
 import requests
 import json
 from django.utils import timezone
 from datetime import timedelta
+from .services.settings_cache import SettingsCache
 
 # Create your models here.
 
@@ -95,10 +97,32 @@ class Patient(models.Model):
     # Metadata
     aangemaakt_op = models.DateTimeField(auto_now_add=True)
     bijgewerkt_op = models.DateTimeField(auto_now=True)
+    natural_key = models.CharField(
+        max_length=32,
+        blank=True,
+        db_index=True,
+        editable=False,
+        help_text="Hash van naam + adres; herkent bestaande patiënten bij een import"
+    )
+    
+    NATURAL_KEY_FIELDS = ('naam', 'straat', 'postcode', 'plaats')
     
     def __str__(self):
         return f"{self.naam} - {self.ophaal_tijd.strftime('%d-%m-%Y %H:%M')}"
     
+    @staticmethod
+    def make_natural_key(naam, straat, postcode, plaats):
+        """Genereer unieke hash voor patiënt op basis van naam + adres (hoofdletter ongevoelig)"""
+        patient_data = '|'.join(str(value or '').strip().lower() for value in (naam, straat, postcode, plaats))
+        return hashlib.md5(patient_data.encode('utf-8')).hexdigest()
+    
+    def save(self, *args, **kwargs):
+        self.natural_key = self.make_natural_key(self.naam, self.straat, self.postcode, self.plaats)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and set(update_fields) & set(self.NATURAL_KEY_FIELDS):
+            kwargs['update_fields'] = set(update_fields) | {'natural_key'}
+        super().save(*args, **kwargs)
+    
     class Meta:
         verbose_name = "Patiënt"
         verbose_name_plural = "Patiënten"
@@ -244,12 +268,11 @@ class Configuration(models.Model):
     
     @classmethod
     def get_value(cls, key, default=None):
-        """Haal een configuratie waarde op"""
-        try:
-            config = cls.objects.get(key=key, is_active=True)
-            return config.value
-        except cls.DoesNotExist:
-            return default
+        """Haal een configuratie waarde op (alle actieve waarden staan in de SettingsCache)"""
+        values = SettingsCache.get(
+            'configuration', lambda: dict(cls.objects.filter(is_active=True).values_list('key', 'value'))
+        )
+        return values.get(key, default)
     
     @classmethod
     def set_value(cls, key, value, description=""):
@@ -303,7 +326,14 @@ class Location(models.Model):
     
     @classmethod
     def get_home_location(cls):
-        """Haal de standaard home/depot locatie op"""
+        """
+        Haal de standaard home/depot locatie op (uit de SettingsCache)
+        Gedeelde instantie: alleen lezen, wijzigen via een eigen query.
+        """
+        return SettingsCache.get('home_location', cls._load_home_location)
+    
+    @classmethod
+    def _load_home_location(cls):
         try:
             return cls.objects.get(location_type='home', is_default=True, is_active=True)
         except cls.DoesNotExist:
@@ -319,6 +349,14 @@ class Location(models.Model):
         if not self.address:
             return False
         
+        # Eerst de persistente geocoding cache
+        entry = GeocodeCacheEntry.lookup(self.address)
+        if entry:
+            if not entry.is_found:
+                return False
+            self.latitude, self.longitude = entry.coordinates
+            return True
+        
         try:
             # Gebruik OpenStreetMap Nominatim API (gratis)
             url = "https://nominatim.openstreetmap.org/search"
@@ -341,8 +379,16 @@ class Location(models.Model):
                 result = data[0]
                 self.latitude = float(result['lat'])
                 self.longitude = float(result['lon'])
+                importance = result.get('importance')
+                GeocodeCacheEntry.store(
+                    self.address,
+                    coordinates=(float(result['lat']), float(result['lon'])),
+                    provider='nominatim',
+                    confidence=float(importance) if importance is not None else None
+                )
                 return True
             else:
+                GeocodeCacheEntry.store(self.address, confidence=0.0)
                 return False
                 
         except Exception as e:
@@ -568,7 +614,14 @@ class GoogleMapsConfig(models.Model):
     
     @classmethod
     def get_active_config(cls):
-        """Haal actieve configuratie op of maak standaard configuratie"""
+        """
+        Haal actieve configuratie op of maak standaard configuratie (uit de SettingsCache)
+        Gedeelde instantie: alleen lezen, wijzigen via een eigen query.
+        """
+        return SettingsCache.get('google_maps_config', cls._load_active_config)
+    
+    @classmethod
+    def _load_active_config(cls):
         config = cls.objects.first()
         if not config:
             config = cls.objects.create()
@@ -676,3 +729,336 @@ class GoogleMapsAPILog(models.Model):
             'total_cost': total_cost,
             'daily_average': total_calls / 30 if total_calls > 0 else 0
         }
+
+
+class GeocodeCacheEntry(models.Model):
+    """
+    Persistente geocoding cache, gedeeld door alle processen en workers
+    Sleutel is een genormaliseerd adres (straat/huisnummer/postcode/plaats)
+    """
+    PROVIDER_CHOICES = [
+        ('nominatim', 'OpenStreetMap Nominatim'),
+        ('google', 'Google Maps'),
+        ('manual', 'Handmatig'),
+    ]
+    
+    DEFAULT_TTL = timedelta(days=180)  # Gevonden adressen veranderen zelden
+    NEGATIVE_TTL = timedelta(days=7)   # Niet gevonden: na een week opnieuw proberen
+    
+    # Google location_type -> betrouwbaarheid (0-1)
+    GOOGLE_CONFIDENCE = {
+        'ROOFTOP': 1.0,
+        'RANGE_INTERPOLATED': 0.8,
+        'GEOMETRIC_CENTER': 0.6,
+        'APPROXIMATE': 0.4,
+    }
+    
+    address_key = models.CharField(max_length=255, unique=True, help_text="Genormaliseerd adres (cache sleutel)")
+    address = models.TextField(blank=True, help_text="Oorspronkelijk adres van de eerste lookup")
+    latitude = models.FloatField(null=True, blank=True, help_text="GPS Breedtegraad (leeg = niet gevonden)")
+    longitude = models.FloatField(null=True, blank=True, help_text="GPS Lengtegraad (leeg = niet gevonden)")
+    provider = models.CharField(max_length=20, choices=PROVIDER_CHOICES, blank=True, help_text="Geocoding provider")
+    confidence = models.FloatField(null=True, blank=True, help_text="Betrouwbaarheid van het resultaat (0-1)")
+    hit_count = models.IntegerField(default=0, help_text="Aantal keer uit de cache gehaald")
+    expires_at = models.DateTimeField(db_index=True, help_text="Na dit moment opnieuw geocoden")
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        verbose_name = "Geocode Cache"
+        verbose_name_plural = "Geocode Cache"
+        ordering = ['address_key']
+    
+    def __str__(self):
+        if self.is_found:
+            return f"{self.address_key} -> ({self.latitude}, {self.longitude})"
+        return f"{self.address_key} -> niet gevonden"
+    
+    @property
+    def is_found(self):
+        return self.latitude is not None and self.longitude is not None
+    
+    @property
+    def coordinates(self):
+        return (self.latitude, self.longitude) if self.is_found else None
+    
+    # Afkortingen en varianten die hetzelfde adres opleveren
+    STREET_REPLACEMENTS = [
+        (r'\bstr\b\.?', 'strasse'),
+        (r'str\.', 'strasse'),
+        (r'(?<=\w)str\b', 'strasse'),
+        (r'\bpl\b\.?', 'platz'),
+    ]
+    COUNTRY_WORDS = {'deutschland', 'germany', 'de', 'duitsland'}
+    
+    @classmethod
+    def _normalize_part(cls, value):
+        import re
+        import unicodedata
+        
+        value = (value or '').lower().strip()
+        value = value.replace('ß', 'ss').replace('ä', 'ae').replace('ö', 'oe').replace('ü', 'ue')
+        value = unicodedata.normalize('NFKD', value).encode('ascii', 'ignore').decode('ascii')
+        for pattern, replacement in cls.STREET_REPLACEMENTS:
+            value = re.sub(pattern, replacement, value)
+        value = re.sub(r'[^\w\s-]', ' ', value)
+        # Huisnummer toevoegingen aan elkaar: "12 a" -> "12a"
+        value = re.sub(r'(\d+)\s+([a-z])\b', r'\1\2', value)
+        return ' '.join(value.replace('-', ' ').split())
+    
+    @classmethod
+    def make_key(cls, street, postcode=None, city=None):
+        """
+        Genormaliseerde cache sleutel voor een adres
+        Een vrij adres ("Straat 1, 53111 Bonn, Deutschland") geeft dezelfde sleutel
+        als de losse velden straat/postcode/plaats
+        """
+        import re
+        
+        street = street or ''
+        if not postcode and not city:
+            parts = [p.strip() for p in street.split(',') if p.strip()]
+            # Land achteraan weglaten
+            while parts and cls._normalize_part(parts[-1]) in cls.COUNTRY_WORDS:
+                parts.pop()
+            for index, part in enumerate(parts):
+                match = re.match(r'^(\d{4,5})\s+(.+)$', part)
+                if match:
+                    street = ', '.join(parts[:index])
+                    postcode, city = match.group(1), match.group(2)
+                    break
+            else:
+                street = ', '.join(parts)
+        
+        postcode = re.sub(r'\D', '', postcode or '')
+        key = '|'.join([cls._normalize_part(street), postcode, cls._normalize_part(city)])
+        return key[:255]
+    
+    @classmethod
+    def lookup(cls, street, postcode=None, city=None):
+        """
+        Zoek een geldig cache resultaat
+        Returns: GeocodeCacheEntry of None (ook None bij ontbrekende tabel)
+        """
+        from django.db import DatabaseError
+        
+        key = cls.make_key(street, postcode, city)
+        try:
+            entry = cls.objects.filter(address_key=key, expires_at__gt=timezone.now()).first()
+            if entry:
+                cls.objects.filter(pk=entry.pk).update(hit_count=models.F('hit_count') + 1)
+            return entry
+        except DatabaseError:
+            return None
+    
+    @classmethod
+    def store(cls, street, postcode=None, city=None, coordinates=None, provider='', confidence=None, ttl=None):
+        """
+        Sla een geocoding resultaat op (coordinates=None = niet gevonden)
+        """
+        from django.db import DatabaseError
+        
+        if ttl is None:
+            ttl = cls.DEFAULT_TTL if coordinates else cls.NEGATIVE_TTL
+        latitude, longitude = coordinates if coordinates else (None, None)
+        address = ', '.join(part for part in [street, postcode, city] if part)
+        try:
+            entry, _ = cls.objects.update_or_create(
+                address_key=cls.make_key(street, postcode, city),
+                defaults={
+                    'address': address,
+                    'latitude': latitude,
+                    'longitude': longitude,
+                    'provider': provider,
+                    'confidence': confidence,
+                    'expires_at': timezone.now() + ttl,
+                }
+            )
+            return entry
+        except DatabaseError:
+            return None
+    
+    @classmethod
+    def lookup_many(cls, keys):
+        """
+        Zoek geldige cache resultaten voor meerdere sleutels in één query
+        Returns: dict address_key -> GeocodeCacheEntry
+        """
+        from django.db import DatabaseError
+        
+        keys = list(set(keys))
+        if not keys:
+            return {}
+        try:
+            entries = {
+                entry.address_key: entry
+                for entry in cls.objects.filter(address_key__in=keys, expires_at__gt=timezone.now())
+            }
+            if entries:
+                cls.objects.filter(pk__in=[entry.pk for entry in entries.values()]).update(
+                    hit_count=models.F('hit_count') + 1
+                )
+            return entries
+        except DatabaseError:
+            return {}
+    
+    @classmethod
+    def store_many(cls, results):
+        """
+        Sla meerdere geocoding resultaten op in één bulk upsert
+        
+        Args:
+            results: lijst van dicts met address_key, address, coordinates, provider, confidence
+        """
+        from django.db import DatabaseError
+        
+        now = timezone.now()
+        entries = []
+        for result in results:
+            coordinates = result.get('coordinates')
+            latitude, longitude = coordinates if coordinates else (None, None)
+            entries.append(cls(
+                address_key=result['address_key'][:255],
+                address=result.get('address', ''),
+                latitude=latitude,
+                longitude=longitude,
+                provider=result.get('provider', '') if coordinates else '',
+                confidence=result.get('confidence'),
+                expires_at=now + (cls.DEFAULT_TTL if coordinates else cls.NEGATIVE_TTL),
+            ))
+        if not entries:
+            return 0
+        try:
+            cls.objects.bulk_create(
+                entries,
+                update_conflicts=True,
+                unique_fields=['address_key'],
+                update_fields=['address', 'latitude', 'longitude', 'provider', 'confidence', 'expires_at', 'updated_at'],
+            )
+            return len(entries)
+        except DatabaseError as e:
+            import logging
+            logging.getLogger(__name__).warning(f"Geocode cache bulk opslag mislukt: {e}")
+            return 0
+
+
+class TravelTimeCacheEntry(models.Model):
+    """
+    Persistente reistijd cache per (origin cel, bestemming cel, vertrek uur)
+    Cellen zijn afgeronde coördinaten, zie planning.services.travel_time_cache
+    """
+    origin_cell = models.CharField(max_length=100, help_text="Afgeronde origin coördinaten (lat,lng)")
+    destination_cell = models.CharField(max_length=100, help_text="Afgeronde bestemming coördinaten (lat,lng)")
+    hour_bucket = models.SmallIntegerField(default=-1, help_text="Vertrek uur bucket (-1 = tijdsonafhankelijk)")
+    distance_meters = models.IntegerField(help_text="Afstand in meters")
+    duration_seconds = models.IntegerField(help_text="Reistijd in seconden")
+    source = models.CharField(max_length=20, default='google', help_text="Bron van de reistijd")
+    hit_count = models.IntegerField(default=0, help_text="Aantal keer uit de cache gehaald")
+    last_used_at = models.DateTimeField(default=timezone.now, db_index=True, help_text="Voor LRU eviction")
+    expires_at = models.DateTimeField(db_index=True, help_text="Na dit moment opnieuw ophalen")
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        verbose_name = "Reistijd Cache"
+        verbose_name_plural = "Reistijd Cache"
+        unique_together = ['origin_cell', 'destination_cell', 'hour_bucket']
+    
+    def __str__(self):
+        return f"{self.origin_cell} -> {self.destination_cell} @{self.hour_bucket}: {self.duration_seconds}s"
+
+
+class DailyPlanningStats(models.Model):
+    """
+    Materialized rollup van patiënt statistieken per dag en voertuig
+    vehicle NULL = patiënten zonder toegewezen voertuig. Wijzigingen aan patiënten
+    markeren de dag als `dirty` (zie planning/signals.py); refresh_dirty() rekent
+    alleen die dagen opnieuw uit voordat de statistieken geaggregeerd worden.
+    """
+    date = models.DateField(db_index=True, help_text="Ophaal datum")
+    vehicle = models.ForeignKey(Vehicle, on_delete=models.CASCADE, null=True, blank=True,
+                                related_name='daily_stats', help_text="Toegewezen voertuig (leeg = niet toegewezen)")
+    patient_count = models.IntegerField(default=0)
+    wheelchair_count = models.IntegerField(default=0)
+    failed_geocoding_count = models.IntegerField(default=0)
+    dirty = models.BooleanField(default=False, db_index=True, help_text="Dag moet opnieuw berekend worden")
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        verbose_name = "Dagelijkse Planning Statistiek"
+        verbose_name_plural = "Dagelijkse Planning Statistieken"
+        ordering = ['date']
+    
+    def __str__(self):
+        vehicle = self.vehicle.kenteken if self.vehicle_id else 'niet toegewezen'
+        return f"{self.date} - {vehicle}: {self.patient_count} patiënten"
+    
+    @staticmethod
+    def date_for(moment):
+        """Ophaal datum zoals de `ophaal_tijd__date` lookup hem ziet"""
+        if isinstance(moment, str):
+            from django.utils.dateparse import parse_datetime
+            moment = parse_datetime(moment)
+        if moment is None:
+            return None
+        if not hasattr(moment, 'date'):
+            return moment
+        if timezone.is_aware(moment):
+            moment = timezone.localtime(moment)
+        return moment.date()
+    
+    @classmethod
+    def mark_dirty(cls, dates):
+        """Markeer dagen voor herberekening (goedkoop: één update plus eventueel een placeholder)"""
+        dates = {d for d in dates if d}
+        if not dates:
+            return 0
+        marked = set(cls.objects.filter(date__in=dates).values_list('date', flat=True).distinct())
+        cls.objects.filter(date__in=marked, dirty=False).update(dirty=True)
+        cls.objects.bulk_create([cls(date=d, dirty=True) for d in dates - marked])
+        return len(dates)
+    
+    @classmethod
+    def refresh_dates(cls, dates):
+        """
+        Reken de rollup voor de gegeven dagen opnieuw uit met één GROUP BY query
+        Returns: aantal geschreven rijen
+        """
+        from django.db import transaction
+        from django.db.models import Count, Q
+        
+        dates = sorted({d for d in dates if d})
+        if not dates:
+            return 0
+        
+        rows = (
+            Patient.objects.filter(ophaal_tijd__date__in=dates)
+            .values('ophaal_tijd__date', 'toegewezen_voertuig')
+            .annotate(
+                patient_count=Count('id'),
+                wheelchair_count=Count('id', filter=Q(rolstoel=True)),
+                failed_geocoding_count=Count('id', filter=Q(geocoding_status='failed')),
+            )
+            .order_by()
+        )
+        entries = [
+            cls(
+                date=row['ophaal_tijd__date'],
+                vehicle_id=row['toegewezen_voertuig'],
+                patient_count=row['patient_count'],
+                wheelchair_count=row['wheelchair_count'],
+                failed_geocoding_count=row['failed_geocoding_count'],
+            )
+            for row in rows
+        ]
+        with transaction.atomic():
+            cls.objects.filter(date__in=dates).delete()
+            cls.objects.bulk_create(entries, batch_size=500)
+        return len(entries)
+    
+    @classmethod
+    def refresh_dirty(cls):
+        """Herbereken alleen de dagen die sinds de vorige refresh gewijzigd zijn"""
+        dates = list(cls.objects.filter(dirty=True).values_list('date', flat=True).distinct())
+        if not dates:
+            return 0
+        return cls.refresh_dates(dates)
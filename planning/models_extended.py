@@ -1,5 +1,6 @@
 from django.db import models
 from django.contrib.auth.models import User
+from django.utils import timezone
 from .models import Vehicle, TimeSlot, Patient
 
 
@@ -181,3 +182,163 @@ class MobileAppNotification(models.Model):
     
     def __str__(self):
         return f"{self.vehicle.kenteken} - {self.get_status_display()} - {self.sent_at}"
+
+
+class PlanningJob(models.Model):
+    """
+    Achtergrond job voor planning berekeningen (OptaPlanner, wizard routes)
+    Wordt uitgevoerd door `manage.py run_planning_worker`; voortgang per tijdblok
+    staat in `events` zodat de frontend kan pollen of een SSE stream kan volgen.
+    """
+    JOB_TYPE_CHOICES = [
+        ('optaplanner', 'OptaPlanner planning'),
+        ('wizard_routes', 'Wizard route generatie'),
+        ('google_maps_routes', 'Google Maps route optimalisatie'),
+    ]
+
+    JOB_STATUS_CHOICES = [
+        ('queued', 'In wachtrij'),
+        ('running', 'Bezig'),
+        ('completed', 'Voltooid'),
+        ('failed', 'Mislukt'),
+    ]
+
+    FINISHED_STATUSES = ('completed', 'failed')
+
+    job_type = models.CharField(max_length=30, choices=JOB_TYPE_CHOICES, help_text="Soort planning job")
+    status = models.CharField(max_length=20, choices=JOB_STATUS_CHOICES, default='queued', db_index=True)
+    created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, help_text="Gebruiker die de job startte")
+    session_key = models.CharField(max_length=40, blank=True, help_text="Django sessie van de aanvrager")
+    payload = models.JSONField(default=dict, blank=True, help_text="Request gegevens en sessie snapshot")
+    result = models.JSONField(null=True, blank=True, help_text="JSON response van de planning")
+    session_updates = models.JSONField(default=dict, blank=True, help_text="Sessie wijzigingen voor de aanvrager")
+    session_applied = models.BooleanField(default=False, help_text="Sessie wijzigingen zijn teruggeschreven")
+    error = models.TextField(blank=True)
+    progress_current = models.IntegerField(default=0)
+    progress_total = models.IntegerField(default=0)
+    progress_message = models.CharField(max_length=255, blank=True)
+    events = models.JSONField(default=list, blank=True, help_text="Voortgang events (per tijdblok)")
+    worker_id = models.CharField(max_length=100, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = "Planning Job"
+        verbose_name_plural = "Planning Jobs"
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"{self.get_job_type_display()} #{self.pk} - {self.get_status_display()}"
+
+    @property
+    def is_finished(self):
+        return self.status in self.FINISHED_STATUSES
+
+    @property
+    def progress_percent(self):
+        if self.status == 'completed':
+            return 100
+        if not self.progress_total:
+            return 0
+        return min(99, int(self.progress_current * 100 / self.progress_total))
+
+    @classmethod
+    def claim_next(cls, worker_id):
+        """
+        Claim de oudste wachtende job; de conditionele update zorgt dat twee
+        workers nooit dezelfde job oppakken
+        """
+        for job_id in cls.objects.filter(status='queued').order_by('created_at').values_list('pk', flat=True)[:5]:
+            now = timezone.now()
+            claimed = cls.objects.filter(pk=job_id, status='queued').update(
+                status='running', worker_id=worker_id, started_at=now, heartbeat_at=now
+            )
+            if claimed:
+                return cls.objects.get(pk=job_id)
+        return None
+
+    @classmethod
+    def requeue_stale(cls, timeout):
+        """Zet running jobs zonder heartbeat (gecrashte worker) terug in de wachtrij"""
+        cutoff = timezone.now() - timeout
+        return cls.objects.filter(status='running', heartbeat_at__lt=cutoff).update(
+            status='queued', worker_id='', started_at=None, heartbeat_at=None
+        )
+
+    def add_event(self, message, current=None, total=None, **data):
+        """Sla een voortgang event op (alleen de worker schrijft, dus geen locking nodig)"""
+        now = timezone.now()
+        if current is not None:
+            self.progress_current = current
+        if total is not None:
+            self.progress_total = total
+        self.progress_message = str(message)[:255]
+        self.events = list(self.events or []) + [dict(
+            data,
+            id=len(self.events or []) + 1,
+            message=self.progress_message,
+            current=self.progress_current,
+            total=self.progress_total,
+            at=now.isoformat(),
+        )]
+        self.heartbeat_at = now
+        self.save(update_fields=['progress_current', 'progress_total', 'progress_message', 'events', 'heartbeat_at'])
+
+    def finish(self, status, result=None, session_updates=None, error=''):
+        self.status = status
+        self.result = result
+        self.session_updates = session_updates or {}
+        self.error = error
+        self.finished_at = timezone.now()
+        if status == 'completed':
+            self.progress_current = self.progress_total
+        self.save(update_fields=['status', 'result', 'session_updates', 'error', 'finished_at', 'progress_current'])
+
+    def as_dict(self, since=0):
+        return {
+            'job_id': self.pk,
+            'job_type': self.job_type,
+            'status': self.status,
+            'progress': {
+                'current': self.progress_current,
+                'total': self.progress_total,
+                'percent': self.progress_percent,
+                'message': self.progress_message,
+            },
+            'events': [event for event in (self.events or []) if event.get('id', 0) > since],
+            'result': self.result if self.is_finished else None,
+            'error': self.error,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None,
+        }
+
+
+class WizardStateEntry(models.Model):
+    """
+    Eén onderdeel van de wizard/planning state van een gebruiker
+    De sessie bevat alleen het state id; de data (upload, toewijzingen, routes)
+    staat hier als zlib gecomprimeerde JSON, per onderdeel apart op te halen en
+    bij te werken. Zie planning/services/wizard_state.py.
+    """
+    state_id = models.UUIDField(db_index=True, help_text="Id uit de sessie (wizard_state_id)")
+    section = models.CharField(max_length=50, help_text="Onderdeel, bijv. wizard_upload_data")
+    payload = models.BinaryField(help_text="zlib gecomprimeerde JSON")
+    size = models.PositiveIntegerField(default=0, help_text="Ongecomprimeerde grootte in bytes")
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
+    class Meta:
+        verbose_name = "Wizard State"
+        verbose_name_plural = "Wizard States"
+        unique_together = ('state_id', 'section')
+
+    def __str__(self):
+        return f"{self.state_id} - {self.section} ({self.size} bytes)"
+
+    @classmethod
+    def purge_older_than(cls, age):
+        """Verwijder state die langer dan `age` (timedelta) niet is bijgewerkt"""
+        deleted, _ = cls.objects.filter(updated_at__lt=timezone.now() - age).delete()
+        return deleted
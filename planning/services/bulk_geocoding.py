@@ -0,0 +1,289 @@
+"""
+Bulk geocoding pipeline
+Ontdubbelt adressen, gebruikt eerst de persistente cache (GeocodeCacheEntry) en
+geocodeert de rest parallel met een token bucket per provider en een gedeelde
+requests.Session. Patiënten worden aan het eind met één bulk_update opgeslagen.
+
+Provider URLs zijn instelbaar (settings of constructor), zodat de pipeline tegen
+een lokale stub server getest kan worden (zie geocoding_stub.py).
+"""
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+from django.conf import settings
+from django.utils import timezone
+
+from planning.models import DailyPlanningStats, GeocodeCacheEntry, Patient
+from .dashboard import DashboardSnapshot
+from .rate_limit import get_bucket
+
+logger = logging.getLogger(__name__)
+
+
+class GeocodeProvider:
+    """
+    Basis voor een geocoding provider
+    parse() geeft (coordinates, confidence); confidence 0.0 zonder coördinaten
+    betekent dat het adres niet bestaat, (None, None) dat de request mislukte.
+    """
+    name = ''
+    default_url = ''
+    default_rate = 1.0
+    default_concurrency = 1
+
+    def __init__(self, base_url=None, rate=None, max_concurrency=None, timeout=10):
+        prefix = f"GEOCODING_{self.name.upper()}"
+        self.base_url = base_url or getattr(settings, f"{prefix}_URL", self.default_url)
+        self.rate = rate or getattr(settings, f"{prefix}_RATE", self.default_rate)
+        self.max_concurrency = max_concurrency or getattr(settings, f"{prefix}_CONCURRENCY", self.default_concurrency)
+        self.timeout = timeout
+        self.bucket = get_bucket(self.name, self.rate, capacity=max(1, self.max_concurrency))
+        self._semaphore = threading.BoundedSemaphore(self.max_concurrency)
+
+    def request_params(self, address):
+        raise NotImplementedError
+
+    def parse(self, data):
+        raise NotImplementedError
+
+    def geocode(self, session, address, deadline=None):
+        """
+        Geocodeer één adres binnen de rate limit
+        Returns: (coordinates, confidence) of None als de deadline verstreek
+        """
+        if not self.bucket.acquire(deadline):
+            return None
+        params, headers = self.request_params(address)
+        with self._semaphore:
+            try:
+                response = session.get(self.base_url, params=params, headers=headers, timeout=self.timeout)
+                if response.status_code != 200:
+                    logger.warning(f"{self.name} geocoding HTTP {response.status_code} voor '{address}'")
+                    return None, None
+                return self.parse(response.json())
+            except requests.RequestException as e:
+                logger.error(f"Network error geocoding '{address}' via {self.name}: {e}")
+                return None, None
+            except (ValueError, KeyError, IndexError) as e:
+                logger.error(f"Data parsing error for '{address}' via {self.name}: {e}")
+                return None, None
+
+
+class NominatimProvider(GeocodeProvider):
+    """OpenStreetMap Nominatim: maximaal 1 request per seconde, niet parallel"""
+    name = 'nominatim'
+    default_url = 'https://nominatim.openstreetmap.org/search'
+    default_rate = 1.0
+    default_concurrency = 1
+
+    def request_params(self, address):
+        params = {
+            'q': address,
+            'format': 'json',
+            'limit': 1,
+            'countrycodes': 'de',
+        }
+        headers = {
+            'User-Agent': 'Routemeister/1.0 (contact@routemeister.com)'  # Vereist voor Nominatim
+        }
+        return params, headers
+
+    def parse(self, data):
+        if not data:
+            return None, 0.0
+        result = data[0]
+        confidence = result.get('importance')
+        return (float(result['lat']), float(result['lon'])), float(confidence) if confidence is not None else None
+
+
+class GoogleGeocodeProvider(GeocodeProvider):
+    """Google Geocoding API: hogere QPS en parallelle requests toegestaan"""
+    name = 'google'
+    default_url = 'https://maps.googleapis.com/maps/api/geocode/json'
+    default_rate = 25.0
+    default_concurrency = 8
+
+    def __init__(self, api_key, **kwargs):
+        super().__init__(**kwargs)
+        self.api_key = api_key
+
+    def request_params(self, address):
+        return {'address': address, 'key': self.api_key, 'region': 'de'}, {}
+
+    def parse(self, data):
+        status = data.get('status')
+        if status == 'ZERO_RESULTS':
+            return None, 0.0
+        if status != 'OK' or not data.get('results'):
+            logger.warning(f"Google geocoding status {status}: {data.get('error_message', '')}")
+            return None, None
+        geometry = data['results'][0]['geometry']
+        location = geometry['location']
+        confidence = GeocodeCacheEntry.GOOGLE_CONFIDENCE.get(geometry.get('location_type'))
+        return (location['lat'], location['lng']), confidence
+
+
+def default_providers(google_api_key=None):
+    """Nominatim eerst (gratis), Google als backup als er een API key is"""
+    providers = [NominatimProvider()]
+    if google_api_key:
+        providers.append(GoogleGeocodeProvider(google_api_key))
+    return providers
+
+
+class BulkGeocoder:
+    """
+    Geocodeer veel adressen tegelijk
+
+    Elk uniek adres (GeocodeCacheEntry.make_key) wordt hooguit één keer opgevraagd.
+    Adressen die na `time_budget` seconden nog niet aan de beurt waren krijgen
+    source 'timeout' en worden niet gecached, zodat een volgende run ze oppakt.
+    """
+
+    def __init__(self, providers=None, time_budget=150, session=None, default_country='Deutschland'):
+        self.providers = providers if providers is not None else default_providers(
+            getattr(settings, 'GOOGLE_MAPS_API_KEY', None)
+        )
+        self.time_budget = time_budget
+        self.default_country = default_country
+        self.max_workers = max([provider.max_concurrency for provider in self.providers] or [1])
+        self.session = session or self._create_session(self.max_workers)
+        self.stats = {}
+
+    @staticmethod
+    def _create_session(pool_size):
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=max(pool_size, 4))
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        return session
+
+    def format_address(self, street, postcode=None, city=None):
+        parts = [part.strip() for part in (street, postcode, city) if part and str(part).strip()]
+        if parts:
+            parts.append(self.default_country)
+        return ', '.join(parts)
+
+    def geocode_many(self, addresses):
+        """
+        Args:
+            addresses: iterable van (straat, postcode, plaats) tuples
+
+        Returns:
+            dict address_key -> {'coordinates', 'provider', 'confidence', 'source'}
+            source is 'cache', 'api', 'not_found', 'error' of 'timeout'
+        """
+        started = time.monotonic()
+        deadline = started + self.time_budget if self.time_budget else None
+
+        # 1. Ontdubbelen
+        unique = {}
+        for street, postcode, city in addresses:
+            if not street and not city:
+                continue
+            key = GeocodeCacheEntry.make_key(street, postcode, city)
+            unique.setdefault(key, self.format_address(street, postcode, city))
+
+        # 2. Persistente cache in één query
+        results = {}
+        for key, entry in GeocodeCacheEntry.lookup_many(unique.keys()).items():
+            results[key] = {
+                'coordinates': entry.coordinates,
+                'provider': entry.provider,
+                'confidence': entry.confidence,
+                'source': 'cache' if entry.is_found else 'not_found',
+            }
+        cache_hits = len(results)
+        missing = [key for key in unique if key not in results]
+
+        # 3. Parallel geocoden binnen de rate limits
+        if missing and self.providers:
+            workers = min(self.max_workers, len(missing))
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                for key, result in zip(missing, pool.map(lambda k: self._geocode_one(unique[k], deadline), missing)):
+                    results[key] = result
+
+        # 4. Definitieve antwoorden in één keer cachen
+        GeocodeCacheEntry.store_many([
+            dict(result, address_key=key, address=unique[key])
+            for key, result in results.items()
+            if key in missing and result['source'] in ('api', 'not_found')
+        ])
+
+        sources = [result['source'] for result in results.values()]
+        self.stats = {
+            'unique_addresses': len(unique),
+            'cache_hits': cache_hits,
+            'geocoded': sources.count('api'),
+            'not_found': sources.count('not_found'),
+            'errors': sources.count('error'),
+            'timeouts': sources.count('timeout'),
+            'elapsed_seconds': round(time.monotonic() - started, 2),
+        }
+        logger.info(f"Bulk geocoding: {self.stats}")
+        return results
+
+    def _geocode_one(self, address, deadline):
+        confidence = None
+        for provider in self.providers:
+            outcome = provider.geocode(self.session, address, deadline)
+            if outcome is None:
+                return {'coordinates': None, 'provider': '', 'confidence': None, 'source': 'timeout'}
+            coordinates, confidence = outcome
+            if coordinates:
+                return {'coordinates': coordinates, 'provider': provider.name, 'confidence': confidence, 'source': 'api'}
+        # Alleen 'not_found' als de laatste provider het adres zeker niet kent
+        source = 'not_found' if confidence == 0.0 else 'error'
+        return {'coordinates': None, 'provider': '', 'confidence': confidence, 'source': source}
+
+    def geocode_patients(self, patients, default_coordinates=None):
+        """
+        Geocodeer patiënten en sla ze op met één bulk_update
+
+        Args:
+            patients: iterable van Patient objecten
+            default_coordinates: functie plaats -> (lat, lon) voor niet gevonden adressen
+
+        Returns:
+            (geocoded_count, failed_count)
+        """
+        patients = [p for p in patients if not (p.latitude and p.longitude)]
+        results = self.geocode_many((p.straat, p.postcode, p.plaats) for p in patients)
+
+        now = timezone.now().strftime('%Y-%m-%d %H:%M')
+        changed = []
+        geocoded_count = 0
+        failed_count = 0
+        for patient in patients:
+            result = results.get(GeocodeCacheEntry.make_key(patient.straat, patient.postcode, patient.plaats))
+            if not result or result['source'] in ('timeout', 'error'):
+                # Volgende run opnieuw proberen
+                continue
+            if result['coordinates']:
+                patient.latitude, patient.longitude = result['coordinates']
+                patient.geocoding_status = 'success'
+                patient.geocoding_notes = f"Geocoded op {now}"
+                geocoded_count += 1
+            else:
+                patient.geocoding_status = 'failed'
+                patient.geocoding_notes = f"Adres '{patient.straat}, {patient.postcode} {patient.plaats}' niet gevonden."
+                if default_coordinates:
+                    patient.latitude, patient.longitude = default_coordinates(patient.plaats)
+                    patient.geocoding_notes += f" Standaard locatie voor {patient.plaats} gebruikt."
+                failed_count += 1
+            changed.append(patient)
+
+        if changed:
+            Patient.objects.bulk_update(
+                changed, ['latitude', 'longitude', 'geocoding_status', 'geocoding_notes'], batch_size=500
+            )
+            # bulk_update stuurt geen post_save signals
+            DashboardSnapshot.invalidate()
+            DailyPlanningStats.mark_dirty({DailyPlanningStats.date_for(p.ophaal_tijd) for p in changed})
+        logger.info(f"Bulk geocoding patiënten: {geocoded_count} geocoded, {failed_count} niet gevonden, "
+                    f"{len(patients) - len(changed)} uitgesteld")
+        return geocoded_count, failed_count
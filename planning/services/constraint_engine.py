@@ -0,0 +1,469 @@
+"""
+Constraint engine voor PlanningConstraint
+De actieve PlanningConstraint records (type, HARD/SOFT, penalty, parameters)
+worden gecompileerd naar score functies over route statistieken. Een
+ScoreDirector houdt per route die statistieken en de score bij, zodat een zet
+(stop invoegen, verwijderen of wisselen) in O(aantal constraints) gescoord
+wordt in plaats van alle routes opnieuw door te rekenen, zoals de incrementele
+score berekening van OptaPlanner.
+
+Werkt, net als de SavingsSolver, op indices van een DistanceMatrix en plain
+data voertuigen (VehicleSpec), zodat het ook in planning workers draait.
+
+Score: (hard, soft), lager = beter; een oplossing is geldig als hard == 0.
+"""
+import logging
+from collections import namedtuple
+
+from .distance_matrix import DistanceMatrix
+from .settings_cache import SettingsCache
+
+logger = logging.getLogger(__name__)
+
+# Gebruikt zolang er geen PlanningConstraint records zijn (zie setup_constraints)
+DEFAULT_CONSTRAINTS = [
+    {'name': 'Voertuig Capaciteit', 'constraint_type': 'vehicle_capacity',
+     'weight': 'HARD', 'penalty': 1000000, 'parameters': {}},
+    {'name': 'Voertuig Speciale Capaciteit', 'constraint_type': 'vehicle_special_capacity',
+     'weight': 'HARD', 'penalty': 1000000, 'parameters': {}},
+    {'name': 'Voertuig Rijtijd', 'constraint_type': 'vehicle_drive_time',
+     'weight': 'HARD', 'penalty': 1000000, 'parameters': {}},
+    {'name': 'Afstand Kosten', 'constraint_type': 'distance_cost',
+     'weight': 'SOFT', 'penalty': 1, 'parameters': {'km_rate': 1.0}},
+]
+
+EPSILON = 1e-6
+
+# Constraint types (PlanningConstraint.CONSTRAINT_TYPES) zonder score functie omdat
+# de patiënt gegevens ontbreken: Patient heeft geen DRV of voorkeurs voertuig veld.
+# Records van deze types worden met één waarschuwing per proces overgeslagen.
+MISSING_PATIENT_DATA = {
+    'preferred_vehicle': 'voorkeurs voertuig',
+    'drv_count': 'DRV',
+}
+_warned_missing = set()
+
+
+class Score(namedtuple('Score', 'hard soft')):
+    """Hard/soft score, lager = beter"""
+    __slots__ = ()
+
+    def __add__(self, other):
+        return Score(self.hard + other.hard, self.soft + other.soft)
+
+    def __sub__(self, other):
+        return Score(self.hard - other.hard, self.soft - other.soft)
+
+    @property
+    def feasible(self):
+        return self.hard <= EPSILON
+
+
+class Delta(namedtuple('Delta', 'hard soft distance')):
+    """Verandering van de totale score door een zet; distance is de tie-breaker"""
+    __slots__ = ()
+
+    def __add__(self, other):
+        return Delta(self.hard + other.hard, self.soft + other.soft, self.distance + other.distance)
+
+    def __sub__(self, other):
+        return Delta(self.hard - other.hard, self.soft - other.soft, self.distance - other.distance)
+
+    def improves(self):
+        if abs(self.hard) > EPSILON:
+            return self.hard < 0
+        if abs(self.soft) > EPSILON:
+            return self.soft < 0
+        return self.distance < -EPSILON
+
+
+class RouteStats:
+    """Samenvatting van één route waar alle constraints op scoren"""
+    __slots__ = ('count', 'special', 'distance', 'travel')
+
+    def __init__(self, count=0, special=0, distance=0.0, travel=0.0):
+        self.count = count
+        self.special = special
+        self.distance = distance
+        self.travel = travel
+
+    def copy(self):
+        return RouteStats(self.count, self.special, self.distance, self.travel)
+
+
+# ----------------------------------------------------------------------
+# Score functies per constraint_type: (stats, vehicle, parameters, service_time) -> overtreding
+# Parameters zijn de standaard als het voertuig zelf geen limiet heeft.
+# Score functies moeten niet-dalend zijn in afstand en reistijd:
+# ScoreDirector.best_insertion gebruikt dat als ondergrens.
+# ----------------------------------------------------------------------
+
+SCORERS = {}
+
+
+def scorer(constraint_type):
+    def register(func):
+        SCORERS[constraint_type] = func
+        return func
+    return register
+
+
+@scorer('vehicle_capacity')
+def _vehicle_capacity(stats, vehicle, parameters, service_time):
+    limit = vehicle.capacity if vehicle.capacity is not None else parameters.get('max_capacity')
+    return max(0, stats.count - limit) if limit is not None else 0
+
+
+@scorer('vehicle_special_capacity')
+def _vehicle_special_capacity(stats, vehicle, parameters, service_time):
+    limit = vehicle.special_capacity if vehicle.special_capacity is not None else parameters.get('max_special_capacity')
+    return max(0, stats.special - limit) if limit is not None else 0
+
+
+@scorer('vehicle_drive_time')
+def _vehicle_drive_time(stats, vehicle, parameters, service_time):
+    limit = vehicle.max_minutes or parameters.get('max_drive_time_minutes')
+    if not limit or not stats.count:
+        return 0
+    return max(0.0, stats.travel + stats.count * service_time - limit)
+
+
+@scorer('distance_cost')
+def _distance_cost(stats, vehicle, parameters, service_time):
+    return stats.distance * float(parameters.get('km_rate', 1.0))
+
+
+class CompiledConstraint:
+    """Eén PlanningConstraint als score functie"""
+    __slots__ = ('name', 'constraint_type', 'hard', 'penalty', 'parameters', 'func')
+
+    def __init__(self, name, constraint_type, hard, penalty, parameters, func):
+        self.name = name
+        self.constraint_type = constraint_type
+        self.hard = hard
+        self.penalty = penalty
+        self.parameters = parameters
+        self.func = func
+
+    def violation(self, stats, vehicle, service_time):
+        return self.func(stats, vehicle, self.parameters, service_time)
+
+
+class ConstraintEngine:
+    """
+    Gecompileerde constraints
+
+        engine = ConstraintEngine.from_database(service_time=5)
+        engine.route_score(stats, vehicle)
+        director = engine.director(matrix, vehicles, routes)
+    """
+
+    def __init__(self, constraints, service_time=5):
+        self.service_time = service_time
+        self.constraints = []
+        for spec in constraints:
+            if spec['constraint_type'] in MISSING_PATIENT_DATA:
+                _warn_missing_data(spec)
+                continue
+            func = SCORERS.get(spec['constraint_type'])
+            if func is None:
+                logger.warning(f"Onbekend constraint type '{spec['constraint_type']}' ({spec.get('name')}) genegeerd")
+                continue
+            self.constraints.append(CompiledConstraint(
+                spec.get('name') or spec['constraint_type'],
+                spec['constraint_type'],
+                spec.get('weight', 'HARD') == 'HARD',
+                spec.get('penalty', 1),
+                spec.get('parameters') or {},
+                func,
+            ))
+        # Platte tuples voor de hot loop van route_score
+        self._compiled = [(c.func, c.parameters, c.hard, c.penalty) for c in self.constraints]
+
+    @staticmethod
+    def load_specs():
+        """Actieve PlanningConstraint records als plain data (picklable voor workers)"""
+        return SettingsCache.get('planning_constraints', _load_constraint_specs)
+
+    @classmethod
+    def from_database(cls, service_time=5):
+        return cls(cls.load_specs(), service_time)
+
+    def route_score(self, stats, vehicle):
+        hard = soft = 0
+        service_time = self.service_time
+        for func, parameters, is_hard, penalty in self._compiled:
+            violation = func(stats, vehicle, parameters, service_time)
+            if violation:
+                if is_hard:
+                    hard += violation * penalty
+                else:
+                    soft += violation * penalty
+        return Score(hard, soft)
+
+    def explain(self, stats, vehicle):
+        """Score per constraint, voor weergave bij een route"""
+        return [
+            {
+                'name': constraint.name,
+                'constraint_type': constraint.constraint_type,
+                'weight': 'HARD' if constraint.hard else 'SOFT',
+                'violation': round(violation, 2),
+                'score': round(violation * constraint.penalty, 2),
+            }
+            for constraint in self.constraints
+            for violation in [constraint.violation(stats, vehicle, self.service_time)]
+        ]
+
+    def director(self, matrix, vehicles, routes=None, wheelchair=None):
+        return ScoreDirector(self, matrix, vehicles, routes, wheelchair)
+
+
+def _warn_missing_data(spec):
+    """Eén keer per proces per constraint type"""
+    constraint_type = spec['constraint_type']
+    if constraint_type in _warned_missing:
+        return
+    _warned_missing.add(constraint_type)
+    logger.warning(
+        f"Constraint '{spec.get('name') or constraint_type}' genegeerd: patiënten hebben geen "
+        f"{MISSING_PATIENT_DATA[constraint_type]} gegevens"
+    )
+
+
+def _load_constraint_specs():
+    from planning.models import PlanningConstraint
+    rows = list(PlanningConstraint.objects.all())
+    if not rows:
+        return list(DEFAULT_CONSTRAINTS)
+    return [
+        {'name': row.name, 'constraint_type': row.constraint_type, 'weight': row.weight,
+         'penalty': row.penalty, 'parameters': row.parameters or {}}
+        for row in rows if row.is_active
+    ]
+
+
+def _as_rows(values):
+    if hasattr(values, 'tolist'):
+        return values.tolist()
+    return [[float(value) for value in row] for row in values]
+
+
+class ScoreDirector:
+    """
+    Incrementele score over een set routes
+
+        director = engine.director(matrix, vehicles, {vehicle_key: [stop, ...]})
+        delta = director.remove_delta(a, 2) + director.insert_delta(b, stop, 0)
+        if delta.improves():
+            director.remove(a, 2)
+            director.insert(b, stop, 0)
+
+    Routes zijn open routes vanaf het depot (zoals SavingsSolver; voor HALEN de
+    omgekeerde volgorde, de matrix is symmetrisch). Stops zijn matrix indices;
+    wheelchair is een dict per index.
+    """
+
+    def __init__(self, engine, matrix, vehicles, routes=None, wheelchair=None):
+        self.engine = engine
+        # Python lijsten: element toegang is veel sneller dan op numpy arrays
+        self.distances = _as_rows(matrix.distances)
+        self.travel_times = _as_rows(matrix.travel_times)
+        self.depot = matrix.index(DistanceMatrix.DEPOT)
+        self.vehicles = {vehicle.key: vehicle for vehicle in vehicles}
+        self.wheelchair = wheelchair or {}
+        self.routes = {}
+        self.stats = {}
+        self.scores = {}
+        # (index, stop) -> Delta per route, geldig tot de route wijzigt
+        self._replace_deltas = {}
+        self.score = Score(0, 0)
+        routes = routes or {}
+        for key in self.vehicles:
+            self.set_route(key, routes.get(key, []))
+
+    # ------------------------------------------------------------------
+    # Volledige (her)berekening
+    # ------------------------------------------------------------------
+
+    def _special(self, stop):
+        return 1 if self.wheelchair.get(stop) else 0
+
+    def compute_stats(self, key, route):
+        stats = RouteStats(count=len(route))
+        previous = self.depot
+        for stop in route:
+            stats.special += self._special(stop)
+            stats.distance += self.distances[previous][stop]
+            stats.travel += self.travel_times[previous][stop]
+            previous = stop
+        return stats
+
+    def set_route(self, key, route):
+        """Vervang een route volledig (na intra-route zetten zoals 2-opt)"""
+        stats = self.compute_stats(key, route)
+        self._store(key, list(route), stats)
+
+    def _store(self, key, route, stats):
+        score = self.engine.route_score(stats, self.vehicles[key])
+        old = self.scores.get(key, Score(0, 0))
+        self.routes[key] = route
+        self.stats[key] = stats
+        self.scores[key] = score
+        self._replace_deltas[key] = {}
+        self.score = self.score - old + score
+
+    # ------------------------------------------------------------------
+    # Delta's
+    # ------------------------------------------------------------------
+
+    def _delta(self, key, stats):
+        score = self.engine.route_score(stats, self.vehicles[key])
+        old = self.scores[key]
+        return Delta(score.hard - old.hard, score.soft - old.soft, stats.distance - self.stats[key].distance)
+
+    def _stats_after_insert(self, key, stop, position):
+        route = self.routes[key]
+        distances, times = self.distances, self.travel_times
+        previous = route[position - 1] if position > 0 else self.depot
+        stats = self.stats[key].copy()
+        stats.count += 1
+        stats.special += self._special(stop)
+        stats.distance += distances[previous][stop]
+        stats.travel += times[previous][stop]
+        if position < len(route):
+            following = route[position]
+            stats.distance += distances[stop][following] - distances[previous][following]
+            stats.travel += times[stop][following] - times[previous][following]
+        return stats
+
+    def _stats_after_remove(self, key, index):
+        route = self.routes[key]
+        distances, times = self.distances, self.travel_times
+        stop = route[index]
+        previous = route[index - 1] if index > 0 else self.depot
+        stats = self.stats[key].copy()
+        stats.count -= 1
+        stats.special -= self._special(stop)
+        stats.distance -= distances[previous][stop]
+        stats.travel -= times[previous][stop]
+        if index + 1 < len(route):
+            following = route[index + 1]
+            stats.distance += distances[previous][following] - distances[stop][following]
+            stats.travel += times[previous][following] - times[stop][following]
+        return stats
+
+    def _stats_after_replace(self, key, index, stop):
+        route = self.routes[key]
+        distances, times = self.distances, self.travel_times
+        old = route[index]
+        previous = route[index - 1] if index > 0 else self.depot
+        stats = self.stats[key].copy()
+        stats.special += self._special(stop) - self._special(old)
+        stats.distance += distances[previous][stop] - distances[previous][old]
+        stats.travel += times[previous][stop] - times[previous][old]
+        if index + 1 < len(route):
+            following = route[index + 1]
+            stats.distance += distances[stop][following] - distances[old][following]
+            stats.travel += times[stop][following] - times[old][following]
+        return stats
+
+    def insert_delta(self, key, stop, position):
+        return self._delta(key, self._stats_after_insert(key, stop, position))
+
+    def best_insertion(self, key, stop, base=None):
+        """
+        Beste positie om `stop` in route `key` in te voegen
+        Met `base` (bijv. de remove_delta van de bron route) alleen als de totale
+        zet verbetert. Eerst wordt een ondergrens gescoord (kleinste omweg in
+        afstand en reistijd over alle posities): past die niet, dan wordt geen
+        enkele positie bekeken.
+
+        Returns: (delta, positie) of None
+        """
+        route = self.routes[key]
+        distances, times = self.distances, self.travel_times
+        detours = []
+        previous = self.depot
+        for following in route:
+            detours.append((
+                distances[previous][stop] + distances[stop][following] - distances[previous][following],
+                times[previous][stop] + times[stop][following] - times[previous][following],
+            ))
+            previous = following
+        detours.append((distances[previous][stop], times[previous][stop]))
+
+        stats = self.stats[key].copy()
+        stats.count += 1
+        stats.special += self._special(stop)
+        distance, travel = stats.distance, stats.travel
+
+        stats.distance = distance + min(detour[0] for detour in detours)
+        stats.travel = travel + min(detour[1] for detour in detours)
+        bound = self._delta(key, stats)
+        if base is not None:
+            bound = base + bound
+        if not bound.improves():
+            return None
+
+        best = None
+        for position, (extra_distance, extra_travel) in enumerate(detours):
+            stats.distance = distance + extra_distance
+            stats.travel = travel + extra_travel
+            delta = self._delta(key, stats)
+            total = base + delta if base is not None else delta
+            if (base is not None and not total.improves()) or (best is not None and not (total - best[0]).improves()):
+                continue
+            best = (total, position)
+        return best
+
+    def remove_delta(self, key, index):
+        return self._delta(key, self._stats_after_remove(key, index))
+
+    def swap_delta(self, key_a, index_a, key_b, index_b):
+        """Wissel twee stops; binnen één route wordt die route opnieuw doorgerekend"""
+        route_a, route_b = self.routes[key_a], self.routes[key_b]
+        if key_a == key_b:
+            swapped = list(route_a)
+            swapped[index_a], swapped[index_b] = swapped[index_b], swapped[index_a]
+            return self._delta(key_a, self.compute_stats(key_a, swapped))
+        return (self._replace_delta(key_a, index_a, route_b[index_b])
+                + self._replace_delta(key_b, index_b, route_a[index_a]))
+
+    def _replace_delta(self, key, index, stop):
+        """Delta van één kant van een swap; onthouden zolang de route niet wijzigt"""
+        cache = self._replace_deltas[key]
+        delta = cache.get((index, stop))
+        if delta is None:
+            delta = cache[(index, stop)] = self._delta(key, self._stats_after_replace(key, index, stop))
+        return delta
+
+    # ------------------------------------------------------------------
+    # Zetten uitvoeren
+    # ------------------------------------------------------------------
+
+    def insert(self, key, stop, position):
+        stats = self._stats_after_insert(key, stop, position)
+        route = self.routes[key]
+        self._store(key, route[:position] + [stop] + route[position:], stats)
+
+    def remove(self, key, index):
+        stats = self._stats_after_remove(key, index)
+        route = self.routes[key]
+        self._store(key, route[:index] + route[index + 1:], stats)
+
+    def swap(self, key_a, index_a, key_b, index_b):
+        route_a, route_b = self.routes[key_a], self.routes[key_b]
+        if key_a == key_b:
+            swapped = list(route_a)
+            swapped[index_a], swapped[index_b] = swapped[index_b], swapped[index_a]
+            self.set_route(key_a, swapped)
+            return
+        stop_a, stop_b = route_a[index_a], route_b[index_b]
+        stats_a = self._stats_after_replace(key_a, index_a, stop_b)
+        stats_b = self._stats_after_replace(key_b, index_b, stop_a)
+        self._store(key_a, route_a[:index_a] + [stop_b] + route_a[index_a + 1:], stats_a)
+        self._store(key_b, route_b[:index_b] + [stop_a] + route_b[index_b + 1:], stats_b)
+
+    def explain(self, key):
+        return self.engine.explain(self.stats[key], self.vehicles[key])
@@ -0,0 +1,181 @@
+"""
+Dashboard snapshot
+Alle dashboard data van één dag in een vast aantal queries (voertuig tellingen,
+patiënten met voertuig, home locatie en Google Maps config), gegroepeerd in Python.
+De snapshot wordt gecachet en ongeldig gemaakt zodra patiënten of voertuigen
+wijzigen (zie planning/signals.py).
+"""
+import logging
+from datetime import date
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Q
+
+from planning.models import GoogleMapsConfig, Location, Patient, Vehicle
+
+logger = logging.getLogger(__name__)
+
+
+class DashboardSnapshot:
+    """
+    Dashboard data voor één dag
+
+        snapshot = DashboardSnapshot.get()      # gecachet
+        snapshot = DashboardSnapshot.build()    # altijd vers uit de database
+        DashboardSnapshot.invalidate()          # na wijzigingen in toewijzingen
+    """
+
+    CACHE_PREFIX = 'dashboard_snapshot'
+    VERSION_KEY = 'dashboard_snapshot:version'
+    ACTIVE_STATUSES = ('gepland', 'onderweg')
+    UPCOMING_STOPS = 8
+
+    def __init__(self, day=None):
+        self.day = day or date.today()
+        self.available_vehicles = 0
+        self.total_vehicles = 0
+        self.patients = []
+        self.vehicles_with_patients = []
+        self.active_timeslots = []
+        self.home_location = None
+        self.google_maps_api_key = ''
+
+    # ------------------------------------------------------------------
+    # Opbouwen
+    # ------------------------------------------------------------------
+
+    @classmethod
+    def build(cls, day=None):
+        snapshot = cls(day)
+        snapshot._load_vehicle_counts()
+        snapshot._load_patients()
+        snapshot._group_by_vehicle()
+        snapshot._collect_timeslots()
+        snapshot._load_config()
+        return snapshot
+
+    def _load_vehicle_counts(self):
+        counts = Vehicle.objects.aggregate(
+            total=Count('id'),
+            available=Count('id', filter=Q(status='beschikbaar')),
+        )
+        self.total_vehicles = counts['total']
+        self.available_vehicles = counts['available']
+
+    def _load_patients(self):
+        self.patients = list(
+            Patient.objects.filter(
+                ophaal_tijd__date=self.day,
+                toegewezen_voertuig__isnull=False,
+                status__in=self.ACTIVE_STATUSES,
+            ).select_related('toegewezen_voertuig').order_by('ophaal_tijd')
+        )
+
+    def _group_by_vehicle(self):
+        """Patiënten per beschikbaar voertuig, met groepen per ophaal/eind tijd"""
+        groups = {}
+        for patient in self.patients:
+            vehicle = patient.toegewezen_voertuig
+            if vehicle.status != 'beschikbaar':
+                continue
+            group = groups.setdefault(vehicle.pk, {
+                'vehicle': vehicle,
+                'patients': [],
+                'patients_by_timeslot': {},
+            })
+            group['patients'].append(patient)
+            if patient.ophaal_tijd:
+                group['patients_by_timeslot'].setdefault(
+                    f"{patient.ophaal_tijd.strftime('%H:%M')} - halen", []
+                ).append(patient)
+            if patient.eind_behandel_tijd:
+                group['patients_by_timeslot'].setdefault(
+                    f"{patient.eind_behandel_tijd.strftime('%H:%M')} - brengen", []
+                ).append(patient)
+
+        self.vehicles_with_patients = []
+        for vehicle_id in sorted(groups):
+            group = groups[vehicle_id]
+            group['patient_count'] = len(group['patients'])
+            self.vehicles_with_patients.append(group)
+
+    def _collect_timeslots(self):
+        """Unieke ophaal/eind tijden van vandaag voor de tijdlijn"""
+        unique_times = {}
+        for patient in self.patients:
+            for moment, slot_type, icon in ((patient.ophaal_tijd, 'halen', '🚐'),
+                                            (patient.eind_behandel_tijd, 'brengen', '🏠')):
+                if not moment:
+                    continue
+                unique_times.setdefault(f"{moment.strftime('%H:%M')}_{slot_type}", {
+                    'time': moment,
+                    'type': slot_type,
+                    'patient_name': patient.naam,
+                    'icon': icon,
+                })
+        self.active_timeslots = sorted(unique_times.values(), key=lambda slot: slot['time'])
+
+    def _load_config(self):
+        try:
+            config = GoogleMapsConfig.get_active_config()
+            self.google_maps_api_key = config.api_key if config.enabled else ''
+        except Exception as e:
+            logger.warning(f"Google Maps config niet beschikbaar: {e}")
+            self.google_maps_api_key = ''
+        try:
+            self.home_location = Location.get_home_location()
+        except Exception as e:
+            logger.warning(f"Home locatie niet beschikbaar: {e}")
+            self.home_location = None
+
+    # ------------------------------------------------------------------
+    # Cache
+    # ------------------------------------------------------------------
+
+    @classmethod
+    def _cache_key(cls, day):
+        version = cache.get(cls.VERSION_KEY, 0)
+        return f"{cls.CACHE_PREFIX}:{version}:{day.isoformat()}"
+
+    @classmethod
+    def get(cls, day=None):
+        """Gecachte snapshot, of een nieuwe als de cache leeg of ongeldig is"""
+        day = day or date.today()
+        key = cls._cache_key(day)
+        snapshot = cache.get(key)
+        if snapshot is None:
+            snapshot = cls.build(day)
+            cache.set(key, snapshot, getattr(settings, 'DASHBOARD_CACHE_TTL', 60))
+        return snapshot
+
+    @classmethod
+    def invalidate(cls):
+        """Maak alle gecachte snapshots ongeldig (nieuwe versie in de cache key)"""
+        try:
+            cache.incr(cls.VERSION_KEY)
+        except ValueError:
+            cache.set(cls.VERSION_KEY, 1, None)
+
+    # ------------------------------------------------------------------
+    # Template context
+    # ------------------------------------------------------------------
+
+    @property
+    def has_planning(self):
+        return bool(self.patients)
+
+    def as_context(self):
+        return {
+            'today_date': self.day,
+            'available_vehicles': self.available_vehicles,
+            'total_vehicles': self.total_vehicles,
+            'upcoming_stops': self.patients[:self.UPCOMING_STOPS],
+            'vehicles_with_patients': self.vehicles_with_patients,
+            'has_today_planning': self.has_planning,
+            'total_today_patients': len(self.patients),
+            'total_today_routes': len(self.vehicles_with_patients),
+            'active_timeslots': self.active_timeslots,
+            'google_maps_api_key': self.google_maps_api_key,
+            'home_location': self.home_location,
+        }
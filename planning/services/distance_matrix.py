@@ -0,0 +1,190 @@
+"""
+Afstand/reistijd matrix voor route planning
+Berekent alle Haversine afstanden van een tijdblok (depot + patiënten) in één keer
+"""
+import logging
+import math
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is optioneel, val terug op pure Python
+    np = None
+
+logger = logging.getLogger(__name__)
+
+
+class DistanceMatrix:
+    """
+    Vooraf berekende afstanden (km) en reistijden (minuten) tussen alle punten
+    van een planningsgroep. Punten worden opgezocht via een sleutel
+    (patiënt id of DistanceMatrix.DEPOT) of via hun index.
+    """
+
+    DEPOT = 'depot'
+    EARTH_RADIUS_KM = 6371
+    DEFAULT_DISTANCE_KM = 10  # Zelfde default als calculate_distance bij ontbrekende GPS
+
+    def __init__(self, points, speed_kmh=30, city_factor=1.3, min_travel_time=5, max_travel_time=60,
+                 profile=None, departure=None):
+        """
+        Args:
+            points: lijst van (key, latitude, longitude) tuples
+            speed_kmh: gemiddelde snelheid voor reistijd (zonder profiel)
+            city_factor: extra tijd voor stadsverkeer (zonder profiel)
+            min_travel_time/max_travel_time: grenzen in minuten (zoals calculate_travel_time)
+            profile: TravelTimeProfile; reistijden per wegklasse en vertrek uur
+            departure: vertrektijd voor de reistijden uit het profiel (datetime, time of uur)
+        """
+        self.keys = [key for key, _, _ in points]
+        self.coordinates = [(self._to_float(lat), self._to_float(lon)) for _, lat, lon in points]
+        self._index = {key: i for i, key in enumerate(self.keys)}
+        self.speed_kmh = speed_kmh
+        self.city_factor = city_factor
+        self.min_travel_time = min_travel_time
+        self.max_travel_time = max_travel_time
+        self.profile = profile
+        self.departure = departure
+
+        if np is not None:
+            self.distances, self.travel_times = self._compute_numpy()
+        else:
+            self.distances, self.travel_times = self._compute_python()
+
+        logger.debug(f"DistanceMatrix berekend voor {len(self.keys)} punten")
+
+    @staticmethod
+    def _to_float(value):
+        if value is None or value == '':
+            return None
+        return float(value)
+
+    @classmethod
+    def for_patients(cls, patients, depot_coords, **kwargs):
+        """
+        Bouw een matrix voor depot + patiënten
+        Patiënten zonder GPS krijgen de depot coördinaten (zoals optimize_route_order)
+        """
+        depot_lat, depot_lon = depot_coords
+        points = [(cls.DEPOT, depot_lat, depot_lon)]
+        for patient in patients:
+            points.append((
+                patient.id,
+                patient.latitude or depot_lat,
+                patient.longitude or depot_lon
+            ))
+        return cls(points, **kwargs)
+
+    def _compute_numpy(self):
+        """Vectorized Haversine over alle paren"""
+        n = len(self.coordinates)
+        lat = np.array([c[0] if c[0] is not None else np.nan for c in self.coordinates], dtype=float)
+        lon = np.array([c[1] if c[1] is not None else np.nan for c in self.coordinates], dtype=float)
+
+        # Ontbrekende of 0-coördinaten gelden als onbekend (zoals `not all([...])`)
+        missing = np.isnan(lat) | np.isnan(lon) | (lat == 0) | (lon == 0)
+
+        lat_r = np.radians(lat)
+        lon_r = np.radians(lon)
+        dlat = lat_r[np.newaxis, :] - lat_r[:, np.newaxis]
+        dlon = lon_r[np.newaxis, :] - lon_r[:, np.newaxis]
+        a = np.sin(dlat / 2) ** 2 + np.cos(lat_r)[:, np.newaxis] * np.cos(lat_r)[np.newaxis, :] * np.sin(dlon / 2) ** 2
+        distances = 2 * np.arcsin(np.sqrt(np.clip(a, 0, 1))) * self.EARTH_RADIUS_KM
+
+        unknown = missing[:, np.newaxis] | missing[np.newaxis, :]
+        distances[unknown] = self.DEFAULT_DISTANCE_KM
+        if n:
+            np.fill_diagonal(distances, 0)
+
+        if self.profile is not None:
+            return distances, self.profile.travel_time_matrix(distances, self.departure)
+
+        travel_times = (distances / self.speed_kmh) * 60 * self.city_factor
+        travel_times = np.clip(travel_times, self.min_travel_time, self.max_travel_time)
+        travel_times[distances <= 0] = self.min_travel_time
+
+        return distances, travel_times
+
+    def _compute_python(self):
+        """Fallback zonder NumPy - nog steeds maar één keer per paar"""
+        n = len(self.coordinates)
+        distances = [[0.0] * n for _ in range(n)]
+        travel_times = [[float(self.min_travel_time)] * n for _ in range(n)]
+
+        for i in range(n):
+            lat1, lon1 = self.coordinates[i]
+            for j in range(i + 1, n):
+                lat2, lon2 = self.coordinates[j]
+                if not all([lat1, lon1, lat2, lon2]):
+                    distance = self.DEFAULT_DISTANCE_KM
+                else:
+                    rlat1, rlon1, rlat2, rlon2 = map(math.radians, [lat1, lon1, lat2, lon2])
+                    a = math.sin((rlat2 - rlat1) / 2) ** 2 + math.cos(rlat1) * math.cos(rlat2) * math.sin((rlon2 - rlon1) / 2) ** 2
+                    distance = 2 * math.asin(math.sqrt(a)) * self.EARTH_RADIUS_KM
+
+                if self.profile is not None:
+                    travel_time = self.profile.travel_time(distance, self.departure)
+                elif distance <= 0:
+                    travel_time = self.min_travel_time
+                else:
+                    travel_time = (distance / self.speed_kmh) * 60 * self.city_factor
+                    travel_time = max(self.min_travel_time, min(self.max_travel_time, travel_time))
+
+                distances[i][j] = distances[j][i] = distance
+                travel_times[i][j] = travel_times[j][i] = travel_time
+
+        return distances, travel_times
+
+    def __len__(self):
+        return len(self.keys)
+
+    def __contains__(self, key):
+        return key in self._index
+
+    def index(self, key):
+        """Geef de matrix index voor een sleutel"""
+        return self._index[key]
+
+    def distance_by_index(self, i, j):
+        return float(self.distances[i][j])
+
+    def travel_time_by_index(self, i, j):
+        return float(self.travel_times[i][j])
+
+    def distance(self, origin, destination):
+        """Afstand in km tussen twee sleutels"""
+        return float(self.distances[self._index[origin]][self._index[destination]])
+
+    def travel_time(self, origin, destination):
+        """Reistijd in minuten tussen twee sleutels"""
+        return float(self.travel_times[self._index[origin]][self._index[destination]])
+
+    def travel_time_at(self, origin, destination, departure):
+        """
+        Reistijd in minuten bij vertrek op `departure`
+        Zonder profiel gelijk aan travel_time (de matrix is tijdsonafhankelijk)
+        """
+        if self.profile is None:
+            return self.travel_time(origin, destination)
+        return self.profile.travel_time(self.distance(origin, destination), departure)
+
+    def route_distance(self, keys):
+        """Totale afstand van een reeks sleutels"""
+        indices = [self._index[key] for key in keys]
+        return sum(float(self.distances[a][b]) for a, b in zip(indices, indices[1:]))
+
+    def route_travel_time(self, keys):
+        """Totale reistijd van een reeks sleutels"""
+        indices = [self._index[key] for key in keys]
+        return sum(float(self.travel_times[a][b]) for a, b in zip(indices, indices[1:]))
+
+    def nearest(self, origin, candidates):
+        """Dichtstbijzijnde sleutel uit candidates gezien vanaf origin"""
+        row = self.distances[self._index[origin]]
+        best_key = None
+        best_distance = float('inf')
+        for key in candidates:
+            distance = row[self._index[key]]
+            if distance < best_distance:
+                best_distance = distance
+                best_key = key
+        return best_key
@@ -0,0 +1,415 @@
+"""
+Gestreamde export van de planning
+Rijen komen uit de concept planning van de client (assignments) of uit de
+historie in de database; alle patiënten, voertuigen en tijdblokken worden
+vooraf met in_bulk opgehaald (geen query per rij). De output wordt per blok
+rijen gegenereerd, zodat ook een maand historie in constant geheugen naar de
+client gaat:
+
+    export = PlanningExport(rows_from_history(start, end), 'xlsx')
+    StreamingHttpResponse(export.stream(), content_type=export.content_type)
+
+Formaten:
+    csv:      één regel per patiënt
+    xlsx:     zelfde kolommen als Excel werkblad (zonder extra dependency,
+              het zip bestand wordt regel voor regel geschreven)
+    manifest: rittenlijst per voertuig en dag voor de chauffeur (platte tekst)
+"""
+import csv
+import logging
+import zipfile
+from collections import namedtuple
+from datetime import date
+from xml.sax.saxutils import escape
+
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from planning.models import Patient, TimeSlot, Vehicle
+
+logger = logging.getLogger(__name__)
+
+# Rijen per chunk van de response
+EXPORT_CHUNK_ROWS = 500
+
+EXPORT_FORMATS = ('csv', 'xlsx', 'manifest')
+
+COLUMNS = [
+    'Patient ID', 'Patient Naam', 'Tijdblok', 'Voertuig',
+    'Volgorde', 'Ophaal Tijd', 'Eind Behandel Tijd',
+    'Adres', 'Plaats', 'Rolstoel', 'Datum'
+]
+
+# Alleen de velden die in een export staan
+PATIENT_FIELDS = ('id', 'naam', 'telefoonnummer', 'straat', 'postcode', 'plaats', 'ophaal_tijd',
+                  'eind_behandel_tijd', 'rolstoel', 'toegewezen_voertuig_id', 'halen_tijdblok_id',
+                  'toegewezen_tijdblok_id')
+
+ExportRow = namedtuple('ExportRow', ['patient', 'vehicle', 'timeslot', 'position', 'day'])
+
+
+def _local(moment, tz=None):
+    if moment is not None and timezone.is_aware(moment):
+        return timezone.localtime(moment, tz)
+    return moment
+
+
+def _clock(moment, tz=None):
+    moment = _local(moment, tz)
+    return moment.strftime('%H:%M') if moment else ''
+
+
+def _day(patient):
+    moment = _local(patient.ophaal_tijd)
+    return moment.date() if moment else None
+
+
+def vehicle_label(vehicle):
+    return f"{vehicle.referentie} - {vehicle.kenteken}" if vehicle else "Niet toegewezen"
+
+
+# ----------------------------------------------------------------------
+# Bronnen
+# ----------------------------------------------------------------------
+
+def rows_from_assignments(assignments):
+    """
+    Export rijen voor de concept planning van de client
+    Drie in_bulk queries, ongeacht het aantal assignments.
+
+    Args:
+        assignments: lijst van {'patient_id', 'vehicle_id', 'timeslot_id', 'position'}
+    """
+    def ids(field):
+        found = set()
+        for assignment in assignments:
+            try:
+                found.add(int(assignment[field]))
+            except (KeyError, TypeError, ValueError):
+                continue
+        return found
+
+    patients = Patient.objects.only(*PATIENT_FIELDS).in_bulk(ids('patient_id'))
+    vehicles = Vehicle.objects.in_bulk(ids('vehicle_id'))
+    timeslots = TimeSlot.objects.in_bulk(ids('timeslot_id'))
+
+    def lookup(objects, value):
+        try:
+            return objects.get(int(value))
+        except (TypeError, ValueError):
+            return None
+
+    def position(assignment):
+        try:
+            return int(assignment.get('position') or 0) + 1
+        except (TypeError, ValueError):
+            return 1
+
+    # De queries hierboven draaien direct, het opbouwen van rijen pas tijdens het streamen
+    def generate():
+        for assignment in assignments:
+            patient = lookup(patients, assignment.get('patient_id'))
+            if patient is None:
+                continue
+            yield ExportRow(
+                patient=patient,
+                vehicle=lookup(vehicles, assignment.get('vehicle_id')),
+                timeslot=lookup(timeslots, assignment.get('timeslot_id')),
+                position=position(assignment),
+                day=_day(patient),
+            )
+
+    return generate()
+
+
+def rows_from_history(start, end, chunk_size=2000):
+    """
+    Export rijen voor alle patiënten met een ophaal datum van start t/m end
+    Gesorteerd per dag en voertuig; de volgorde is de volgorde van ophaal tijd.
+    Voertuigen en tijdblokken worden direct opgehaald, patiënten pas tijdens
+    het streamen en per chunk (server-side cursor), als named tuples in plaats
+    van model instanties.
+    """
+    vehicles = Vehicle.objects.in_bulk()
+    timeslots = TimeSlot.objects.in_bulk()
+    patients = (
+        Patient.objects.filter(ophaal_tijd__date__range=(start, end))
+        .annotate(export_day=TruncDate('ophaal_tijd'))
+        .order_by('export_day', 'toegewezen_voertuig_id', 'ophaal_tijd', 'id')
+        .values_list(*PATIENT_FIELDS, 'export_day', named=True)
+    )
+
+    def generate():
+        group, position = None, 0
+        for patient in patients.iterator(chunk_size=chunk_size):
+            if (patient.export_day, patient.toegewezen_voertuig_id) != group:
+                group, position = (patient.export_day, patient.toegewezen_voertuig_id), 0
+            position += 1
+            yield ExportRow(
+                patient=patient,
+                vehicle=vehicles.get(patient.toegewezen_voertuig_id),
+                timeslot=timeslots.get(patient.halen_tijdblok_id or patient.toegewezen_tijdblok_id),
+                position=position,
+                day=patient.export_day,
+            )
+
+    return generate()
+
+
+def table_rows(rows):
+    """Rijen als lijsten in de volgorde van COLUMNS"""
+    tz = timezone.get_current_timezone()
+    for row in rows:
+        patient = row.patient
+        yield [
+            patient.id,
+            patient.naam,
+            row.timeslot.naam if row.timeslot else "Niet toegewezen",
+            vehicle_label(row.vehicle),
+            row.position,
+            _clock(patient.ophaal_tijd, tz),
+            _clock(patient.eind_behandel_tijd, tz),
+            patient.straat,
+            patient.plaats,
+            'Ja' if patient.rolstoel else 'Nee',
+            row.day.isoformat() if row.day else '',
+        ]
+
+
+# ----------------------------------------------------------------------
+# Schrijvers
+# ----------------------------------------------------------------------
+
+class _Buffer:
+    """Write-only bestand dat alles bewaart tot drain(); voor csv.writer en zipfile"""
+
+    def __init__(self):
+        self._parts = []
+        self._position = 0
+
+    def write(self, data):
+        self._parts.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        parts, self._parts = self._parts, []
+        return parts
+
+
+def stream_csv(rows, chunk_rows=EXPORT_CHUNK_ROWS):
+    buffer = _Buffer()
+    writer = csv.writer(buffer)
+    writer.writerow(COLUMNS)
+    for count, values in enumerate(table_rows(rows), start=1):
+        writer.writerow(values)
+        if count % chunk_rows == 0:
+            yield ''.join(buffer.drain())
+    yield ''.join(buffer.drain())
+
+
+def _xlsx_cell(column, row_number, value, style=0):
+    reference = f"{_xlsx_column(column)}{row_number}"
+    style_attr = f' s="{style}"' if style else ''
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return f'<c r="{reference}"{style_attr}><v>{value}</v></c>'
+    text = escape(''.join(ch for ch in str(value or '') if ch in '\t\n\r' or ch >= ' '))
+    return f'<c r="{reference}" t="inlineStr"{style_attr}><is><t xml:space="preserve">{text}</t></is></c>'
+
+
+def _xlsx_column(index):
+    letters = ''
+    index += 1
+    while index:
+        index, remainder = divmod(index - 1, 26)
+        letters = chr(65 + remainder) + letters
+    return letters
+
+
+def _xlsx_row(row_number, values, style=0):
+    cells = ''.join(_xlsx_cell(column, row_number, value, style) for column, value in enumerate(values))
+    return f'<row r="{row_number}">{cells}</row>'
+
+
+XLSX_STATIC = {
+    '[Content_Types].xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '<Override PartName="/xl/styles.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>'
+        '</Types>'
+    ),
+    '_rels/.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+        'Target="xl/workbook.xml"/>'
+        '</Relationships>'
+    ),
+    'xl/_rels/workbook.xml.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+        'Target="worksheets/sheet1.xml"/>'
+        '<Relationship Id="rId2" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles" '
+        'Target="styles.xml"/>'
+        '</Relationships>'
+    ),
+    'xl/styles.xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<styleSheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+        '<fonts count="2"><font><sz val="11"/><name val="Calibri"/></font>'
+        '<font><b/><sz val="11"/><name val="Calibri"/></font></fonts>'
+        '<fills count="2"><fill><patternFill patternType="none"/></fill>'
+        '<fill><patternFill patternType="gray125"/></fill></fills>'
+        '<borders count="1"><border><left/><right/><top/><bottom/><diagonal/></border></borders>'
+        '<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>'
+        '<cellXfs count="2"><xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/>'
+        '<xf numFmtId="0" fontId="1" fillId="0" borderId="0" xfId="0" applyFont="1"/></cellXfs>'
+        '</styleSheet>'
+    ),
+}
+
+
+def stream_xlsx(rows, sheet_name='Planning', chunk_rows=EXPORT_CHUNK_ROWS):
+    """
+    XLSX werkblad met inline strings, regel voor regel in een zip gestreamd
+    Het zip bestand wordt niet teruggespoeld (data descriptors), dus alleen het
+    huidige blok rijen staat in het geheugen.
+    """
+    buffer = _Buffer()
+    with zipfile.ZipFile(buffer, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+        for name, content in XLSX_STATIC.items():
+            archive.writestr(name, content)
+        archive.writestr('xl/workbook.xml', (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+            'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+            f'<sheets><sheet name="{escape(sheet_name[:31])}" sheetId="1" r:id="rId1"/></sheets>'
+            '</workbook>'
+        ))
+        yield b''.join(buffer.drain())
+
+        with archive.open('xl/worksheets/sheet1.xml', 'w', force_zip64=True) as sheet:
+            sheet.write((
+                '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+                '<sheetViews><sheetView workbookViewId="0"><pane ySplit="1" topLeftCell="A2" '
+                'activePane="bottomLeft" state="frozen"/></sheetView></sheetViews>'
+                '<sheetData>' + _xlsx_row(1, COLUMNS, style=1)
+            ).encode('utf-8'))
+            lines = []
+            for row_number, values in enumerate(table_rows(rows), start=2):
+                lines.append(_xlsx_row(row_number, values))
+                if len(lines) >= chunk_rows:
+                    sheet.write(''.join(lines).encode('utf-8'))
+                    lines = []
+                    yield b''.join(buffer.drain())
+            sheet.write((''.join(lines) + '</sheetData></worksheet>').encode('utf-8'))
+    yield b''.join(buffer.drain())
+
+
+def stream_manifest(rows, chunk_rows=EXPORT_CHUNK_ROWS):
+    """
+    Rittenlijst per voertuig en dag, in volgorde van de route
+    Rijen moeten per dag en voertuig gegroepeerd binnenkomen (zie PlanningExport)
+    """
+    tz = timezone.get_current_timezone()
+    lines = []
+    group = None
+    for count, row in enumerate(rows, start=1):
+        patient = row.patient
+        key = (row.day, row.vehicle.id if row.vehicle else None)
+        if key != group:
+            if group is not None:
+                lines.append('')
+            group = key
+            title = f"{vehicle_label(row.vehicle)}"
+            if row.vehicle and row.vehicle.merk_model:
+                title += f" ({row.vehicle.merk_model})"
+            lines.append(f"{title} - {row.day.strftime('%d-%m-%Y') if row.day else 'onbekende datum'}")
+            lines.append('=' * len(lines[-1]))
+        address = ', '.join(part for part in (patient.straat, f"{patient.postcode or ''} {patient.plaats or ''}".strip()) if part)
+        timeslot = f" [{row.timeslot.naam}]" if row.timeslot else ''
+        wheelchair = '  ROLSTOEL' if patient.rolstoel else ''
+        lines.append(f"{row.position:>3}. {_clock(patient.ophaal_tijd, tz):>5}  {patient.naam}{timeslot}{wheelchair}")
+        lines.append(f"            {address or 'Geen adres beschikbaar'}  tel. {patient.telefoonnummer or '-'}")
+        if count % chunk_rows == 0:
+            yield '\n'.join(lines) + '\n'
+            lines = []
+    if group is None:
+        lines.append('Geen ritten gevonden.')
+    yield '\n'.join(lines) + '\n'
+
+
+class PlanningExport:
+    """
+    Eén export in een van EXPORT_FORMATS
+
+    Args:
+        rows: iterable van ExportRow (rows_from_assignments of rows_from_history)
+        export_format: 'csv', 'xlsx' of 'manifest'
+        name: basis voor de bestandsnaam
+    """
+
+    CONTENT_TYPES = {
+        'csv': 'text/csv; charset=utf-8',
+        'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+        'manifest': 'text/plain; charset=utf-8',
+    }
+    EXTENSIONS = {'csv': 'csv', 'xlsx': 'xlsx', 'manifest': 'txt'}
+
+    def __init__(self, rows, export_format='csv', name=None):
+        if export_format not in EXPORT_FORMATS:
+            raise ValueError(f"Onbekend export formaat: {export_format}")
+        self.rows = rows
+        self.export_format = export_format
+        self.name = name or f"planning_{date.today().strftime('%Y%m%d')}"
+
+    @classmethod
+    def for_assignments(cls, assignments, export_format='csv', name=None):
+        if export_format == 'manifest':
+            # Manifest groepeert per voertuig; de client stuurt assignments in willekeurige volgorde
+            rows = sorted(
+                rows_from_assignments(assignments),
+                key=lambda row: (row.day or date.min, row.vehicle is None, vehicle_label(row.vehicle), row.position)
+            )
+        else:
+            rows = rows_from_assignments(assignments)
+        return cls(rows, export_format, name)
+
+    @classmethod
+    def for_history(cls, start, end, export_format='csv'):
+        name = f"planning_{start.strftime('%Y%m%d')}_{end.strftime('%Y%m%d')}"
+        return cls(rows_from_history(start, end), export_format, name)
+
+    @property
+    def content_type(self):
+        return self.CONTENT_TYPES[self.export_format]
+
+    @property
+    def filename(self):
+        suffix = '_manifest' if self.export_format == 'manifest' else ''
+        return f"{self.name}{suffix}.{self.EXTENSIONS[self.export_format]}"
+
+    def stream(self):
+        if self.export_format == 'xlsx':
+            return stream_xlsx(self.rows)
+        if self.export_format == 'manifest':
+            return stream_manifest(self.rows)
+        return stream_csv(self.rows)
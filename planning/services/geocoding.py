@@ -10,6 +10,9 @@ from django.utils import timezone
 from typing import Tuple, Optional
 import re
 
+from planning.models import GeocodeCacheEntry
+from .lazy import LazyService
+
 logger = logging.getLogger(__name__)
 
 
@@ -61,6 +64,14 @@ class GeocodingService:
         Geocodeer adres met OpenStreetMap Nominatim (gratis)
         Returns: (latitude, longitude) of None
         """
+        return self._query_nominatim(address)[0]
+    
+    def _query_nominatim(self, address: str) -> Tuple[Optional[Tuple[float, float]], Optional[float]]:
+        """
+        Nominatim request
+        Returns: ((latitude, longitude) of None, betrouwbaarheid)
+        Betrouwbaarheid 0.0 zonder coördinaten = adres bestaat niet, None = request mislukt
+        """
         try:
             # Rate limiting voor Nominatim
             time.sleep(self.rate_limit_delay)
@@ -90,31 +101,39 @@ class GeocodingService:
                     result = results[0]
                     lat = float(result['lat'])
                     lon = float(result['lon'])
+                    confidence = result.get('importance')
                     
                     logger.info(f"Geocoded '{address}' to ({lat}, {lon})")
-                    return (lat, lon)
+                    return (lat, lon), float(confidence) if confidence is not None else None
                 else:
                     logger.warning(f"No results found for address: {address}")
-                    return None
+                    return None, 0.0
             else:
                 logger.error(f"Nominatim API error {response.status_code}: {response.text}")
-                return None
+                return None, None
                 
         except requests.RequestException as e:
             logger.error(f"Network error geocoding '{address}': {e}")
-            return None
+            return None, None
         except (ValueError, KeyError) as e:
             logger.error(f"Data parsing error for '{address}': {e}")
-            return None
+            return None, None
     
     def geocode_with_google(self, address: str) -> Optional[Tuple[float, float]]:
         """
         Geocodeer adres met Google Maps API (vereist API key)
         Returns: (latitude, longitude) of None
         """
+        return self._query_google(address)[0]
+    
+    def _query_google(self, address: str) -> Tuple[Optional[Tuple[float, float]], Optional[float]]:
+        """
+        Google Geocoding request
+        Returns: ((latitude, longitude) of None, betrouwbaarheid) zoals _query_nominatim
+        """
         if not self.google_api_key:
             logger.debug("Google Maps API key not configured")
-            return None
+            return None, None
         
         try:
             params = {
@@ -132,30 +151,36 @@ class GeocodingService:
             if response.status_code == 200:
                 data = response.json()
                 if data['status'] == 'OK' and data['results']:
-                    location = data['results'][0]['geometry']['location']
+                    geometry = data['results'][0]['geometry']
+                    location = geometry['location']
                     lat = location['lat']
                     lon = location['lng']
+                    confidence = GeocodeCacheEntry.GOOGLE_CONFIDENCE.get(geometry.get('location_type'))
                     
                     logger.info(f"Google geocoded '{address}' to ({lat}, {lon})")
-                    return (lat, lon)
+                    return (lat, lon), confidence
+                elif data['status'] == 'ZERO_RESULTS':
+                    logger.warning(f"Google geocoding failed for '{address}': {data['status']}")
+                    return None, 0.0
                 else:
                     logger.warning(f"Google geocoding failed for '{address}': {data['status']}")
-                    return None
+                    return None, None
             else:
                 logger.error(f"Google API error {response.status_code}")
-                return None
+                return None, None
                 
         except requests.RequestException as e:
             logger.error(f"Network error with Google API for '{address}': {e}")
-            return None
+            return None, None
         except (ValueError, KeyError) as e:
             logger.error(f"Google API data parsing error for '{address}': {e}")
-            return None
+            return None, None
     
     def geocode_address(self, address: str, postcode: str = None, city: str = None) -> Optional[Tuple[float, float]]:
         """
         Hoofdfunctie: geocodeer een adres naar GPS coordinaten
-        Probeert eerst cache, dan Nominatim, dan Google als backup
+        Probeert eerst de proces cache, dan de database cache (GeocodeCacheEntry),
+        dan Nominatim, dan Google als backup
         """
         # Maak adres schoon
         clean_addr = self.clean_address(address, postcode, city)
@@ -165,21 +190,39 @@ class GeocodingService:
             return None
         
         # Check cache eerst
-        cache_key = clean_addr.lower()
+        cache_key = GeocodeCacheEntry.make_key(address, postcode, city)
         if cache_key in self._cache:
             logger.debug(f"Using cached coordinates for '{clean_addr}'")
             return self._cache[cache_key]
         
+        # Persistente cache (gedeeld tussen processen en herstarts)
+        entry = GeocodeCacheEntry.lookup(address, postcode, city)
+        if entry:
+            logger.debug(f"Using database cached coordinates for '{clean_addr}'")
+            self._cache[cache_key] = entry.coordinates
+            return entry.coordinates
+        
         # Probeer Nominatim eerst (gratis)
-        coordinates = self.geocode_with_nominatim(clean_addr)
+        provider = 'nominatim'
+        coordinates, confidence = self._query_nominatim(clean_addr)
         
         # Als Nominatim faalt, probeer Google (als API key beschikbaar)
-        if not coordinates:
-            coordinates = self.geocode_with_google(clean_addr)
+        if not coordinates and self.google_api_key:
+            provider = 'google'
+            coordinates, confidence = self._query_google(clean_addr)
         
         # Sla resultaat op in cache (ook None om herhaalde verzoeken te voorkomen)
         self._cache[cache_key] = coordinates
         
+        # Alleen definitieve antwoorden persistent opslaan, geen netwerkfouten
+        if coordinates or confidence == 0.0:
+            GeocodeCacheEntry.store(
+                address, postcode, city,
+                coordinates=coordinates,
+                provider=provider if coordinates else '',
+                confidence=confidence
+            )
+        
         return coordinates
     
     def get_default_coordinates(self, city: str = None) -> Tuple[float, float]:
@@ -205,44 +248,26 @@ class GeocodingService:
     def bulk_geocode_patients(self, patients):
         """
         Geocodeer meerdere patiënten in bulk
-        Updates patient records met GPS coordinaten
+        Unieke adressen worden één keer opgezocht (cache eerst, rate limited per provider)
+        en de patiënten worden met één bulk_update opgeslagen
         """
-        geocoded_count = 0
-        failed_count = 0
+        from .bulk_geocoding import BulkGeocoder, NominatimProvider, GoogleGeocodeProvider
         
-        for patient in patients:
-            # Skip als al geocoded
-            if patient.latitude and patient.longitude:
-                continue
-            
-            logger.info(f"Geocoding patient: {patient.naam}")
-            
-            coordinates = self.geocode_address(
-                patient.straat,
-                patient.postcode,
-                patient.plaats
-            )
-            
-            if coordinates:
-                patient.latitude, patient.longitude = coordinates
-                patient.geocoding_status = 'success'
-                patient.geocoding_notes = f"Geocoded op {timezone.now().strftime('%Y-%m-%d %H:%M')}"
-                patient.save()
-                geocoded_count += 1
-                logger.info(f"✅ Geocoded {patient.naam}: {coordinates}")
-            else:
-                # Gebruik standaard coordinaten gebaseerd op stad
-                default_coords = self.get_default_coordinates(patient.plaats)
-                patient.latitude, patient.longitude = default_coords
-                patient.geocoding_status = 'failed'
-                patient.geocoding_notes = f"Adres '{patient.straat}, {patient.postcode} {patient.plaats}' niet gevonden. Standaard locatie voor {patient.plaats} gebruikt."
-                patient.save()
-                failed_count += 1
-                logger.warning(f"⚠️ Used default coordinates for {patient.naam}: {default_coords}")
+        providers = [NominatimProvider(base_url=self.nominatim_base_url)]
+        if self.google_api_key:
+            providers.append(GoogleGeocodeProvider(self.google_api_key))
+        
+        geocoded_count, failed_count = BulkGeocoder(providers=providers).geocode_patients(
+            patients, default_coordinates=self.get_default_coordinates
+        )
         
         logger.info(f"Bulk geocoding completed: {geocoded_count} geocoded, {failed_count} defaults used")
         return geocoded_count, failed_count
 
 
-# Singleton instance
-geocoding_service = GeocodingService()
+# Singleton instance, lazy: gebouwd bij het eerste gebruik
+geocoding_service = LazyService(GeocodingService)
+
+
+def get_geocoding_service() -> GeocodingService:
+    return geocoding_service.get()
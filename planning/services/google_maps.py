@@ -7,7 +7,13 @@ import json
 from typing import List, Dict, Tuple, Optional
 from django.conf import settings
 from django.utils import timezone
-from ..models import GoogleMapsConfig, GoogleMapsAPILog
+from requests.adapters import HTTPAdapter
+from ..models import GoogleMapsConfig, GoogleMapsAPILog, GeocodeCacheEntry
+from .matrix_tiling import DistanceMatrixTiler
+from .spatial_index import SpatialIndex, sweep_partition
+from .travel_time_cache import travel_time_cache
+from .planning_jobs import report_progress
+from .lazy import LazyService
 
 logger = logging.getLogger(__name__)
 
@@ -21,6 +27,7 @@ class GoogleMapsService:
         self.config = GoogleMapsConfig.get_active_config()
         self.base_url = "https://maps.googleapis.com/maps/api"
         self.api_key = self.config.api_key if self.config.enabled else None
+        self._session = None
         logger.info(f"GoogleMapsService initialized: config={self.config}, enabled={self.config.enabled}, api_key_length={len(self.api_key) if self.api_key else 0}")
         
     def is_enabled(self) -> bool:
@@ -85,6 +92,15 @@ class GoogleMapsService:
         Returns:
             Dictionary met afstanden en reistijden
         """
+        # Reistijden met verkeer voor nu: in de cache onder het huidige uur
+        departure_time = timezone.localtime()
+        
+        # Alle cellen al bekend: geen (betaalde) API call nodig
+        cached = travel_time_cache.matrix_from_cache(origins, destinations, departure_time)
+        if cached:
+            logger.info(f"✅ Distance matrix {len(origins)}x{len(destinations)} uit reistijd cache")
+            return cached
+        
         params = {
             'origins': '|'.join(origins),
             'destinations': '|'.join(destinations),
@@ -94,7 +110,86 @@ class GoogleMapsService:
             'departure_time': 'now'
         }
         
-        return self._make_api_call('distancematrix/json', params)
+        data = self._make_api_call('distancematrix/json', params)
+        if data:
+            travel_time_cache.store_matrix(origins, destinations, data, departure_time)
+        return data
+    
+    def _get_session(self) -> requests.Session:
+        """Gedeelde HTTP sessie met connection pooling voor parallelle requests"""
+        if self._session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=2, pool_maxsize=8)
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+            self._session = session
+        return self._session
+    
+    def _fetch_matrix_tile(self, origins: List[str], destinations: List[str],
+                           departure_time=None) -> Optional[List[List[Dict]]]:
+        """
+        Haal één blok van de distance matrix op
+        Met departure_time (niet in het verleden) geeft Google ook duration_in_traffic.
+        Returns: rijen met elementen, of None als het blok opnieuw geprobeerd moet worden
+        """
+        params = {
+            'origins': '|'.join(origins),
+            'destinations': '|'.join(destinations),
+            'mode': 'driving',
+            'units': 'metric',
+            'key': self.api_key,
+        }
+        if departure_time is not None:
+            params['departure_time'] = int(departure_time.timestamp())
+            params['traffic_model'] = 'best_guess'
+        try:
+            response = self._get_session().get(f"{self.base_url}/distancematrix/json", params=params, timeout=10)
+            if response.status_code != 200:
+                # Geen URL loggen: daar staat de API key in
+                logger.warning(f"❌ Distance matrix blok mislukt: HTTP {response.status_code}")
+                return None
+            data = response.json()
+        except (requests.RequestException, ValueError) as e:
+            logger.warning(f"❌ Distance matrix blok mislukt: {type(e).__name__}")
+            return None
+        
+        if data.get('status') != 'OK':
+            logger.warning(f"❌ Distance matrix blok status: {data.get('status')} - {data.get('error_message', '')}")
+            return None
+        return [row['elements'] for row in data.get('rows', [])]
+    
+    def get_full_distance_matrix(self, locations: List[str], known: Dict = None,
+                                 departure_time=None) -> Optional[Dict]:
+        """
+        Volledige N×N distance matrix, ongeacht het aantal locaties
+        
+        Args:
+            locations: List van locaties (lat,lng of adres)
+            known: dict (i, j) -> element met cellen die al bekend zijn
+            departure_time: geplande vertrektijd (aware datetime); zonder vertrektijd
+                reistijden zonder verkeer, gecachet als tijdsonafhankelijk
+            
+        Returns:
+            Dictionary in het Distance Matrix formaat, of None als de API niet beschikbaar is
+        """
+        if not self.is_enabled():
+            return None
+        
+        # Alleen cellen ophalen die niet in de reistijd cache staan
+        known = dict(travel_time_cache.known_cells(locations, departure_time=departure_time), **(known or {}))
+        
+        tiler = DistanceMatrixTiler(
+            lambda origins, destinations: self._fetch_matrix_tile(origins, destinations, departure_time)
+        )
+        matrix = tiler.build(locations, known=known)
+        
+        if tiler.stats['requests']:
+            GoogleMapsAPILog.log_api_call('distancematrix', calls=tiler.stats['requests'])
+            travel_time_cache.store_matrix(locations, locations, matrix, departure_time)
+        if tiler.stats['failed_tiles'] == tiler.stats['tiles'] and tiler.stats['tiles']:
+            # Niets opgehaald: laat de aanroeper zijn eigen fallback kiezen
+            return None
+        return matrix
     
     def get_directions(self, origin: str, destination: str, waypoints: List[str] = None) -> Optional[Dict]:
         """
@@ -118,8 +213,41 @@ class GoogleMapsService:
         
         if waypoints:
             params['waypoints'] = '|'.join(waypoints)
-        
-        return self._make_api_call('directions/json', params)
+        else:
+            # Enkele rit: uit de reistijd cache als die bekend is
+            cached = travel_time_cache.get_many([(origin, destination)]).get(
+                (travel_time_cache.cell(origin), travel_time_cache.cell(destination))
+            )
+            if cached:
+                distance_meters, duration_seconds = cached
+                return {
+                    'status': 'OK',
+                    'cached': True,
+                    'routes': [{'legs': [{
+                        'distance': {'text': f'{distance_meters / 1000:.1f} km', 'value': distance_meters},
+                        'duration': {'text': f'{duration_seconds // 60} min', 'value': duration_seconds},
+                        'start_address': origin,
+                        'end_address': destination,
+                    }]}],
+                }
+        
+        data = self._make_api_call('directions/json', params)
+        if data and data.get('routes'):
+            self._store_direction_legs(data, origin, destination, waypoints)
+        return data
+    
+    def _store_direction_legs(self, data: Dict, origin: str, destination: str, waypoints: List[str] = None):
+        """Sla elke leg van een Directions response op in de reistijd cache"""
+        route = data['routes'][0]
+        order = route.get('waypoint_order') or list(range(len(waypoints or [])))
+        stops = [origin] + [waypoints[i] for i in order] + [destination]
+        legs = route.get('legs', [])
+        if len(legs) != len(stops) - 1:
+            return
+        travel_time_cache.set_many(
+            (stops[i], stops[i + 1], leg['distance']['value'], leg['duration']['value'])
+            for i, leg in enumerate(legs)
+        )
     
     def geocode_address(self, address: str) -> Optional[Tuple[float, float]]:
         """
@@ -133,6 +261,12 @@ class GoogleMapsService:
         """
         logger.info(f"🗺️ Geocode adres: {address}")
         
+        # Persistente cache eerst: bespaart betaalde API calls
+        entry = GeocodeCacheEntry.lookup(address)
+        if entry and entry.is_found:
+            logger.info(f"✅ Geocoding uit cache: {entry.coordinates}")
+            return entry.coordinates
+        
         if not self.is_enabled():
             logger.warning("❌ Google Maps API niet beschikbaar voor geocoding")
             return None
@@ -158,12 +292,20 @@ class GoogleMapsService:
         
         if data.get('status') == 'ZERO_RESULTS':
             logger.warning(f"❌ Geen resultaten gevonden voor: {address}")
+            GeocodeCacheEntry.store(address, confidence=0.0)
             return None
         
         if data and data.get('results'):
-            location = data['results'][0]['geometry']['location']
+            geometry = data['results'][0]['geometry']
+            location = geometry['location']
             coords = (location['lat'], location['lng'])
             logger.info(f"✅ Geocoding succesvol: {coords}")
+            GeocodeCacheEntry.store(
+                address,
+                coordinates=coords,
+                provider='google',
+                confidence=GeocodeCacheEntry.GOOGLE_CONFIDENCE.get(geometry.get('location_type'))
+            )
             return coords
         
         logger.warning(f"❌ Onverwachte response: {data}")
@@ -192,9 +334,11 @@ class GoogleMapsService:
             return self._fallback_optimization(timeslot_assignments, vehicles)
         
         optimized_routes = {}
+        total = len(timeslot_assignments)
         
-        for timeslot_id, patients in timeslot_assignments.items():
+        for index, (timeslot_id, patients) in enumerate(timeslot_assignments.items(), start=1):
             logger.info(f"Optimaliseer routes voor tijdblok {timeslot_id} met {len(patients)} patiënten")
+            report_progress(f"Tijdblok {timeslot_id} optimaliseren", current=index - 1, total=total, timeslot=timeslot_id)
             
             # 1. Bereken afstanden tussen alle locaties
             locations = self._extract_locations(patients)
@@ -224,6 +368,8 @@ class GoogleMapsService:
                 'total_cost': sum(route['total_cost'] for route in routes),
                 'vehicle_count': len(routes)
             }
+            report_progress(f"Tijdblok {timeslot_id} geoptimaliseerd", current=index, total=total,
+                            timeslot=timeslot_id, routes=len(routes))
         
         return optimized_routes
     
@@ -344,30 +490,18 @@ class GoogleMapsService:
         if len(locations) <= 1:
             return None
         
-        # Google Maps Distance Matrix heeft limiet van 25 origins/destinations
-        # Voor grotere datasets moeten we batching gebruiken
-        if len(locations) <= 25:
-            distance_matrix = self.get_distance_matrix(locations, locations)
-            if distance_matrix:
-                return distance_matrix
-            else:
-                logger.warning("Google Maps Distance Matrix faalde, gebruik fallback")
-                return self._generate_fallback_distance_matrix(locations)
-        else:
-            logger.warning(f"Te veel locaties ({len(locations)}), gebruik batching")
-            return self._batch_distance_matrix(locations)
+        # Google Maps Distance Matrix heeft limieten per request (25 origins/destinations,
+        # 100 elementen), dus altijd via blokken ophalen
+        return self._batch_distance_matrix(locations)
     
     def _batch_distance_matrix(self, locations: List[str]) -> Dict:
-        """Batch distance matrix voor grote datasets"""
-        # Implementeer batching logica hier
-        # Voor nu, gebruik alleen eerste 25 locaties
-        limited_locations = locations[:25]
-        distance_matrix = self.get_distance_matrix(limited_locations, limited_locations)
+        """Batch distance matrix voor grote datasets (alle locaties, in blokken)"""
+        distance_matrix = self.get_full_distance_matrix(locations)
         if distance_matrix:
             return distance_matrix
         else:
             logger.warning("Google Maps Distance Matrix faalde, gebruik fallback")
-            return self._generate_fallback_distance_matrix(limited_locations)
+            return self._generate_fallback_distance_matrix(locations)
     
     def _generate_fallback_distance_matrix(self, locations: List[str]) -> Dict:
         """Genereer een fallback distance matrix met geschatte afstanden"""
@@ -443,17 +577,37 @@ class GoogleMapsService:
         return assignments
     
     def _assign_balanced(self, patients: List, vehicles: List) -> Dict:
-        """Evenwichtige verdeling over voertuigen"""
+        """Evenwichtige verdeling over voertuigen, per voertuig een aaneengesloten sector"""
+        return self._assign_by_sweep(patients, vehicles)
+    
+    def _assign_by_sweep(self, patients: List, vehicles: List) -> Dict:
+        """
+        Verdeel patiënten gelijkmatig en geografisch compact (sweep rond het depot)
+        Capaciteit: aantal_zitplaatsen - 1 (chauffeur)
+        """
         assignments = {vehicle: [] for vehicle in vehicles}
+        if not patients or not vehicles:
+            return assignments
         
-        # Verdeel patiënten gelijkmatig
+        from ..models import Location
+        home = Location.get_home_location()
+        depot = (float(home.latitude), float(home.longitude)) if home and home.latitude and home.longitude else (50.7467, 7.1516)
+        # Patiënten kunnen model instanties of dictionaries (CSV upload) zijn: sleutel = positie
+        points = []
         for i, patient in enumerate(patients):
-            vehicle_index = i % len(vehicles)
-            vehicle = vehicles[vehicle_index]
-            
-            if len(assignments[vehicle]) < vehicle.aantal_zitplaatsen - 1:
-                assignments[vehicle].append(patient)
-        
+            if isinstance(patient, dict):
+                points.append((i, patient.get('latitude'), patient.get('longitude')))
+            else:
+                points.append((i, patient.latitude, patient.longitude))
+        groups, remaining = sweep_partition(
+            SpatialIndex(points, depot), list(range(len(patients))),
+            [max(0, vehicle.aantal_zitplaatsen - 1) for vehicle in vehicles],
+            balanced=True,
+        )
+        for vehicle, keys in zip(vehicles, groups):
+            assignments[vehicle] = [patients[key] for key in keys]
+        if remaining:
+            logger.warning(f"{len(remaining)} patiënten passen niet in de beschikbare voertuigen")
         return assignments
     
     def _assign_min_vehicles(self, patients: List, vehicles: List) -> Dict:
@@ -524,10 +678,13 @@ class GoogleMapsService:
         
         # Simuleer route optimalisatie resultaten
         optimized_routes = {}
+        total = len(timeslot_assignments)
         
-        for timeslot_id, patients in timeslot_assignments.items():
+        for index, (timeslot_id, patients) in enumerate(timeslot_assignments.items(), start=1):
             if not patients:
                 logger.warning(f"Geen patiënten voor tijdblok {timeslot_id}")
+                report_progress(f"Tijdblok {timeslot_id} overgeslagen (geen patiënten)", current=index, total=total,
+                                timeslot=timeslot_id, routes=0)
                 continue
                 
             logger.info(f"Verwerk tijdblok {timeslot_id} met {len(patients)} patiënten")
@@ -571,6 +728,8 @@ class GoogleMapsService:
             }
             
             logger.info(f"Tijdblok {timeslot_id}: {len(routes)} routes, {optimized_routes[timeslot_id]['total_distance']:.1f} km, €{optimized_routes[timeslot_id]['total_cost']:.2f}")
+            report_progress(f"Tijdblok {timeslot_id} gepland", current=index, total=total,
+                            timeslot=timeslot_id, routes=len(routes))
         
         return optimized_routes
     
@@ -579,33 +738,22 @@ class GoogleMapsService:
         if not vehicles:
             return {}
             
-        assignments = {vehicle: [] for vehicle in vehicles}
+        # Verdeel patiënten gelijkmatig en geografisch compact over voertuigen
+        assignments = self._assign_by_sweep(patients, vehicles)
         
-        # Verdeel patiënten gelijkmatig over voertuigen
-        for i, patient in enumerate(patients):
-            vehicle_index = i % len(vehicles)
-            vehicle = vehicles[vehicle_index]
-            
-            # Check capaciteit
-            if len(assignments[vehicle]) < vehicle.aantal_zitplaatsen - 1:  # -1 voor chauffeur
-                assignments[vehicle].append(patient)
+        for vehicle, assigned_patients in assignments.items():
+            for patient in assigned_patients:
                 # Wijs voertuig toe aan patiënt in database
                 patient.toegewezen_voertuig = vehicle
                 patient.save()
                 logger.info(f"✅ Patiënt {patient.naam} toegewezen aan voertuig {vehicle.referentie or vehicle.merk_model}")
-            else:
-                # Zoek een ander voertuig met ruimte
-                for other_vehicle in vehicles:
-                    if len(assignments[other_vehicle]) < other_vehicle.aantal_zitplaatsen - 1:
-                        assignments[other_vehicle].append(patient)
-                        # Wijs voertuig toe aan patiënt in database
-                        patient.toegewezen_voertuig = other_vehicle
-                        patient.save()
-                        logger.info(f"✅ Patiënt {patient.naam} toegewezen aan voertuig {other_vehicle.referentie or other_vehicle.merk_model}")
-                        break
         
         return assignments
 
 
-# Singleton instance
-google_maps_service = GoogleMapsService()
+# Singleton instance, lazy: gebouwd bij het eerste gebruik en opnieuw na een wijziging in GoogleMapsConfig
+google_maps_service = LazyService(GoogleMapsService, refresh=True)
+
+
+def get_google_maps_service() -> GoogleMapsService:
+    return google_maps_service.get()
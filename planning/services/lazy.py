@@ -0,0 +1,63 @@
+"""
+Lazy service singletons
+De module-level services (optaplanner_service, google_maps_service, ...) worden
+pas bij het eerste gebruik aangemaakt, zodat het importeren van planning.views
+geen database queries doet (migrate op een lege database, snellere start van
+manage.py en workers).
+
+    optaplanner_service = LazyService(OptaPlannerService)
+    optaplanner_service.base_url          # bouwt de service bij de eerste aanroep
+    get_optaplanner_service()             # zelfde instantie, expliciet
+
+Met refresh=True wordt de service opnieuw gebouwd zodra de SettingsCache
+geleegd is (Configuration, Location of GoogleMapsConfig gewijzigd).
+"""
+import threading
+
+from .settings_cache import SettingsCache
+
+
+class LazyService:
+    """Thread-safe proxy die de echte service bij het eerste gebruik bouwt"""
+
+    def __init__(self, factory, refresh=False):
+        object.__setattr__(self, '_factory', factory)
+        object.__setattr__(self, '_refresh', refresh)
+        object.__setattr__(self, '_lock', threading.Lock())
+        object.__setattr__(self, '_instance', None)
+        object.__setattr__(self, '_generation', None)
+
+    def get(self):
+        generation = SettingsCache.current_generation() if self._refresh else None
+        instance = self._instance
+        if instance is not None and generation == self._generation:
+            return instance
+        with self._lock:
+            if self._instance is None or generation != self._generation:
+                instance = self._factory()
+                if self._refresh and SettingsCache.current_generation() != generation:
+                    # Config gewijzigd tijdens het bouwen (bijv. standaard config aangemaakt)
+                    generation = SettingsCache.current_generation()
+                    instance = self._factory()
+                object.__setattr__(self, '_instance', instance)
+                object.__setattr__(self, '_generation', generation)
+            return self._instance
+
+    def reset(self):
+        """Volgende aanroep bouwt een nieuwe instantie"""
+        with self._lock:
+            object.__setattr__(self, '_instance', None)
+
+    @property
+    def is_built(self):
+        return self._instance is not None
+
+    def __getattr__(self, name):
+        return getattr(self.get(), name)
+
+    def __setattr__(self, name, value):
+        setattr(self.get(), name, value)
+
+    def __repr__(self):
+        name = getattr(self._factory, '__name__', repr(self._factory))
+        return f"<LazyService {name}{'' if self.is_built else ' (nog niet gebouwd)'}>"
@@ -0,0 +1,221 @@
+"""
+Tiling van grote Distance Matrix requests
+Google staat per request maximaal 25 origins, 25 destinations en 100 elementen toe.
+Een N×N matrix wordt daarom in blokken gesplitst, parallel opgehaald, opnieuw
+geprobeerd voor alleen de mislukte blokken en weer tot één matrix samengevoegd.
+"""
+import logging
+import math
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from .distance_matrix import DistanceMatrix
+from .rate_limit import get_bucket
+from .travel_profile import get_travel_profile
+
+logger = logging.getLogger(__name__)
+
+
+class MatrixTile:
+    """Eén origin/destination blok van de matrix (indices in de locatielijst)"""
+    __slots__ = ('rows', 'cols', 'attempts')
+
+    def __init__(self, rows, cols):
+        self.rows = rows
+        self.cols = cols
+        self.attempts = 0
+
+    @property
+    def elements(self):
+        return len(self.rows) * len(self.cols)
+
+    def __repr__(self):
+        return f"MatrixTile({len(self.rows)}x{len(self.cols)})"
+
+
+class DistanceMatrixTiler:
+    """
+    Bouwt een volledige N×N matrix uit provider-legale blokken
+
+    fetch_tile(origins, destinations) moet een lijst van rijen met Google
+    elementen teruggeven, of None als de request mislukte.
+    """
+
+    def __init__(self, fetch_tile, max_origins=25, max_destinations=25, max_elements=100,
+                 elements_per_second=1000, max_workers=4, max_retries=2, retry_backoff=0.5,
+                 symmetric=True, rate_limit_name='google_distance_matrix'):
+        """
+        Args:
+            fetch_tile: functie (origins, destinations) -> rijen met elementen of None
+            max_origins/max_destinations/max_elements: limieten per request
+            elements_per_second: limiet over alle requests samen
+            max_retries: aantal extra pogingen voor mislukte blokken
+            symmetric: A->B gelijk aan B->A gebruiken (halveert het aantal elementen)
+        """
+        self.fetch_tile = fetch_tile
+        self.max_origins = max_origins
+        self.max_destinations = max_destinations
+        self.max_elements = max_elements
+        self.max_workers = max_workers
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self.symmetric = symmetric
+        self.bucket = get_bucket(rate_limit_name, elements_per_second, capacity=elements_per_second)
+        self.stats = {}
+
+    def _block_size(self):
+        side = int(math.isqrt(self.max_elements))
+        return max(1, min(self.max_origins, self.max_destinations, side))
+
+    def plan_tiles(self, size, known=None):
+        """
+        Verdeel de ontbrekende cellen over blokken
+
+        Args:
+            size: aantal locaties
+            known: dict (i, j) -> element met al bekende cellen
+
+        Returns:
+            lijst van MatrixTile met alleen de rijen/kolommen die nog iets missen
+        """
+        known = known or {}
+        block = self._block_size()
+        blocks = [list(range(start, min(start + block, size))) for start in range(0, size, block)]
+
+        tiles = []
+        for bi, block_rows in enumerate(blocks):
+            for bj, block_cols in enumerate(blocks):
+                if self.symmetric and bj < bi:
+                    continue
+                missing = [
+                    (i, j) for i in block_rows for j in block_cols
+                    if i != j
+                    and (i, j) not in known
+                    and not (self.symmetric and ((j, i) in known or (bi == bj and j < i)))
+                ]
+                if not missing:
+                    continue
+                rows = sorted({i for i, _ in missing})
+                cols = sorted({j for _, j in missing})
+                tiles.append(MatrixTile(rows, cols))
+        return tiles
+
+    def build(self, locations, known=None):
+        """
+        Haal de volledige matrix op
+
+        Args:
+            locations: lijst van "lat,lng" strings of adressen
+            known: dict (i, j) -> element dat niet opnieuw opgehaald hoeft te worden
+
+        Returns:
+            Google-vormige distance matrix dict met rows/elements voor alle paren
+        """
+        started = time.perf_counter()
+        size = len(locations)
+        grid = [[None] * size for _ in range(size)]
+        for i in range(size):
+            grid[i][i] = {'status': 'OK', 'distance': {'text': '0 km', 'value': 0}, 'duration': {'text': '0 min', 'value': 0}}
+        for (i, j), element in (known or {}).items():
+            grid[i][j] = element
+            if self.symmetric and grid[j][i] is None:
+                grid[j][i] = dict(element, mirrored=True)
+
+        pending = self.plan_tiles(size, known)
+        planned = len(pending)
+        requested_elements = sum(tile.elements for tile in pending)
+        requests_made = 0
+
+        for attempt in range(self.max_retries + 1):
+            if not pending:
+                break
+            if attempt:
+                time.sleep(self.retry_backoff * (2 ** (attempt - 1)))
+                logger.warning(f"Distance matrix: {len(pending)} mislukte blokken opnieuw proberen (poging {attempt + 1})")
+
+            workers = max(1, min(self.max_workers, len(pending)))
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                outcomes = list(pool.map(lambda tile: self._fetch(tile, locations), pending))
+            requests_made += len(pending)
+
+            failed = []
+            for tile, rows in zip(pending, outcomes):
+                if rows is None:
+                    failed.append(tile)
+                    continue
+                self._stitch(grid, tile, rows)
+            pending = failed
+
+        # Blokken die blijven falen krijgen een Haversine schatting
+        estimated = self._fill_estimates(grid, locations)
+
+        self.stats = {
+            'locations': size,
+            'tiles': planned,
+            'requests': requests_made,
+            'elements_requested': requested_elements,
+            'elements_known': len(known or {}),
+            'failed_tiles': len(pending),
+            'estimated_cells': estimated,
+            'elapsed_seconds': round(time.perf_counter() - started, 3),
+        }
+        logger.info(f"Distance matrix tiling: {self.stats}")
+
+        return {
+            'status': 'OK',
+            'origin_addresses': list(locations),
+            'destination_addresses': list(locations),
+            'rows': [{'elements': row} for row in grid],
+        }
+
+    def _fetch(self, tile, locations):
+        tile.attempts += 1
+        self.bucket.acquire(tokens=tile.elements)
+        try:
+            rows = self.fetch_tile(
+                [locations[i] for i in tile.rows],
+                [locations[j] for j in tile.cols]
+            )
+        except Exception as e:
+            logger.error(f"Distance matrix blok {tile} mislukt: {e}")
+            return None
+        if rows is None or len(rows) != len(tile.rows) or any(len(row) != len(tile.cols) for row in rows):
+            return None
+        return rows
+
+    def _stitch(self, grid, tile, rows):
+        for row_index, i in enumerate(tile.rows):
+            for col_index, j in enumerate(tile.cols):
+                if i == j:
+                    continue
+                element = rows[row_index][col_index]
+                grid[i][j] = element
+                if self.symmetric and grid[j][i] is None:
+                    # B->A is niet gemeten: niet als echte meting cachen
+                    grid[j][i] = dict(element, mirrored=True)
+
+    def _fill_estimates(self, grid, locations):
+        missing = [(i, j) for i, row in enumerate(grid) for j, element in enumerate(row) if element is None]
+        if not missing:
+            return 0
+
+        points = []
+        for index, location in enumerate(locations):
+            try:
+                lat, lng = (float(part) for part in str(location).split(','))
+            except ValueError:
+                lat, lng = None, None
+            points.append((index, lat, lng))
+        estimate = DistanceMatrix(points, profile=get_travel_profile())
+
+        for i, j in missing:
+            distance_km = estimate.distance_by_index(i, j)
+            minutes = estimate.travel_time_by_index(i, j)
+            grid[i][j] = {
+                'status': 'OK',
+                'distance': {'text': f'{distance_km:.1f} km', 'value': int(distance_km * 1000)},
+                'duration': {'text': f'{int(minutes)} min', 'value': int(minutes * 60)},
+                'estimated': True,
+            }
+        logger.warning(f"Distance matrix: {len(missing)} cellen geschat (Haversine)")
+        return len(missing)
@@ -2,6 +2,8 @@ import requests
 from django.conf import settings
 import logging
 
+from .lazy import LazyService
+
 logger = logging.getLogger(__name__)
 
 
@@ -9,8 +11,15 @@ class OptaPlannerService:
     """
     Service voor communicatie met OptaPlanner API
     Gebaseerd op bestaande PHP implementatie
+    
+    Een probleem (voertuigen + locaties) wordt bij voorkeur in één JSON POST naar
+    api/problem gestuurd. Servers zonder dat endpoint krijgen de oude per-entity
+    GET requests (api/vehicleadd, api/locationadd) via dezelfde sessie.
     """
     
+    # HTTP statussen waarmee een server aangeeft dat api/problem niet bestaat
+    BATCH_UNSUPPORTED_STATUS = (404, 405, 501)
+    
     def __init__(self):
         # Haal configuratie uit database, fallback naar settings
         from planning.models import Configuration
@@ -22,6 +31,10 @@ class OptaPlannerService:
         # Timeout settings uit database
         timeout = Configuration.get_value('OPTAPLANNER_TIMEOUT', '30')
         self.session.timeout = int(timeout)
+        self.timeout = int(timeout)
+        
+        # None = nog niet bekend, wordt bij de eerste submit vastgesteld
+        self.batch_supported = None
     
     def is_enabled(self):
         """Check if OptaPlanner is enabled"""
@@ -54,21 +67,10 @@ class OptaPlannerService:
         URL: api/vehicleadd/{name}/{people}/{specialseats}/{kmRate}/{maxDriveTimeInSeconds}
         """
         try:
-            # Convert vehicle data to OptaPlanner format
-            name = vehicle.kenteken.replace(' ', '_').replace('-', '_')
-            people = vehicle.aantal_zitplaatsen
-            specialseats = vehicle.speciale_zitplaatsen
-            
-            # Convert km_kosten_per_km to cents (multiply by 100)
-            km_rate = int(float(vehicle.km_kosten_per_km) * 100)
-            
-            # Convert maximale_rit_tijd to seconds (if it's in hours)
-            max_drive_time = int(vehicle.maximale_rit_tijd * 3600) if vehicle.maximale_rit_tijd < 100 else int(vehicle.maximale_rit_tijd)
-            
-            url = f"{self.base_url}/api/vehicleadd/{name}/{people}/{specialseats}/{km_rate}/{max_drive_time}"
-            response = self.session.get(url)
+            payload = self.vehicle_payload(vehicle)
+            response = self.session.get(self._vehicle_url(payload), timeout=self.timeout)
             
-            logger.info(f"Add vehicle {name}: {response.text}")
+            logger.info(f"Add vehicle {payload['name']}: {response.text}")
             return response.text
             
         except requests.RequestException as e:
@@ -86,35 +88,166 @@ class OptaPlannerService:
             preferred_vehicle: Vehicle name or '_' for any
         """
         try:
-            # Create unique location name with proper encoding
-            location_name = f"{patient.naam.replace(' ', '_').replace('-', '_').replace('.', '_')}_{location_type[0].upper()}"
+            payload = self.location_payload(patient, location_type, preferred_vehicle)
+            response = self.session.get(self._location_url(payload), timeout=self.timeout)
             
-            # Use patient coordinates or default (you might want to geocode addresses later)
-            longitude = patient.longitude or 4.0  # Default to Netherlands center
-            latitude = patient.latitude or 52.0
-            
-            # Determine special requirements
-            special = 1 if patient.rolstoel else 0  # Use the rolstoel field
-            drv = 0  # Assuming no DRV for now
-            pickup = 1 if location_type == 'pickup' else 0
-            
-            url = f"{self.base_url}/api/locationadd/{location_name}/{longitude}/{latitude}/{special}/{drv}/{preferred_vehicle}/{pickup}"
-            response = self.session.get(url)
-            
-            logger.info(f"Add location {location_name}: {response.text}")
+            logger.info(f"Add location {payload['name']}: {response.text}")
             return response.text
             
         except requests.RequestException as e:
             logger.error(f"Error adding location for patient {patient.naam}: {e}")
             return None
     
+    # ------------------------------------------------------------------
+    # Probleem opbouw (gedeeld door batch en per-entity pad)
+    # ------------------------------------------------------------------
+    
+    @staticmethod
+    def vehicle_payload(vehicle):
+        """Voertuig in OptaPlanner formaat"""
+        # Convert maximale_rit_tijd to seconds (if it's in hours)
+        max_drive_time = int(vehicle.maximale_rit_tijd * 3600) if vehicle.maximale_rit_tijd < 100 else int(vehicle.maximale_rit_tijd)
+        return {
+            'name': vehicle.kenteken.replace(' ', '_').replace('-', '_'),
+            'people': vehicle.aantal_zitplaatsen,
+            'specialSeats': vehicle.speciale_zitplaatsen,
+            'kmRate': int(float(vehicle.km_kosten_per_km) * 100),  # Centen
+            'maxDriveTimeInSeconds': max_drive_time,
+        }
+    
+    @staticmethod
+    def location_payload(patient, location_type, preferred_vehicle='_'):
+        """Ophaal- of afzetlocatie van een patiënt in OptaPlanner formaat"""
+        return {
+            'name': f"{patient.naam.replace(' ', '_').replace('-', '_').replace('.', '_')}_{location_type[0].upper()}",
+            # Use patient coordinates or default (you might want to geocode addresses later)
+            'longitude': patient.longitude or 4.0,  # Default to Netherlands center
+            'latitude': patient.latitude or 52.0,
+            'special': 1 if patient.rolstoel else 0,
+            'drv': 0,  # Assuming no DRV for now
+            'preferredVehicle': preferred_vehicle,
+            'pickup': 1 if location_type == 'pickup' else 0,
+        }
+    
+    @staticmethod
+    def depot_payload(location):
+        """Depot (home locatie) in OptaPlanner formaat"""
+        return {
+            'name': location.name.replace(' ', '_'),
+            'longitude': float(location.longitude),
+            'latitude': float(location.latitude),
+            'special': 0,
+            'drv': 0,
+            'preferredVehicle': '_',
+            'pickup': 1,
+        }
+    
+    def _vehicle_url(self, payload):
+        return (f"{self.base_url}/api/vehicleadd/{payload['name']}/{payload['people']}/"
+                f"{payload['specialSeats']}/{payload['kmRate']}/{payload['maxDriveTimeInSeconds']}")
+    
+    def _location_url(self, payload):
+        return (f"{self.base_url}/api/locationadd/{payload['name']}/{payload['longitude']}/{payload['latitude']}/"
+                f"{payload['special']}/{payload['drv']}/{payload['preferredVehicle']}/{payload['pickup']}")
+    
+    def submit_problem(self, vehicles, locations):
+        """
+        Stuur een compleet probleem naar OptaPlanner (vervangt het huidige probleem)
+        
+        Args:
+            vehicles: lijst van vehicle_payload dicts
+            locations: lijst van location_payload/depot_payload dicts
+            
+        Returns:
+            dict met mode ('batch' of 'per_entity'), vehicles_added, locations_added en round_trips,
+            of None als de batch mislukte of de server niet gereset kon worden
+            
+        Alleen als de server api/problem niet kent (BATCH_UNSUPPORTED_STATUS) wordt
+        teruggevallen op de per-entity endpoints; een netwerk fout of andere status
+        is een fout en geen reden voor honderden losse requests.
+        """
+        if self.batch_supported is not False:
+            result = self._submit_batch(vehicles, locations)
+            if result is not None or self.batch_supported is not False:
+                return result
+        return self._submit_per_entity(vehicles, locations)
+    
+    def _submit_batch(self, vehicles, locations):
+        """
+        Eén POST naar api/problem
+        None bij een fout; batch_supported wordt False als de server het endpoint niet kent
+        """
+        try:
+            response = self.session.post(
+                f"{self.base_url}/api/problem",
+                json={'vehicles': vehicles, 'locations': locations},
+                timeout=self.timeout
+            )
+        except requests.RequestException as e:
+            logger.error(f"Error submitting problem batch: {e}")
+            return None
+        
+        if response.status_code in self.BATCH_UNSUPPORTED_STATUS:
+            logger.info(f"OptaPlanner server ondersteunt api/problem niet ({response.status_code}), gebruik per-entity endpoints")
+            self.batch_supported = False
+            return None
+        if response.status_code != 200:
+            logger.error(f"Problem batch error {response.status_code}: {response.text}")
+            return None
+        
+        self.batch_supported = True
+        logger.info(f"Problem batch submitted: {len(vehicles)} vehicles, {len(locations)} locations")
+        return {
+            'mode': 'batch',
+            'vehicles_added': len(vehicles),
+            'locations_added': len(locations),
+            'round_trips': 1,
+        }
+    
+    def _submit_per_entity(self, vehicles, locations):
+        """Oude pad: clear + één GET per voertuig en per locatie over de gedeelde sessie"""
+        round_trips = 2
+        if self.clear_planner() is None or not self.clear_vehicles():
+            return None
+        
+        vehicles_added = 0
+        for payload in vehicles:
+            try:
+                response = self.session.get(self._vehicle_url(payload), timeout=self.timeout)
+                round_trips += 1
+                if response.status_code == 200:
+                    vehicles_added += 1
+                else:
+                    logger.error(f"Vehicle {payload['name']} error response: {response.text}")
+            except requests.RequestException as e:
+                logger.error(f"Error adding vehicle {payload['name']}: {e}")
+        
+        locations_added = 0
+        for payload in locations:
+            try:
+                response = self.session.get(self._location_url(payload), timeout=self.timeout)
+                round_trips += 1
+                if response.status_code == 200:
+                    locations_added += 1
+                else:
+                    logger.error(f"Location {payload['name']} error response: {response.text}")
+            except requests.RequestException as e:
+                logger.error(f"Error adding location {payload['name']}: {e}")
+        
+        return {
+            'mode': 'per_entity',
+            'vehicles_added': vehicles_added,
+            'locations_added': locations_added,
+            'round_trips': round_trips,
+        }
+    
     def get_route_result(self):
         """
         Get the optimized route result
         Returns: List of vehicles with their routes
         """
         try:
-            response = self.session.get(f"{self.base_url}/api/route")
+            response = self.session.get(f"{self.base_url}/api/route", timeout=self.timeout)
             result = response.json()
             
             logger.info(f"Route result received: {result.get('vehicleCount', 0)} vehicles")
@@ -145,30 +278,24 @@ class OptaPlannerService:
         try:
             logger.info("Starting route planning process")
             
-            # Step 1: Clear planner
-            clear_result = self.clear_planner()
-            if clear_result is None:
-                return None
-            
-            # Step 2: Clear vehicles
-            if not self.clear_vehicles():
-                return None
-            
-            # Step 3: Add vehicles
-            for vehicle in vehicles:
-                if vehicle.status == 'beschikbaar':
-                    self.add_vehicle(vehicle)
-            
-            # Step 4: Add patient locations (pickup and dropoff)
+            # Step 1: Build the complete problem (vehicles + pickup and dropoff per patient)
+            vehicle_payloads = [
+                self.vehicle_payload(vehicle) for vehicle in vehicles
+                if vehicle.status == 'beschikbaar'
+            ]
+            location_payloads = []
             for patient in patients:
                 if patient.toegewezen_tijdblok and patient.status in ['nieuw', 'gepland']:
-                    # Add pickup location
-                    self.add_location(patient, 'pickup')
-                    
-                    # Add dropoff location (use destination or default)
-                    self.add_location(patient, 'dropoff')
+                    location_payloads.append(self.location_payload(patient, 'pickup'))
+                    location_payloads.append(self.location_payload(patient, 'dropoff'))
+            
+            # Step 2: Submit in one request (or per entity on older servers)
+            submission = self.submit_problem(vehicle_payloads, location_payloads)
+            if submission is None:
+                return None
+            logger.info(f"Problem submitted via {submission['mode']} in {submission['round_trips']} round trips")
             
-            # Step 5: Get optimized routes
+            # Step 3: Get optimized routes
             routes = self.get_route_result()
             
             logger.info(f"Route planning completed: {len(routes)} routes generated")
@@ -179,5 +306,9 @@ class OptaPlannerService:
             return None
 
 
-# Singleton instance
-optaplanner_service = OptaPlannerService()
+# Singleton instance, lazy: gebouwd bij het eerste gebruik en opnieuw na een wijziging in Configuration (URL, enabled, timeout)
+optaplanner_service = LazyService(OptaPlannerService, refresh=True)
+
+
+def get_optaplanner_service() -> OptaPlannerService:
+    return optaplanner_service.get()
@@ -0,0 +1,162 @@
+"""
+Lokale stub server voor de OptaPlanner REST API
+Ondersteunt het batch endpoint (api/problem) en de oude per-entity endpoints,
+zodat beide submit paden zonder echte OptaPlanner server getest kunnen worden:
+
+    with OptaPlannerStubServer(batch_support=False) as stub:
+        service = OptaPlannerService()
+        service.base_url = stub.base_url
+        service.submit_problem(vehicles, locations)
+        stub.round_trips  # aantal requests
+"""
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import unquote, urlparse
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+
+    def _reply(self, status, body, content_type='text/plain'):
+        payload = body if isinstance(body, bytes) else body.encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_GET(self):
+        stub = self.server.stub
+        parts = [unquote(part) for part in urlparse(self.path).path.strip('/').split('/')]
+        stub.record('GET', parts[:2])
+
+        if parts[:2] == ['api', 'clear']:
+            stub.clear()
+            return self._reply(200, 'cleared')
+        if parts[:2] == ['api', 'version']:
+            return self._reply(200, 'optaplanner-stub')
+        if parts[:2] == ['api', 'vehicleadd'] and len(parts) == 7:
+            name, people, special, km_rate, max_time = parts[2:]
+            stub.add_vehicle({'name': name, 'people': int(people), 'specialSeats': int(special),
+                              'kmRate': int(km_rate), 'maxDriveTimeInSeconds': int(max_time)})
+            return self._reply(200, 'added')
+        if parts[:2] == ['api', 'locationadd'] and len(parts) == 9:
+            name, longitude, latitude, special, drv, preferred, pickup = parts[2:]
+            stub.add_location({'name': name, 'longitude': float(longitude), 'latitude': float(latitude),
+                               'special': int(special), 'drv': int(drv), 'preferredVehicle': preferred,
+                               'pickup': int(pickup)})
+            return self._reply(200, 'added')
+        if parts[:2] == ['api', 'route']:
+            return self._reply(200, json.dumps(stub.route()), 'application/json')
+        return self._reply(404, 'not found')
+
+    def do_POST(self):
+        stub = self.server.stub
+        parts = urlparse(self.path).path.strip('/').split('/')
+        stub.record('POST', parts[:2])
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length) if length else b''
+
+        if parts[:2] == ['api', 'clearvehicle']:
+            stub.clear_vehicles()
+            return self._reply(200, 'cleared')
+        if parts[:2] == ['api', 'problem']:
+            if not stub.batch_support:
+                return self._reply(404, 'not found')
+            try:
+                problem = json.loads(body or b'{}')
+            except ValueError:
+                return self._reply(400, 'invalid json')
+            stub.load_problem(problem)
+            return self._reply(200, json.dumps({'vehicles': len(stub.vehicles), 'locations': len(stub.locations)}),
+                               'application/json')
+        return self._reply(404, 'not found')
+
+    def log_message(self, format, *args):
+        pass
+
+
+class OptaPlannerStubServer:
+    """
+    In-memory OptaPlanner: houdt voertuigen en locaties bij en verdeelt de
+    locaties round-robin over de voertuigen bij api/route
+    """
+
+    def __init__(self, host='127.0.0.1', port=0, batch_support=True):
+        self.batch_support = batch_support
+        self.vehicles = []
+        self.locations = []
+        self.requests = {}
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), _StubHandler)
+        self._server.stub = self
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def round_trips(self):
+        return sum(self.requests.values())
+
+    def record(self, method, parts):
+        key = f"{method} /{'/'.join(parts)}"
+        with self._lock:
+            self.requests[key] = self.requests.get(key, 0) + 1
+
+    def clear(self):
+        with self._lock:
+            self.locations = []
+
+    def clear_vehicles(self):
+        with self._lock:
+            self.vehicles = []
+
+    def add_vehicle(self, vehicle):
+        with self._lock:
+            self.vehicles.append(vehicle)
+
+    def add_location(self, location):
+        with self._lock:
+            self.locations.append(location)
+
+    def load_problem(self, problem):
+        with self._lock:
+            self.vehicles = list(problem.get('vehicles', []))
+            self.locations = list(problem.get('locations', []))
+
+    def route(self):
+        with self._lock:
+            routes = [
+                {'vehicle': {'name': vehicle['name'], 'capacity': vehicle['people'],
+                             'specialCapacity': vehicle['specialSeats']},
+                 'visits': [], 'locations': []}
+                for vehicle in self.vehicles
+            ]
+            for index, location in enumerate(self.locations):
+                if not routes:
+                    break
+                route = routes[index % len(routes)]
+                visit = {'name': location['name'], 'latitude': location['latitude'],
+                         'longitude': location['longitude'],
+                         'type': 'PICKUP' if location['pickup'] else 'DROPOFF'}
+                route['visits'].append(visit)
+                route['locations'].append(visit)
+            return {'routes': routes, 'vehicleCount': len(routes)}
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
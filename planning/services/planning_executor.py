@@ -0,0 +1,201 @@
+"""
+Parallelle planning per tijdblok
+Elk tijdblok is een onafhankelijk probleem en wordt in een eigen proces opgelost.
+Workers krijgen alleen plain-data snapshots (geen ORM objecten of database connecties).
+"""
+import logging
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+
+from .constraint_engine import ConstraintEngine
+from .distance_matrix import DistanceMatrix
+from .travel_profile import TravelTimeProfile
+from .vrp_solver import SavingsSolver, VehicleSpec
+
+logger = logging.getLogger(__name__)
+
+
+def snapshot_patient(patient):
+    """Picklable snapshot van een patiënt voor de solver"""
+    return {
+        'id': patient.id,
+        'latitude': float(patient.latitude) if patient.latitude else None,
+        'longitude': float(patient.longitude) if patient.longitude else None,
+        'rolstoel': bool(patient.rolstoel),
+    }
+
+
+def snapshot_vehicle(vehicle, max_minutes):
+    """Picklable snapshot van een voertuig voor de solver"""
+    return {
+        'id': vehicle.id,
+        'capacity': vehicle.aantal_zitplaatsen,
+        'special_capacity': vehicle.speciale_zitplaatsen,
+        'max_minutes': max_minutes,
+    }
+
+
+def solve_timeslot_job(job):
+    """
+    Los één tijdblok op (draait in een worker proces)
+
+    Args:
+        job: dict met depot, patients, vehicles en solver instellingen (alleen plain data)
+
+    Returns:
+        dict met routes als lijsten van patiënt ids per voertuig
+    """
+    started = time.perf_counter()
+    depot_lat, depot_lon = job['depot']
+    points = [(DistanceMatrix.DEPOT, depot_lat, depot_lon)]
+    for patient in job['patients']:
+        points.append((
+            patient['id'],
+            patient['latitude'] or depot_lat,
+            patient['longitude'] or depot_lon
+        ))
+    # Reistijden bij vertrek aan het begin van het tijdvenster
+    profile = TravelTimeProfile.from_data(job['travel_profile']) if job.get('travel_profile') else None
+    distance_matrix = DistanceMatrix(points, profile=profile, departure=job['window'][0])
+
+    engine = None
+    if job.get('constraints') is not None:
+        engine = ConstraintEngine(job['constraints'], service_time=job['service_time'])
+
+    solver = SavingsSolver(
+        distance_matrix,
+        service_time=job['service_time'],
+        time_budget=job['time_budget'],
+        route_max_minutes=job['route_max_minutes'],
+        engine=engine
+    )
+    specs = [
+        VehicleSpec(v['id'], v['capacity'], v['special_capacity'], v['max_minutes'])
+        for v in job['vehicles']
+    ]
+    wheelchair = {patient['id']: patient['rolstoel'] for patient in job['patients']}
+    solved_routes, unassigned = solver.solve([p['id'] for p in job['patients']], specs, wheelchair)
+
+    routes = []
+    for vehicle_id, patient_ids in solved_routes:
+        stops = [distance_matrix.index(patient_id) for patient_id in patient_ids]
+        routes.append({
+            'vehicle_id': vehicle_id,
+            'patient_ids': patient_ids,
+            'wheelchairs': sum(1 for patient_id in patient_ids if wheelchair.get(patient_id)),
+            'duration': solver.route_duration(stops),
+            'distance': solver.route_cost(stops),
+        })
+
+    return {
+        'group_key': job['group_key'],
+        'route_type': job['route_type'],
+        'window': job['window'],
+        'routes': routes,
+        'unassigned': unassigned,
+        'stats': dict(solver.stats, worker_seconds=time.perf_counter() - started),
+    }
+
+
+class PlanningExecutor:
+    """
+    Verdeelt tijdblok jobs over een ProcessPoolExecutor en voegt de resultaten samen
+    """
+
+    def __init__(self, max_workers=None, parallel=True):
+        self.max_workers = max_workers
+        self.parallel = parallel
+
+    def run(self, jobs):
+        """
+        Voer alle jobs uit, parallel als dat zin heeft
+        Returns: resultaten in dezelfde volgorde als jobs
+        """
+        if not jobs:
+            return []
+
+        if not self.parallel or len(jobs) == 1 or self.max_workers == 1:
+            return [solve_timeslot_job(job) for job in jobs]
+
+        started = time.perf_counter()
+        workers = min(len(jobs), self.max_workers) if self.max_workers else None
+        try:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                results = list(pool.map(solve_timeslot_job, jobs))
+        except Exception as e:
+            # Bijvoorbeeld geen fork/semaphores beschikbaar: val terug op sequentieel
+            logger.warning(f"Parallelle planning niet beschikbaar ({e}), plan sequentieel")
+            return [solve_timeslot_job(job) for job in jobs]
+
+        slowest = max(result['stats'].get('worker_seconds', 0) for result in results)
+        logger.info(f"Parallelle planning: {len(jobs)} tijdblokken in {time.perf_counter() - started:.2f}s "
+                    f"(traagste tijdblok {slowest:.2f}s)")
+        return results
+
+
+def _route_interval(result, route, day):
+    """Bepaal (start, eind) van een route binnen het venster van het tijdblok"""
+    window_start, window_end = result['window']
+    duration = timedelta(minutes=route['duration'])
+    if result['route_type'] == 'HALEN':
+        end = datetime.combine(day, window_end)
+        return end - duration, end
+    start = datetime.combine(day, window_start)
+    return start, start + duration
+
+
+def resolve_vehicle_conflicts(results, vehicles, day=None):
+    """
+    Zorg dat een voertuig niet in twee overlappende tijdblokken tegelijk rijdt
+
+    Routes worden op starttijd verwerkt; een route die overlapt met een eerdere
+    route van hetzelfde voertuig gaat naar een vrij voertuig dat past. Lukt dat
+    niet, dan krijgt de route 'vehicle_conflict' = True.
+
+    Args:
+        results: uitkomsten van solve_timeslot_job (worden aangepast)
+        vehicles: voertuig snapshots (zie snapshot_vehicle)
+    """
+    day = day or datetime.now().date()
+    busy = {vehicle['id']: [] for vehicle in vehicles}
+
+    entries = []
+    for result in results:
+        for route in result['routes']:
+            start, end = _route_interval(result, route, day)
+            entries.append((start, end, route))
+    entries.sort(key=lambda entry: entry[0])
+
+    def is_free(vehicle_id, start, end):
+        return all(end <= other_start or start >= other_end for other_start, other_end in busy[vehicle_id])
+
+    def fits(vehicle, route):
+        return (len(route['patient_ids']) <= vehicle['capacity']
+                and route['wheelchairs'] <= vehicle['special_capacity']
+                and (not vehicle['max_minutes'] or route['duration'] <= vehicle['max_minutes']))
+
+    conflicts = 0
+    for start, end, route in entries:
+        route['vehicle_conflict'] = False
+        if is_free(route['vehicle_id'], start, end):
+            busy[route['vehicle_id']].append((start, end))
+            continue
+
+        # Kleinste vrije voertuig dat de route aankan
+        candidates = sorted(
+            (v for v in vehicles if fits(v, route) and is_free(v['id'], start, end)),
+            key=lambda v: (v['capacity'], v['special_capacity'])
+        )
+        if candidates:
+            logger.info(f"Voertuig conflict opgelost: route van {route['vehicle_id']} naar {candidates[0]['id']}")
+            route['vehicle_id'] = candidates[0]['id']
+            busy[route['vehicle_id']].append((start, end))
+        else:
+            route['vehicle_conflict'] = True
+            busy.setdefault(route['vehicle_id'], []).append((start, end))
+            conflicts += 1
+
+    if conflicts:
+        logger.warning(f"{conflicts} routes hebben een voertuig dat al in een overlappend tijdblok rijdt")
+    return results
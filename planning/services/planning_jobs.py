@@ -0,0 +1,301 @@
+"""
+Achtergrond uitvoering van planning views
+De planning views (OptaPlanner, wizard routes, Google Maps routes) zijn met
+@planning_job gemarkeerd. Een request met `async=1` (form veld, query parameter
+of JSON body) wordt dan als PlanningJob in de wachtrij gezet en krijgt direct een
+job id terug. `manage.py run_planning_worker` voert de view later uit met een
+JobRequest: dezelfde body en de wizard sleutels uit de sessie (JOB_SESSION_KEYS,
+geen login gegevens). De JSON response komt in job.result en sessie wijzigingen
+worden bij het pollen teruggeschreven.
+
+Voortgang: report_progress() vanuit de planning code (per tijdblok). Buiten een
+job doet de functie niets, dus de synchrone route blijft ongewijzigd werken.
+"""
+import json
+import logging
+import os
+import socket
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from functools import wraps
+from importlib import import_module
+
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.db import DatabaseError, connections
+from django.http import JsonResponse, QueryDict
+from django.http.request import RawPostDataException
+from django.utils import timezone
+
+from planning.models_extended import PlanningJob
+from .wizard_state import SESSION_KEY as WIZARD_STATE_KEY
+
+logger = logging.getLogger(__name__)
+
+# job_type -> originele (niet gedecoreerde) view
+_JOB_VIEWS = {}
+
+# De OptaPlanner server heeft één probleem tegelijk in het geheugen
+_EXCLUSIVE_LOCKS = {'optaplanner': threading.Lock()}
+
+_current = threading.local()
+
+# Sessie sleutels die de job views lezen: de wizard state id en oude sessie data
+# die WizardState bij het eerste lezen verhuist. De payload is in de admin te
+# zien, dus _auth_user_id/_auth_user_hash en andere sessie data gaan niet mee.
+JOB_SESSION_KEYS = (WIZARD_STATE_KEY, 'planning_data', 'wizard_planning_data', 'wizard_upload_data')
+
+
+def report_progress(message, current=None, total=None, **data):
+    """
+    Voortgang van de lopende job opslaan (no-op buiten een worker)
+
+    Args:
+        message: korte omschrijving, bijv. "Tijdblok 08:00 verwerkt"
+        current/total: voortgang in stappen (meestal tijdblokken)
+        data: extra JSON velden voor de frontend (timeslot, routes, ...)
+    """
+    job = getattr(_current, 'job', None)
+    if job is None:
+        return
+    try:
+        job.add_event(message, current=current, total=total, **data)
+    except DatabaseError as e:
+        logger.warning(f"Voortgang van job {job.pk} niet opgeslagen: {e}")
+
+
+def wants_async(request):
+    """Vraagt de client om achtergrond uitvoering?"""
+    truthy = ('1', 'true', 'yes', 'on')
+    if str(request.GET.get('async', '')).lower() in truthy:
+        return True
+    if request.content_type == 'application/json':
+        try:
+            data = json.loads(request.body or b'{}')
+        except (ValueError, RawPostDataException):
+            return False
+        return isinstance(data, dict) and data.get('async') in (True, 1, '1', 'true')
+    return str(request.POST.get('async', '')).lower() in truthy
+
+
+def planning_job(job_type):
+    """
+    Decorator voor planning views die ook als achtergrond job kunnen draaien
+    """
+    def decorator(view):
+        _JOB_VIEWS[job_type] = view
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method == 'POST' and not isinstance(request, JobRequest) and wants_async(request):
+                return enqueue_request(job_type, request)
+            return view(request, *args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def enqueue_request(job_type, request):
+    """Zet een request in de wachtrij en geef het job id terug (HTTP 202)"""
+    if not request.session.session_key:
+        request.session.save()
+
+    try:
+        body = request.body.decode('utf-8', errors='replace')
+    except RawPostDataException:
+        body = ''
+
+    job = PlanningJob.objects.create(
+        job_type=job_type,
+        created_by=request.user if request.user.is_authenticated else None,
+        session_key=request.session.session_key or '',
+        payload={
+            'method': request.method,
+            'content_type': request.content_type,
+            'body': body,
+            'GET': request.GET.urlencode(),
+            'POST': request.POST.urlencode() if request.content_type != 'application/json' else '',
+            'session': {key: request.session[key] for key in JOB_SESSION_KEYS if key in request.session},
+        },
+    )
+    logger.info(f"Planning job {job.pk} ({job_type}) in wachtrij gezet")
+    return JsonResponse({
+        'success': True,
+        'status': 'queued',
+        'job_id': job.pk,
+        'status_url': f'/api/planning-jobs/{job.pk}/',
+        # Alleen onder ASGI; anders pollt de frontend status_url
+        'events_url': f'/api/planning-jobs/{job.pk}/events/' if event_stream_enabled() else None,
+    }, status=202)
+
+
+def event_stream_enabled():
+    """SSE voortgang (PLANNING_JOBS['event_stream']), alleen zinvol onder ASGI"""
+    return bool(getattr(settings, 'PLANNING_JOBS', {}).get('event_stream', False))
+
+
+class JobSession(dict):
+    """Sessie kopie voor een job; wijzigingen worden na afloop als diff bewaard"""
+
+    def __init__(self, data, session_key=''):
+        super().__init__(data)
+        self.session_key = session_key
+        self.modified = False
+
+    def __setitem__(self, key, value):
+        super().__setitem__(key, value)
+        self.modified = True
+
+    def __delitem__(self, key):
+        super().__delitem__(key)
+        self.modified = True
+
+    def save(self):
+        pass
+
+    def diff(self, original):
+        return {
+            'set': {key: value for key, value in self.items() if key not in original or original[key] != value},
+            'delete': [key for key in original if key not in self],
+        }
+
+
+class JobRequest:
+    """
+    Minimale HttpRequest vervanger waarmee een view in de worker draait
+    """
+
+    def __init__(self, job):
+        payload = job.payload or {}
+        self.job = job
+        self.method = payload.get('method', 'POST')
+        self.content_type = payload.get('content_type', '')
+        self.body = payload.get('body', '').encode('utf-8')
+        self.GET = QueryDict(payload.get('GET', ''))
+        self.POST = QueryDict(payload.get('POST', ''))
+        self.FILES = {}
+        self.META = {}
+        self.headers = {}
+        self.path = ''
+        self.session = JobSession(payload.get('session', {}), job.session_key)
+        self.user = job.created_by or AnonymousUser()
+
+
+def apply_session_updates(job, session):
+    """
+    Schrijf de sessie wijzigingen van een afgeronde job terug (één keer)
+    """
+    if not job.is_finished or job.session_applied or not job.session_updates:
+        return False
+    if not PlanningJob.objects.filter(pk=job.pk, session_applied=False).update(session_applied=True):
+        return False
+    for key, value in job.session_updates.get('set', {}).items():
+        session[key] = value
+    for key in job.session_updates.get('delete', []):
+        session.pop(key, None)
+    job.session_applied = True
+    return True
+
+
+def run_job(job):
+    """Voer een geclaimde job uit en sla de response op"""
+    import_module('planning.views')  # registreert de @planning_job views
+    view = _JOB_VIEWS.get(job.job_type)
+    if view is None:
+        job.finish('failed', error=f"Onbekend job type: {job.job_type}")
+        return job
+
+    request = JobRequest(job)
+    original_session = dict(request.session)
+    lock = _EXCLUSIVE_LOCKS.get(job.job_type)
+
+    if lock:
+        lock.acquire()
+    _current.job = job
+    try:
+        response = view(request)
+    except Exception as e:
+        logger.exception(f"Planning job {job.pk} mislukt")
+        job.finish('failed', error=str(e))
+        return job
+    finally:
+        if lock:
+            lock.release()
+        _current.job = None
+
+    try:
+        result = json.loads(response.content)
+    except ValueError:
+        result = {'content': response.content.decode('utf-8', errors='replace')}
+
+    failed = (
+        response.status_code >= 400
+        or not isinstance(result, dict)
+        or result.get('status') == 'error'
+        or result.get('success') is False
+    )
+    error = ''
+    if failed and isinstance(result, dict):
+        error = str(result.get('error') or result.get('message') or f"HTTP {response.status_code}")
+    job.finish('failed' if failed else 'completed', result=result,
+               session_updates=request.session.diff(original_session), error=error)
+    logger.info(f"Planning job {job.pk} ({job.job_type}): {job.status}")
+    return job
+
+
+class PlanningJobWorker:
+    """
+    Voert planning jobs uit in een thread pool, zonder externe broker
+    De database is de wachtrij; meerdere workers kunnen naast elkaar draaien.
+    """
+
+    def __init__(self, concurrency=None, poll_interval=None, stale_after=None):
+        config = getattr(settings, 'PLANNING_JOBS', {})
+        self.concurrency = concurrency or config.get('concurrency', 2)
+        self.poll_interval = poll_interval or config.get('poll_interval', 1.0)
+        self.stale_after = timedelta(seconds=stale_after or config.get('stale_after', 300))
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        self._stop = threading.Event()
+
+    def stop(self):
+        self._stop.set()
+
+    def run(self, once=False):
+        """
+        Args:
+            once: stop zodra de wachtrij leeg is en alle jobs klaar zijn
+        """
+        requeued = PlanningJob.requeue_stale(self.stale_after)
+        if requeued:
+            logger.warning(f"{requeued} vastgelopen planning jobs opnieuw in de wachtrij gezet")
+
+        running = set()
+        with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix='planning-job') as pool:
+            while not self._stop.is_set():
+                running = {future for future in running if not future.done()}
+                while len(running) < self.concurrency:
+                    job = PlanningJob.claim_next(self.worker_id)
+                    if job is None:
+                        break
+                    logger.info(f"Worker {self.worker_id} start job {job.pk} ({job.job_type})")
+                    running.add(pool.submit(self._execute, job))
+
+                if once and not running:
+                    break
+                self._heartbeat()
+                self._stop.wait(self.poll_interval)
+        return self
+
+    def _heartbeat(self):
+        try:
+            PlanningJob.objects.filter(worker_id=self.worker_id, status='running').update(heartbeat_at=timezone.now())
+        except DatabaseError as e:
+            logger.warning(f"Heartbeat mislukt: {e}")
+
+    @staticmethod
+    def _execute(job):
+        try:
+            run_job(job)
+        finally:
+            # Elke thread heeft een eigen database verbinding
+            connections.close_all()
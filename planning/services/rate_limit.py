@@ -0,0 +1,52 @@
+"""
+Rate limiting voor externe API's (geocoding, Google Distance Matrix)
+Eén token bucket per provider per proces, gedeeld door alle threads
+"""
+import threading
+import time
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket: maximaal `rate` tokens per seconde,
+    met een burst van `capacity` tokens
+    """
+
+    def __init__(self, rate, capacity=1):
+        self.rate = float(rate)
+        self.capacity = float(capacity)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, deadline=None, tokens=1):
+        """
+        Wacht tot er `tokens` beschikbaar zijn
+        Returns: False als de deadline (time.monotonic) eerder verstrijkt
+        """
+        tokens = min(float(tokens), self.capacity)
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return True
+                wait = (tokens - self._tokens) / self.rate
+            if deadline is not None and now + wait > deadline:
+                return False
+            time.sleep(wait)
+
+
+_buckets = {}
+_buckets_lock = threading.Lock()
+
+
+def get_bucket(name, rate, capacity=1):
+    """Gedeelde bucket per naam; een nieuwe rate vervangt de bucket"""
+    with _buckets_lock:
+        bucket = _buckets.get(name)
+        if bucket is None or bucket.rate != float(rate) or bucket.capacity != float(capacity):
+            bucket = _buckets[name] = TokenBucket(rate, capacity)
+        return bucket
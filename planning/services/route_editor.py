@@ -0,0 +1,175 @@
+"""
+Incrementele route herberekening voor drag-and-drop in de concept planning
+Bij het verplaatsen van een patiënt worden alleen de twee betrokken routes
+opnieuw bepaald, tegen een gecachte DistanceMatrix van het hele tijdblok:
+
+- bron route: patiënt eruit, 2-opt over de overgebleven stops
+- doel route: cheapest insertion van de patiënt, daarna 2-opt
+
+ETA's, constraints en score komen uit SimpleRouteService.create_route_for_vehicle
+(keep_order=True), zodat het resultaat gelijk is aan een volledige planning.
+"""
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+from django.db.models import Q
+
+from planning.models import Patient
+from .distance_matrix import DistanceMatrix
+from .simple_router import get_simple_route_service
+from .travel_profile import departure_hour, get_travel_profile
+
+logger = logging.getLogger(__name__)
+
+# Matrices per tijdblok (depot + alle patiënten van het blok), LRU
+MATRIX_CACHE_SIZE = 16
+_matrix_cache = OrderedDict()
+_matrix_lock = threading.Lock()
+
+
+def matrix_for(patients, depot_coords, departure=None):
+    """
+    DistanceMatrix voor depot + patiënten, hergebruikt zolang dezelfde patiënten
+    met dezelfde coördinaten, hetzelfde vertrek uur en hetzelfde reistijd profiel
+    gevraagd worden
+    """
+    profile = get_travel_profile()
+    signature = (tuple(depot_coords), departure_hour(departure), profile.signature,
+                 tuple(sorted((p.id, p.latitude, p.longitude) for p in patients)))
+    with _matrix_lock:
+        matrix = _matrix_cache.get(signature)
+        if matrix is not None:
+            _matrix_cache.move_to_end(signature)
+            return matrix
+    matrix = DistanceMatrix.for_patients(patients, depot_coords, profile=profile, departure=departure)
+    with _matrix_lock:
+        _matrix_cache[signature] = matrix
+        while len(_matrix_cache) > MATRIX_CACHE_SIZE:
+            _matrix_cache.popitem(last=False)
+    return matrix
+
+
+def route_keys(order, route_type):
+    """HALEN eindigt bij het depot, BRINGEN begint er"""
+    if route_type == 'HALEN':
+        return list(order) + [DistanceMatrix.DEPOT]
+    return [DistanceMatrix.DEPOT] + list(order)
+
+
+def route_distance(matrix, order, route_type):
+    return matrix.route_distance(route_keys(order, route_type)) if order else 0.0
+
+
+def cheapest_insertion(matrix, order, key, route_type):
+    """Voeg `key` in op de positie met de kleinste extra afstand"""
+    best_order, best_cost = None, None
+    for position in range(len(order) + 1):
+        candidate = order[:position] + [key] + order[position:]
+        cost = route_distance(matrix, candidate, route_type)
+        if best_cost is None or cost < best_cost:
+            best_order, best_cost = candidate, cost
+    return best_order
+
+
+def two_opt(matrix, order, route_type, max_rounds=20):
+    """Draai segmenten om zolang de route korter wordt"""
+    best_cost = route_distance(matrix, order, route_type)
+    for _ in range(max_rounds):
+        improved = False
+        for i in range(len(order) - 1):
+            for j in range(i + 1, len(order)):
+                candidate = order[:i] + order[i:j + 1][::-1] + order[j + 1:]
+                cost = route_distance(matrix, candidate, route_type)
+                if cost < best_cost - 1e-9:
+                    order, best_cost, improved = candidate, cost, True
+        if not improved:
+            break
+    return order
+
+
+class RouteEditor:
+    """
+    Herbereken de twee routes die een drag-and-drop raakt
+
+        editor = RouteEditor(timeslot, 'HALEN', day)
+        result = editor.move(patient, from_vehicle, to_vehicle)
+        result['source'], result['target'], result['elapsed_ms']
+
+    Args:
+        timeslot: TimeSlot van de routes
+        route_type: 'HALEN' of 'BRINGEN'
+        day: planning dag (datum van ophaal_tijd)
+    """
+
+    def __init__(self, timeslot, route_type, day, service=None):
+        self.timeslot = timeslot
+        self.route_type = 'HALEN' if str(route_type).upper() == 'HALEN' else 'BRINGEN'
+        self.day = day
+        self.service = service or get_simple_route_service()
+
+    def block_patients(self):
+        """Alle patiënten van dit tijdblok op deze dag (één query)"""
+        field = 'halen_tijdblok' if self.route_type == 'HALEN' else 'bringen_tijdblok'
+        return list(Patient.objects.filter(Q(**{field: self.timeslot}), ophaal_tijd__date=self.day))
+
+    def current_order(self, vehicle, patients_by_id, matrix, given=None):
+        """
+        Volgorde van een route: zoals de client hem toont, anders nearest
+        neighbour over de patiënten die nu aan het voertuig hangen
+        """
+        if given is not None:
+            return [int(pid) for pid in given if int(pid) in patients_by_id]
+        members = [p for p in patients_by_id.values() if p.toegewezen_voertuig_id == vehicle.id]
+        ordered = self.service.optimize_route_order(members, distance_matrix=matrix) if members else []
+        return [p.id for p in ordered]
+
+    def move(self, patient, from_vehicle, to_vehicle, source_order=None, target_order=None):
+        """
+        Verplaats `patient` van from_vehicle naar to_vehicle (None = niet toegewezen)
+        Slaat niets op; de aanroeper bewaart de toewijzing.
+        """
+        started = time.perf_counter()
+        patients_by_id = {p.id: p for p in self.block_patients()}
+        patients_by_id[patient.id] = patient
+        _, depot_coords = self.service.get_reha_center()
+        departure, _ = self.service.get_timeslot_window(self.timeslot, self.route_type)
+        matrix = matrix_for(patients_by_id.values(), depot_coords, departure)
+
+        result = {'source': None, 'target': None}
+        if from_vehicle is not None and (to_vehicle is None or from_vehicle.id != to_vehicle.id):
+            order = [pid for pid in self.current_order(from_vehicle, patients_by_id, matrix, source_order) if pid != patient.id]
+            order = two_opt(matrix, order, self.route_type)
+            result['source'] = self.build_route(from_vehicle, order, patients_by_id, matrix)
+        if to_vehicle is not None:
+            order = [pid for pid in self.current_order(to_vehicle, patients_by_id, matrix, target_order) if pid != patient.id]
+            order = two_opt(matrix, cheapest_insertion(matrix, order, patient.id, self.route_type), self.route_type)
+            result['target'] = self.build_route(to_vehicle, order, patients_by_id, matrix)
+
+        result['elapsed_ms'] = round((time.perf_counter() - started) * 1000, 1)
+        logger.debug(f"Route update patiënt {patient.id} in {result['elapsed_ms']}ms")
+        return result
+
+    def build_route(self, vehicle, order, patients_by_id, matrix):
+        """Route dict zoals create_route_for_vehicle, plus afstand, duur en kosten"""
+        patients = [patients_by_id[pid] for pid in order]
+        distance = route_distance(matrix, order, self.route_type)
+        duration = (matrix.route_travel_time(route_keys(order, self.route_type)) if order else 0.0) \
+            + len(order) * self.service.default_service_time
+        if patients:
+            route = self.service.create_route_for_vehicle(
+                vehicle, patients, self.timeslot, self.route_type, distance_matrix=matrix, keep_order=True
+            )
+        else:
+            route = {'vehicle_name': vehicle.kenteken, 'vehicle_referentie': vehicle.referentie,
+                     'route_type': self.route_type, 'total_patients': 0, 'stops': [],
+                     'constraints': {'hard_constraints_valid': True, 'hard_constraint_violations': []}}
+        route.update({
+            'vehicle_id': vehicle.id,
+            'patient_order': order,
+            'total_distance_km': round(distance, 2),
+            'total_time_minutes': round(duration, 1),
+            'total_cost': round(distance * float(vehicle.km_kosten_per_km or 0), 2),
+        })
+        return route
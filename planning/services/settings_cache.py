@@ -0,0 +1,109 @@
+"""
+Proces cache voor instellingen
+Configuration, de home Location, GoogleMapsConfig en de PlanningConstraints
+veranderen zelden maar worden in route loops per voertuig/route opgevraagd.
+Ze worden één keer per proces geladen; daarna is een lookup een dictionary lookup.
+
+Invalidatie:
+- post_save/post_delete signals (planning/signals.py) legen de cache direct en
+  nogmaals na de commit van de transactie
+- andere processen (workers, meerdere web processen) zien de wijziging via een
+  versie nummer in de Django cache, dat hooguit elke
+  SETTINGS_CACHE_VERSION_CHECK seconden gelezen wordt (None: niet controleren).
+  Dat werkt alleen met een gedeelde cache backend (settings.CACHES: DatabaseCache
+  of Redis), niet met de LocMemCache per proces.
+
+Queryset .update() stuurt geen signals: roep daarna zelf SettingsCache.invalidate() aan.
+"""
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+logger = logging.getLogger(__name__)
+
+
+class SettingsCache:
+    """
+    Gedeelde waarden per naam
+
+        values = SettingsCache.get('configuration', load_configuration)
+    """
+
+    VERSION_KEY = 'settings_cache:version'
+
+    _values = {}
+    _lock = threading.Lock()
+    _generation = 0
+    _version = None
+    _checked_at = 0.0
+
+    @classmethod
+    def get(cls, name, loader):
+        cls._check_version()
+        try:
+            return cls._values[name]
+        except KeyError:
+            pass
+
+        generation = cls._generation
+        value = loader()
+        with cls._lock:
+            # Tijdens het laden geïnvalideerd: niet bewaren, volgende aanroep laadt opnieuw
+            if generation == cls._generation:
+                cls._values[name] = value
+        return value
+
+    @classmethod
+    def current_generation(cls):
+        """Verandert bij elke invalidatie (ook uit een ander proces); voor afgeleide caches"""
+        cls._check_version()
+        return cls._generation
+
+    @classmethod
+    def clear(cls):
+        """Leeg alleen de cache van dit proces"""
+        with cls._lock:
+            cls._values = {}
+            cls._generation += 1
+
+    @classmethod
+    def invalidate(cls):
+        """Leeg de cache hier en (via het versie nummer) in andere processen"""
+        cls.clear()
+        try:
+            cls._version = cache.incr(cls.VERSION_KEY)
+        except ValueError:
+            cache.set(cls.VERSION_KEY, 1, None)
+            cls._version = 1
+        except Exception as e:
+            logger.warning(f"Settings cache versie niet bijgewerkt: {e}")
+
+    @classmethod
+    def invalidate_on_commit(cls):
+        """Direct legen, en nogmaals na de commit zodat geen oude waarde blijft hangen"""
+        cls.invalidate()
+        transaction.on_commit(cls.invalidate)
+
+    @classmethod
+    def _check_version(cls):
+        interval = getattr(settings, 'SETTINGS_CACHE_VERSION_CHECK', 5)
+        if interval is None:
+            return
+        now = time.monotonic()
+        if now - cls._checked_at < interval:
+            return
+        cls._checked_at = now
+        try:
+            version = cache.get(cls.VERSION_KEY)
+        except Exception as e:
+            logger.warning(f"Settings cache versie niet leesbaar: {e}")
+            return
+        if version != cls._version:
+            if cls._version is not None:
+                logger.debug(f"Settings gewijzigd in een ander proces (versie {version}), cache geleegd")
+            cls.clear()
+            cls._version = version
@@ -3,10 +3,21 @@ Simpele route planner met OptaPlanner-style constraints
 Verdeelt patiënten over voertuigen en maakt basis routes met hard/soft constraints
 """
 import logging
+from django.conf import settings
 from django.utils import timezone
 from datetime import datetime, timedelta
 import math
 
+from .constraint_engine import ConstraintEngine
+from .distance_matrix import DistanceMatrix
+from .lazy import LazyService
+from .planning_executor import (
+    PlanningExecutor, resolve_vehicle_conflicts, snapshot_patient, snapshot_vehicle, solve_timeslot_job
+)
+from .spatial_index import SPATIAL_INDEX_MIN_POINTS, SpatialIndex, nearest_neighbour_order, sweep_partition
+from .travel_profile import get_travel_profile
+from .vrp_solver import VehicleSpec
+
 logger = logging.getLogger(__name__)
 
 
@@ -15,10 +26,19 @@ class SimpleRouteService:
     Eenvoudige route planning service met OptaPlanner-style constraints
     """
     
-    def __init__(self):
+    # 'savings' = Clarke-Wright savings + local search over alle voertuigen, alle
+    #             tijdblokken parallel in een process pool (standaard)
+    # 'simple'  = oude planning: één voertuig per tijdblok, tijdblokken na elkaar
+    SOLVER_MODES = ('simple', 'savings')
+    
+    def __init__(self, solver_mode=None, time_budget=1.0):
         self.default_travel_time_per_stop = 15  # minuten per stop
         self.default_service_time = 5  # minuten per patiënt ophalen/afzetten
         
+        # Solver instellingen
+        self.solver_mode = solver_mode or getattr(settings, 'ROUTE_SOLVER_MODE', 'savings')
+        self.time_budget = time_budget  # seconden rekentijd per tijdblok (savings mode)
+        
         # OptaPlanner-style constraints
         self.constraints = {
             # HARD CONSTRAINTS (moeten altijd voldaan worden)
@@ -56,7 +76,7 @@ class SimpleRouteService:
         # 2. Max travel time constraint
         if self.constraints['hard']['max_travel_time']:
             estimated_travel_time = self.calculate_route_travel_time(route)
-            max_allowed_time = vehicle.maximale_rit_tijd * 60  # Convert to minutes
+            max_allowed_time = self.get_max_route_minutes(vehicle)
             if estimated_travel_time > max_allowed_time:
                 violations.append(f"Route tijd ({estimated_travel_time} min) overschrijdt maximum ({max_allowed_time} min) voor voertuig {vehicle.kenteken}")
         
@@ -117,6 +137,22 @@ class SimpleRouteService:
         breakdown['total_score'] = score
         return score, breakdown
     
+    def score_planning_constraints(self, vehicle, sorted_patients, route_type, distance_matrix):
+        """
+        Score een route tegen de actieve PlanningConstraints
+        Returns: (Score(hard, soft), score per constraint)
+        """
+        engine = ConstraintEngine.from_database(self.default_service_time)
+        spec = VehicleSpec(vehicle.id, vehicle.aantal_zitplaatsen, vehicle.speciale_zitplaatsen,
+                           self.get_max_route_minutes(vehicle))
+        # De engine rekent open routes vanaf het depot: HALEN omgedraaid
+        ordered = sorted_patients[::-1] if route_type == 'HALEN' else sorted_patients
+        director = engine.director(
+            distance_matrix, [spec], {vehicle.id: [distance_matrix.index(patient.id) for patient in ordered]},
+            wheelchair={distance_matrix.index(patient.id): patient.rolstoel for patient in ordered},
+        )
+        return director.score, director.explain(vehicle.id)
+
     def check_time_windows(self, route, patients):
         """
         Check of alle patiënten binnen hun tijdvenster passen
@@ -157,10 +193,17 @@ class SimpleRouteService:
     def calculate_route_distance(self, route):
         """
         Bereken totale afstand van een route
+        Gebruikt de distance matrix van de route als die beschikbaar is
         """
         total_distance = 0
         stops = route.get('stops', [])
         
+        distance_matrix = route.get('distance_matrix')
+        if distance_matrix is not None:
+            keys = [stop.get('patient_id') or DistanceMatrix.DEPOT for stop in stops]
+            if all(key in distance_matrix for key in keys):
+                return distance_matrix.route_distance(keys)
+        
         for i in range(len(stops) - 1):
             current_stop = stops[i]
             next_stop = stops[i + 1]
@@ -176,7 +219,16 @@ class SimpleRouteService:
     def calculate_route_travel_time(self, route):
         """
         Bereken totale reistijd van een route
+        Met een distance matrix: reistijd per rit + service tijd per patiënt (zoals de ETA's)
         """
+        distance_matrix = route.get('distance_matrix')
+        if distance_matrix is not None:
+            stops = route.get('stops', [])
+            keys = [stop.get('patient_id') or DistanceMatrix.DEPOT for stop in stops]
+            if all(key in distance_matrix for key in keys):
+                patient_stops = sum(1 for stop in stops if stop.get('patient_id'))
+                return distance_matrix.route_travel_time(keys) + patient_stops * self.default_service_time
+        
         total_distance = self.calculate_route_distance(route)
         travel_time = self.calculate_travel_time(total_distance)
         
@@ -223,10 +275,13 @@ class SimpleRouteService:
         
         return None
     
-    def optimize_route_with_constraints(self, vehicles, patients, timeslot):
+    def optimize_route_with_constraints(self, vehicles, patients, timeslot, distance_matrix=None):
         """
         Optimaliseer route met OptaPlanner-style constraints
         """
+        if distance_matrix is None:
+            distance_matrix = self.build_distance_matrix(patients)
+        
         best_routes = []
         best_score = float('inf')
         
@@ -237,14 +292,15 @@ class SimpleRouteService:
                 patient_group = patients[:i]
                 
                 # Maak test route
-                test_route = self.create_route_for_vehicle(vehicle, patient_group, timeslot, 'HALEN')
+                test_route = self.create_route_for_vehicle(vehicle, patient_group, timeslot, 'HALEN', distance_matrix)
                 
-                # Valideer hard constraints
-                is_valid, violations = self.validate_hard_constraints(test_route, vehicle, patient_group)
+                # Valideer hard constraints (met de gedeelde distance matrix)
+                scoring_route = dict(test_route, distance_matrix=distance_matrix)
+                is_valid, violations = self.validate_hard_constraints(scoring_route, vehicle, patient_group)
                 
                 if is_valid:
                     # Bereken soft constraints score
-                    score, breakdown = self.calculate_soft_constraints_score(test_route, vehicle, patient_group)
+                    score, breakdown = self.calculate_soft_constraints_score(scoring_route, vehicle, patient_group)
                     
                     if score < best_score:
                         best_score = score
@@ -275,11 +331,16 @@ class SimpleRouteService:
         
         return c * r
     
-    def calculate_travel_time(self, distance_km, speed_kmh=30):
+    def calculate_travel_time(self, distance_km, speed_kmh=None, departure=None):
         """
-        Bereken reistijd gebaseerd op afstand en gemiddelde snelheid
+        Bereken reistijd gebaseerd op afstand en vertrektijd
+        Zonder speed_kmh uit het reistijd profiel (snelheid per uur en wegklasse),
+        met speed_kmh de oude vaste snelheid met stadsfactor
         Returns: tijd in minuten
         """
+        if speed_kmh is None:
+            return get_travel_profile().travel_time(distance_km, departure)
+        
         if distance_km <= 0:
             return 5  # Minimum 5 minuten voor stop
         
@@ -293,56 +354,105 @@ class SimpleRouteService:
         # Minimum 5 minuten, maximum 60 minuten tussen stops
         return max(5, min(60, travel_time))
     
-    def optimize_route_order(self, patients, reha_center_coords=None):
+    def get_max_route_minutes(self, vehicle):
+        """
+        Maximale rit tijd van een voertuig in minuten
+        maximale_rit_tijd staat in seconden, oude waarden (< 100) in uren
+        """
+        if vehicle.maximale_rit_tijd < 100:
+            return vehicle.maximale_rit_tijd * 60
+        return vehicle.maximale_rit_tijd / 60
+    
+    def get_timeslot_window(self, timeslot, route_type):
+        """
+        Bepaal het tijdvenster (start, eind) van een tijdblok
+        HALEN: aankomst bij reha center uiterlijk op aankomst_tijd
+        BRINGEN: vertrek vanaf reha center op aankomst_tijd
+        """
+        # Oude tijdblokken met expliciete heen/terug tijden
+        if route_type == 'HALEN' and getattr(timeslot, 'heen_start_tijd', None):
+            return timeslot.heen_start_tijd, timeslot.heen_eind_tijd
+        if route_type != 'HALEN' and getattr(timeslot, 'terug_start_tijd', None):
+            return timeslot.terug_start_tijd, timeslot.terug_eind_tijd
+        
+        window = timedelta(minutes=timeslot.max_rijtijd_minuten or 60)
+        anchor = datetime.combine(timezone.now().date(), timeslot.aankomst_tijd)
+        if route_type == 'HALEN':
+            return (anchor - window).time(), anchor.time()
+        return anchor.time(), (anchor + window).time()
+    
+    def get_timeslot_window_minutes(self, timeslot, route_type):
+        """Lengte van het tijdvenster in minuten"""
+        start_time, end_time = self.get_timeslot_window(timeslot, route_type)
+        today = timezone.now().date()
+        delta = datetime.combine(today, end_time) - datetime.combine(today, start_time)
+        return delta.total_seconds() / 60
+    
+    def get_reha_center(self):
+        """
+        Haal depot locatie en coördinaten op uit Django Admin
+        Returns: (home_location, (latitude, longitude))
+        """
+        from planning.models import Location
+        home_location = Location.get_home_location()
+        if home_location and home_location.latitude and home_location.longitude:
+            return home_location, (float(home_location.latitude), float(home_location.longitude))
+        return home_location, (50.8, 7.0)  # Fallback naar Bonn
+
+    def build_distance_matrix(self, patients, reha_center_coords=None, departure=None):
+        """
+        Bereken in één keer alle afstanden/reistijden voor depot + patiënten
+        Reistijden uit het reistijd profiel bij vertrek op `departure`
+        """
+        if reha_center_coords is None:
+            _, reha_center_coords = self.get_reha_center()
+        return DistanceMatrix.for_patients(
+            patients, reha_center_coords, profile=get_travel_profile(), departure=departure
+        )
+
+    def route_minutes(self, distance_matrix, keys, departure):
+        """
+        Reistijd plus service tijd over een reeks sleutels (zoals de ETA's),
+        elke rit met de reistijd van het moment waarop hij begint
+        """
+        elapsed = 0.0
+        for origin, destination in zip(keys, keys[1:]):
+            at = departure + timedelta(minutes=elapsed)
+            elapsed += distance_matrix.travel_time_at(origin, destination, at) + self.default_service_time
+        return elapsed
+
+    def optimize_route_order(self, patients, reha_center_coords=None, distance_matrix=None):
         """
         Optimaliseer de volgorde van patiënten gebaseerd op GPS afstanden
         Gebruikt een eenvoudige nearest neighbor algoritme
+        Grote groepen via de SpatialIndex (sub-kwadratisch), kleine via de distance matrix
         """
-        # Haal depot coördinaten op als niet meegegeven
-        if reha_center_coords is None:
-            from planning.models import Location
-            home_location = Location.get_home_location()
-            if home_location and home_location.latitude and home_location.longitude:
-                reha_center_coords = (home_location.latitude, home_location.longitude)
-            else:
-                reha_center_coords = (50.8, 7.0)  # Fallback naar Bonn
         if len(patients) <= 1:
             return patients
-        
-        # Start met reha center coordinaten
-        current_coords = reha_center_coords
+
+        if len(patients) >= SPATIAL_INDEX_MIN_POINTS:
+            if reha_center_coords is None:
+                _, reha_center_coords = self.get_reha_center()
+            patients_by_key = {patient.id: patient for patient in patients}
+            index = SpatialIndex.for_patients(patients, reha_center_coords)
+            return [patients_by_key[key] for key in nearest_neighbour_order(index, list(patients_by_key))]
+
+        if distance_matrix is None or not all(patient.id in distance_matrix for patient in patients):
+            distance_matrix = self.build_distance_matrix(patients, reha_center_coords)
+
+        # Start bij het reha center
+        patients_by_key = {patient.id: patient for patient in patients}
+        current_key = DistanceMatrix.DEPOT
         optimized_order = []
-        remaining_patients = list(patients)
-        
-        while remaining_patients:
+        remaining_keys = list(patients_by_key)
+
+        while remaining_keys:
             # Vind dichtstbijzijnde patiënt
-            closest_patient = None
-            closest_distance = float('inf')
-            
-            for patient in remaining_patients:
-                patient_coords = (
-                    patient.latitude or reha_center_coords[0],
-                    patient.longitude or reha_center_coords[1]
-                )
-                
-                distance = self.calculate_distance(
-                    current_coords[0], current_coords[1],
-                    patient_coords[0], patient_coords[1]
-                )
-                
-                if distance < closest_distance:
-                    closest_distance = distance
-                    closest_patient = patient
-            
-            # Voeg dichtstbijzijnde patiënt toe aan route
-            if closest_patient:
-                optimized_order.append(closest_patient)
-                remaining_patients.remove(closest_patient)
-                current_coords = (
-                    closest_patient.latitude or reha_center_coords[0],
-                    closest_patient.longitude or reha_center_coords[1]
-                )
-        
+            closest_key = distance_matrix.nearest(current_key, remaining_keys)
+            optimized_order.append(patients_by_key[closest_key])
+            remaining_keys.remove(closest_key)
+            current_key = closest_key
+
         return optimized_order
     
     def group_patients_by_timeslot(self, patients):
@@ -377,7 +487,7 @@ class SimpleRouteService:
         
         return halen_groups, bringen_groups
     
-    def distribute_patients_over_vehicles(self, patient_group, vehicles):
+    def distribute_patients_over_vehicles(self, patient_group, vehicles, solver_mode=None, time_budget=None):
         """
         Verdeel patiënten van een tijdblok over beschikbare voertuigen
         Nu met OptaPlanner-style constraints
@@ -389,17 +499,24 @@ class SimpleRouteService:
         if not patients or not vehicles:
             return []
         
+        # Eén distance matrix per tijdblok, gedeeld door alle kandidaat routes
+        departure, _ = self.get_timeslot_window(timeslot, route_type)
+        distance_matrix = self.build_distance_matrix(patients, departure=departure)
+        
+        if (solver_mode or self.solver_mode) == 'savings':
+            return self.distribute_patients_savings(patient_group, vehicles, distance_matrix, time_budget)
+        
         # Gebruik constraint-based optimalisatie
-        optimized_routes = self.optimize_route_with_constraints(vehicles, patients, timeslot)
+        optimized_routes = self.optimize_route_with_constraints(vehicles, patients, timeslot, distance_matrix)
         
         if optimized_routes:
             return optimized_routes
         
         # Fallback naar originele methode als optimalisatie faalt
         logger.warning("Constraint optimalisatie faalde, gebruik fallback methode")
-        return self.distribute_patients_fallback(patient_group, vehicles)
+        return self.distribute_patients_fallback(patient_group, vehicles, distance_matrix)
     
-    def distribute_patients_fallback(self, patient_group, vehicles):
+    def distribute_patients_fallback(self, patient_group, vehicles, distance_matrix=None):
         """
         Fallback methode voor patiënt verdeling (originele logica)
         """
@@ -413,68 +530,179 @@ class SimpleRouteService:
         # Sorteer voertuigen op capaciteit (grootste eerst)
         sorted_vehicles = sorted(vehicles, key=lambda v: v.aantal_zitplaatsen, reverse=True)
         
-        routes = []
-        remaining_patients = patients.copy()
+        # Geografisch verdelen: elk voertuig een aaneengesloten sector rond het depot
+        _, reha_center_coords = self.get_reha_center()
+        index = SpatialIndex.for_patients(patients, reha_center_coords)
+        patients_by_key = {patient.id: patient for patient in patients}
+        groups, remaining_keys = sweep_partition(
+            index, list(patients_by_key),
+            [vehicle.aantal_zitplaatsen for vehicle in sorted_vehicles],
+            wheelchair={patient.id: patient.rolstoel for patient in patients},
+            special_capacities=[vehicle.speciale_zitplaatsen for vehicle in sorted_vehicles],
+        )
+        
+        # Rolstoel patiënten zonder vrije rolstoelplek niet laten vallen: in het
+        # dichtstbijzijnde voertuig met een vrije stoel, de constraint rapportage
+        # van de route toont dan de schending
+        unplaced = []
+        for key in remaining_keys:
+            candidates = [i for i, vehicle in enumerate(sorted_vehicles) if len(groups[i]) < vehicle.aantal_zitplaatsen]
+            if not candidates:
+                unplaced.append(key)
+                continue
+            target = min(candidates, key=lambda i: min(
+                (index.distance(key, other) for other in groups[i]), default=index.distance(key, DistanceMatrix.DEPOT)
+            ))
+            groups[target].append(key)
         
-        # Verdeel patiënten over voertuigen
-        for vehicle in sorted_vehicles:
-            if not remaining_patients:
-                break
-            
-            # Bepaal hoeveel patiënten in dit voertuig passen
-            vehicle_capacity = vehicle.aantal_zitplaatsen
-            
-            # Neem maximaal vehicle_capacity patiënten
-            patients_for_vehicle = remaining_patients[:vehicle_capacity]
-            
-            if patients_for_vehicle:
+        routes = []
+        for vehicle, keys in zip(sorted_vehicles, groups):
+            if keys:
                 route = self.create_route_for_vehicle(
-                    vehicle, patients_for_vehicle, timeslot, route_type
+                    vehicle, [patients_by_key[key] for key in keys], timeslot, route_type, distance_matrix
                 )
                 routes.append(route)
-                
-                # Verwijder toegewezen patiënten uit de lijst
-                remaining_patients = remaining_patients[vehicle_capacity:]
         
-        # Als er nog patiënten over zijn, probeer ze toe te voegen aan bestaande routes
-        if remaining_patients and routes:
-            logger.warning(f"Er zijn nog {len(remaining_patients)} patiënten over die niet toegewezen konden worden")
+        # Meer patiënten dan zitplaatsen in het hele wagenpark
+        if unplaced and routes:
+            logger.warning(f"Er zijn nog {len(unplaced)} patiënten over die niet toegewezen konden worden")
+        
+        return routes
+    
+    def build_timeslot_job(self, patient_group, vehicles, reha_center_coords, time_budget=None):
+        """
+        Maak een picklable job (plain data) voor één tijdblok
+        Zie planning_executor.solve_timeslot_job
+        """
+        timeslot = patient_group['timeslot']
+        route_type = patient_group['type']
+        return {
+            'group_key': (route_type, timeslot.id),
+            'route_type': route_type,
+            'window': self.get_timeslot_window(timeslot, route_type),
+            'depot': (float(reha_center_coords[0]), float(reha_center_coords[1])),
+            'patients': [snapshot_patient(patient) for patient in patient_group['patients']],
+            'vehicles': [
+                snapshot_vehicle(vehicle, self.get_max_route_minutes(vehicle))
+                for vehicle in vehicles if vehicle.status == 'beschikbaar'
+            ],
+            'service_time': self.default_service_time,
+            'time_budget': self.time_budget if time_budget is None else time_budget,
+            'route_max_minutes': self.get_timeslot_window_minutes(timeslot, route_type),
+            'constraints': ConstraintEngine.load_specs(),
+            'travel_profile': get_travel_profile().to_data(),
+        }
+    
+    def build_routes_from_result(self, result, patient_group, vehicles_by_id, distance_matrix=None):
+        """
+        Zet een solver resultaat (patiënt ids per voertuig) om naar route dictionaries
+        """
+        timeslot = patient_group['timeslot']
+        route_type = patient_group['type']
+        patients_by_id = {patient.id: patient for patient in patient_group['patients']}
+        
+        if result['unassigned']:
+            logger.warning(f"Savings solver: {len(result['unassigned'])} patiënten in {timeslot.naam} konden niet ingepland worden")
+        
+        if distance_matrix is None:
+            departure, _ = self.get_timeslot_window(timeslot, route_type)
+            distance_matrix = self.build_distance_matrix(patient_group['patients'], departure=departure)
+        
+        routes = []
+        for solved in result['routes']:
+            vehicle = vehicles_by_id[solved['vehicle_id']]
+            ordered_patients = [patients_by_id[patient_id] for patient_id in solved['patient_ids']]
+            if route_type == 'HALEN':
+                # Solver plant vanaf het depot, HALEN eindigt juist bij het depot
+                ordered_patients.reverse()
+            route = self.create_route_for_vehicle(
+                vehicle, ordered_patients, timeslot, route_type,
+                distance_matrix, keep_order=True
+            )
+            if solved.get('vehicle_conflict'):
+                route['constraints']['hard_constraints_valid'] = False
+                route['constraints']['hard_constraint_violations'].append(
+                    f"Voertuig {vehicle.kenteken} rijdt al in een overlappend tijdblok"
+                )
+            routes.append(route)
         
         return routes
     
-    def create_route_for_vehicle(self, vehicle, patients, timeslot, route_type):
+    def distribute_patients_savings(self, patient_group, vehicles, distance_matrix=None, time_budget=None):
+        """
+        Verdeel patiënten met de CVRPTW solver (savings + local search)
+        Gebruikt meerdere voertuigen per tijdblok
+        """
+        _, reha_center_coords = self.get_reha_center()
+        job = self.build_timeslot_job(patient_group, vehicles, reha_center_coords, time_budget)
+        result = solve_timeslot_job(job)
+        vehicles_by_id = {vehicle.id: vehicle for vehicle in vehicles}
+        return self.build_routes_from_result(result, patient_group, vehicles_by_id, distance_matrix)
+    
+    def plan_groups_parallel(self, groups, vehicles, time_budget=None, max_workers=None):
+        """
+        Plan alle tijdblokken tegelijk in een process pool (savings solver)
+        Daarna worden voertuig conflicten tussen overlappende tijdblokken opgelost
+        """
+        if not groups or not vehicles:
+            return []
+        
+        _, reha_center_coords = self.get_reha_center()
+        jobs = [self.build_timeslot_job(group, vehicles, reha_center_coords, time_budget) for group in groups]
+        
+        results = PlanningExecutor(max_workers=max_workers).run(jobs)
+        vehicle_snapshots = [
+            snapshot_vehicle(vehicle, self.get_max_route_minutes(vehicle))
+            for vehicle in vehicles if vehicle.status == 'beschikbaar'
+        ]
+        resolve_vehicle_conflicts(results, vehicle_snapshots, timezone.now().date())
+        
+        vehicles_by_id = {vehicle.id: vehicle for vehicle in vehicles}
+        all_routes = []
+        for group, result in zip(groups, results):
+            all_routes.extend(self.build_routes_from_result(result, group, vehicles_by_id))
+        return all_routes
+    
+    def create_route_for_vehicle(self, vehicle, patients, timeslot, route_type, distance_matrix=None, keep_order=False):
         """
         Maak een route voor een specifiek voertuig
+        Met keep_order=True wordt de volgorde van patients niet opnieuw bepaald
         """
         # Bepaal start tijd gebaseerd op tijdblok
-        if route_type == 'HALEN':
-            start_time = timeslot.heen_start_tijd
-            end_time = timeslot.heen_eind_tijd
-        else:  # BRINGEN
-            start_time = timeslot.terug_start_tijd  
-            end_time = timeslot.terug_eind_tijd
+        start_time, end_time = self.get_timeslot_window(timeslot, route_type)
         
         # Maak stops voor elke patiënt
         stops = []
         current_time = datetime.combine(timezone.now().date(), start_time)
         
         # Haal depot coördinaten op uit Django Admin
-        from planning.models import Location
-        home_location = Location.get_home_location()
-        if home_location and home_location.latitude and home_location.longitude:
-            reha_center_coords = (home_location.latitude, home_location.longitude)
-        else:
-            reha_center_coords = (50.8, 7.0)  # Fallback naar Bonn
-        
-        if route_type == 'HALEN':
+        home_location, reha_center_coords = self.get_reha_center()
+
+        # Alle afstanden voor deze route in één keer (of gedeeld per tijdblok)
+        if distance_matrix is None or not all(patient.id in distance_matrix for patient in patients):
+            distance_matrix = self.build_distance_matrix(patients, reha_center_coords, departure=start_time)
+
+        if keep_order:
+            sorted_patients = list(patients)
+        elif route_type == 'HALEN':
             # Voor HALEN: start bij patiënten, eindig bij reha center
             # Optimaliseer van eerste patiënt naar reha center
-            sorted_patients = self.optimize_route_order(patients)
+            sorted_patients = self.optimize_route_order(patients, reha_center_coords, distance_matrix)
         else:  # BRINGEN
             # Voor BRINGEN: start bij reha center, ga naar patiënten
             # Optimaliseer van reha center naar patiënten
-            sorted_patients = self.optimize_route_order(patients)
-        
+            sorted_patients = self.optimize_route_order(patients, reha_center_coords, distance_matrix)
+
+        if route_type == 'HALEN' and sorted_patients:
+            # Plan terug vanaf de aankomsttijd zodat de route op tijd bij het reha center eindigt
+            route_keys = [patient.id for patient in sorted_patients] + [DistanceMatrix.DEPOT]
+            arrival = datetime.combine(current_time.date(), end_time)
+            route_minutes = distance_matrix.route_travel_time(route_keys) + len(sorted_patients) * self.default_service_time
+            # Nogmaals met de reistijden van het geschatte vertrek (spits)
+            route_minutes = self.route_minutes(distance_matrix, route_keys, arrival - timedelta(minutes=route_minutes))
+            latest_start = arrival - timedelta(minutes=route_minutes)
+            current_time = max(current_time, latest_start)
+
         for i, patient in enumerate(sorted_patients):
             # Bepaal stop type
             if route_type == 'HALEN':
@@ -530,18 +758,12 @@ class SimpleRouteService:
             
             # Bereken reistijd naar volgende stop
             if i < len(sorted_patients) - 1:
-                # Afstand naar volgende patiënt
+                # Reistijd naar volgende patiënt
                 next_patient = sorted_patients[i + 1]
-                current_coords = (patient.latitude or reha_center_coords[0], patient.longitude or reha_center_coords[1])
-                next_coords = (next_patient.latitude or reha_center_coords[0], next_patient.longitude or reha_center_coords[1])
-                
-                distance = self.calculate_distance(current_coords[0], current_coords[1], next_coords[0], next_coords[1])
-                travel_time = self.calculate_travel_time(distance)
+                travel_time = distance_matrix.travel_time_at(patient.id, next_patient.id, current_time)
             else:
                 # Laatste stop - reistijd naar reha center (of default)
-                current_coords = (patient.latitude or reha_center_coords[0], patient.longitude or reha_center_coords[1])
-                distance = self.calculate_distance(current_coords[0], current_coords[1], reha_center_coords[0], reha_center_coords[1])
-                travel_time = self.calculate_travel_time(distance)
+                travel_time = distance_matrix.travel_time_at(patient.id, DistanceMatrix.DEPOT, current_time)
             
             # Voeg service tijd toe (tijd om patiënt op te halen/af te zetten)
             total_time = travel_time + self.default_service_time
@@ -585,14 +807,25 @@ class SimpleRouteService:
         is_valid, violations = self.validate_hard_constraints({
             'stops': stops,
             'vehicle': vehicle,
-            'patients': patients
+            'patients': patients,
+            'distance_matrix': distance_matrix
         }, vehicle, patients)
         
         score, breakdown = self.calculate_soft_constraints_score({
             'stops': stops,
             'vehicle': vehicle,
-            'patients': patients
+            'patients': patients,
+            'distance_matrix': distance_matrix
         }, vehicle, patients)
+
+        # PlanningConstraints uit de admin
+        planning_score, planning_constraints = self.score_planning_constraints(
+            vehicle, sorted_patients, route_type, distance_matrix
+        )
+        for constraint in planning_constraints:
+            if constraint['weight'] == 'HARD' and constraint['violation']:
+                violations.append(f"{constraint['name']}: overschreden met {constraint['violation']} ({vehicle.kenteken})")
+                is_valid = False
         
         return {
             'vehicle_name': vehicle.kenteken,
@@ -612,14 +845,20 @@ class SimpleRouteService:
                 'hard_constraints_valid': is_valid,
                 'hard_constraint_violations': violations,
                 'soft_constraints_score': score,
-                'soft_constraints_breakdown': breakdown
+                'soft_constraints_breakdown': breakdown,
+                'planning_score': {'hard': planning_score.hard, 'soft': round(planning_score.soft, 2)},
+                'planning_constraints': planning_constraints
             }
         }
     
-    def plan_simple_routes(self, vehicles, patients):
+    def plan_simple_routes(self, vehicles, patients, solver_mode=None, time_budget=None):
         """
         Hoofdfunctie: plan alle routes voor alle tijdblokken met OptaPlanner-style constraints
+        solver_mode: 'simple' of 'savings' (standaard self.solver_mode, settings.ROUTE_SOLVER_MODE)
+        time_budget: rekentijd in seconden per tijdblok voor de savings solver
+        Alleen in savings mode worden de tijdblokken parallel gepland.
         """
+        solver_mode = solver_mode or self.solver_mode
         try:
             logger.info(f"Starting constraint-based route planning for {patients.count()} patients and {vehicles.count()} vehicles")
             
@@ -639,6 +878,12 @@ class SimpleRouteService:
             vehicle_list = list(vehicles)
             vehicle_index = 0
             
+            if solver_mode == 'savings':
+                # Savings solver: alle tijdblokken parallel, elk met alle voertuigen
+                groups = list(halen_groups.values()) + list(bringen_groups.values())
+                all_routes.extend(self.plan_groups_parallel(groups, vehicle_list, time_budget))
+                halen_groups, bringen_groups = {}, {}
+            
             # Plan HALEN routes
             for group in halen_groups.values():
                 if vehicle_index >= len(vehicle_list):
@@ -689,5 +934,9 @@ class SimpleRouteService:
             return []
 
 
-# Singleton instance
-simple_route_service = SimpleRouteService()
+# Singleton instance, lazy: gebouwd bij het eerste gebruik
+simple_route_service = LazyService(SimpleRouteService)
+
+
+def get_simple_route_service() -> SimpleRouteService:
+    return simple_route_service.get()
@@ -0,0 +1,282 @@
+"""
+Ruimtelijke index over patiënten
+Uniform grid over geprojecteerde coördinaten (km, equirectangular rond het
+depot). Eén keer per planning run of tijdblok gebouwd; daarna zijn k-nearest
+en straal queries lokaal in plaats van een scan over alle patiënten.
+
+    index = SpatialIndex.for_patients(patients, depot_coords)
+    index.nearest(patient.id, k=3)
+    index.within(DistanceMatrix.DEPOT, radius_km=10)
+    nearest_neighbour_order(index, keys)              # route volgorde, sub-kwadratisch
+    groups, rest = sweep_partition(index, keys, [6, 6, 4])
+
+Afstanden zijn hemelsbreed in km; op de schaal van een werkgebied (tientallen
+km) wijkt de projectie minder dan een promille af van Haversine.
+"""
+import heapq
+import logging
+import math
+from collections import defaultdict
+
+from .distance_matrix import DistanceMatrix
+
+logger = logging.getLogger(__name__)
+
+KM_PER_DEGREE_LAT = 110.574
+KM_PER_DEGREE_LON = 111.320
+
+# Onder dit aantal punten is een lineaire scan sneller dan het grid
+SPATIAL_INDEX_MIN_POINTS = 64
+
+
+class SpatialIndex:
+    """
+    Grid index: sleutel -> (x, y) in km vanaf de origin (depot)
+    De origin zelf (DistanceMatrix.DEPOT) is op te vragen als positie maar
+    wordt nooit als buur teruggegeven.
+    """
+
+    def __init__(self, points, origin, cell_km=None):
+        """
+        Args:
+            points: lijst van (key, latitude, longitude); zonder GPS -> origin
+            origin: (latitude, longitude) van het depot
+            cell_km: grootte van een grid cel, standaard ~1 punt per cel
+        """
+        self.origin = (float(origin[0]), float(origin[1]))
+        self._lon_scale = KM_PER_DEGREE_LON * math.cos(math.radians(self.origin[0]))
+        self.positions = {DistanceMatrix.DEPOT: (0.0, 0.0)}
+        for key, lat, lon in points:
+            self.positions[key] = self.project(lat, lon)
+
+        self.cell_km = cell_km or self._default_cell_km()
+        self.cells = defaultdict(list)
+        self._count = 0
+        for key, position in self.positions.items():
+            if key != DistanceMatrix.DEPOT:
+                self.cells[self._cell(*position)].append(key)
+                self._count += 1
+
+    @classmethod
+    def for_patients(cls, patients, depot_coords, **kwargs):
+        return cls([(patient.id, patient.latitude, patient.longitude) for patient in patients], depot_coords, **kwargs)
+
+    def project(self, lat, lon):
+        if lat in (None, '') or lon in (None, ''):
+            return 0.0, 0.0
+        return ((float(lon) - self.origin[1]) * self._lon_scale,
+                (float(lat) - self.origin[0]) * KM_PER_DEGREE_LAT)
+
+    def _default_cell_km(self):
+        points = [position for key, position in self.positions.items() if key != DistanceMatrix.DEPOT]
+        if len(points) < 2:
+            return 1.0
+        xs = [x for x, _ in points]
+        ys = [y for _, y in points]
+        area = max(max(xs) - min(xs), 0.1) * max(max(ys) - min(ys), 0.1)
+        return max(0.25, math.sqrt(area / len(points)))
+
+    def _cell(self, x, y):
+        return math.floor(x / self.cell_km), math.floor(y / self.cell_km)
+
+    def __len__(self):
+        return self._count
+
+    def __contains__(self, key):
+        return key in self.positions and key != DistanceMatrix.DEPOT and self._in_cells(key)
+
+    def _in_cells(self, key):
+        return key in self.cells.get(self._cell(*self.positions[key]), ())
+
+    def subset(self, keys):
+        """Nieuwe index over alleen `keys`, met dezelfde projectie en cellen"""
+        subset = SpatialIndex([], self.origin, cell_km=self.cell_km)
+        subset.positions = dict(self.positions)
+        for key in keys:
+            subset.cells[subset._cell(*self.positions[key])].append(key)
+            subset._count += 1
+        return subset
+
+    def remove(self, key):
+        """Haal een punt uit de index (bijv. al bezocht); de positie blijft op te vragen"""
+        cell_key = self._cell(*self.positions[key])
+        cell = self.cells.get(cell_key)
+        if cell and key in cell:
+            cell.remove(key)
+            self._count -= 1
+            if not cell:
+                # Lege cellen weghalen houdt _scan O(resterende punten)
+                del self.cells[cell_key]
+
+    def distance(self, a, b):
+        (ax, ay), (bx, by) = self.positions[a], self.positions[b]
+        return math.hypot(ax - bx, ay - by)
+
+    def angle(self, key):
+        """Richting vanaf het depot in radialen (0..2π)"""
+        x, y = self.positions[key]
+        return math.atan2(y, x) % (2 * math.pi)
+
+    # ------------------------------------------------------------------
+    # Queries
+    # ------------------------------------------------------------------
+
+    def _ring(self, cx, cy, radius):
+        if radius == 0:
+            yield cx, cy
+            return
+        for dx in range(-radius, radius + 1):
+            yield cx + dx, cy - radius
+            yield cx + dx, cy + radius
+        for dy in range(-radius + 1, radius):
+            yield cx - radius, cy + dy
+            yield cx + radius, cy + dy
+
+    def nearest(self, origin, k=1, exclude=()):
+        """
+        De k dichtstbijzijnde sleutels vanaf `origin` (een sleutel in de index
+        of DistanceMatrix.DEPOT), dichtstbij eerst
+        """
+        ox, oy = self.positions[origin]
+        skip = set(exclude)
+        skip.add(origin)
+        available = self._count - sum(1 for key in skip if key in self)
+        k = min(k, available)
+        if k <= 0:
+            return []
+
+        best = []  # max-heap via negatieve afstand
+        cx, cy = self._cell(ox, oy)
+        radius = 0
+        while True:
+            # Ring groter dan het aantal resterende punten: lineair is goedkoper
+            if 8 * radius > self._count:
+                return self._scan(ox, oy, k, skip)
+            for cell in self._ring(cx, cy, radius):
+                for key in self.cells.get(cell, ()):
+                    if key in skip:
+                        continue
+                    x, y = self.positions[key]
+                    distance = math.hypot(x - ox, y - oy)
+                    if len(best) < k:
+                        heapq.heappush(best, (-distance, key))
+                    elif distance < -best[0][0]:
+                        heapq.heapreplace(best, (-distance, key))
+            # Alles buiten deze ring ligt minstens radius * cell_km weg
+            if len(best) == k and -best[0][0] <= radius * self.cell_km:
+                break
+            radius += 1
+        return [key for _, key in sorted((-distance, key) for distance, key in best)]
+
+    def _scan(self, ox, oy, k, skip):
+        candidates = (
+            (math.hypot(self.positions[key][0] - ox, self.positions[key][1] - oy), key)
+            for cell in self.cells.values() for key in cell if key not in skip
+        )
+        return [key for _, key in heapq.nsmallest(k, candidates, key=lambda item: item[0])]
+
+    def within(self, origin, radius_km):
+        """Alle sleutels binnen radius_km van `origin`, dichtstbij eerst"""
+        ox, oy = self.positions[origin]
+        min_x, min_y = self._cell(ox - radius_km, oy - radius_km)
+        max_x, max_y = self._cell(ox + radius_km, oy + radius_km)
+        found = []
+        for gx in range(min_x, max_x + 1):
+            for gy in range(min_y, max_y + 1):
+                for key in self.cells.get((gx, gy), ()):
+                    if key == origin:
+                        continue
+                    x, y = self.positions[key]
+                    distance = math.hypot(x - ox, y - oy)
+                    if distance <= radius_km:
+                        found.append((distance, key))
+        found.sort(key=lambda item: item[0])
+        return [key for _, key in found]
+
+
+def nearest_neighbour_order(index, keys, start=DistanceMatrix.DEPOT):
+    """
+    Nearest neighbour volgorde over `keys` vanaf `start`
+    Bouwt een eigen index over alleen deze sleutels, zodat bezochte punten
+    verwijderd kunnen worden zonder de gedeelde index te wijzigen.
+    """
+    tour_index = index.subset(keys)
+    order = []
+    current = start
+    while len(tour_index):
+        following = tour_index.nearest(current, k=1)[0]
+        tour_index.remove(following)
+        order.append(following)
+        current = following
+    return order
+
+
+def sweep_partition(index, keys, capacities, wheelchair=None, special_capacities=None, balanced=False):
+    """
+    Verdeel sleutels over voertuigen met een sweep rond het depot
+    Patiënten worden op hoek vanaf het depot gesorteerd (beginnend in de grootste
+    lege sector) en in die volgorde per voertuig gevuld: elk voertuig krijgt een
+    aaneengesloten taartpunt van het werkgebied.
+
+    Args:
+        index: SpatialIndex met alle sleutels
+        keys: sleutels van het tijdblok
+        capacities: capaciteit per voertuig (volgorde = volgorde van vullen)
+        wheelchair: dict sleutel -> bool
+        special_capacities: rolstoelplaatsen per voertuig
+        balanced: verdeel gelijkmatig over alle voertuigen in plaats van vol maken
+
+    Returns:
+        (groepen per voertuig, niet ingedeelde sleutels)
+    """
+    wheelchair = wheelchair or {}
+    special_capacities = special_capacities or [0] * len(capacities)
+    groups = [[] for _ in capacities]
+    if not keys or not capacities:
+        return groups, list(keys)
+
+    by_angle = sorted(keys, key=index.angle)
+    angles = [index.angle(key) for key in by_angle]
+    # Start na de grootste lege sector, zodat geen cluster over die grens loopt
+    gaps = [(angles[(i + 1) % len(angles)] - angles[i]) % (2 * math.pi) for i in range(len(angles))]
+    start = (max(range(len(gaps)), key=gaps.__getitem__) + 1) % len(by_angle)
+    by_angle = by_angle[start:] + by_angle[:start]
+
+    if balanced:
+        share = math.ceil(len(by_angle) / len(capacities))
+        targets = [min(capacity, share) for capacity in capacities]
+    else:
+        targets = list(capacities)
+    special_left = list(special_capacities)
+
+    unassigned = []
+    vehicle = 0
+    for key in by_angle:
+        while vehicle < len(groups) and len(groups[vehicle]) >= targets[vehicle]:
+            vehicle += 1
+        if vehicle >= len(groups):
+            unassigned.append(key)
+            continue
+        target = vehicle
+        if wheelchair.get(key):
+            # Eerstvolgend voertuig met een vrije rolstoelplek (de sweep loopt door)
+            target = next((i for i in range(vehicle, len(groups))
+                           if special_left[i] > 0 and len(groups[i]) < capacities[i]), None)
+            if target is None:
+                unassigned.append(key)
+                continue
+            special_left[target] -= 1
+        groups[target].append(key)
+
+    # Restanten (bijv. door rolstoel plaatsen) in voertuigen met ruimte over
+    remaining = []
+    for key in unassigned:
+        target = next((i for i in range(len(groups)) if len(groups[i]) < capacities[i]
+                       and (not wheelchair.get(key) or special_left[i] > 0)), None)
+        if target is None:
+            remaining.append(key)
+            continue
+        if wheelchair.get(key):
+            special_left[target] -= 1
+        groups[target].append(key)
+    return groups, remaining
@@ -0,0 +1,162 @@
+"""
+Streaming SYLK (.slk) lezer
+Leest het bestand regel voor regel en geeft afgeronde rijen in volgorde terug,
+zonder eerst alle cellen of een CSV string op te bouwen. Het geheugengebruik
+hangt alleen af van de breedte van één rij.
+
+Ondersteunde records:
+    ID              bestandskop (genegeerd)
+    C;Y;X;K         cel; Y en X zijn optioneel en vallen terug op de huidige
+                    positie (die ook door F records gezet wordt)
+    F;Y;X           opmaak; alleen de positie wordt overgenomen
+    E               einde bestand
+Overige records (B, P, O, NN, ...) worden overgeslagen.
+
+Tekst escapes (ESC N + accent + letter, bijv. "f\x1bNHur" -> "für") worden
+omgezet naar unicode; ";;" binnen een veld is een letterlijke puntkomma.
+"""
+import csv
+import logging
+import re
+import unicodedata
+
+logger = logging.getLogger(__name__)
+
+# ESC N + ISO 6937 accent teken -> combining character
+_ACCENTS = {
+    'A': '\u0300',  # grave
+    'B': '\u0301',  # acute
+    'C': '\u0302',  # circumflex
+    'D': '\u0303',  # tilde
+    'H': '\u0308',  # umlaut
+    'J': '\u030a',  # ring
+    'K': '\u0327',  # cedille
+}
+_SPECIALS = {'{': 'ß', '#': '#', '$': '$', '(': '¤', '0': '°'}
+_ESCAPE_RE = re.compile('\x1bN(?:([A-O])(.)|(.))')
+
+
+def _replace_escape(match):
+    accent, base, special = match.groups()
+    if special is not None:
+        return _SPECIALS.get(special, special)
+    combining = _ACCENTS.get(accent)
+    if combining is None:
+        return base
+    return unicodedata.normalize('NFC', base + combining)
+
+
+def decode_text(value):
+    """SYLK escapes in een celwaarde omzetten"""
+    if '\x1b' not in value:
+        return value
+    return _ESCAPE_RE.sub(_replace_escape, value)
+
+
+def _decode_line(line):
+    try:
+        return line.decode('utf-8')
+    except UnicodeDecodeError:
+        return line.decode('latin-1')
+
+
+def _split_fields(line):
+    if ';;' not in line:
+        return line.split(';')
+    return [field.replace('\x00', ';') for field in line.replace(';;', '\x00').split(';')]
+
+
+def _cell_value(raw):
+    if raw.startswith('"'):
+        raw = raw[1:-1] if len(raw) > 1 and raw.endswith('"') else raw[1:]
+        raw = raw.replace('""', '"')
+    return decode_text(raw)
+
+
+def _finish_row(cells):
+    return [cells.get(col, '') for col in range(1, max(cells) + 1)]
+
+
+def iter_sylk_rows(lines):
+    """
+    Afgeronde rijen van een SYLK bestand, in volgorde
+
+    Args:
+        lines: iterable van regels (str of bytes), bijv. een geopend bestand
+               of een Django UploadedFile
+
+    Yields:
+        (rij nummer, [celwaarden]) met kolom X1 op index 0; lege kolommen
+        binnen de rij zijn ''. Rijen zonder cellen worden overgeslagen.
+    """
+    row = col = 1
+    current_row = None
+    cells = {}
+    # Cellen voor een rij die al teruggegeven is (komt in normale exports niet voor)
+    late = {}
+
+    for line_number, line in enumerate(lines, 1):
+        if isinstance(line, bytes):
+            line = _decode_line(line)
+        line = line.rstrip('\r\n')
+        if not line:
+            continue
+
+        fields = _split_fields(line)
+        record = fields[0]
+        if record == 'E':
+            break
+        if record not in ('C', 'F'):
+            continue
+
+        value = None
+        try:
+            for field in fields[1:]:
+                if not field:
+                    continue
+                code = field[0]
+                if code == 'Y':
+                    row = int(field[1:])
+                elif code == 'X':
+                    col = int(field[1:])
+                elif code == 'K' and record == 'C':
+                    value = _cell_value(field[1:])
+        except ValueError:
+            logger.debug(f"SYLK regel {line_number} overgeslagen: {line[:50]}")
+            continue
+
+        if value is None:
+            continue
+
+        if row == current_row:
+            cells[col] = value
+        elif current_row is None or row > current_row:
+            if cells:
+                yield current_row, _finish_row(cells)
+            current_row = row
+            cells = {col: value}
+        else:
+            late.setdefault(row, {})[col] = value
+
+    if cells:
+        yield current_row, _finish_row(cells)
+
+    if late:
+        logger.warning(f"SYLK bestand bevat {len(late)} rijen buiten volgorde; deze komen achteraan")
+        for row_number in sorted(late):
+            yield row_number, _finish_row(late[row_number])
+
+
+def write_sylk_as_csv(lines, output, delimiter=';'):
+    """
+    Schrijf een SYLK bestand rij voor rij als CSV naar `output` (file-achtig)
+
+    Returns:
+        aantal geschreven rijen
+    """
+    writer = csv.writer(output, delimiter=delimiter, lineterminator='\n')
+    count = 0
+    for _, cells in iter_sylk_rows(lines):
+        writer.writerow(cells)
+        count += 1
+    return count
@@ -0,0 +1,141 @@
+"""
+Interval index voor tijdblok toewijzing
+Eén keer per run opgebouwd: gesorteerde Halen starttijden en Brengen aankomsttijden,
+doorzocht met bisect in plaats van een scan over alle tijdblokken per patiënt.
+
+Halen:   starttijd in [blok x, volgend Halen blok) -> blok x
+         (na het laatste blok nog `last_block_minutes` minuten)
+Brengen: eerste Brengen blok met aankomst_tijd >= eind behandeling
+"""
+import logging
+from bisect import bisect_left, bisect_right
+from datetime import datetime, time, timedelta
+
+from planning.models import Patient, TimeSlot
+
+logger = logging.getLogger(__name__)
+
+
+def _time_of(value):
+    """time uit een datetime, time of "HH:MM" string"""
+    if value is None or value == '':
+        return None
+    if isinstance(value, str):
+        return time.fromisoformat(value)
+    if hasattr(value, 'time'):
+        return value.time()
+    return value
+
+
+class TimeslotIndex:
+    """
+    Opzoek structuur voor Halen en Brengen tijdblokken
+
+        index = TimeslotIndex.for_selected()
+        assignments = index.assign(patients)
+        index.save(assignments)
+    """
+
+    def __init__(self, timeslots, last_block_minutes=90):
+        ordered = sorted(timeslots, key=lambda ts: ts.aankomst_tijd)
+        self.timeslots = ordered
+        self.halen = [ts for ts in ordered if ts.tijdblok_type == 'halen']
+        self.brengen = [ts for ts in ordered if ts.tijdblok_type == 'brengen']
+        self._halen_starts = [ts.aankomst_tijd for ts in self.halen]
+        self._brengen_times = [ts.aankomst_tijd for ts in self.brengen]
+        self._last_halen_end = None
+        if self.halen:
+            last_start = datetime.combine(datetime.today(), self._halen_starts[-1])
+            self._last_halen_end = (last_start + timedelta(minutes=last_block_minutes)).time()
+
+    @classmethod
+    def for_selected(cls, **kwargs):
+        """Actieve en standaard geselecteerde tijdblokken (planning pagina)"""
+        return cls(TimeSlot.objects.filter(actief=True, default_selected=True), **kwargs)
+
+    @classmethod
+    def for_active(cls, **kwargs):
+        return cls(TimeSlot.objects.filter(actief=True), **kwargs)
+
+    # ------------------------------------------------------------------
+    # Opzoeken
+    # ------------------------------------------------------------------
+
+    def halen_block(self, start_time, bounded=True):
+        """
+        Halen blok waarin de eerste afspraak valt
+
+        Args:
+            start_time: time of datetime van de eerste afspraak
+            bounded: na het laatste blok alleen binnen `last_block_minutes`
+                     (False: altijd het dichtstbijzijnde eerdere blok)
+        """
+        start_time = _time_of(start_time)
+        if start_time is None or not self.halen:
+            return None
+        i = bisect_right(self._halen_starts, start_time) - 1
+        if i < 0:
+            return None
+        if bounded and i == len(self.halen) - 1 and start_time >= self._last_halen_end:
+            return None
+        return self.halen[i]
+
+    def brengen_candidates(self, end_time):
+        """Brengen blokken vanaf de eind behandeling, vroegste eerst"""
+        end_time = _time_of(end_time)
+        if end_time is None:
+            return []
+        return self.brengen[bisect_left(self._brengen_times, end_time):]
+
+    def brengen_block(self, end_time, fallback_to_last=False):
+        """
+        Eerste Brengen blok na de eind behandeling
+        fallback_to_last: eind tijd na het laatste blok -> laatste blok
+        """
+        candidates = self.brengen_candidates(end_time)
+        if candidates:
+            return candidates[0]
+        if fallback_to_last and self.brengen and _time_of(end_time) is not None:
+            return self.brengen[-1]
+        return None
+
+    # ------------------------------------------------------------------
+    # Batch toewijzing
+    # ------------------------------------------------------------------
+
+    def assign(self, patients, skip_assigned=True):
+        """
+        Bepaal tijdblokken voor een batch patiënten zonder iets op te slaan
+
+        Returns:
+            lijst van (patient, halen_tijdblok, bringen_tijdblok) voor patiënten
+            waarvoor minstens één blok gevonden is
+        """
+        assignments = []
+        for patient in patients:
+            if skip_assigned and patient.halen_tijdblok_id and patient.bringen_tijdblok_id:
+                continue
+            halen = self.halen_block(patient.ophaal_tijd)
+            brengen = self.brengen_block(patient.eind_behandel_tijd, fallback_to_last=True)
+            if halen or brengen:
+                assignments.append((patient, halen, brengen))
+        return assignments
+
+    @staticmethod
+    def save(assignments, extra_fields=()):
+        """
+        Schrijf toewijzingen weg met één bulk_update
+        Een ontbrekend blok laat de bestaande toewijzing van de patiënt staan.
+        """
+        changed = []
+        for patient, halen, brengen in assignments:
+            if halen:
+                patient.halen_tijdblok = halen
+            if brengen:
+                patient.bringen_tijdblok = brengen
+            changed.append(patient)
+        if changed:
+            Patient.objects.bulk_update(
+                changed, ['halen_tijdblok', 'bringen_tijdblok', *extra_fields], batch_size=500
+            )
+        return len(changed)
@@ -0,0 +1,304 @@
+"""
+Tijdsafhankelijke reistijd profielen
+Vervangt de vaste 30 km/u × 1.3 stadsfactor door een snelheidstabel per
+vertrek uur en wegklasse. Snelheden zijn effectieve snelheden over de
+hemelsbrede (Haversine) afstand, zodat omrijden in de snelheid zit en de
+DistanceMatrix niets anders hoeft te rekenen.
+
+    profile = get_travel_profile()
+    profile.travel_time(8.2, departure=time(7, 30))     # minuten, spits
+    profile.travel_time(8.2)                            # zonder vertrektijd
+    DistanceMatrix(points, profile=profile, departure=time(7, 30))
+
+Wegklasse volgt uit de afstand van de rit (korte ritten blijven in de stad,
+lange ritten gaan over de snelweg). Zonder geleerde gegevens is de snelheid
+buiten de spits gelijk aan de oude 30 km/u / 1.3, in de ochtend- en avondspits
+lager (DEFAULT_HOURLY_FACTORS). Uit de gecachte Google resultaten
+(TravelTimeCacheEntry) wordt geleerd zodra er genoeg ritten zijn:
+- de basis snelheid per wegklasse uit reistijden zonder verkeer (bucket -1)
+- de snelheid per uur alleen uit duration_in_traffic, opgeslagen onder het
+  gevraagde vertrek uur. Zolang de planning geen vertrektijd meegeeft aan
+  get_full_distance_matrix zijn die er niet en blijft de spits de vaste factor.
+
+Profielen zijn plain data (to_data/from_data) zodat ze naar solver workers
+kunnen. Instellingen (settings.TRAVEL_PROFILE):
+    min_samples:     aantal ritten voordat een geleerde snelheid gebruikt wordt
+    road_class_km:   grenzen in km tussen stad, regionaal en snelweg
+    refresh_seconds: hoe lang een geleerd profiel geldig is
+"""
+import logging
+import math
+import statistics
+import threading
+import time
+from datetime import datetime, time as dt_time
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .settings_cache import SettingsCache
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is optioneel, val terug op pure Python
+    np = None
+
+logger = logging.getLogger(__name__)
+
+ROAD_CLASSES = ('city', 'regional', 'highway')
+
+# Oude berekening: 30 km/u met 30% extra tijd voor stadsverkeer
+LEGACY_SPEED_KMH = 30 / 1.3
+
+# Snelheid per uur ten opzichte van buiten de spits (zonder geleerde gegevens)
+DEFAULT_HOURLY_FACTORS = [1.0] * 24
+DEFAULT_HOURLY_FACTORS[7] = DEFAULT_HOURLY_FACTORS[8] = 0.8
+DEFAULT_HOURLY_FACTORS[16] = DEFAULT_HOURLY_FACTORS[17] = 0.85
+
+EARTH_RADIUS_KM = 6371
+# Kortere ritten zeggen vooral iets over parkeren en stoplichten, niet over snelheid
+MIN_SAMPLE_KM = 0.2
+
+
+def departure_hour(departure):
+    """Uur van de dag (0-23) voor een datetime, time of getal; None blijft None"""
+    if departure is None:
+        return None
+    if isinstance(departure, datetime):
+        if departure.tzinfo is not None:
+            from django.utils import timezone
+            departure = timezone.localtime(departure)
+        return departure.hour
+    if isinstance(departure, dt_time):
+        return departure.hour
+    return int(departure) % 24
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    lat1, lon1, lat2, lon2 = map(math.radians, [lat1, lon1, lat2, lon2])
+    a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 2 * math.asin(math.sqrt(min(1.0, a))) * EARTH_RADIUS_KM
+
+
+class TravelTimeProfile:
+    """
+    Effectieve snelheid (km/u hemelsbreed) per wegklasse en vertrek uur
+
+    Args:
+        hourly: dict wegklasse -> 24 snelheden
+        base: dict wegklasse -> snelheid zonder bekende vertrektijd
+        bands: grenzen in km tussen de wegklassen (oplopend)
+        min_travel_time/max_travel_time: grenzen in minuten (zoals calculate_travel_time)
+        samples: aantal ritten waarop het profiel gebaseerd is (informatief)
+    """
+
+    DEFAULTS = {
+        'min_samples': 5,
+        'road_class_km': (3, 15),
+        'refresh_seconds': 3600,
+    }
+
+    def __init__(self, hourly=None, base=None, bands=None, min_travel_time=5, max_travel_time=60, samples=0):
+        config = self.config()
+        self.bands = tuple(bands or config['road_class_km'])
+        self.base = {road_class: LEGACY_SPEED_KMH for road_class in ROAD_CLASSES}
+        self.base.update(base or {})
+        self.hourly = {
+            road_class: [self.base[road_class] * factor for factor in DEFAULT_HOURLY_FACTORS]
+            for road_class in ROAD_CLASSES
+        }
+        for road_class, speeds in (hourly or {}).items():
+            self.hourly[road_class] = [float(speed) for speed in speeds]
+        self.min_travel_time = min_travel_time
+        self.max_travel_time = max_travel_time
+        self.samples = samples
+        # Voor caches van afgeleide matrices (zie route_editor.matrix_for)
+        self.signature = hash((self.bands, tuple(sorted(self.base.items())),
+                               tuple((key, tuple(value)) for key, value in sorted(self.hourly.items()))))
+
+    @classmethod
+    def config(cls):
+        return dict(cls.DEFAULTS, **getattr(settings, 'TRAVEL_PROFILE', {}))
+
+    # ------------------------------------------------------------------
+    # Queries
+    # ------------------------------------------------------------------
+
+    def road_class(self, distance_km):
+        for road_class, limit in zip(ROAD_CLASSES, self.bands):
+            if distance_km < limit:
+                return road_class
+        return ROAD_CLASSES[-1]
+
+    def speed(self, distance_km, departure=None):
+        """Effectieve snelheid in km/u voor een rit van distance_km"""
+        road_class = self.road_class(distance_km)
+        hour = departure_hour(departure)
+        if hour is None:
+            return self.base[road_class]
+        return self.hourly[road_class][hour]
+
+    def travel_time(self, distance_km, departure=None):
+        """Reistijd in minuten, begrensd op min/max_travel_time"""
+        if distance_km <= 0:
+            return self.min_travel_time
+        minutes = distance_km / self.speed(distance_km, departure) * 60
+        return max(self.min_travel_time, min(self.max_travel_time, minutes))
+
+    def travel_time_matrix(self, distances, departure=None):
+        """Reistijden voor een hele afstand matrix (NumPy array of lijst van lijsten)"""
+        if np is not None and isinstance(distances, np.ndarray):
+            hour = departure_hour(departure)
+            speeds = np.array([
+                self.base[road_class] if hour is None else self.hourly[road_class][hour]
+                for road_class in ROAD_CLASSES
+            ])
+            classes = np.searchsorted(np.array(self.bands, dtype=float), distances, side='right')
+            travel_times = distances / speeds[classes] * 60
+            travel_times = np.clip(travel_times, self.min_travel_time, self.max_travel_time)
+            travel_times[distances <= 0] = self.min_travel_time
+            return travel_times
+        return [[self.travel_time(distance, departure) for distance in row] for row in distances]
+
+    # ------------------------------------------------------------------
+    # Plain data (solver workers, Django cache)
+    # ------------------------------------------------------------------
+
+    def to_data(self):
+        return {
+            'hourly': {key: list(value) for key, value in self.hourly.items()},
+            'base': dict(self.base),
+            'bands': list(self.bands),
+            'min_travel_time': self.min_travel_time,
+            'max_travel_time': self.max_travel_time,
+            'samples': self.samples,
+        }
+
+    @classmethod
+    def from_data(cls, data):
+        if data is None:
+            return cls()
+        if isinstance(data, cls):
+            return data
+        return cls(**data)
+
+    # ------------------------------------------------------------------
+    # Leren uit de reistijd cache
+    # ------------------------------------------------------------------
+
+    @classmethod
+    def from_samples(cls, samples, bucket_hours=1, min_samples=None, bands=None):
+        """
+        Args:
+            samples: iterable van (hemelsbrede km, reistijd seconden, uur bucket)
+                     uur bucket -1 = zonder verkeer, anders duration_in_traffic
+                     voor dat vertrek uur
+            bucket_hours: breedte van een uur bucket (TRAVEL_TIME_CACHE)
+
+        Basis snelheden komen uit bucket -1, uur snelheden alleen uit de uur buckets.
+        """
+        config = cls.config()
+        min_samples = config['min_samples'] if min_samples is None else min_samples
+        profile = cls(bands=bands)
+
+        speeds_per_class = {road_class: [] for road_class in ROAD_CLASSES}
+        speeds_per_bucket = {}
+        count = 0
+        for distance_km, duration_seconds, bucket in samples:
+            if distance_km < MIN_SAMPLE_KM or duration_seconds <= 0:
+                continue
+            speed = distance_km / (duration_seconds / 3600)
+            road_class = profile.road_class(distance_km)
+            if bucket is not None and bucket >= 0:
+                speeds_per_bucket.setdefault((road_class, bucket), []).append(speed)
+            else:
+                speeds_per_class[road_class].append(speed)
+            count += 1
+
+        base, hourly = {}, {}
+        for road_class in ROAD_CLASSES:
+            speeds = speeds_per_class[road_class]
+            base[road_class] = statistics.median(speeds) if len(speeds) >= min_samples else LEGACY_SPEED_KMH
+            hourly[road_class] = []
+            for hour in range(24):
+                bucket_speeds = speeds_per_bucket.get((road_class, hour // bucket_hours), ()) if bucket_hours else ()
+                if len(bucket_speeds) >= min_samples:
+                    hourly[road_class].append(statistics.median(bucket_speeds))
+                else:
+                    hourly[road_class].append(base[road_class] * DEFAULT_HOURLY_FACTORS[hour])
+
+        return cls(hourly=hourly, base=base, bands=profile.bands, samples=count)
+
+    @classmethod
+    def from_database(cls):
+        """Leer een profiel uit de geldige regels van de reistijd cache"""
+        from django.db import DatabaseError
+        from django.utils import timezone
+
+        from planning.models import TravelTimeCacheEntry
+        from .travel_time_cache import travel_time_cache
+
+        def samples(rows):
+            for origin_cell, destination_cell, bucket, duration_seconds in rows:
+                try:
+                    lat1, lon1 = (float(part) for part in origin_cell.split(','))
+                    lat2, lon2 = (float(part) for part in destination_cell.split(','))
+                except ValueError:
+                    continue  # Cel op adres in plaats van coördinaten
+                yield haversine_km(lat1, lon1, lat2, lon2), duration_seconds, bucket
+
+        try:
+            rows = TravelTimeCacheEntry.objects.filter(
+                expires_at__gt=timezone.now(), duration_seconds__gt=0
+            ).values_list('origin_cell', 'destination_cell', 'hour_bucket', 'duration_seconds')
+            profile = cls.from_samples(samples(rows.iterator(chunk_size=2000)), travel_time_cache.bucket_hours)
+        except DatabaseError as e:
+            logger.warning(f"Reistijd profiel niet te leren: {e}")
+            return cls()
+        logger.info(f"Reistijd profiel geleerd uit {profile.samples} gecachte ritten")
+        return profile
+
+
+# ----------------------------------------------------------------------
+# Gedeeld profiel per proces
+# ----------------------------------------------------------------------
+
+CACHE_KEY = 'travel_profile:data'
+
+_lock = threading.Lock()
+_current = {'profile': None, 'loaded_at': 0.0, 'generation': None}
+
+
+def rebuild_travel_profile():
+    """Leer het profiel opnieuw en deel het via de Django cache met andere processen"""
+    profile = TravelTimeProfile.from_database()
+    cache.set(CACHE_KEY, profile.to_data(), TravelTimeProfile.config()['refresh_seconds'])
+    with _lock:
+        _current.update(profile=profile, loaded_at=time.monotonic(), generation=SettingsCache.current_generation())
+    return profile
+
+
+def get_travel_profile():
+    """
+    Het huidige profiel; hooguit elke refresh_seconds opnieuw geleerd
+    (of gelezen uit de Django cache als een ander proces dat al deed)
+    """
+    refresh_seconds = TravelTimeProfile.config()['refresh_seconds']
+    generation = SettingsCache.current_generation()
+    profile = _current['profile']
+    if profile is not None and generation == _current['generation'] \
+            and time.monotonic() - _current['loaded_at'] < refresh_seconds:
+        return profile
+
+    with _lock:
+        profile = _current['profile']
+        if profile is not None and generation == _current['generation'] \
+                and time.monotonic() - _current['loaded_at'] < refresh_seconds:
+            return profile
+        data = cache.get(CACHE_KEY)
+        if data is not None:
+            profile = TravelTimeProfile.from_data(data)
+            _current.update(profile=profile, loaded_at=time.monotonic(), generation=generation)
+            return profile
+
+    return rebuild_travel_profile()
@@ -0,0 +1,251 @@
+"""
+Persistente reistijd cache voor Google Distance Matrix en Directions resultaten
+Sleutel: (origin cel, bestemming cel, vertrek uur bucket). Cellen zijn afgeronde
+coördinaten, zodat dezelfde rit (thuis -> reha center) elke werkdag uit de cache komt.
+
+De uur bucket is het gevraagde vertrek uur van een rit met verkeer
+(duration_in_traffic). Zonder vertrektijd geeft Google reistijden zonder verkeer;
+die staan in bucket -1, los van het moment waarop de planner de API aanriep.
+
+Instellingen (settings.TRAVEL_TIME_CACHE):
+    precision:    aantal decimalen voor afronding (3 = ~100 meter)
+    bucket_hours: breedte van een vertrek bucket in uren (0 = tijdsonafhankelijk)
+    ttl_days:     geldigheid van een cache regel
+    max_entries:  maximaal aantal regels, daarboven LRU eviction
+"""
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import DatabaseError
+from django.db.models import F
+from django.utils import timezone
+
+from planning.models import TravelTimeCacheEntry
+
+logger = logging.getLogger(__name__)
+
+
+class TravelTimeCache:
+    """
+    Opslag van afstand en reistijd per celpaar
+    """
+
+    DEFAULTS = {
+        'precision': 3,
+        'bucket_hours': 1,
+        'ttl_days': 30,
+        'max_entries': 100000,
+    }
+
+    def __init__(self, **options):
+        config = dict(self.DEFAULTS, **getattr(settings, 'TRAVEL_TIME_CACHE', {}))
+        config.update(options)
+        self.precision = config['precision']
+        self.bucket_hours = config['bucket_hours']
+        self.ttl = timedelta(days=config['ttl_days'])
+        self.max_entries = config['max_entries']
+
+    # ------------------------------------------------------------------
+    # Sleutels
+    # ------------------------------------------------------------------
+
+    def cell(self, location):
+        """
+        Afgeronde cel voor een locatie ("lat,lng" string of (lat, lng) tuple)
+        Adressen zonder coördinaten gebruiken het genormaliseerde adres als cel
+        """
+        if isinstance(location, (tuple, list)):
+            lat, lng = location
+        else:
+            try:
+                lat, lng = (float(part) for part in str(location).split(','))
+            except ValueError:
+                return ' '.join(str(location).lower().split())[:100]
+        return f"{round(float(lat), self.precision):.{self.precision}f},{round(float(lng), self.precision):.{self.precision}f}"
+
+    def bucket(self, departure_time=None):
+        """Vertrek uur bucket; -1 zonder vertrektijd of als de cache tijdsonafhankelijk is"""
+        if not self.bucket_hours or departure_time is None:
+            return -1
+        if timezone.is_aware(departure_time):
+            departure_time = timezone.localtime(departure_time)
+        return departure_time.hour // self.bucket_hours
+
+    # ------------------------------------------------------------------
+    # Lezen en schrijven
+    # ------------------------------------------------------------------
+
+    def get_many(self, pairs, departure_time=None):
+        """
+        Args:
+            pairs: iterable van (origin, destination) locaties
+
+        Returns:
+            dict (origin_cell, destination_cell) -> (distance_meters, duration_seconds)
+        """
+        cells = {(self.cell(origin), self.cell(destination)) for origin, destination in pairs}
+        if not cells:
+            return {}
+
+        bucket = self.bucket(departure_time)
+        origins = {origin for origin, _ in cells}
+        destinations = {destination for _, destination in cells}
+        try:
+            entries = [
+                entry for entry in TravelTimeCacheEntry.objects.filter(
+                    origin_cell__in=origins,
+                    destination_cell__in=destinations,
+                    hour_bucket=bucket,
+                    expires_at__gt=timezone.now(),
+                )
+                if (entry.origin_cell, entry.destination_cell) in cells
+            ]
+            if entries:
+                TravelTimeCacheEntry.objects.filter(pk__in=[entry.pk for entry in entries]).update(
+                    hit_count=F('hit_count') + 1, last_used_at=timezone.now()
+                )
+        except DatabaseError as e:
+            logger.warning(f"Reistijd cache niet beschikbaar: {e}")
+            return {}
+
+        return {
+            (entry.origin_cell, entry.destination_cell): (entry.distance_meters, entry.duration_seconds)
+            for entry in entries
+        }
+
+    def set_many(self, items, departure_time=None, source='google'):
+        """
+        Args:
+            items: iterable van (origin, destination, distance_meters, duration_seconds)
+        """
+        bucket = self.bucket(departure_time)
+        now = timezone.now()
+        entries = {}
+        for origin, destination, distance_meters, duration_seconds in items:
+            key = (self.cell(origin), self.cell(destination))
+            if key[0] == key[1]:
+                continue
+            entries[key] = TravelTimeCacheEntry(
+                origin_cell=key[0],
+                destination_cell=key[1],
+                hour_bucket=bucket,
+                distance_meters=int(distance_meters),
+                duration_seconds=int(duration_seconds),
+                source=source,
+                last_used_at=now,
+                expires_at=now + self.ttl,
+            )
+        if not entries:
+            return 0
+
+        try:
+            TravelTimeCacheEntry.objects.bulk_create(
+                list(entries.values()),
+                batch_size=500,
+                update_conflicts=True,
+                unique_fields=['origin_cell', 'destination_cell', 'hour_bucket'],
+                update_fields=['distance_meters', 'duration_seconds', 'source', 'last_used_at', 'expires_at'],
+            )
+        except DatabaseError as e:
+            logger.warning(f"Reistijd cache opslaan mislukt: {e}")
+            return 0
+
+        self.evict()
+        return len(entries)
+
+    def evict(self):
+        """Verwijder verlopen regels en de minst recent gebruikte boven max_entries"""
+        try:
+            expired = TravelTimeCacheEntry.objects.filter(expires_at__lte=timezone.now()).delete()[0]
+            overflow = TravelTimeCacheEntry.objects.count() - self.max_entries
+            evicted = 0
+            if overflow > 0:
+                oldest = TravelTimeCacheEntry.objects.order_by('last_used_at').values_list('pk', flat=True)[:overflow]
+                evicted = TravelTimeCacheEntry.objects.filter(pk__in=list(oldest)).delete()[0]
+            if expired or evicted:
+                logger.info(f"Reistijd cache: {expired} verlopen en {evicted} LRU regels verwijderd")
+            return expired + evicted
+        except DatabaseError:
+            return 0
+
+    # ------------------------------------------------------------------
+    # Distance Matrix koppeling
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _element(distance_meters, duration_seconds):
+        return {
+            'status': 'OK',
+            'distance': {'text': f'{distance_meters / 1000:.1f} km', 'value': distance_meters},
+            'duration': {'text': f'{duration_seconds // 60} min', 'value': duration_seconds},
+            'cached': True,
+        }
+
+    def known_cells(self, origins, destinations=None, departure_time=None):
+        """
+        Gecachte cellen als (i, j) -> element voor DistanceMatrixTiler.build(known=...)
+        """
+        destinations = origins if destinations is None else destinations
+        pairs = [(origin, destination) for origin in origins for destination in destinations]
+        cached = self.get_many(pairs, departure_time)
+        if not cached:
+            return {}
+
+        origin_cells = [self.cell(origin) for origin in origins]
+        destination_cells = [self.cell(destination) for destination in destinations]
+        known = {}
+        for i, origin_cell in enumerate(origin_cells):
+            for j, destination_cell in enumerate(destination_cells):
+                value = cached.get((origin_cell, destination_cell))
+                if value:
+                    known[(i, j)] = self._element(*value)
+        return known
+
+    def store_matrix(self, origins, destinations, matrix, departure_time=None):
+        """
+        Sla alle gemeten cellen van een matrix op
+        Geschatte, gecachte en gespiegelde (symmetrische tiler) cellen worden
+        overgeslagen. Met departure_time alleen cellen met duration_in_traffic.
+        """
+        items = []
+        for i, row in enumerate(matrix.get('rows', [])):
+            for j, element in enumerate(row.get('elements', [])):
+                if element.get('status') != 'OK' or element.get('estimated') or element.get('cached') \
+                        or element.get('mirrored'):
+                    continue
+                if departure_time is not None:
+                    duration = element.get('duration_in_traffic')
+                    if not duration:
+                        continue
+                else:
+                    duration = element['duration']
+                items.append((origins[i], destinations[j], element['distance']['value'], duration['value']))
+        return self.set_many(items, departure_time)
+
+    def matrix_from_cache(self, origins, destinations, departure_time=None):
+        """
+        Volledige matrix uit de cache, of None als er ook maar één cel ontbreekt
+        """
+        known = self.known_cells(origins, destinations, departure_time)
+        rows = []
+        for i, origin in enumerate(origins):
+            elements = []
+            for j, destination in enumerate(destinations):
+                if self.cell(origin) == self.cell(destination):
+                    elements.append(self._element(0, 0))
+                elif (i, j) in known:
+                    elements.append(known[(i, j)])
+                else:
+                    return None
+            rows.append({'elements': elements})
+        return {
+            'status': 'OK',
+            'origin_addresses': list(origins),
+            'destination_addresses': list(destinations),
+            'rows': rows,
+        }
+
+
+# Singleton instance
+travel_time_cache = TravelTimeCache()
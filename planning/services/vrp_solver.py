@@ -0,0 +1,394 @@
+"""
+CVRPTW solver voor één tijdblok
+Clarke-Wright savings constructie + 2-opt, Or-opt en relocate/exchange local search
+Werkt alleen op sleutels uit een DistanceMatrix, dus zonder ORM objecten
+
+Met een ConstraintEngine worden relocate/exchange zetten incrementeel gescoord
+tegen de PlanningConstraints (ScoreDirector) in plaats van alleen op afstand.
+"""
+import logging
+import time
+
+from .distance_matrix import DistanceMatrix
+
+logger = logging.getLogger(__name__)
+
+
+class VehicleSpec:
+    """
+    Plain-data beschrijving van een voertuig voor de solver
+    """
+
+    def __init__(self, key, capacity, special_capacity=0, max_minutes=None):
+        self.key = key
+        self.capacity = capacity
+        self.special_capacity = special_capacity
+        self.max_minutes = max_minutes
+
+    def __repr__(self):
+        return f"VehicleSpec({self.key!r}, capacity={self.capacity}, special={self.special_capacity}, max_minutes={self.max_minutes})"
+
+
+class SavingsSolver:
+    """
+    Open-route CVRPTW solver: elke route start bij het depot (BRINGEN).
+    Voor HALEN routes wordt de volgorde omgedraaid door de aanroeper,
+    de matrix is symmetrisch dus kosten en duur blijven gelijk.
+    """
+
+    def __init__(self, distance_matrix, service_time=5, time_budget=1.0, route_max_minutes=None, engine=None):
+        """
+        Args:
+            distance_matrix: DistanceMatrix met DistanceMatrix.DEPOT + alle stops
+            service_time: minuten per stop (ophalen/afzetten)
+            time_budget: maximale rekentijd in seconden voor de local search
+            route_max_minutes: maximale routeduur uit het tijdblok venster
+            engine: optionele ConstraintEngine voor de inter-route zetten
+        """
+        self.matrix = distance_matrix
+        self.service_time = service_time
+        self.time_budget = time_budget
+        self.route_max_minutes = route_max_minutes
+        self.engine = engine
+        self.director = None
+        self.depot = distance_matrix.index(DistanceMatrix.DEPOT)
+        self._deadline = None
+        self.stats = {}
+
+    # ------------------------------------------------------------------
+    # Route evaluatie
+    # ------------------------------------------------------------------
+
+    def _dist(self, a, b):
+        return self.matrix.distances[a][b]
+
+    def route_cost(self, route):
+        """Afstand van depot langs alle stops (open route)"""
+        if not route:
+            return 0.0
+        cost = self._dist(self.depot, route[0])
+        for a, b in zip(route, route[1:]):
+            cost += self._dist(a, b)
+        return float(cost)
+
+    def route_duration(self, route):
+        """Reistijd + service tijd in minuten"""
+        if not route:
+            return 0.0
+        times = self.matrix.travel_times
+        duration = times[self.depot][route[0]]
+        for a, b in zip(route, route[1:]):
+            duration += times[a][b]
+        return float(duration) + len(route) * self.service_time
+
+    def _max_minutes(self, vehicle):
+        limits = [limit for limit in (vehicle.max_minutes, self.route_max_minutes) if limit]
+        return min(limits) if limits else None
+
+    def is_feasible(self, route, vehicle):
+        """Check capaciteit, rolstoelplaatsen en maximale routeduur"""
+        if len(route) > vehicle.capacity:
+            return False
+        if sum(1 for stop in route if self._wheelchair[stop]) > vehicle.special_capacity:
+            return False
+        max_minutes = self._max_minutes(vehicle)
+        if max_minutes is not None and self.route_duration(route) > max_minutes:
+            return False
+        return True
+
+    def _out_of_time(self):
+        return self._deadline is not None and time.perf_counter() > self._deadline
+
+    # ------------------------------------------------------------------
+    # Hoofdfunctie
+    # ------------------------------------------------------------------
+
+    def solve(self, stop_keys, vehicles, wheelchair=None):
+        """
+        Plan stops over voertuigen
+
+        Args:
+            stop_keys: sleutels (patiënt ids) in de distance matrix
+            vehicles: lijst van VehicleSpec
+            wheelchair: dict sleutel -> bool voor rolstoel patiënten
+
+        Returns:
+            (routes, unassigned): routes is een lijst van (vehicle_key, [stop_keys])
+        """
+        started = time.perf_counter()
+        self._deadline = started + self.time_budget if self.time_budget else None
+
+        wheelchair = wheelchair or {}
+        stops = [self.matrix.index(key) for key in stop_keys]
+        self._wheelchair = {self.matrix.index(key): bool(wheelchair.get(key)) for key in stop_keys}
+
+        vehicles = sorted(vehicles, key=lambda v: (v.capacity, v.special_capacity), reverse=True)
+        if not stops or not vehicles:
+            return [], list(stop_keys)
+
+        # 1. Clarke-Wright savings constructie
+        routes = self._savings_construction(stops, vehicles)
+
+        # 2. Routes aan voertuigen koppelen
+        assignment, unassigned = self._assign_vehicles(routes, vehicles)
+
+        # 3. Overgebleven stops via cheapest insertion toevoegen
+        unassigned = self._insert_unassigned(assignment, vehicles, unassigned)
+        construction_cost = self._total_cost(assignment)
+
+        # 4. Local search binnen het tijdbudget
+        if self.engine is not None:
+            self.director = self._make_director(assignment, vehicles)
+        self._local_search(assignment, vehicles)
+
+        final_cost = self._total_cost(assignment)
+        self.stats = {
+            'construction_cost': construction_cost,
+            'final_cost': final_cost,
+            'routes': sum(1 for route in assignment.values() if route),
+            'unassigned': len(unassigned),
+            'elapsed_seconds': time.perf_counter() - started,
+        }
+        if self.director is not None:
+            self.stats['score'] = tuple(self.director.score)
+        logger.info(f"Savings solver: {len(stops)} stops, {self.stats['routes']} routes, "
+                    f"{construction_cost:.1f} km -> {final_cost:.1f} km in {self.stats['elapsed_seconds']:.3f}s")
+
+        keys = self.matrix.keys
+        result = [
+            (vehicle.key, [keys[stop] for stop in assignment[vehicle.key]])
+            for vehicle in vehicles if assignment[vehicle.key]
+        ]
+        return result, [keys[stop] for stop in unassigned]
+
+    def _total_cost(self, assignment):
+        return sum(self.route_cost(route) for route in assignment.values())
+
+    # ------------------------------------------------------------------
+    # Constructie
+    # ------------------------------------------------------------------
+
+    def _savings_construction(self, stops, vehicles):
+        """
+        Open-route savings: koppel het einde van route A aan het begin van route B
+        besparing s(i, j) = d(depot, j) - d(i, j)
+        """
+        largest = vehicles[0]
+        route_of = {stop: [stop] for stop in stops}
+
+        savings = []
+        for i in stops:
+            for j in stops:
+                if i != j:
+                    saving = self._dist(self.depot, j) - self._dist(i, j)
+                    if saving > 0:
+                        savings.append((saving, i, j))
+        savings.sort(key=lambda item: item[0], reverse=True)
+
+        for _, i, j in savings:
+            route_i = route_of[i]
+            route_j = route_of[j]
+            if route_i is route_j or route_i[-1] != i or route_j[0] != j:
+                continue
+            merged = route_i + route_j
+            if not self.is_feasible(merged, largest):
+                continue
+            for stop in merged:
+                route_of[stop] = merged
+
+        unique = []
+        seen = set()
+        for route in route_of.values():
+            if id(route) not in seen:
+                seen.add(id(route))
+                unique.append(route)
+        return unique
+
+    def _assign_vehicles(self, routes, vehicles):
+        """Koppel de grootste routes aan de grootste passende voertuigen"""
+        assignment = {vehicle.key: [] for vehicle in vehicles}
+        unassigned = []
+        free = list(vehicles)
+
+        for route in sorted(routes, key=len, reverse=True):
+            match = None
+            # Kleinste voertuig waar de route nog in past
+            for vehicle in reversed(free):
+                if self.is_feasible(route, vehicle):
+                    match = vehicle
+                    break
+            if match:
+                assignment[match.key] = list(route)
+                free.remove(match)
+            else:
+                unassigned.extend(route)
+
+        return assignment, unassigned
+
+    def _insert_unassigned(self, assignment, vehicles, unassigned):
+        """Cheapest insertion voor stops zonder route"""
+        remaining = []
+        for stop in unassigned:
+            best = None
+            for vehicle in vehicles:
+                route = assignment[vehicle.key]
+                base = self.route_cost(route)
+                for position in range(len(route) + 1):
+                    candidate = route[:position] + [stop] + route[position:]
+                    if not self.is_feasible(candidate, vehicle):
+                        continue
+                    delta = self.route_cost(candidate) - base
+                    if best is None or delta < best[0]:
+                        best = (delta, vehicle.key, candidate)
+            if best:
+                assignment[best[1]] = best[2]
+            else:
+                remaining.append(stop)
+        return remaining
+
+    # ------------------------------------------------------------------
+    # Local search
+    # ------------------------------------------------------------------
+
+    def _make_director(self, assignment, vehicles):
+        """ScoreDirector met de gecombineerde routeduur limiet per voertuig"""
+        specs = [
+            VehicleSpec(vehicle.key, vehicle.capacity, vehicle.special_capacity, self._max_minutes(vehicle))
+            for vehicle in vehicles
+        ]
+        return self.engine.director(self.matrix, specs, assignment, self._wheelchair)
+
+    def _local_search(self, assignment, vehicles):
+        relocate = self._relocate_scored if self.director else self._relocate
+        exchange = self._exchange_scored if self.director else self._exchange
+        improved = True
+        while improved and not self._out_of_time():
+            improved = False
+            for vehicle in vehicles:
+                changed = self._two_opt(assignment, vehicle)
+                changed = self._or_opt(assignment, vehicle) or changed
+                if changed:
+                    improved = True
+                    if self.director:
+                        self.director.set_route(vehicle.key, assignment[vehicle.key])
+            if relocate(assignment, vehicles):
+                improved = True
+            if exchange(assignment, vehicles):
+                improved = True
+
+    def _two_opt(self, assignment, vehicle):
+        """Draai segmenten om binnen één route"""
+        route = assignment[vehicle.key]
+        improved = False
+        best_cost = self.route_cost(route)
+        for i in range(len(route) - 1):
+            for j in range(i + 1, len(route)):
+                if self._out_of_time():
+                    return improved
+                candidate = route[:i] + route[i:j + 1][::-1] + route[j + 1:]
+                cost = self.route_cost(candidate)
+                if cost < best_cost - 1e-9 and self.is_feasible(candidate, vehicle):
+                    route, best_cost, improved = candidate, cost, True
+        assignment[vehicle.key] = route
+        return improved
+
+    def _or_opt(self, assignment, vehicle):
+        """Verplaats segmenten van 1-3 stops binnen één route"""
+        route = assignment[vehicle.key]
+        improved = False
+        best_cost = self.route_cost(route)
+        for length in (1, 2, 3):
+            for start in range(len(route) - length + 1):
+                segment = route[start:start + length]
+                rest = route[:start] + route[start + length:]
+                for position in range(len(rest) + 1):
+                    if position == start or self._out_of_time():
+                        continue
+                    candidate = rest[:position] + segment + rest[position:]
+                    cost = self.route_cost(candidate)
+                    if cost < best_cost - 1e-9 and self.is_feasible(candidate, vehicle):
+                        assignment[vehicle.key] = candidate
+                        return True
+        return improved
+
+    def _relocate(self, assignment, vehicles):
+        """Verplaats één stop naar een andere route"""
+        for source in vehicles:
+            source_route = assignment[source.key]
+            for index, stop in enumerate(source_route):
+                reduced = source_route[:index] + source_route[index + 1:]
+                gain = self.route_cost(source_route) - self.route_cost(reduced)
+                for target in vehicles:
+                    if target is source:
+                        continue
+                    target_route = assignment[target.key]
+                    base = self.route_cost(target_route)
+                    for position in range(len(target_route) + 1):
+                        if self._out_of_time():
+                            return False
+                        candidate = target_route[:position] + [stop] + target_route[position:]
+                        if self.route_cost(candidate) - base < gain - 1e-9 and self.is_feasible(candidate, target):
+                            assignment[source.key] = reduced
+                            assignment[target.key] = candidate
+                            return True
+        return False
+
+    def _exchange(self, assignment, vehicles):
+        """Wissel twee stops tussen routes"""
+        for a_index, vehicle_a in enumerate(vehicles):
+            route_a = assignment[vehicle_a.key]
+            for vehicle_b in vehicles[a_index + 1:]:
+                route_b = assignment[vehicle_b.key]
+                if not route_a or not route_b:
+                    continue
+                base = self.route_cost(route_a) + self.route_cost(route_b)
+                for i in range(len(route_a)):
+                    for j in range(len(route_b)):
+                        if self._out_of_time():
+                            return False
+                        new_a = route_a[:i] + [route_b[j]] + route_a[i + 1:]
+                        new_b = route_b[:j] + [route_a[i]] + route_b[j + 1:]
+                        if (self.route_cost(new_a) + self.route_cost(new_b) < base - 1e-9
+                                and self.is_feasible(new_a, vehicle_a)
+                                and self.is_feasible(new_b, vehicle_b)):
+                            assignment[vehicle_a.key] = new_a
+                            assignment[vehicle_b.key] = new_b
+                            return True
+        return False
+
+    def _relocate_scored(self, assignment, vehicles):
+        """Relocate met delta score: O(aantal constraints) per kandidaat"""
+        director = self.director
+        for source in vehicles:
+            for index, stop in enumerate(director.routes[source.key]):
+                removed = director.remove_delta(source.key, index)
+                for target in vehicles:
+                    if target is source:
+                        continue
+                    if self._out_of_time():
+                        return False
+                    best = director.best_insertion(target.key, stop, base=removed)
+                    if best is not None:
+                        director.remove(source.key, index)
+                        director.insert(target.key, stop, best[1])
+                        assignment[source.key] = list(director.routes[source.key])
+                        assignment[target.key] = list(director.routes[target.key])
+                        return True
+        return False
+
+    def _exchange_scored(self, assignment, vehicles):
+        """Exchange met delta score"""
+        director = self.director
+        for a_index, vehicle_a in enumerate(vehicles):
+            for vehicle_b in vehicles[a_index + 1:]:
+                route_a, route_b = director.routes[vehicle_a.key], director.routes[vehicle_b.key]
+                for i in range(len(route_a)):
+                    for j in range(len(route_b)):
+                        if self._out_of_time():
+                            return False
+                        if director.swap_delta(vehicle_a.key, i, vehicle_b.key, j).improves():
+                            director.swap(vehicle_a.key, i, vehicle_b.key, j)
+                            assignment[vehicle_a.key] = list(director.routes[vehicle_a.key])
+                            assignment[vehicle_b.key] = list(director.routes[vehicle_b.key])
+                            return True
+        return False
@@ -0,0 +1,151 @@
+"""
+Server-side wizard state
+Grote wizard en planning data (CSV rijen, geocoding, toewijzingen, routes) staat
+niet meer in request.session maar in WizardStateEntry rijen. De sessie bevat
+alleen `wizard_state_id`, zodat een request die de sessie leest (elke request
+met login) geen grote JSON blob meer decodeert en de sessie tabel klein blijft.
+
+- lazy: een onderdeel wordt pas bij het eerste gebruik opgehaald (één query)
+- gecomprimeerd: zlib over compacte JSON
+- gedeeltelijk: alleen gewijzigde onderdelen worden weggeschreven
+
+Oude sessie data wordt bij het eerste lezen naar de store verplaatst.
+"""
+import json
+import logging
+import uuid
+import zlib
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from planning.models_extended import WizardStateEntry
+
+logger = logging.getLogger(__name__)
+
+SESSION_KEY = 'wizard_state_id'
+
+_MISSING = object()
+
+
+def encode_payload(value):
+    raw = json.dumps(value, cls=DjangoJSONEncoder, separators=(',', ':')).encode('utf-8')
+    return zlib.compress(raw), len(raw)
+
+
+def decode_payload(payload):
+    return json.loads(zlib.decompress(bytes(payload)).decode('utf-8'))
+
+
+class WizardState:
+    """
+    State store voor één sessie
+
+        state = WizardState.for_request(request)
+        upload_data = state.get('wizard_upload_data', {})
+        state['wizard_route_data'] = route_result
+        state.update('wizard_upload_data', geocoded_patients=patients)
+        state.delete('wizard_upload_data', 'wizard_planning_data')
+    """
+
+    def __init__(self, session):
+        self.session = session
+        self._cache = {}
+
+    @classmethod
+    def for_request(cls, request):
+        """Eén store per request, zodat onderdelen maar één keer geladen worden"""
+        state = getattr(request, '_wizard_state', None)
+        if state is None or state.session is not request.session:
+            state = cls(request.session)
+            request._wizard_state = state
+        return state
+
+    @property
+    def state_id(self):
+        return self.session.get(SESSION_KEY)
+
+    def _ensure_state_id(self):
+        if not self.state_id:
+            self.session[SESSION_KEY] = str(uuid.uuid4())
+        return self.state_id
+
+    # ------------------------------------------------------------------
+    # Lezen
+    # ------------------------------------------------------------------
+
+    def load(self, *sections):
+        """Haal meerdere onderdelen in één query op (optioneel, get() doet het ook)"""
+        wanted = [section for section in sections if section not in self._cache]
+        if not wanted or not self.state_id:
+            return
+        for section, payload in WizardStateEntry.objects.filter(
+            state_id=self.state_id, section__in=wanted
+        ).values_list('section', 'payload'):
+            self._cache[section] = decode_payload(payload)
+        for section in wanted:
+            self._cache.setdefault(section, _MISSING)
+
+    def get(self, section, default=None):
+        if section not in self._cache:
+            self.load(section)
+        value = self._cache.get(section, _MISSING)
+        if value is _MISSING:
+            if section in self.session:
+                # Data van voor de store: eenmalig verhuizen
+                value = self.session.pop(section)
+                self.set(section, value)
+                return value
+            return default
+        return value
+
+    def __getitem__(self, section):
+        value = self.get(section, _MISSING)
+        if value is _MISSING:
+            raise KeyError(section)
+        return value
+
+    def __contains__(self, section):
+        return self.get(section, _MISSING) is not _MISSING
+
+    # ------------------------------------------------------------------
+    # Schrijven
+    # ------------------------------------------------------------------
+
+    def set(self, section, value):
+        """Schrijf één onderdeel weg (update, of insert als het nog niet bestaat)"""
+        state_id = self._ensure_state_id()
+        payload, size = encode_payload(value)
+        entries = WizardStateEntry.objects.filter(state_id=state_id, section=section)
+        if not entries.update(payload=payload, size=size, updated_at=timezone.now()):
+            try:
+                with transaction.atomic():
+                    WizardStateEntry.objects.create(state_id=state_id, section=section, payload=payload, size=size)
+            except IntegrityError:
+                # Gelijktijdige request maakte het onderdeel net aan
+                entries.update(payload=payload, size=size, updated_at=timezone.now())
+        self._cache[section] = value
+
+    __setitem__ = set
+
+    def update(self, section, **changes):
+        """Pas losse sleutels van een dict onderdeel aan"""
+        value = dict(self.get(section) or {})
+        value.update(changes)
+        self.set(section, value)
+        return value
+
+    def delete(self, *sections):
+        for section in sections:
+            self._cache[section] = _MISSING
+            self.session.pop(section, None)
+        if self.state_id:
+            WizardStateEntry.objects.filter(state_id=self.state_id, section__in=sections).delete()
+
+    def clear(self):
+        """Verwijder alle state van deze sessie"""
+        if self.state_id:
+            WizardStateEntry.objects.filter(state_id=self.state_id).delete()
+            self.session.pop(SESSION_KEY, None)
+        self._cache = {}
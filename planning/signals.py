@@ -0,0 +1,91 @@
+"""
+Signal handlers voor cache invalidatie en de statistieken rollup
+"""
+import threading
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import receiver
+
+from .models import (
+    Configuration, DailyPlanningStats, GoogleMapsConfig, Location, Patient, PlanningConstraint, Vehicle
+)
+from .services.dashboard import DashboardSnapshot
+from .services.settings_cache import SettingsCache
+
+
+@receiver([post_save, post_delete], sender=Patient)
+@receiver([post_save, post_delete], sender=Vehicle)
+@receiver([post_save, post_delete], sender=Location)
+@receiver([post_save, post_delete], sender=GoogleMapsConfig)
+def invalidate_dashboard_snapshot(sender, **kwargs):
+    """Toewijzingen, voertuigen of kaart instellingen gewijzigd: dashboard opnieuw opbouwen"""
+    DashboardSnapshot.invalidate()
+
+
+@receiver([post_save, post_delete], sender=Configuration)
+@receiver([post_save, post_delete], sender=Location)
+@receiver([post_save, post_delete], sender=GoogleMapsConfig)
+@receiver([post_save, post_delete], sender=PlanningConstraint)
+def invalidate_settings_cache(sender, **kwargs):
+    """Instellingen gewijzigd: proces caches (ook in andere processen) opnieuw laden"""
+    SettingsCache.invalidate_on_commit()
+
+
+_pending_stats = threading.local()
+
+
+def _mark_stats_dirty_on_commit(dates):
+    """
+    Verzamel dagen tot de commit: een queryset delete (één signal per rij) of een
+    save loop in een transactie markeert de rollup dan één keer
+    """
+    pending = getattr(_pending_stats, 'dates', None)
+    if pending is None:
+        pending = _pending_stats.dates = set()
+    pending.update(d for d in dates if d)
+    transaction.on_commit(_flush_stats_dirty)
+
+
+def _flush_stats_dirty():
+    dates = getattr(_pending_stats, 'dates', None)
+    if dates:
+        # Latere callbacks van dezelfde transactie vinden een lege set (geen queries)
+        _pending_stats.dates = set()
+        DailyPlanningStats.mark_dirty(dates)
+
+
+# Velden waaruit DailyPlanningStats.refresh_dates de rollup opbouwt (naast de ophaal datum)
+STATS_FIELDS = ('toegewezen_voertuig_id', 'rolstoel', 'geocoding_status')
+
+
+def _stats_inputs(instance):
+    """Datum en rollup velden via __dict__, zodat een deferred veld geen query doet"""
+    values = instance.__dict__
+    return (DailyPlanningStats.date_for(values.get('ophaal_tijd')),
+            tuple(values.get(field) for field in STATS_FIELDS))
+
+
+@receiver(post_init, sender=Patient)
+def remember_patient_stats_date(sender, instance, **kwargs):
+    """Onthoud de oorspronkelijke ophaal datum en rollup velden"""
+    instance._stats_date, instance._stats_values = _stats_inputs(instance)
+
+
+@receiver(post_save, sender=Patient)
+def mark_patient_stats_dirty(sender, instance, created=False, **kwargs):
+    """
+    Oude en nieuwe ophaal datum opnieuw berekenen, maar alleen als de datum of
+    een rollup veld veranderd is (een gewijzigd telefoonnummer kost geen queries)
+    """
+    current, values = _stats_inputs(instance)
+    previous = getattr(instance, '_stats_date', None)
+    if created or current != previous or values != getattr(instance, '_stats_values', None):
+        _mark_stats_dirty_on_commit({previous, current})
+    instance._stats_date, instance._stats_values = current, values
+
+
+@receiver(post_delete, sender=Patient)
+def mark_deleted_patient_stats_dirty(sender, instance, **kwargs):
+    """Verwijderde patiënt: de dag opnieuw berekenen"""
+    _mark_stats_dirty_on_commit({getattr(instance, '_stats_date', None)})
@@ -1,3 +1,975 @@
-from django.test import TestCase
+import csv
+import io
+import random
+import zipfile
+from datetime import date, datetime, time
+from decimal import Decimal
+from importlib import import_module
+from pathlib import Path
+from unittest import mock
+from xml.etree import ElementTree
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from django.apps import apps
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+
+from planning.benchmarks.generator import generate_dataset
+from planning.ingest import IngestPipeline
+from planning.ingest.decoding import SNIFF_BYTES
+from planning.models import DailyPlanningStats, GeocodeCacheEntry, Patient, TimeSlot, TravelTimeCacheEntry, Vehicle
+from planning.models_extended import PlanningJob
+from planning.services.bulk_geocoding import BulkGeocoder, NominatimProvider
+from planning.services.constraint_engine import DEFAULT_CONSTRAINTS, ConstraintEngine
+from planning.services.distance_matrix import DistanceMatrix
+from planning.services.exports import (
+    COLUMNS, rows_from_assignments, rows_from_history, stream_csv, stream_manifest, stream_xlsx, table_rows,
+)
+from planning.services.geocoding_stub import GeocodingStubServer
+from planning.services.matrix_tiling import DistanceMatrixTiler
+from planning.services.optaplanner import OptaPlannerService
+from planning.services.optaplanner_stub import OptaPlannerStubServer
+from planning.services.planning_executor import PlanningExecutor
+from planning.services.settings_cache import SettingsCache
+from planning.services.simple_router import SimpleRouteService
+from planning.services.spatial_index import SPATIAL_INDEX_MIN_POINTS, SpatialIndex, sweep_partition
+from planning.services.sylk import iter_sylk_rows, write_sylk_as_csv
+from planning.services.timeslot_index import TimeslotIndex
+from planning.services.travel_profile import DEFAULT_HOURLY_FACTORS, TravelTimeProfile
+from planning.services.travel_time_cache import TravelTimeCache
+from planning.services.vrp_solver import SavingsSolver, VehicleSpec
+
+
+VEHICLES = [
+    {'name': f'BUS_{index}', 'people': 8, 'specialSeats': 1, 'kmRate': 29, 'maxDriveTimeInSeconds': 3600}
+    for index in range(3)
+]
+LOCATIONS = [
+    {'name': f'Patient_{index}_P', 'longitude': 4.3 + index / 100, 'latitude': 52.0, 'special': 0,
+     'drv': 0, 'preferredVehicle': '_', 'pickup': 1}
+    for index in range(5)
+]
+
+
+class OptaPlannerSubmitTests(TestCase):
+    """submit_problem tegen de lokale stub server"""
+
+    def service_for(self, base_url):
+        service = OptaPlannerService()
+        service.base_url = base_url
+        return service
+
+    def test_batch_submit_uses_one_round_trip(self):
+        with OptaPlannerStubServer() as stub:
+            service = self.service_for(stub.base_url)
+            result = service.submit_problem(VEHICLES, LOCATIONS)
+
+            self.assertEqual(result['mode'], 'batch')
+            self.assertEqual(result['round_trips'], 1)
+            self.assertEqual(stub.round_trips, 1)
+            self.assertEqual(len(stub.vehicles), len(VEHICLES))
+            self.assertEqual(len(stub.locations), len(LOCATIONS))
+            self.assertIsNot(service.batch_supported, False)
+
+    def test_falls_back_to_per_entity_when_batch_unsupported(self):
+        with OptaPlannerStubServer(batch_support=False) as stub:
+            service = self.service_for(stub.base_url)
+            result = service.submit_problem(VEHICLES, LOCATIONS)
+
+            self.assertEqual(result['mode'], 'per_entity')
+            self.assertIs(service.batch_supported, False)
+            # Mislukte POST api/problem + clear + clearvehicle + één GET per entiteit
+            self.assertEqual(stub.round_trips, 1 + 2 + len(VEHICLES) + len(LOCATIONS))
+            self.assertEqual(stub.requests['GET /api/vehicleadd'], len(VEHICLES))
+            self.assertEqual(stub.requests['GET /api/locationadd'], len(LOCATIONS))
+
+            # Volgende submit slaat het batch endpoint over
+            stub.requests.clear()
+            service.submit_problem(VEHICLES, LOCATIONS)
+            self.assertNotIn('POST /api/problem', stub.requests)
+
+    def test_server_error_does_not_fall_back(self):
+        with OptaPlannerStubServer() as stub:
+            service = self.service_for(stub.base_url)
+            failed = mock.Mock(status_code=500, text='internal error')
+            with mock.patch.object(service.session, 'post', return_value=failed), \
+                    self.assertLogs('planning.services.optaplanner', level='ERROR'):
+                result = service.submit_problem(VEHICLES, LOCATIONS)
+
+            self.assertIsNone(result)
+            self.assertIsNot(service.batch_supported, False)
+            self.assertEqual(stub.round_trips, 0)
+
+
+class BulkGeocoderTests(TestCase):
+    """BulkGeocoder tegen de lokale geocoding stub server"""
+
+    ADDRESSES = [
+        ('Hauptstraße 1', '53111', 'Bonn'),
+        ('Hauptstraße 1', '53111', 'Bonn'),
+        ('hauptstraße 1 ', '53111', 'BONN'),
+        ('Rheinweg 12', '53113', 'Bonn'),
+        ('Unbekannte Gasse 3', '53115', 'Bonn'),
+    ]
+
+    def geocoder_for(self, stub, rate=50, time_budget=30):
+        provider = NominatimProvider(base_url=stub.nominatim_url, rate=rate)
+        return BulkGeocoder(providers=[provider], time_budget=time_budget)
+
+    def create_patient(self, index, street, postcode='53111', city='Bonn'):
+        return Patient.objects.create(
+            naam=f'Patient {index}', straat=street, postcode=postcode, plaats=city,
+            bestemming='Klinik', ophaal_tijd=timezone.make_aware(datetime(2026, 3, 2, 8, 0)),
+        )
+
+    def test_duplicates_are_geocoded_once_and_cached(self):
+        with GeocodingStubServer() as stub:
+            results = self.geocoder_for(stub).geocode_many(self.ADDRESSES)
+
+            self.assertEqual(len(results), 3)
+            self.assertEqual(stub.requests['/nominatim/search'], 3)
+            self.assertEqual(sorted(result['source'] for result in results.values()), ['api', 'api', 'not_found'])
+            self.assertEqual(GeocodeCacheEntry.objects.count(), 3)
+
+            geocoder = self.geocoder_for(stub)
+            cached = geocoder.geocode_many(self.ADDRESSES)
+
+            self.assertEqual(stub.requests['/nominatim/search'], 3)
+            self.assertEqual(geocoder.stats['cache_hits'], 3)
+            self.assertEqual(sorted(result['source'] for result in cached.values()), ['cache', 'cache', 'not_found'])
+
+    def test_patients_are_saved_with_one_bulk_update(self):
+        patients = [self.create_patient(index, street, postcode, city)
+                    for index, (street, postcode, city) in enumerate(self.ADDRESSES)]
+
+        with GeocodingStubServer() as stub, \
+                mock.patch.object(Patient.objects, 'bulk_update', wraps=Patient.objects.bulk_update) as bulk_update:
+            geocoded, failed = self.geocoder_for(stub).geocode_patients(patients)
+
+        self.assertEqual((geocoded, failed), (4, 1))
+        bulk_update.assert_called_once()
+        statuses = dict(Patient.objects.values_list('naam', 'geocoding_status'))
+        self.assertEqual(statuses['Patient 4'], 'failed')
+        self.assertEqual(Patient.objects.filter(geocoding_status='success', latitude__isnull=False).count(), 4)
+
+    def test_addresses_past_the_time_budget_are_deferred(self):
+        patients = [self.create_patient(index, f'Rheinweg {index}') for index in range(4)]
+
+        with GeocodingStubServer() as stub:
+            # Eén token per seconde: na het eerste adres past er niets meer in het budget
+            geocoder = self.geocoder_for(stub, rate=1, time_budget=0.5)
+            geocoded, failed = geocoder.geocode_patients(patients)
+
+            self.assertEqual(stub.requests['/nominatim/search'], 1)
+        self.assertEqual((geocoded, failed), (1, 0))
+        self.assertEqual(geocoder.stats['timeouts'], 3)
+        # Uitgestelde adressen worden niet gecached en de patiënten blijven ongewijzigd
+        self.assertEqual(GeocodeCacheEntry.objects.count(), 1)
+        self.assertEqual(Patient.objects.filter(latitude__isnull=True).count(), 3)
+
+
+class PlanningJobQueueTests(TestCase):
+    """Achtergrond jobs: sessie snapshot en voortgang zonder web worker bezetting"""
+
+    def setUp(self):
+        self.user = User.objects.create_user('planner', password='secret')
+        self.client.force_login(self.user)
+        session = self.client.session
+        session['wizard_state_id'] = 'state-1'
+        session['unrelated'] = 'x'
+        session.save()
+
+    def enqueue(self):
+        response = self.client.post('/start-optaplanner-planning/', {'start_planning': 'true', 'async': '1'})
+        self.assertEqual(response.status_code, 202)
+        return response.json()
+
+    def test_payload_only_contains_wizard_session_keys(self):
+        data = self.enqueue()
+
+        job = PlanningJob.objects.get(pk=data['job_id'])
+        self.assertEqual(job.payload['session'], {'wizard_state_id': 'state-1'})
+
+    def test_event_stream_is_off_by_default(self):
+        data = self.enqueue()
+
+        self.assertIsNone(data['events_url'])
+        response = self.client.get(f"/api/planning-jobs/{data['job_id']}/events/")
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(self.client.get(data['status_url']).json()['status'], 'queued')
+
+    @override_settings(PLANNING_JOBS={'event_stream': True})
+    def test_event_stream_when_enabled(self):
+        data = self.enqueue()
+        PlanningJob.objects.filter(pk=data['job_id']).update(status='completed')
+
+        response = self.client.get(data['events_url'])
+
+        async def read():
+            return b''.join([chunk async for chunk in response.streaming_content])
+        body = async_to_sync(read)().decode()
+        self.assertIn('event: done', body)
+
+
+class SettingsCacheTests(TestCase):
+    """Invalidatie moet via de gedeelde cache backend andere processen bereiken"""
+
+    def test_cache_backend_is_shared_between_processes(self):
+        self.assertNotIsInstance(caches['default'], LocMemCache)
+
+    def test_version_bump_from_another_process_clears_the_cache(self):
+        SettingsCache.clear()
+        self.assertEqual(SettingsCache.get('example', lambda: 'old'), 'old')
+
+        # Eigen backend instantie, zoals in een worker proces
+        other = caches.create_connection('default')
+        other.set(SettingsCache.VERSION_KEY, (SettingsCache._version or 0) + 1, None)
+        SettingsCache._checked_at = 0.0
+
+        self.assertEqual(SettingsCache.get('example', lambda: 'new'), 'new')
+
+
+class TravelTimeCacheTests(TestCase):
+    """Vertrek uur buckets en gespiegelde cellen van de symmetrische tiler"""
+
+    LOCATIONS = ['50.700,7.100', '50.710,7.120', '50.730,7.150']
+
+    @staticmethod
+    def fetch_tile(origins, destinations):
+        return [[{'status': 'OK', 'distance': {'value': 1000 + 10 * i + j}, 'duration': {'value': 120},
+                  'duration_in_traffic': {'value': 180}}
+                 for j, _ in enumerate(destinations)] for i, _ in enumerate(origins)]
+
+    def test_without_departure_time_the_bucket_is_untimed(self):
+        cache = TravelTimeCache(bucket_hours=1)
+        self.assertEqual(cache.bucket(), -1)
+        departure = timezone.make_aware(datetime(2026, 3, 2, 7, 30))
+        self.assertEqual(cache.bucket(departure), 7)
+
+    def test_mirrored_cells_are_not_stored(self):
+        tiler = DistanceMatrixTiler(self.fetch_tile)
+        matrix = tiler.build(self.LOCATIONS)
+        cache = TravelTimeCache(bucket_hours=1)
+
+        stored = cache.store_matrix(self.LOCATIONS, self.LOCATIONS, matrix)
+
+        # Alleen de gemeten helft van de 3x3 matrix (zonder diagonaal)
+        self.assertEqual(stored, 3)
+        self.assertEqual(set(TravelTimeCacheEntry.objects.values_list('hour_bucket', flat=True)), {-1})
+        self.assertEqual(set(TravelTimeCacheEntry.objects.values_list('duration_seconds', flat=True)), {120})
+        # Gespiegelde cellen blijven wel bruikbaar in de matrix zelf
+        self.assertEqual(len(cache.known_cells(self.LOCATIONS)), 3)
+
+    def test_departure_time_stores_traffic_durations_under_that_hour(self):
+        matrix = DistanceMatrixTiler(self.fetch_tile).build(self.LOCATIONS)
+        cache = TravelTimeCache(bucket_hours=1)
+        departure = timezone.make_aware(datetime(2026, 3, 2, 8, 15))
+
+        cache.store_matrix(self.LOCATIONS, self.LOCATIONS, matrix, departure)
+
+        self.assertEqual(set(TravelTimeCacheEntry.objects.values_list('hour_bucket', 'duration_seconds')), {(8, 180)})
+        self.assertEqual(cache.known_cells(self.LOCATIONS), {})
+        self.assertEqual(len(cache.known_cells(self.LOCATIONS, departure_time=departure)), 3)
+
+
+class TravelTimeProfileTests(TestCase):
+    """Uur snelheden komen alleen uit reistijden met verkeer voor een vertrek uur"""
+
+    def test_untimed_samples_only_set_the_base_speed(self):
+        # 10 km in 15 minuten = 40 km/u, zonder vertrektijd
+        profile = TravelTimeProfile.from_samples([(10.0, 900, -1)] * 5, min_samples=5)
+
+        self.assertAlmostEqual(profile.base['regional'], 40.0)
+        self.assertAlmostEqual(profile.hourly['regional'][8], 40.0 * DEFAULT_HOURLY_FACTORS[8])
+
+    def test_traffic_samples_set_the_speed_for_their_hour(self):
+        samples = [(10.0, 900, -1)] * 5 + [(10.0, 1200, 8)] * 5
+        profile = TravelTimeProfile.from_samples(samples, min_samples=5)
+
+        self.assertAlmostEqual(profile.base['regional'], 40.0)
+        self.assertAlmostEqual(profile.hourly['regional'][8], 30.0)
+        self.assertAlmostEqual(profile.hourly['regional'][12], 40.0)
+
+
+class ParallelPlanningTests(TestCase):
+    """Standaard (savings) planning gaat per tijdblok door de PlanningExecutor"""
+
+    def setUp(self):
+        generate_dataset(40, timeslots=4, save=True)
+        index = TimeslotIndex.for_active()
+        index.save(index.assign(Patient.objects.all(), skip_assigned=False))
+        self.patients = Patient.objects.select_related('halen_tijdblok', 'bringen_tijdblok')
+        self.vehicles = Vehicle.objects.filter(status='beschikbaar')
+
+    def plan(self, solver_mode=None):
+        executor = PlanningExecutor(max_workers=1)
+        with mock.patch('planning.services.simple_router.PlanningExecutor', return_value=executor), \
+                mock.patch.object(executor, 'run', wraps=executor.run) as run:
+            routes = SimpleRouteService(time_budget=0.1).plan_simple_routes(
+                self.vehicles, self.patients, solver_mode=solver_mode
+            )
+        return routes, run
+
+    def test_default_mode_plans_all_groups_through_the_executor(self):
+        self.assertEqual(SimpleRouteService().solver_mode, 'savings')
+
+        routes, run = self.plan()
+
+        run.assert_called_once()
+        groups = run.call_args.args[0]
+        self.assertGreater(len(groups), 1)
+        self.assertTrue(routes)
+
+    def test_simple_mode_stays_sequential(self):
+        routes, run = self.plan('simple')
+
+        run.assert_not_called()
+        self.assertTrue(routes)
+
+
+class DailyPlanningStatsBackfillTests(TestCase):
+    """Migratie 0029 markeert alle bestaande ophaal datums voor herberekening"""
+
+    def test_existing_dates_are_marked_and_refreshed(self):
+        for day, count in ((2, 3), (3, 2)):
+            for index in range(count):
+                Patient.objects.create(
+                    naam=f'Patient {day}-{index}', straat='Rheinweg 1', postcode='53113', plaats='Bonn',
+                    bestemming='Klinik', ophaal_tijd=timezone.make_aware(datetime(2026, 3, day, 8, index)),
+                )
+        # Toestand direct na migratie 0024: lege tabel
+        DailyPlanningStats.objects.all().delete()
+
+        migration = import_module('planning.migrations.0029_backfill_planning_stats')
+        migration.mark_existing_dates_dirty(apps, None)
+
+        self.assertEqual(
+            set(DailyPlanningStats.objects.filter(dirty=True).values_list('date', flat=True)),
+            {date(2026, 3, 2), date(2026, 3, 3)},
+        )
+        DailyPlanningStats.refresh_dirty()
+        counts = {}
+        for row in DailyPlanningStats.objects.all():
+            counts[row.date] = counts.get(row.date, 0) + row.patient_count
+        self.assertEqual(counts, {date(2026, 3, 2): 3, date(2026, 3, 3): 2})
+
+
+def random_problem(seed, stops=16, vehicles=3, capacity=5, special_capacity=1, max_minutes=90):
+    """DistanceMatrix rond Bonn met rolstoel patiënten en krappe voertuigen"""
+    rng = random.Random(seed)
+    points = [(DistanceMatrix.DEPOT, 50.73, 7.10)]
+    points += [(key, 50.65 + rng.random() * 0.2, 7.0 + rng.random() * 0.25) for key in range(1, stops + 1)]
+    matrix = DistanceMatrix(points)
+    specs = [VehicleSpec(f'V{index}', capacity, special_capacity, max_minutes) for index in range(vehicles)]
+    wheelchair = {matrix.index(key): rng.random() < 0.3 for key in range(1, stops + 1)}
+    return rng, matrix, specs, wheelchair
+
+
+class ScoreDirectorTests(SimpleTestCase):
+    """Incrementele delta's moeten gelijk zijn aan een volledige herberekening"""
+
+    def setUp(self):
+        self.engine = ConstraintEngine(DEFAULT_CONSTRAINTS, service_time=5)
+
+    def random_state(self, seed):
+        rng, matrix, specs, wheelchair = random_problem(seed)
+        stops = [matrix.index(key) for key in range(1, len(matrix.keys))]
+        rng.shuffle(stops)
+        # Een paar stops blijven over om in te voegen; routes mogen te vol zijn
+        unassigned = stops[:3]
+        routes = {spec.key: [] for spec in specs}
+        for stop in stops[3:]:
+            routes[rng.choice(specs).key].append(stop)
+        return rng, matrix, specs, wheelchair, routes, unassigned
+
+    def director(self, matrix, specs, wheelchair, routes):
+        return self.engine.director(matrix, specs, {key: list(route) for key, route in routes.items()}, wheelchair)
+
+    def assertDeltaMatches(self, delta, before, after):
+        expected_distance = sum(after.stats[key].distance - before.stats[key].distance for key in before.routes)
+        self.assertAlmostEqual(delta.hard, after.score.hard - before.score.hard, places=6)
+        self.assertAlmostEqual(delta.soft, after.score.soft - before.score.soft, places=6)
+        self.assertAlmostEqual(delta.distance, expected_distance, places=6)
+
+    def assertStatsMatch(self, director):
+        for key, route in director.routes.items():
+            fresh = director.compute_stats(key, route)
+            stats = director.stats[key]
+            for field in ('count', 'special', 'distance', 'travel'):
+                self.assertAlmostEqual(getattr(stats, field), getattr(fresh, field), places=6)
+
+    def test_insert_and_remove_deltas_match_recomputation(self):
+        for seed in range(30):
+            rng, matrix, specs, wheelchair, routes, unassigned = self.random_state(seed)
+            director = self.director(matrix, specs, wheelchair, routes)
+            key = rng.choice(specs).key
+            stop = unassigned[0]
+            position = rng.randint(0, len(routes[key]))
+
+            changed = dict(routes, **{key: routes[key][:position] + [stop] + routes[key][position:]})
+            self.assertDeltaMatches(director.insert_delta(key, stop, position),
+                                    director, self.director(matrix, specs, wheelchair, changed))
+
+            if routes[key]:
+                index = rng.randrange(len(routes[key]))
+                changed = dict(routes, **{key: routes[key][:index] + routes[key][index + 1:]})
+                self.assertDeltaMatches(director.remove_delta(key, index),
+                                        director, self.director(matrix, specs, wheelchair, changed))
+
+    def test_swap_deltas_match_recomputation(self):
+        for seed in range(30):
+            rng, matrix, specs, wheelchair, routes, _ = self.random_state(seed)
+            director = self.director(matrix, specs, wheelchair, routes)
+            filled = [spec.key for spec in specs if routes[spec.key]]
+            key_a, key_b = rng.choice(filled), rng.choice(filled)
+            index_a, index_b = rng.randrange(len(routes[key_a])), rng.randrange(len(routes[key_b]))
+            if key_a == key_b and index_a == index_b:
+                continue
+
+            changed = {key: list(route) for key, route in routes.items()}
+            changed[key_a][index_a], changed[key_b][index_b] = routes[key_b][index_b], routes[key_a][index_a]
+            self.assertDeltaMatches(director.swap_delta(key_a, index_a, key_b, index_b),
+                                    director, self.director(matrix, specs, wheelchair, changed))
+
+    def test_applied_moves_keep_stats_and_score_consistent(self):
+        rng, matrix, specs, wheelchair, routes, unassigned = self.random_state(7)
+        director = self.director(matrix, specs, wheelchair, routes)
+        for stop in unassigned:
+            key = rng.choice(specs).key
+            director.insert(key, stop, rng.randint(0, len(director.routes[key])))
+        for _ in range(50):
+            filled = [spec.key for spec in specs if director.routes[spec.key]]
+            key_a, key_b = rng.choice(filled), rng.choice(filled)
+            index_a, index_b = rng.randrange(len(director.routes[key_a])), rng.randrange(len(director.routes[key_b]))
+            if rng.random() < 0.5:
+                director.swap(key_a, index_a, key_b, index_b)
+            else:
+                stop = director.routes[key_a][index_a]
+                director.remove(key_a, index_a)
+                director.insert(key_b, stop, rng.randint(0, len(director.routes[key_b])))
+
+        self.assertStatsMatch(director)
+        fresh = self.director(matrix, specs, wheelchair, director.routes)
+        self.assertAlmostEqual(director.score.hard, fresh.score.hard, places=6)
+        self.assertAlmostEqual(director.score.soft, fresh.score.soft, places=6)
+
+    def test_best_insertion_bound_never_skips_an_improving_move(self):
+        checked = improving = 0
+        for seed in range(40):
+            rng, matrix, specs, wheelchair, routes, _ = self.random_state(seed)
+            director = self.director(matrix, specs, wheelchair, routes)
+            for source in specs:
+                for index, stop in enumerate(director.routes[source.key]):
+                    base = director.remove_delta(source.key, index)
+                    for target in specs:
+                        if target is source:
+                            continue
+                        totals = [base + director.insert_delta(target.key, stop, position)
+                                  for position in range(len(director.routes[target.key]) + 1)]
+                        best = director.best_insertion(target.key, stop, base=base)
+                        checked += 1
+                        if not any(total.improves() for total in totals):
+                            self.assertIsNone(best)
+                            continue
+                        improving += 1
+                        self.assertIsNotNone(best)
+                        self.assertFalse(any((total - best[0]).improves() for total in totals))
+        self.assertGreater(improving, 0)
+        self.assertGreater(checked, improving)
+
+
+class SavingsSolverEngineTests(SimpleTestCase):
+    """Met en zonder ConstraintEngine blijven alle routes uitvoerbaar"""
+
+    def solve(self, seed, engine):
+        _, matrix, specs, wheelchair = random_problem(seed, stops=30, vehicles=4, capacity=8,
+                                                      special_capacity=2, max_minutes=120)
+        solver = SavingsSolver(matrix, service_time=5, time_budget=0.2, engine=engine)
+        keys = list(range(1, 31))
+        routes, unassigned = solver.solve(keys, specs, {key: wheelchair[matrix.index(key)] for key in keys})
+        return solver, matrix, specs, routes, unassigned
+
+    def test_routes_stay_feasible_with_and_without_engine(self):
+        engine = ConstraintEngine(DEFAULT_CONSTRAINTS, service_time=5)
+        for seed in range(5):
+            for with_engine in (False, True):
+                solver, matrix, specs, routes, unassigned = self.solve(seed, engine if with_engine else None)
+                vehicles = {spec.key: spec for spec in specs}
+                planned = [key for _, route in routes for key in route]
+
+                self.assertEqual(sorted(planned + unassigned), list(range(1, 31)))
+                for vehicle_key, route in routes:
+                    stops = [matrix.index(key) for key in route]
+                    self.assertTrue(solver.is_feasible(stops, vehicles[vehicle_key]),
+                                    f"seed {seed}, engine {with_engine}: {vehicle_key} {route}")
+                if with_engine:
+                    self.assertEqual(solver.director.score.hard, 0)
+
+
+class SpatialIndexTests(SimpleTestCase):
+    """Grid queries geven hetzelfde resultaat als een lineaire scan"""
+
+    def setUp(self):
+        rng = random.Random(3)
+        # Twee clusters plus verspreide punten, zodat lege cellen en ringen voorkomen
+        points = [(key, 50.70 + rng.gauss(0, 0.01), 7.10 + rng.gauss(0, 0.015)) for key in range(150)]
+        points += [(key, 50.55 + rng.random() * 0.4, 6.85 + rng.random() * 0.5) for key in range(150, 300)]
+        points.append((300, None, None))
+        self.index = SpatialIndex(points, (50.73, 7.10))
+        self.keys = [key for key, _, _ in points]
+        self.assertGreater(len(self.index), SPATIAL_INDEX_MIN_POINTS)
+
+    def brute_force(self, origin, exclude=()):
+        others = [key for key in self.keys if key != origin and key not in exclude]
+        return sorted(others, key=lambda key: (self.index.distance(origin, key), key))
+
+    def assertSameDistances(self, found, expected, origin):
+        # Bij gelijke afstanden mag de volgorde van sleutels verschillen
+        self.assertEqual([round(self.index.distance(origin, key), 9) for key in found],
+                         [round(self.index.distance(origin, key), 9) for key in expected])
+
+    def test_nearest_matches_brute_force(self):
+        rng = random.Random(5)
+        for origin in rng.sample(self.keys, 40) + [DistanceMatrix.DEPOT]:
+            for k in (1, 5, 25):
+                exclude = set(rng.sample(self.keys, 10))
+                found = self.index.nearest(origin, k=k, exclude=exclude)
+                self.assertEqual(len(found), k)
+                self.assertFalse(exclude & set(found))
+                self.assertNotIn(origin, found)
+                self.assertSameDistances(found, self.brute_force(origin, exclude)[:k], origin)
+
+    def test_nearest_after_remove_and_on_subset(self):
+        subset = self.index.subset(self.keys[:120])
+        for key in self.keys[:60]:
+            subset.remove(key)
+        self.keys = self.keys[60:120]
+        for origin in (DistanceMatrix.DEPOT, 10, 200):
+            found = subset.nearest(origin, k=8)
+            self.assertSameDistances(found, self.brute_force(origin)[:8], origin)
+        self.assertEqual(len(subset.nearest(DistanceMatrix.DEPOT, k=100)), 60)
+
+    def test_within_matches_brute_force(self):
+        for origin in (DistanceMatrix.DEPOT, 0, 42, 160, 300):
+            for radius in (0.5, 2.0, 10.0, 40.0):
+                expected = [key for key in self.brute_force(origin) if self.index.distance(origin, key) <= radius]
+                found = self.index.within(origin, radius)
+                self.assertEqual(set(found), set(expected))
+                self.assertSameDistances(found, expected, origin)
+
+
+class SweepPartitionTests(SimpleTestCase):
+    """Sweep verdeling respecteert zitplaatsen en rolstoelplekken"""
+
+    def setUp(self):
+        rng = random.Random(11)
+        self.points = [(key, 50.6 + rng.random() * 0.25, 6.95 + rng.random() * 0.3) for key in range(30)]
+        self.index = SpatialIndex(self.points, (50.73, 7.10))
+        self.keys = [key for key, _, _ in self.points]
+        self.wheelchair = {key: key % 4 == 0 for key in self.keys}
+
+    def assertPartition(self, groups, remaining):
+        assigned = [key for group in groups for key in group]
+        self.assertEqual(sorted(assigned + remaining), self.keys)
+
+    def test_capacities_are_never_exceeded(self):
+        for capacities in ([10, 10, 10], [7, 7, 4], [5, 5], [12, 12, 12]):
+            for balanced in (False, True):
+                groups, remaining = sweep_partition(self.index, self.keys, capacities, balanced=balanced)
+                self.assertPartition(groups, remaining)
+                for group, capacity in zip(groups, capacities):
+                    self.assertLessEqual(len(group), capacity)
+                self.assertEqual(len(remaining), max(0, len(self.keys) - sum(capacities)))
+                if balanced and sum(capacities) >= len(self.keys):
+                    share = -(-len(self.keys) // len(capacities))
+                    self.assertTrue(all(len(group) <= share for group in groups))
+
+    def test_wheelchair_patients_only_on_special_seats(self):
+        special_capacities = [2, 0, 3]
+        groups, remaining = sweep_partition(self.index, self.keys, [10, 10, 10], wheelchair=self.wheelchair,
+                                            special_capacities=special_capacities)
+        self.assertPartition(groups, remaining)
+        for group, seats in zip(groups, special_capacities):
+            self.assertLessEqual(sum(1 for key in group if self.wheelchair[key]), seats)
+        # 8 rolstoel patiënten, 5 plekken: de rest blijft over, niemand anders
+        self.assertEqual(len(remaining), 3)
+        self.assertTrue(all(self.wheelchair[key] for key in remaining))
+
+    def test_without_special_seats_wheelchair_patients_are_left_over(self):
+        groups, remaining = sweep_partition(self.index, self.keys, [10, 10, 10], wheelchair=self.wheelchair)
+        self.assertPartition(groups, remaining)
+        self.assertEqual(sorted(remaining), [key for key in self.keys if self.wheelchair[key]])
+
+
+class FallbackDistributionTests(TestCase):
+    """Fallback verdeling laat rolstoel patiënten zonder rolstoelplekken niet vallen"""
+
+    def setUp(self):
+        generate_dataset(8, vehicles=3, timeslots=2, save=True)
+        Vehicle.objects.update(speciale_zitplaatsen=0)
+        Patient.objects.filter(pk__in=Patient.objects.values_list('pk', flat=True)[:3]).update(rolstoel=True)
+
+    def test_all_patients_routed_without_special_seats(self):
+        patients = list(Patient.objects.all())
+        group = {'patients': patients, 'timeslot': TimeSlot.objects.get(tijdblok_type='halen'), 'type': 'HALEN'}
+
+        routes = SimpleRouteService().distribute_patients_fallback(group, list(Vehicle.objects.all()))
+
+        routed = [stop['patient_id'] for route in routes for stop in route['stops'] if stop['patient_id']]
+        self.assertEqual(sorted(routed), sorted(patient.id for patient in patients))
+        for route in routes:
+            self.assertLessEqual(route['total_patients'], route['vehicle_capacity'])
+
+
+class IngestPipelineTests(TestCase):
+    """Echte exports uit de repository door de import pipeline"""
+
+    CSV_DIR = Path(settings.BASE_DIR) / 'routemeister csv'
+
+    def setUp(self):
+        # Zelfde parser configuraties als in productie
+        call_command('setup_csv_parsers', stdout=io.StringIO())
+
+    def run_file(self, path, content=None, **kwargs):
+        source = io.BytesIO(content if content is not None else path.read_bytes())
+        return IngestPipeline(source, filename=path.name).run(**kwargs)
+
+    def test_routemeister_csv_files_without_headers(self):
+        paths = sorted(self.CSV_DIR.glob('*.csv'))
+        self.assertTrue(paths)
+        for path in paths:
+            result = self.run_file(path)
+            lines = [line for line in path.read_text().splitlines() if line.strip()]
+
+            self.assertEqual(result.source_format, 'csv')
+            self.assertEqual(result.delimiter, ';')
+            self.assertEqual(result.detection['detected_format'], 'Routemeister')
+            self.assertFalse(any(row['type'] == 'header' for row in result.rows))
+            self.assertEqual(result.row_count, len(lines))
+            self.assertEqual(len(result.valid_records), len(lines), result.validation_result()['errors'])
+            self.assertEqual(result.validation_result()['errors'], [])
+            self.assertEqual(len(result.dates), 1)
+
+        record = self.run_file(self.CSV_DIR / 'routemeister_08082025 (1).csv').records[0]
+        self.assertEqual((record.naam, record.straat, record.postcode, record.plaats),
+                         ('Lofo Makonga', 'Cranachstr. 15', '53757', 'Sankt Augustin'))
+        self.assertEqual((record.datum, record.start_tijd.strftime('%H:%M'), record.eind_tijd.strftime('%H:%M')),
+                         (date(2025, 8, 8), '08:45', '15:15'))
+
+    def test_datum_column_wins_over_filename(self):
+        # Bestandsnaam zegt 27-06, de datum kolom (zonder voorloopnul) 29-8
+        result = self.run_file(self.CSV_DIR / 'routemeister_27062025 (19).csv')
+        self.assertEqual(result.dates, [date(2025, 8, 29)])
+        self.assertEqual(result.records[0].start_tijd.strftime('%H:%M'), '08:45')
+
+    def test_fahrdlist_slk_files(self):
+        for path in sorted(Path(settings.BASE_DIR).glob('fahrdlist*.slk')):
+            result = self.run_file(path)
+            file_date = datetime.strptime(path.stem[-8:], '%Y%m%d').date()
+
+            self.assertEqual(result.source_format, 'slk')
+            self.assertTrue(any(row['type'] == 'header' for row in result.rows))
+            self.assertGreater(result.row_count, 0)
+            self.assertEqual(len(result.valid_records), result.row_count, result.validation_result()['errors'])
+            self.assertEqual(result.dates, [file_date])
+
+        names = {record.naam for record in self.run_file(Path(settings.BASE_DIR) / 'fahrdlist20250808.slk').records}
+        self.assertIn('Julia Glückmann', names)
+
+    def test_encoding_sniffing(self):
+        path = self.CSV_DIR / 'routemeister_08082025 (1).csv'
+        text = path.read_text().replace('Gluckmann', 'Glückmann').replace('Lahnstr.', 'Lahnstraße')
+        for content, encoding in ((text.encode('utf-8'), 'utf-8'),
+                                  (text.encode('utf-8-sig'), 'utf-8-sig'),
+                                  (text.encode('cp1252'), 'cp1252')):
+            result = self.run_file(path, content)
+            self.assertEqual(result.encoding, encoding)
+            self.assertEqual(result.records[0].patient_id, '')
+            self.assertEqual(result.records[0].naam, 'Lofo Makonga')
+            self.assertIn(('Julia Glückmann', 'Lahnstraße 12'),
+                          [(record.naam, record.straat) for record in result.records])
+            self.assertEqual(len(result.valid_records), result.row_count)
+
+    def test_non_utf8_line_after_sniffed_head(self):
+        # Eerste niet-ASCII byte na het gesnifte begin: de regel wordt nog steeds gelezen
+        path = self.CSV_DIR / 'routemeister_08082025 (1).csv'
+        lines = path.read_text().splitlines(keepends=True)
+        repeats = SNIFF_BYTES // len(''.join(lines).encode()) + 1
+        content = ''.join(lines * repeats).encode('ascii') + lines[1].replace('Gluckmann', 'Glückmann').encode('cp1252')
+
+        result = self.run_file(path, content)
+
+        self.assertEqual(result.encoding, 'utf-8')
+        self.assertEqual(result.records[-1].naam, 'Julia Glückmann')
+        self.assertEqual(result.row_count, len(lines) * repeats + 1)
+
+    def test_save_patient_records_replace_existing(self):
+        csv_path = self.CSV_DIR / 'routemeister_08082025 (1).csv'
+        slk_path = Path(settings.BASE_DIR) / 'fahrdlist20250808.slk'
+        Patient.objects.create(naam='Andere Dag', straat='Rheinweg 1', postcode='53113', plaats='Bonn',
+                               bestemming='Klinik', ophaal_tijd=timezone.make_aware(datetime(2025, 8, 9, 8, 45)))
+
+        first = self.run_file(csv_path, persist=True)
+        self.assertEqual(first.saved, {'created': 11, 'updated': 0, 'deleted': 0})
+        again = self.run_file(csv_path, persist=True)
+        self.assertEqual(again.saved, {'created': 0, 'updated': 11, 'deleted': 0})
+
+        # Zonder replace_existing blijven afwijkende patiënten van dezelfde dag staan
+        added = self.run_file(slk_path, persist=True)
+        self.assertGreater(added.saved['created'], 0)
+        same_day = Patient.objects.filter(ophaal_tijd__date=date(2025, 8, 8))
+        self.assertEqual(same_day.count(), 11 + added.saved['created'])
+
+        replaced = self.run_file(slk_path, persist=True, replace_existing=True)
+        self.assertEqual(replaced.saved['created'], 0)
+        self.assertEqual(replaced.saved['updated'], len(replaced.valid_records))
+        self.assertEqual(replaced.saved['deleted'], added.saved['created'])
+        self.assertEqual(set(same_day.values_list('naam', flat=True)),
+                         {record.naam for record in replaced.valid_records})
+        # Andere dagen blijven onaangeroerd
+        self.assertTrue(Patient.objects.filter(naam='Andere Dag').exists())
+
+
+class SylkReaderTests(SimpleTestCase):
+    """Streaming SYLK lezer: posities, escapes en volgorde van rijen"""
+
+    def rows(self, text):
+        return list(iter_sylk_rows(text.splitlines(keepends=True)))
+
+    def test_implicit_positions_from_f_records(self):
+        rows = self.rows(
+            'ID;PMREPORT;N\n'
+            'F;SDM6;Y2;X1\n'
+            'C;K"eerste"\n'          # Y2 X1 uit het F record
+            'C;X3;K"derde"\n'        # rij blijft 2
+            'F;Y3\n'
+            'C;K"kolom 3"\n'         # kolom blijft 3
+            'F;FG0L;X2\n'
+            'C;K42\n'
+            'E\n'
+        )
+        self.assertEqual(rows, [(2, ['eerste', '', 'derde']), (3, ['', '42', 'kolom 3'])])
+
+    def test_records_after_e_and_unknown_records_are_ignored(self):
+        rows = self.rows('P;FArial;M240\nB;Y2;X2\nC;Y1;X1;K"a"\nO;L\nE\nC;Y2;X1;K"na einde"\n')
+        self.assertEqual(rows, [(1, ['a'])])
+
+    def test_double_semicolon_is_a_literal(self):
+        rows = self.rows('C;Y1;X1;K"Termin;;Fahrer"\nC;X2;K"a;;;;b"\nC;X3;K"x""y"\n')
+        self.assertEqual(rows, [(1, ['Termin;Fahrer', 'a;;b', 'x"y'])])
+
+    def test_escape_accents(self):
+        rows = self.rows('C;Y1;X1;K"f\x1bNHur"\nC;X2;K"Stra\x1bN{e"\nC;X3;K"Caf\x1bNBe"\nC;X4;K"Gar\x1bNKcon"\n')
+        self.assertEqual(rows, [(1, ['für', 'Straße', 'Café', 'Garçon'])])
+
+    def test_bytes_lines_fall_back_to_latin1(self):
+        rows = list(iter_sylk_rows([b'C;Y1;X1;K"M\xfcller"\n', 'C;X2;K"Köln"\n'.encode('utf-8')]))
+        self.assertEqual(rows, [(1, ['Müller', 'Köln'])])
+
+    def test_rows_out_of_order_come_last(self):
+        text = 'C;Y1;X1;K"een"\nC;Y3;X1;K"drie"\nC;Y2;X2;K"twee"\nC;Y4;X1;K"vier"\nC;Y2;X1;K"twee a"\n'
+        with self.assertLogs('planning.services.sylk', 'WARNING'):
+            rows = self.rows(text)
+        self.assertEqual(rows, [(1, ['een']), (3, ['drie']), (4, ['vier']), (2, ['twee a', 'twee'])])
+
+    def test_repository_export(self):
+        with open(Path(settings.BASE_DIR) / 'fahrdlist20250808.slk', 'rb') as source:
+            rows = list(iter_sylk_rows(source))
+        numbers = [number for number, _ in rows]
+        self.assertEqual(numbers, sorted(numbers))
+        self.assertEqual(rows[0][1][0], 'Fahrdienstliste Bonner Zentrum für Ambulante Rehabilitation GmbH für den:')
+        self.assertEqual(rows[1][1][0], '08.08.2025')
+
+        with open(Path(settings.BASE_DIR) / 'fahrdlist20250808.slk', 'rb') as source:
+            output = io.StringIO()
+            self.assertEqual(write_sylk_as_csv(source, output), len(rows))
+        self.assertEqual(len(output.getvalue().splitlines()), len(rows))
+
+
+class TimeslotIndexTests(SimpleTestCase):
+    """Bisect opzoeking van Halen en Brengen blokken"""
+
+    def setUp(self):
+        blocks = [('halen', '09:30'), ('brengen', '16:00'), ('halen', '08:00'), ('brengen', '12:00'),
+                  ('halen', '11:00'), ('brengen', '14:00')]
+        self.index = TimeslotIndex([
+            TimeSlot(naam=f'{kind} {moment}', tijdblok_type=kind, aankomst_tijd=time.fromisoformat(moment))
+            for kind, moment in blocks
+        ])
+
+    def block_time(self, timeslot):
+        return timeslot.aankomst_tijd.strftime('%H:%M') if timeslot else None
+
+    def test_halen_block_boundaries(self):
+        cases = {'07:59': None, '08:00': '08:00', '09:29': '08:00', '09:30': '09:30', '10:59': '09:30', '11:00': '11:00'}
+        for start, expected in cases.items():
+            self.assertEqual(self.block_time(self.index.halen_block(time.fromisoformat(start))), expected, start)
+
+    def test_halen_tail_after_last_block(self):
+        # Laatste blok 11:00 plus 90 minuten: t/m 12:29 nog in het blok
+        self.assertEqual(self.block_time(self.index.halen_block(time(12, 29))), '11:00')
+        self.assertIsNone(self.index.halen_block(time(12, 30)))
+        self.assertEqual(self.block_time(self.index.halen_block(time(12, 30), bounded=False)), '11:00')
+
+        shorter = TimeslotIndex(self.index.timeslots, last_block_minutes=30)
+        self.assertEqual(self.block_time(shorter.halen_block(time(11, 29))), '11:00')
+        self.assertIsNone(shorter.halen_block(time(11, 30)))
+
+    def test_halen_block_input_types(self):
+        self.assertEqual(self.block_time(self.index.halen_block('09:45')), '09:30')
+        self.assertEqual(self.block_time(self.index.halen_block(datetime(2025, 8, 8, 9, 45))), '09:30')
+        self.assertIsNone(self.index.halen_block(None))
+        self.assertIsNone(self.index.halen_block(''))
+        self.assertIsNone(TimeslotIndex([]).halen_block(time(9, 0)))
+
+    def test_brengen_block_boundaries(self):
+        cases = {'11:00': '12:00', '12:00': '12:00', '12:01': '14:00', '14:00': '14:00', '15:59': '16:00', '16:00': '16:00'}
+        for end, expected in cases.items():
+            self.assertEqual(self.block_time(self.index.brengen_block(time.fromisoformat(end))), expected, end)
+        self.assertEqual([self.block_time(ts) for ts in self.index.brengen_candidates('13:00')], ['14:00', '16:00'])
+
+    def test_brengen_fallback_to_last_block(self):
+        self.assertIsNone(self.index.brengen_block(time(16, 1)))
+        self.assertEqual(self.block_time(self.index.brengen_block(time(16, 1), fallback_to_last=True)), '16:00')
+        self.assertEqual(self.block_time(self.index.brengen_block(time(23, 59), fallback_to_last=True)), '16:00')
+        # Zonder eind tijd of zonder Brengen blokken geen terugval
+        self.assertIsNone(self.index.brengen_block(None, fallback_to_last=True))
+        halen_only = TimeslotIndex(self.index.halen)
+        self.assertIsNone(halen_only.brengen_block(time(17, 0), fallback_to_last=True))
+
+    def test_assign_uses_tail_and_fallback(self):
+        patients = [
+            Patient(naam='Vroeg', ophaal_tijd=datetime(2025, 8, 8, 7, 30), eind_behandel_tijd=datetime(2025, 8, 8, 11, 0)),
+            Patient(naam='Laat', ophaal_tijd=datetime(2025, 8, 8, 12, 15), eind_behandel_tijd=datetime(2025, 8, 8, 17, 0)),
+            Patient(naam='Niets', ophaal_tijd=datetime(2025, 8, 8, 13, 0), eind_behandel_tijd=None),
+        ]
+        assignments = {patient.naam: (self.block_time(halen), self.block_time(brengen))
+                       for patient, halen, brengen in self.index.assign(patients)}
+        self.assertEqual(assignments, {'Vroeg': (None, '12:00'), 'Laat': ('11:00', '16:00')})
+
+
+class PlanningExportTests(TestCase):
+    """Gestreamde CSV, XLSX en manifest exports teruggelezen"""
+
+    SHEET_NS = {'s': 'http://schemas.openxmlformats.org/spreadsheetml/2006/main'}
+
+    def setUp(self):
+        self.vehicles = [
+            Vehicle.objects.create(referentie=f'RM-{index}', kenteken=f'BN-RM {index}', merk_model='VW Crafter',
+                                   aantal_zitplaatsen=7, km_kosten_per_km=Decimal('0.29'), status='beschikbaar')
+            for index in (1, 2)
+        ]
+        self.timeslot = TimeSlot.objects.create(naam='Halen 08:00', tijdblok_type='halen', aankomst_tijd=time(8, 0))
+        patients = [
+            # naam, dag, uur, voertuig, rolstoel
+            ('Anna Schmitz & Co <test>', 8, 9, 0, False),
+            ('Bernd Müller', 8, 8, 0, True),
+            ('Clara Weber\x01', 8, 10, 1, False),
+            ('Dieter Kurz', 8, 11, None, False),
+            ('Erika Lang', 9, 8, 0, False),
+        ]
+        self.patients = []
+        for naam, day, hour, vehicle, rolstoel in patients:
+            self.patients.append(Patient.objects.create(
+                naam=naam, straat='Rheinweg 1', postcode='53113', plaats='Bonn', bestemming='Klinik',
+                telefoonnummer='0228 123', rolstoel=rolstoel, halen_tijdblok=self.timeslot,
+                ophaal_tijd=timezone.make_aware(datetime(2025, 8, day, hour, 15)),
+                eind_behandel_tijd=timezone.make_aware(datetime(2025, 8, day, 15, 0)),
+                toegewezen_voertuig=self.vehicles[vehicle] if vehicle is not None else None,
+            ))
+
+    def history(self):
+        return rows_from_history(date(2025, 8, 8), date(2025, 8, 9))
+
+    def expected_table(self):
+        return [[str(value) for value in values] for values in table_rows(self.history())]
+
+    def read_xlsx(self, chunks):
+        archive = zipfile.ZipFile(io.BytesIO(b''.join(chunks)))
+        self.assertIsNone(archive.testzip())
+        sheet = ElementTree.fromstring(archive.read('xl/worksheets/sheet1.xml'))
+        table = []
+        for row in sheet.iterfind('.//s:sheetData/s:row', self.SHEET_NS):
+            table.append([
+                ''.join(cell.itertext()) for cell in row.iterfind('s:c', self.SHEET_NS)
+            ])
+        return archive, table
+
+    def test_history_rows_are_grouped_per_day_and_vehicle(self):
+        rows = [(row.day, row.vehicle.referentie if row.vehicle else None, row.position, row.patient.naam)
+                for row in self.history()]
+        # Niet toegewezen (NULL voertuig) komt per dag vooraan
+        self.assertEqual(rows, [
+            (date(2025, 8, 8), None, 1, 'Dieter Kurz'),
+            (date(2025, 8, 8), 'RM-1', 1, 'Bernd Müller'),
+            (date(2025, 8, 8), 'RM-1', 2, 'Anna Schmitz & Co <test>'),
+            (date(2025, 8, 8), 'RM-2', 1, 'Clara Weber\x01'),
+            (date(2025, 8, 9), 'RM-1', 1, 'Erika Lang'),
+        ])
+
+    def test_xlsx_reads_back_as_the_table(self):
+        chunks = list(stream_xlsx(self.history(), sheet_name='Planning augustus', chunk_rows=2))
+        self.assertGreater(len(chunks), 3)
+
+        archive, table = self.read_xlsx(chunks)
+        self.assertTrue({'[Content_Types].xml', '_rels/.rels', 'xl/workbook.xml', 'xl/styles.xml',
+                         'xl/_rels/workbook.xml.rels', 'xl/worksheets/sheet1.xml'} <= set(archive.namelist()))
+        self.assertIn('name="Planning augustus"', archive.read('xl/workbook.xml').decode())
+        expected = self.expected_table()
+        # Stuurtekens worden uit cellen gefilterd
+        expected = [[value.replace('\x01', '') for value in values] for values in expected]
+        self.assertEqual(table, [COLUMNS] + expected)
+        self.assertIn('Anna Schmitz & Co <test>', [values[1] for values in table])
+
+    def test_xlsx_without_rows(self):
+        _, table = self.read_xlsx(stream_xlsx(rows_from_history(date(2024, 1, 1), date(2024, 1, 2))))
+        self.assertEqual(table, [COLUMNS])
+
+    def test_csv_reads_back_as_the_table(self):
+        chunks = list(stream_csv(self.history(), chunk_rows=2))
+        self.assertGreater(len(chunks), 2)
+        table = list(csv.reader(io.StringIO(''.join(chunks))))
+        self.assertEqual(table, [COLUMNS] + self.expected_table())
+        self.assertEqual(table[2][1], 'Bernd Müller')
+        self.assertEqual(table[2][5:], ['08:15', '15:00', 'Rheinweg 1', 'Bonn', 'Ja', '2025-08-08'])
+
+    def test_manifest_per_vehicle_and_day(self):
+        manifest = ''.join(stream_manifest(self.history()))
+        headings = [line for line in manifest.splitlines() if ' - 0' in line and not line.startswith(' ')]
+        self.assertEqual(headings, [
+            'Niet toegewezen - 08-08-2025',
+            'RM-1 - BN-RM 1 (VW Crafter) - 08-08-2025',
+            'RM-2 - BN-RM 2 (VW Crafter) - 08-08-2025',
+            'RM-1 - BN-RM 1 (VW Crafter) - 09-08-2025',
+        ])
+        self.assertIn('  1. 08:15  Bernd Müller [Halen 08:00]  ROLSTOEL', manifest)
+        self.assertIn('Rheinweg 1, 53113 Bonn  tel. 0228 123', manifest)
+        self.assertEqual(''.join(stream_manifest([])), 'Geen ritten gevonden.\n')
+
+    def test_rows_from_assignments_in_three_queries(self):
+        anna, bernd = self.patients[:2]
+        assignments = [
+            {'patient_id': str(anna.id), 'vehicle_id': str(self.vehicles[1].id), 'timeslot_id': self.timeslot.id, 'position': 0},
+            {'patient_id': bernd.id, 'vehicle_id': None, 'timeslot_id': 'x', 'position': 'y'},
+            {'patient_id': 'onbekend'},
+            {'patient_id': 999999, 'vehicle_id': self.vehicles[0].id},
+        ]
+        with self.assertNumQueries(3):
+            rows = rows_from_assignments(assignments)
+        with self.assertNumQueries(0):
+            rows = list(rows)
+
+        self.assertEqual([(row.patient.id, row.vehicle, row.timeslot, row.position, row.day) for row in rows], [
+            (anna.id, self.vehicles[1], self.timeslot, 1, date(2025, 8, 8)),
+            (bernd.id, None, None, 1, date(2025, 8, 8)),
+        ])
+        _, table = self.read_xlsx(stream_xlsx(rows))
+        self.assertEqual([values[:5] for values in table[1:]], [
+            [str(anna.id), 'Anna Schmitz & Co <test>', 'Halen 08:00', 'RM-2 - BN-RM 2', '1'],
+            [str(bernd.id), 'Bernd Müller', 'Niet toegewezen', 'Niet toegewezen', '1'],
+        ])
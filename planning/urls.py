@@ -20,6 +20,7 @@ urlpatterns = [
     path('api/log-planning-action/', views.api_log_planning_action, name='api_log_planning_action'),
     path('api/save-concept-planning/', views.api_save_concept_planning, name='api_save_concept_planning'),
     path('api/export-planning-csv/', views.api_export_planning_csv, name='api_export_planning_csv'),
+    path('api/export-planning/', views.api_export_planning_csv, name='api_export_planning'),
     
     # Statistieken
     path('statistics/', views.statistics_view, name='statistics'),
@@ -49,6 +50,8 @@ urlpatterns = [
     path('test-optaplanner/', views.test_optaplanner_api, name='test_optaplanner_api'),
     path('optaplanner-status/', views.optaplanner_status, name='optaplanner_status'),
     path('start-optaplanner-planning/', views.start_optaplanner_planning, name='start_optaplanner_planning'),
+    path('api/planning-jobs/<int:job_id>/', views.api_planning_job_status, name='api_planning_job_status'),
+    path('api/planning-jobs/<int:job_id>/events/', views.api_planning_job_events, name='api_planning_job_events'),
     path('route-results/', views.route_results, name='route_results'),
     path('vehicles-overview/', views.vehicles_overview, name='vehicles_overview'),
     path('timeslots-overview/', views.timeslots_overview, name='timeslots_overview'),
@@ -77,4 +80,8 @@ urlpatterns = [
 
     # Parser Configurator
     path('parser-configurator/', views.parser_configurator, name='parser_configurator'),
+    
+    # Request instrumentatie (alleen staff)
+    path('instrumentatie/', views.instrumentation_overview, name='instrumentation_overview'),
+    path('api/instrumentatie/', views.api_instrumentation, name='api_instrumentation'),
 ]
@@ -1,13 +1,17 @@
 from django.shortcuts import render, redirect
 from django.contrib import messages
-from django.http import JsonResponse
+from django.http import JsonResponse, StreamingHttpResponse, Http404
 from django.views.decorators.csrf import csrf_exempt
-from django.db.models import Q
+from django.db.models import Q, Count, Sum
+from django.db.models.functions import ExtractYear, TruncMonth
 from django.utils import timezone
 from .models import Patient, Vehicle, TimeSlot, Location, GoogleMapsConfig, GoogleMapsAPILog
 from django.db import models
 from .services.optaplanner import optaplanner_service
 from .services.simple_router import simple_route_service
+from .services.planning_jobs import planning_job, report_progress, apply_session_updates, event_stream_enabled
+from .services.wizard_state import WizardState
+from .ingest import IngestPipeline
 import csv
 import io
 import requests
@@ -73,108 +77,18 @@ def home(request):
 def dashboard(request):
     """
     Nieuwe dashboard met moderne UI/UX gebaseerd op SVG design
-    Toont planning van vandaag (2 september 2025) of knop voor nieuwe planning
+    Toont planning van vandaag of knop voor nieuwe planning
+    Alle database data komt uit een gecachte DashboardSnapshot (vast aantal queries)
     """
-    from datetime import date, timedelta, datetime, timezone
+    from .services.dashboard import DashboardSnapshot
     
-    # Get today's date (2 september 2025)
-    today = date.today()
-    now = datetime.now(timezone.utc)
-    
-    # Get available vehicles count
-    available_vehicles = Vehicle.objects.filter(status='beschikbaar').count()
-    
-    # Get total vehicles count
-    total_vehicles = Vehicle.objects.count()
-    
-    # Get today's patients with assigned vehicles (planning van vandaag)
-    today_patients = Patient.objects.filter(
-        ophaal_tijd__date=today,
-        toegewezen_voertuig__isnull=False,
-        status__in=['gepland', 'onderweg']
-    ).order_by('ophaal_tijd')
-    
-    # Get upcoming stops for sidebar (only today's patients)
-    upcoming_stops = today_patients[:8]
-    
-    # Check if there's any planning for today
-    has_today_planning = today_patients.exists()
-    
-    # Get actual patient times from CSV data (not hardcoded timeslots)
-    patient_times = []
-    
-    for patient in today_patients:
-        if patient.ophaal_tijd:
-            # Add pickup time
-            patient_times.append({
-                'time': patient.ophaal_tijd,
-                'type': 'halen',
-                'patient_name': patient.naam,
-                'icon': '🚐'
-            })
-        if patient.eind_behandel_tijd:
-            # Add end time
-            patient_times.append({
-                'time': patient.eind_behandel_tijd,
-                'type': 'brengen',
-                'patient_name': patient.naam,
-                'icon': '🏠'
-            })
-    
-    # Sort by time and remove duplicates (same time, same type)
-    unique_times = {}
-    for pt in patient_times:
-        time_key = f"{pt['time'].strftime('%H:%M')}_{pt['type']}"
-        if time_key not in unique_times:
-            unique_times[time_key] = pt
-    
-    # Convert to sorted list
-    active_timeslots = sorted(unique_times.values(), key=lambda x: x['time'])
-    
-    # Print patient times for debugging
-    timeline_info = []
-    for pt in active_timeslots:
-        timeline_info.append(f"{pt['time'].strftime('%H:%M')} {pt['type']}")
-    print(f"Patient times for timeline: {timeline_info}")
-    
-    # Get vehicle data for map visualization (only for today)
-    vehicles_with_patients = []
-    if has_today_planning:
-        for vehicle in Vehicle.objects.filter(status='beschikbaar'):
-            patients = Patient.objects.filter(
-                toegewezen_voertuig=vehicle,
-                ophaal_tijd__date=today,
-                status__in=['gepland', 'onderweg']
-            )
-            if patients.exists():
-                # Group patients by actual patient times from CSV
-                patients_by_timeslot = {}
-                for patient in patients:
-                    # Create timeslot keys based on actual patient times
-                    if patient.ophaal_tijd:
-                        pickup_key = f"{patient.ophaal_tijd.strftime('%H:%M')} - halen"
-                        if pickup_key not in patients_by_timeslot:
-                            patients_by_timeslot[pickup_key] = []
-                        patients_by_timeslot[pickup_key].append(patient)
-                    
-                    if patient.eind_behandel_tijd:
-                        end_key = f"{patient.eind_behandel_tijd.strftime('%H:%M')} - brengen"
-                        if end_key not in patients_by_timeslot:
-                            patients_by_timeslot[end_key] = []
-                        patients_by_timeslot[end_key].append(patient)
-                
-                vehicles_with_patients.append({
-                    'vehicle': vehicle,
-                    'patients': patients,
-                    'patient_count': patients.count(),
-                    'patients_by_timeslot': patients_by_timeslot
-                })
+    snapshot = DashboardSnapshot.get()
     
     # Get routes from the planning wizard session (Google Maps API results)
     routes_data = {}
     try:
         # Check if there are routes in the current planning session
-        planning_session = request.session.get('planning_session', {})
+        planning_session = WizardState.for_request(request).get('planning_session', {})
         if planning_session:
             routes_data = planning_session.get('routes', {})
             logger.info(f"Routes found in session: {len(routes_data)} timeslots")
@@ -184,38 +98,8 @@ def dashboard(request):
         logger.warning(f"Could not retrieve routes: {e}")
         routes_data = {}
     
-    # Get today's statistics
-    total_today_patients = today_patients.count()
-    total_today_routes = len(vehicles_with_patients)
-    
-    # Get Google Maps API key from configuration
-    try:
-        google_maps_config = GoogleMapsConfig.get_active_config()
-        google_maps_api_key = google_maps_config.api_key if google_maps_config.enabled else ''
-    except:
-        google_maps_api_key = ''
-    
-    # Get home location for map
-    try:
-        from .models import Location
-        home_location = Location.get_home_location()
-    except:
-        home_location = None
-    
-    context = {
-        'today_date': today,
-        'available_vehicles': available_vehicles,
-        'total_vehicles': total_vehicles,
-        'upcoming_stops': upcoming_stops,
-        'vehicles_with_patients': vehicles_with_patients,
-        'has_today_planning': has_today_planning,
-        'total_today_patients': total_today_patients,
-        'total_today_routes': total_today_routes,
-        'active_timeslots': active_timeslots,  # Only timeslots with assigned patients
-        'routes_data': routes_data,  # Google Maps API routes
-        'google_maps_api_key': google_maps_api_key,  # Google Maps API key
-        'home_location': home_location,  # Home location for map
-    }
+    context = snapshot.as_context()
+    context['routes_data'] = routes_data  # Google Maps API routes
     
     return render(request, 'planning/dashboard.html', context)
 
@@ -231,19 +115,14 @@ def upload_csv(request):
             messages.error(request, 'Geen bestand geselecteerd.')
             return redirect('upload_csv')
             
-        if not csv_file.name.endswith('.csv'):
-            messages.error(request, 'Alleen CSV bestanden zijn toegestaan.')
+        if not csv_file.name.lower().endswith(('.csv', '.slk')):
+            messages.error(request, 'Alleen CSV en SLK bestanden zijn toegestaan.')
             return redirect('upload_csv')
         
         # Start CSV logging
         from .models_extended import CSVImportLog
         
-        # Lees CSV content voor logging
-        csv_file.seek(0)  # Reset file pointer
-        csv_content = csv_file.read().decode('utf-8', errors='ignore')
-        csv_file.seek(0)  # Reset file pointer again
-        
-        # Maak CSV log entry
+        # Maak CSV log entry; de inhoud wordt tijdens de import (één leesdoorgang) gevuld
         imported_by = request.user if request.user.is_authenticated else None
         csv_log = CSVImportLog.objects.create(
             filename=csv_file.name,
@@ -251,72 +130,26 @@ def upload_csv(request):
             status='failed',  # Start with failed, update to success later
             total_patients=0,
             imported_patients=0,
-            csv_content=csv_content
+            csv_content=''
         )
         
         try:
-            # Probeer verschillende encodings
-            file_bytes = csv_file.read()
-            file_data = None
-            
-            # Probeer verschillende encodings in volgorde van waarschijnlijkheid
-            encodings = ['utf-8', 'windows-1252', 'iso-8859-1', 'cp1252', 'latin-1']
-            
-            for encoding in encodings:
-                try:
-                    file_data = file_bytes.decode(encoding)
-                    break
-                except UnicodeDecodeError:
-                    continue
-            
-            if file_data is None:
-                csv_log.errors = "Kan het bestand niet lezen. Controleer de encoding."
-                csv_log.save()
-                messages.error(request, 'Kan het bestand niet lezen. Controleer de encoding.')
-                return redirect('upload_csv')
-            
-            csv_reader = csv.reader(io.StringIO(file_data), delimiter=';')
-            
-            # Verwijder alle bestaande patiënten voor vandaag voordat nieuwe worden aangemaakt
-            today = date.today()
-            existing_patients = Patient.objects.filter(ophaal_tijd__date=today)
-            if existing_patients.exists():
-                deleted_count = existing_patients.count()
-                existing_patients.delete()
-                print(f"🗑️ Verwijderd {deleted_count} bestaande patiënten voor {today}")
-                messages.info(request, f'{deleted_count} bestaande patiënten voor {today} zijn verwijderd om plaats te maken voor de nieuwe planning.')
-            
-            patients_created = 0
-            patients_updated = 0
-            total_rows = 0
-            error_rows = []
-            
-            # Gebruik cache manager voor slimme patiënten verwerking
-            from .cache_manager import PatientCacheManager
-            
-            print("🚀 Start slimme CSV verwerking met caching...")
-            
-            # Converteer CSV reader naar lijst voor cache manager
-            csv_rows = []
-            for row_index, row in enumerate(csv_reader):
-                total_rows += 1
-                if len(row) >= 21:
-                    csv_rows.append({
-                        'data': row,
-                        'row_index': row_index
-                    })
-            
-            # Verwerk CSV met cache manager
-            cache_results = PatientCacheManager.bulk_update_patients_from_csv(csv_rows, detection_result)
-            
-            patients_created = cache_results['created']
-            patients_updated = cache_results['updated']
-            patients_cached = cache_results['cached']
-            
-            print(f"💾 Cache resultaten: {patients_cached} patiënten uit cache")
+            # Eén leesdoorgang: parsen, valideren en opslaan. Een nieuwe dagplanning
+            # vervangt alle bestaande patiënten op de dag(en) uit het bestand.
+            result = IngestPipeline(csv_file, keep_rows=0, keep_text=True).run(persist=True, replace_existing=True)
+            patients_created = result.saved['created']
+            patients_updated = result.saved['updated']
+            if result.saved['deleted']:
+                days = ', '.join(str(import_date) for import_date in result.dates)
+                messages.info(request, f"{result.saved['deleted']} bestaande patiënten voor {days} zijn verwijderd om plaats te maken voor de nieuwe planning.")
+            error_rows = [
+                f"Rij {record.line_number}: {', '.join(record.errors)}"
+                for record in result.records if record.errors
+            ]
             
             # Update CSV log met resultaten
-            csv_log.total_patients = total_rows
+            csv_log.csv_content = result.text
+            csv_log.total_patients = result.row_count
             csv_log.imported_patients = patients_created + patients_updated
             csv_log.status = 'success' if len(error_rows) == 0 else 'partial'
             if error_rows:
@@ -548,7 +381,7 @@ def plan_routes(request):
                 return redirect('plan_routes')
             
             # Store results in session for display
-            request.session['planned_routes'] = routes
+            WizardState.for_request(request)['planned_routes'] = routes
             request.session['route_planner_type'] = planner_type
             
             messages.success(request, f'🎉 {len(routes)} routes gegenereerd met {planner_name}!')
@@ -602,17 +435,20 @@ def plan_routes_simple(request):
                 messages.error(request, 'Geen toegewezen patiënten gevonden. Wijs eerst patiënten toe aan tijdblokken.')
                 return redirect('home')
             
-            # Plan routes using simple router
+            # Plan routes using simple router ('simple' of 'savings' solver)
+            solver_mode = request.POST.get('solver_mode')
+            if solver_mode not in simple_route_service.SOLVER_MODES:
+                solver_mode = None
             logger.info(f"Planning simple routes for {assigned_patients.count()} patients and {available_vehicles.count()} vehicles")
             
-            routes = simple_route_service.plan_simple_routes(available_vehicles, assigned_patients)
+            routes = simple_route_service.plan_simple_routes(available_vehicles, assigned_patients, solver_mode=solver_mode)
             
             if not routes:
                 messages.warning(request, 'Geen routes gegenereerd. Controleer patiënt toewijzingen.')
                 return redirect('home')
             
             # Store results in session for display
-            request.session['planned_routes'] = routes
+            WizardState.for_request(request)['planned_routes'] = routes
             
             messages.success(request, f'🎉 {len(routes)} routes gegenereerd!')
             
@@ -672,7 +508,7 @@ def plan_routes_optaplanner(request):
                 return redirect('home')
             
             # Store results in session for display
-            request.session['planned_routes'] = routes
+            WizardState.for_request(request)['planned_routes'] = routes
             
             messages.success(request, f'🎉 {len(routes)} routes gegenereerd!')
             
@@ -761,7 +597,7 @@ def optaplanner_status(request):
             
             if total_locations > 0:
                 # Planning is complete, store results
-                request.session['planning_results'] = route_data
+                WizardState.for_request(request)['planning_results'] = route_data
                 request.session['planning_complete'] = True
                 request.session['planning_started'] = False
                 
@@ -771,8 +607,8 @@ def optaplanner_status(request):
                     'results': route_data
                 })
             else:
-                # Still processing - check session data for progress
-                planning_data = request.session.get('planning_data', {})
+                # Still processing - voortgang uit de state store
+                planning_data = WizardState.for_request(request).get('planning_data', {})
                 vehicles_added = planning_data.get('vehicles_added', 0)
                 patients_added = planning_data.get('patients_added', 0)
                 total_vehicles = planning_data.get('total_vehicles', 0)
@@ -799,14 +635,16 @@ def optaplanner_status(request):
         })
 
 
+@planning_job('optaplanner')
 def start_optaplanner_planning(request):
     """
     Start OptaPlanner planning process with per-time-slot approach
+    Met async=1 wordt de planning als PlanningJob op de achtergrond uitgevoerd
     """
     if request.method == 'POST':
         try:
-            # Get planning data from session
-            session_data = request.session.get('planning_data', {})
+            # Get planning data from the state store
+            session_data = WizardState.for_request(request).get('planning_data', {})
             selected_vehicles = session_data.get('selected_vehicles', [])
             selected_timeslots = session_data.get('selected_timeslots', [])
             
@@ -854,94 +692,54 @@ def start_optaplanner_planning(request):
             total_patients_added = 0
             total_vehicles_added = 0
             
-            for timeslot_name, patients_list in patients_by_halen.items():
+            # Depot en voertuigen zijn voor elk tijdblok gelijk: één keer ophalen en opbouwen
+            home_location = Location.get_home_location()
+            vehicles_by_id = Vehicle.objects.in_bulk([int(vehicle_id) for vehicle_id in selected_vehicles])
+            vehicle_payloads = [
+                optaplanner_service.vehicle_payload(vehicles_by_id[int(vehicle_id)])
+                for vehicle_id in selected_vehicles if int(vehicle_id) in vehicles_by_id
+            ]
+            
+            report_progress(f"{len(patients_by_halen)} tijdblokken te plannen", current=0, total=len(patients_by_halen))
+            
+            for index, (timeslot_name, patients_list) in enumerate(patients_by_halen.items(), start=1):
                 print(f"🚀 Processing time slot: {timeslot_name} ({len(patients_list)} patients)")
                 
-                # STEP 2a: Clear OptaPlanner for this time slot
-                print(f"   🔄 Clearing OptaPlanner for {timeslot_name}...")
-                try:
-                    clear_response = requests.get(f"{optaplanner_service.base_url}/api/clear", timeout=5)
-                    print(f"   📡 Clear response: {clear_response.status_code}")
-                    
-                    clear_vehicles_response = requests.post(f"{optaplanner_service.base_url}/api/clearvehicle", timeout=5)
-                    print(f"   📡 Clear vehicles response: {clear_vehicles_response.status_code}")
-                except Exception as e:
-                    print(f"   ❌ Clear error: {e}")
-                
-                # STEP 2b: Add depot for this time slot
-                print(f"   🏠 Adding depot for {timeslot_name}...")
-                try:
-                    home_location = Location.get_home_location()
-                    if home_location and home_location.latitude and home_location.longitude:
-                        depot_url = f"{optaplanner_service.base_url}/api/locationadd/{home_location.name.replace(' ', '_')}/{home_location.longitude}/{home_location.latitude}/0/0/_/1"
-                        depot_response = requests.get(depot_url, timeout=5)
-                        print(f"   ✅ Depot {home_location.name} added: {depot_response.status_code}")
-                        if depot_response.status_code != 200:
-                            print(f"   ❌ Depot error response: {depot_response.text}")
-                    else:
-                        print("   ⚠️  Warning: No home location found in Django Admin settings!")
-                except Exception as e:
-                    print(f"   ❌ Depot error: {e}")
-                
-                # STEP 2c: Add vehicles for this time slot
-                print(f"   🚗 Adding vehicles for {timeslot_name}...")
-                vehicles_added_for_timeslot = 0
-                for vehicle_id in selected_vehicles:
-                    try:
-                        vehicle = Vehicle.objects.get(id=vehicle_id)
-                        # URL encode kenteken
-                        encoded_kenteken = vehicle.kenteken.replace(' ', '_').replace('-', '_')
-                        # Convert km rate to cents
-                        km_tarief_cents = int(float(vehicle.km_kosten_per_km) * 100)
-                        # Convert max travel time to seconds
-                        max_tijd_seconden = int(vehicle.maximale_rit_tijd * 3600) if vehicle.maximale_rit_tijd < 100 else int(vehicle.maximale_rit_tijd)
-                        
-                        vehicle_url = f"{optaplanner_service.base_url}/api/vehicleadd/{encoded_kenteken}/{vehicle.aantal_zitplaatsen}/{vehicle.speciale_zitplaatsen}/{km_tarief_cents}/{max_tijd_seconden}"
-                        vehicle_response = requests.get(vehicle_url, timeout=5)
-                        print(f"   ✅ Vehicle {vehicle.kenteken} added: {vehicle_response.status_code}")
-                        if vehicle_response.status_code == 200:
-                            vehicles_added_for_timeslot += 1
-                        else:
-                            print(f"   ❌ Vehicle {vehicle.kenteken} error response: {vehicle_response.text}")
-                    except Exception as e:
-                        print(f"   ❌ Vehicle {vehicle_id} error: {e}")
-                
-                total_vehicles_added += vehicles_added_for_timeslot
-                print(f"   📊 Added {vehicles_added_for_timeslot}/{len(selected_vehicles)} vehicles for {timeslot_name}")
+                # STEP 2a: Build the problem for this time slot (depot + vehicles + patients)
+                location_payloads = []
+                if home_location and home_location.latitude and home_location.longitude:
+                    location_payloads.append(optaplanner_service.depot_payload(home_location))
+                else:
+                    print("   ⚠️  Warning: No home location found in Django Admin settings!")
+                depot_count = len(location_payloads)
                 
-                # STEP 2d: Add patients for this time slot
-                print(f"   👥 Adding patients for {timeslot_name}...")
-                patients_added = 0
                 for patient in patients_list:
                     if patient.latitude and patient.longitude:
-                        try:
-                            # Determine pickup/dropoff type based on time slots
-                            # All patients in this time slot are for pickup (halen)
-                            pickup_type = "1"  # Always pickup for halen time slots
-                            # URL encode speciale karakters in naam
-                            encoded_naam = patient.naam.replace(' ', '_').replace('-', '_').replace('.', '_')
-                            # Determine if patient needs special seating
-                            special_seating = "1" if patient.rolstoel else "0"
-                            
-                            location_url = f"{optaplanner_service.base_url}/api/locationadd/{encoded_naam}/{patient.longitude}/{patient.latitude}/{special_seating}/0/_/{pickup_type}"
-                            location_response = requests.get(location_url, timeout=5)
-                            print(f"   ✅ Patient {patient.naam} added: {location_response.status_code} (lat: {patient.latitude}, lon: {patient.longitude})")
-                            if location_response.status_code != 200:
-                                print(f"   ❌ Patient {patient.naam} error response: {location_response.text}")
-                            else:
-                                patients_added += 1
-                        except Exception as e:
-                            print(f"   ❌ Patient {patient.naam} error: {e}")
+                        # All patients in this time slot are for pickup (halen)
+                        location_payloads.append(optaplanner_service.location_payload(patient, 'pickup'))
                     else:
                         print(f"   ⚠️  Patient {patient.naam} has no coordinates! (lat: {patient.latitude}, lon: {patient.longitude})")
                 
+                # STEP 2b: Submit in one request (per-entity fallback for older servers)
+                logger.info(f"Submitting {len(vehicle_payloads)} vehicles and {len(location_payloads)} locations for {timeslot_name}")
+                submission = optaplanner_service.submit_problem(vehicle_payloads, location_payloads)
+                if submission is None:
+                    logger.error(f"Submit error for {timeslot_name}")
+                    submission = {'mode': 'failed', 'vehicles_added': 0, 'locations_added': 0, 'round_trips': 0}
+                else:
+                    logger.info(f"Submitted {timeslot_name} via {submission['mode']} in {submission['round_trips']} round trips")
+                
+                vehicles_added_for_timeslot = submission['vehicles_added']
+                patients_added = max(0, submission['locations_added'] - depot_count)
+                total_vehicles_added += vehicles_added_for_timeslot
                 total_patients_added += patients_added
-                print(f"   📊 Added {patients_added}/{len(patients_list)} patients for {timeslot_name}")
+                print(f"   📊 Added {vehicles_added_for_timeslot}/{len(selected_vehicles)} vehicles and "
+                      f"{patients_added}/{len(patients_list)} patients for {timeslot_name}")
                 
                 # STEP 2e: Get route for this time slot
                 print(f"   🛣️  Getting route for {timeslot_name}...")
                 try:
-                    route_response = requests.get(f"{optaplanner_service.base_url}/api/route", timeout=10)
+                    route_response = optaplanner_service.session.get(f"{optaplanner_service.base_url}/api/route", timeout=10)
                     if route_response.status_code == 200:
                         route_data = route_response.json()
                         all_results[timeslot_name] = {
@@ -965,6 +763,12 @@ def start_optaplanner_planning(request):
                         'vehicles_added': vehicles_added_for_timeslot
                     }
                 
+                report_progress(
+                    f"Tijdblok {timeslot_name} gepland", current=index, total=len(patients_by_halen),
+                    timeslot=timeslot_name, patients_added=patients_added,
+                    routes=len(all_results[timeslot_name]['route_data'].get('routes', []))
+                )
+                
                 # Wait a moment for OptaPlanner to process this time slot
                 print(f"   ⏳ Waiting 3 seconds for OptaPlanner to process {timeslot_name}...")
                 time.sleep(3)
@@ -972,10 +776,10 @@ def start_optaplanner_planning(request):
             print(f"🎯 Total patients added: {total_patients_added}/{assigned_patients.count()}")
             print(f"🎯 Total vehicles added: {total_vehicles_added}")
             
-            # Store session data for status checking
+            # Alleen de vlaggen in de sessie; resultaten per tijdblok in de state store
             request.session['planning_session_id'] = str(uuid.uuid4())
             request.session['planning_started'] = True
-            request.session['planning_data'] = {
+            WizardState.for_request(request)['planning_data'] = {
                 'vehicles_added': total_vehicles_added,
                 'patients_added': total_patients_added,
                 'total_vehicles': len(selected_vehicles),
@@ -1000,6 +804,93 @@ def start_optaplanner_planning(request):
     return JsonResponse({'status': 'error', 'message': 'Invalid request method'})
 
 
+def _get_planning_job(request, job_id):
+    """
+    Planning job van de huidige sessie of gebruiker (staff ziet alle jobs)
+    """
+    from .models_extended import PlanningJob
+    
+    try:
+        job = PlanningJob.objects.get(pk=job_id)
+    except PlanningJob.DoesNotExist:
+        raise Http404("Planning job niet gevonden")
+    
+    user = request.user
+    if job.session_key and job.session_key == request.session.session_key:
+        return job
+    if user.is_authenticated and (user.is_staff or job.created_by_id == user.id):
+        return job
+    raise Http404("Planning job niet gevonden")
+
+
+def api_planning_job_status(request, job_id):
+    """
+    Polling endpoint voor een planning job
+    ?since=<event id> geeft alleen nieuwere voortgang events terug. Als de job klaar
+    is worden de sessie wijzigingen (planning_data, wizard_route_data, ...) van de
+    job in de sessie van de aanvrager gezet, zodat de resultaat pagina's werken.
+    """
+    job = _get_planning_job(request, job_id)
+    try:
+        since = int(request.GET.get('since', 0))
+    except ValueError:
+        since = 0
+    
+    if job.is_finished and job.session_key == request.session.session_key:
+        apply_session_updates(job, request.session)
+    
+    return JsonResponse(job.as_dict(since=since))
+
+
+def api_planning_job_events(request, job_id):
+    """
+    Server-Sent Events stream met de voortgang van een planning job
+    Alleen met PLANNING_JOBS['event_stream'] (ASGI): de stream is een async generator
+    en houdt geen worker thread vast. Onder WSGI zou elke open verwerkingspagina een
+    web worker bezet houden, daar pollt de frontend api_planning_job_status.
+    De stream sluit na `max_seconds`; EventSource verbindt dan opnieuw met Last-Event-ID.
+    """
+    import asyncio
+    from asgiref.sync import sync_to_async
+    from .models_extended import PlanningJob
+    
+    if not event_stream_enabled():
+        raise Http404("Voortgang stream staat uit, gebruik het status endpoint")
+    
+    job = _get_planning_job(request, job_id)
+    try:
+        last_event_id = int(request.headers.get('Last-Event-ID') or request.GET.get('since') or 0)
+    except ValueError:
+        last_event_id = 0
+    max_seconds = 30
+    get_job = sync_to_async(PlanningJob.objects.get)
+    
+    async def stream():
+        current = job
+        sent = last_event_id
+        started = time.monotonic()
+        yield "retry: 2000\n\n"
+        while True:
+            for event in current.events or []:
+                if event.get('id', 0) > sent:
+                    sent = event['id']
+                    yield f"id: {sent}\nevent: progress\ndata: {json.dumps(event)}\n\n"
+            if current.is_finished:
+                done = {'job_id': current.pk, 'status': current.status, 'error': current.error}
+                yield f"event: done\ndata: {json.dumps(done)}\n\n"
+                return
+            if time.monotonic() - started > max_seconds:
+                return
+            yield ": keepalive\n\n"
+            await asyncio.sleep(1)
+            current = await get_job(pk=current.pk)
+    
+    response = StreamingHttpResponse(stream(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
 def route_results(request):
     """
     Display route results (both simple and OptaPlanner)
@@ -1024,7 +915,7 @@ def route_results(request):
     if selected_date < four_months_ago or selected_date > today:
         selected_date = today
     
-    routes = request.session.get('planned_routes', [])
+    routes = WizardState.for_request(request).get('planned_routes', [])
     
     # Als er geen routes zijn, toon een lege planning pagina
     if not routes:
@@ -1088,7 +979,7 @@ def route_results(request):
     home_location = Location.get_home_location()
     
     # Haal geselecteerde tijdblokken op uit session
-    selected_timeslot_ids = request.session.get('planning_data', {}).get('timeslots', [])
+    selected_timeslot_ids = WizardState.for_request(request).get('planning_data', {}).get('timeslots', [])
     selected_timeslots = []
     if selected_timeslot_ids:
         selected_timeslots = TimeSlot.objects.filter(id__in=selected_timeslot_ids).order_by('aankomst_tijd')
@@ -1529,601 +1420,6 @@ def patients_today(request):
     return render(request, 'planning/patients_today.html', context)
 
 
-def auto_detect_csv_mapping(csv_data, filename=None):
-    """
-    Slimme auto-detectie van CSV kolom mapping met admin-geconfigureerde parser configuraties
-    """
-    detection_results = {
-        'confidence': 0,
-        'mappings': {},
-        'warnings': [],
-        'suggestions': [],
-        'detected_format': 'unknown',
-        'config_id': None
-    }
-    
-    if not csv_data or len(csv_data) < 2:
-        detection_results['warnings'].append("Onvoldoende data voor detectie")
-        return detection_results
-    
-    # Haal alle actieve parser configuraties op
-    try:
-        from .models import CSVParserConfig
-        configs = CSVParserConfig.objects.filter(actief=True).order_by('-prioriteit')
-    except Exception as e:
-        print(f"⚠️ Kon parser configuraties niet laden: {e}")
-        detection_results['warnings'].append("Kon parser configuraties niet laden")
-        return detection_results
-    
-    if not configs.exists():
-        detection_results['warnings'].append("Geen parser configuraties gevonden")
-        return detection_results
-    
-    # Test elke configuratie
-    best_config = None
-    best_score = 0
-    
-    for config in configs:
-        score = config.test_detectie(filename or '', csv_data[0])
-        print(f"🔍 Test config '{config.naam}': score {score}")
-        
-        if score > best_score:
-            best_score = score
-            best_config = config
-    
-    if best_config and best_score > 0:
-        detection_results.update({
-            'detected_format': best_config.naam,
-            'confidence': min(best_score / 100, 1.0),  # Normaliseer naar 0-1
-            'mappings': best_config.get_kolom_mapping(),
-            'config_id': best_config.id
-        })
-        
-        print(f"✅ Beste match: '{best_config.naam}' (score: {best_score})")
-        
-        # Voeg suggesties toe
-        if best_score < 50:
-            detection_results['suggestions'].append(f"Lage detectie score ({best_score}) - controleer configuratie")
-        
-        if not best_config.get_kolom_mapping():
-            detection_results['warnings'].append("Geen kolom mapping geconfigureerd")
-    else:
-        detection_results['warnings'].append("Geen passende parser configuratie gevonden")
-        detection_results['suggestions'].append("Controleer of er een configuratie is voor dit CSV formaat")
-    
-    return detection_results
-
-
-def analyze_filename(filename):
-    """
-    Analyseer bestandsnaam voor formaat indicaties
-    """
-    if not filename:
-        return {}
-    
-    filename_lower = filename.lower()
-    patterns = {}
-    
-    # Detecteer formaat op basis van bestandsnaam
-    if 'fahrdlist' in filename_lower:
-        patterns['format'] = 'fahrdlist'
-        patterns['confidence'] = 0.9
-    elif 'routemeister' in filename_lower:
-        patterns['format'] = 'routemeister'
-        patterns['confidence'] = 0.9
-    elif 'fahrer' in filename_lower:
-        patterns['format'] = 'fahrdlist'
-        patterns['confidence'] = 0.7
-    elif 'kunde' in filename_lower:
-        patterns['format'] = 'fahrdlist'
-        patterns['confidence'] = 0.7
-    
-    return patterns
-
-
-def analyze_headers(header_row):
-    """
-    Analyseer header rij voor kolomnamen en patronen
-    """
-    patterns = {}
-    header_text = ' '.join(str(cell).lower() for cell in header_row)
-    
-    # Zoek naar specifieke kolomnamen
-    column_matches = {
-        'patient_id': ['patient', 'kunde', 'id', 'nummer', 'patient_id', 'kunde_id'],
-        'achternaam': ['nachname', 'achternaam', 'surname', 'lastname', 'familie'],
-        'voornaam': ['vorname', 'voornaam', 'firstname', 'name'],
-        'adres': ['straße', 'street', 'adres', 'address', 'adresse'],
-        'plaats': ['stadt', 'city', 'plaats', 'ort', 'gemeinde'],
-        'postcode': ['plz', 'postcode', 'postal', 'postleitzahl'],
-        'telefoon1': ['telefon', 'phone', 'telefoon', 'tel'],
-        'telefoon2': ['mobil', 'mobile', 'telefoon2', 'tel2'],
-        'datum': ['datum', 'date', 'termin', 'afspraak'],
-        'start_tijd': ['start', 'begin', 'startzeit', 'start_time'],
-        'eind_tijd': ['ende', 'eind', 'endzeit', 'end_time', 'eind_tijd']
-    }
-    
-    detected_columns = {}
-    for field, keywords in column_matches.items():
-        for i, cell in enumerate(header_row):
-            cell_lower = str(cell).lower()
-            for keyword in keywords:
-                if keyword in cell_lower:
-                    detected_columns[field] = i
-                    break
-            if field in detected_columns:
-                break
-    
-    patterns['detected_columns'] = detected_columns
-    patterns['confidence'] = len(detected_columns) / len(column_matches) * 0.8
-    
-    return patterns
-
-
-def analyze_content(data_rows):
-    """
-    Analyseer inhoud voor data patronen
-    """
-    patterns = {}
-    if not data_rows:
-        return patterns
-    
-    # Patroon definities
-    pattern_rules = {
-        'patient_id': [
-            {'pattern': r'^FL\d{8}$', 'confidence': 0.95},  # FL25004678
-            {'pattern': r'^[A-Z]{2}\d{6,8}$', 'confidence': 0.85},  # Algemene ID patroon
-            {'pattern': r'^\d{6,10}$', 'confidence': 0.70}  # Numerieke ID
-        ],
-        'datum': [
-            {'pattern': r'^\d{1,2}-\d{1,2}-\d{4}$', 'confidence': 0.90},  # 27-8-2025
-            {'pattern': r'^\d{4}-\d{2}-\d{2}$', 'confidence': 0.90},  # 2025-08-27
-            {'pattern': r'^\d{1,2}\.\d{1,2}\.\d{4}$', 'confidence': 0.90},  # 27.08.2025
-            {'pattern': r'^\d{1,2}/\d{1,2}/\d{4}$', 'confidence': 0.90}  # 27/08/2025
-        ],
-        'tijd': [
-            {'pattern': r'^\d{3,4}$', 'confidence': 0.80},  # 845, 1515
-            {'pattern': r'^\d{1,2}:\d{2}$', 'confidence': 0.85},  # 8:45, 15:15
-            {'pattern': r'^\d{1,2}:\d{2}\s*(AM|PM)?$', 'confidence': 0.80}  # 8:45 AM
-        ],
-        'telefoon': [
-            {'pattern': r'^\d{10,15}$', 'confidence': 0.85},  # 02241880514
-            {'pattern': r'^\+?\d{1,3}\s?\d{6,12}$', 'confidence': 0.80},  # +49 228 1880514
-            {'pattern': r'^\d{3,4}\s?\d{3,4}\s?\d{3,4}$', 'confidence': 0.75}  # 0224 188 0514
-        ],
-        'postcode': [
-            {'pattern': r'^\d{4,5}\s?[A-Z]?$', 'confidence': 0.90},  # 53757 D
-            {'pattern': r'^[A-Z]-\d{5}$', 'confidence': 0.85},  # D-53757
-            {'pattern': r'^\d{4}\s?[A-Z]{2}$', 'confidence': 0.80}  # 1234 AB
-        ],
-        'achternaam': [
-            {'pattern': r'^[A-Z][a-z]+$', 'confidence': 0.75},  # Makonga, Gluckmann
-            {'pattern': r'^[A-Z][a-z]+\s+[A-Z][a-z]+$', 'confidence': 0.70}  # Van der Berg
-        ],
-        'voornaam': [
-            {'pattern': r'^[A-Z][a-z]+$', 'confidence': 0.75},  # Lofo, Julia
-            {'pattern': r'^[A-Z][a-z]+\s+[A-Z][a-z]+$', 'confidence': 0.70}  # Jan Peter
-        ],
-        'adres': [
-            {'pattern': r'.*str\.?\s+\d+.*', 'confidence': 0.85},  # Cranachstr. 15
-            {'pattern': r'.*straat\s+\d+.*', 'confidence': 0.85},  # Hoofdstraat 123
-            {'pattern': r'.*\d+.*', 'confidence': 0.60}  # Bevat nummer
-        ],
-        'plaats': [
-            {'pattern': r'^[A-Z][a-z]+(\s+[A-Z][a-z]+)*$', 'confidence': 0.70},  # Sankt Augustin
-            {'pattern': r'^[A-Z][a-z]+$', 'confidence': 0.65}  # Amsterdam
-        ]
-    }
-    
-    # Analyseer elke kolom
-    column_scores = defaultdict(list)
-    
-    for row in data_rows:
-        for col_index, cell in enumerate(row):
-            cell_str = str(cell).strip()
-            if not cell_str:
-                continue
-                
-            for field, rules in pattern_rules.items():
-                for rule in rules:
-                    if re.match(rule['pattern'], cell_str):
-                        column_scores[col_index].append({
-                            'field': field,
-                            'confidence': rule['confidence']
-                        })
-                        break
-    
-    # Bereken gemiddelde confidence per kolom
-    column_confidence = {}
-    for col_index, scores in column_scores.items():
-        if scores:
-            # Neem het veld met hoogste confidence
-            best_match = max(scores, key=lambda x: x['confidence'])
-            column_confidence[col_index] = best_match
-    
-    patterns['column_confidence'] = column_confidence
-    patterns['confidence'] = len(column_confidence) / len(pattern_rules) * 0.7
-    
-    return patterns
-
-
-def combine_detections(filename_patterns, header_patterns, content_patterns):
-    """
-    Combineer alle detectie resultaten tot een finale mapping
-    """
-    final_mapping = {
-        'mappings': {},
-        'confidence': 0,
-        'detected_format': 'unknown',
-        'warnings': [],
-        'suggestions': []
-    }
-    
-    # Bepaal formaat
-    format_confidence = {
-        'fahrdlist': 0,
-        'routemeister': 0
-    }
-    
-    # Bestandsnaam weging
-    if 'format' in filename_patterns:
-        format_confidence[filename_patterns['format']] += filename_patterns['confidence'] * 0.3
-    
-    # Header weging
-    if header_patterns.get('detected_columns'):
-        detected_count = len(header_patterns['detected_columns'])
-        if detected_count > 5:
-            format_confidence['fahrdlist'] += 0.4
-        else:
-            format_confidence['routemeister'] += 0.4
-    
-    # Inhoud weging
-    if content_patterns.get('column_confidence'):
-        content_score = content_patterns['confidence']
-        if content_score > 0.6:
-            format_confidence['fahrdlist'] += content_score * 0.3
-        else:
-            format_confidence['routemeister'] += content_score * 0.3
-    
-    # Bepaal winnend formaat
-    if format_confidence['fahrdlist'] > format_confidence['routemeister']:
-        final_mapping['detected_format'] = 'fahrdlist'
-        final_mapping['confidence'] = format_confidence['fahrdlist']
-    else:
-        final_mapping['detected_format'] = 'routemeister'
-        final_mapping['confidence'] = format_confidence['routemeister']
-    
-    # Genereer mapping
-    if final_mapping['detected_format'] == 'fahrdlist':
-        final_mapping['mappings'] = get_column_mapping('fahrdlist')
-    else:
-        final_mapping['mappings'] = get_column_mapping('routemeister')
-    
-    # Voeg waarschuwingen toe
-    if final_mapping['confidence'] < 0.5:
-        final_mapping['warnings'].append("Lage betrouwbaarheid detectie - handmatige controle aanbevolen")
-    
-    if header_patterns.get('detected_columns'):
-        missing_fields = set(get_column_mapping(final_mapping['detected_format']).keys()) - set(header_patterns['detected_columns'].keys())
-        if missing_fields:
-            final_mapping['suggestions'].append(f"Missende velden gedetecteerd: {', '.join(missing_fields)}")
-    
-    return final_mapping
-
-
-def parse_slk_file(file_data):
-    """
-    Parse een SYLK (Symbolic Link) bestand
-    """
-    try:
-        lines = file_data.split('\n')
-        data = []
-        
-        print(f"🔍 SLK parsing: {len(lines)} regels gevonden")
-        
-        for i, line in enumerate(lines):
-            line = line.strip()
-            if not line:
-                continue
-            
-            print(f"📝 Regel {i+1}: {line[:100]}...")  # Debug: eerste 100 karakters
-            
-            # Skip header regels
-            if line.startswith('ID') or line.startswith('P') or line.startswith('B'):
-                print(f"⏭️ Skipping header regel: {line[:50]}...")
-                continue
-            
-            # Parse SYLK rij
-            row_data = parse_slk_row(line)
-            if row_data:
-                data.append(row_data)
-                print(f"✅ Rij geparsed: rij={row_data['row']}, kolom={row_data['col']}, waarde='{row_data['value']}'")
-            else:
-                print(f"❌ Kon rij niet parsen: {line[:50]}...")
-        
-        print(f"📊 Totaal geparsed: {len(data)} cellen")
-        return data if data else None
-        
-    except Exception as e:
-        print(f"❌ SLK parsing fout: {e}")
-        import traceback
-        traceback.print_exc()
-        return None
-
-
-def parse_slk_row(line):
-    """
-    Parse een enkele SYLK rij
-    """
-    try:
-        # SYLK formaat: C;Y1;X1;K"value"
-        # C = Cell, Y = Row, X = Column, K = Value
-        if not line.startswith('C'):
-            return None
-        
-        parts = line.split(';')
-        if len(parts) < 3:  # Minimaal C, Y, X nodig
-            return None
-        
-        # Haal rij en kolom op
-        row_part = None
-        col_part = None
-        value_part = None
-        
-        for part in parts:
-            part = part.strip()
-            if part.startswith('Y'):
-                row_part = part[1:]
-            elif part.startswith('X'):
-                col_part = part[1:]
-            elif part.startswith('K'):
-                # Verwijder quotes en escape karakters
-                value_part = part[1:]
-                if value_part.startswith('"') and value_part.endswith('"'):
-                    value_part = value_part[1:-1]
-                # Unescape quotes
-                value_part = value_part.replace('""', '"')
-        
-        # Als er geen K deel is, probeer de laatste part als waarde
-        if not value_part and len(parts) >= 3:
-            value_part = parts[-1].strip()
-            if value_part.startswith('"') and value_part.endswith('"'):
-                value_part = value_part[1:-1]
-            value_part = value_part.replace('""', '"')
-        
-        if row_part and col_part and value_part is not None:
-            try:
-                return {
-                    'row': int(row_part),
-                    'col': int(col_part),
-                    'value': value_part
-                }
-            except ValueError as ve:
-                print(f"❌ Kon rij/kolom niet converteren naar int: {ve}")
-                return None
-        
-        return None
-    except Exception as e:
-        print(f"❌ SLK rij parsing fout: {e}")
-        return None
-
-
-def convert_slk_to_csv(slk_data):
-    """
-    Converteer SLK data naar CSV formaat
-    """
-    try:
-        print(f"🔄 Converteer {len(slk_data)} SLK cellen naar CSV...")
-        
-        # Groepeer data per rij
-        rows = {}
-        for cell in slk_data:
-            row_num = cell['row']
-            col_num = cell['col']
-            value = cell['value']
-            
-            if row_num not in rows:
-                rows[row_num] = {}
-            
-            rows[row_num][col_num] = value
-        
-        print(f"📊 Gevonden rijen: {list(rows.keys())}")
-        
-        # Converteer naar CSV rijen
-        csv_rows = []
-        for row_num in sorted(rows.keys()):
-            row_data = rows[row_num]
-            max_col = max(row_data.keys()) if row_data else 0
-            
-            print(f"📝 Verwerk rij {row_num}: kolommen 1-{max_col}")
-            
-            # Maak rij met alle kolommen
-            csv_row = []
-            for col_num in range(1, max_col + 1):
-                cell_value = row_data.get(col_num, '')
-                csv_row.append(str(cell_value) if cell_value is not None else '')
-            
-            csv_rows.append(csv_row)
-            print(f"✅ Rij {row_num}: {len(csv_row)} kolommen")
-        
-        # Converteer naar CSV string
-        csv_string = ''
-        for row in csv_rows:
-            csv_string += ';'.join(cell for cell in row) + '\n'
-        
-        print(f"🎉 CSV conversie voltooid: {len(csv_rows)} rijen")
-        return csv_string
-        
-    except Exception as e:
-        print(f"❌ SLK naar CSV conversie fout: {e}")
-        import traceback
-        traceback.print_exc()
-        return None
-
-
-def detect_csv_format(csv_reader):
-    """
-    Verbeterde CSV formaat detectie met auto-detectie
-    """
-    try:
-        # Lees alle data voor analyse
-        csv_data = list(csv_reader)
-        
-        # Gebruik auto-detectie
-        detection_result = auto_detect_csv_mapping(csv_data)
-        
-        print(f"🤖 Auto-detectie resultaat:")
-        print(f"   Formaat: {detection_result['detected_format']}")
-        print(f"   Betrouwbaarheid: {detection_result['confidence']:.1%}")
-        print(f"   Mapping: {detection_result['mappings']}")
-        
-        if detection_result['warnings']:
-            print(f"   ⚠️ Waarschuwingen: {detection_result['warnings']}")
-        
-        if detection_result['suggestions']:
-            print(f"   💡 Suggesties: {detection_result['suggestions']}")
-        
-        return detection_result['detected_format']
-        
-    except Exception as e:
-        print(f"❌ Auto-detectie fout: {e}")
-        return 'routemeister'  # Fallback
-
-
-def get_column_mapping(format_type):
-    """
-    Krijg kolom mapping voor verschillende CSV formaten
-    """
-    if format_type == 'fahrdlist':
-        return {
-            'patient_id': 0,      # Mogelijk Kunde ID
-            'achternaam': 1,      # Achternaam
-            'voornaam': 2,        # Voornaam
-            'adres': 3,           # Straat + Hausnummer
-            'plaats': 4,          # Stadt
-            'postcode': 5,        # PLZ
-            'telefoon1': 6,       # Telefon
-            'telefoon2': 7,       # Mobil
-            'datum': 8,           # Termin Datum
-            'start_tijd': 9,      # Start Zeit
-            'eind_tijd': 10,      # Ende Zeit
-        }
-    else:  # routemeister format
-        return {
-            'patient_id': 1,      # Kolom B
-            'achternaam': 2,      # Kolom C
-            'voornaam': 3,        # Kolom D
-            'adres': 6,           # Kolom G
-            'plaats': 8,          # Kolom I
-            'postcode': 9,        # Kolom J
-            'telefoon1': 10,      # Kolom K
-            'telefoon2': 11,      # Kolom L
-            'datum': 15,          # Kolom P
-            'start_tijd': 17,     # Kolom R
-            'eind_tijd': 18,      # Kolom S
-        }
-
-
-def validate_csv_row_flexible(row, row_number, format_type):
-    """
-    Flexibele CSV validatie voor verschillende formaten
-    """
-    errors = []
-    mapping = get_column_mapping(format_type)
-    
-    # Controleer minimale lengte
-    min_columns = max(mapping.values()) + 1
-    if len(row) < min_columns:
-        errors.append(f"Onvoldoende kolommen: {len(row)} (verwacht: {min_columns}+)")
-        return {'status': 'error', 'errors': errors}
-    
-    # Haal data op basis van mapping
-    patient_id = row[mapping['patient_id']] if mapping['patient_id'] < len(row) else ""
-    achternaam = row[mapping['achternaam']] if mapping['achternaam'] < len(row) else ""
-    voornaam = row[mapping['voornaam']] if mapping['voornaam'] < len(row) else ""
-    adres_volledig = row[mapping['adres']] if mapping['adres'] < len(row) else ""
-    plaats = row[mapping['plaats']] if mapping['plaats'] < len(row) else ""
-    postcode = row[mapping['postcode']] if mapping['postcode'] < len(row) else ""
-    telefoon1 = row[mapping['telefoon1']] if mapping['telefoon1'] < len(row) else ""
-    telefoon2 = row[mapping['telefoon2']] if mapping['telefoon2'] < len(row) else ""
-    afspraak_datum = row[mapping['datum']] if mapping['datum'] < len(row) else ""
-    eerste_behandeling_tijd = row[mapping['start_tijd']] if mapping['start_tijd'] < len(row) else ""
-    laatste_behandeling_tijd = row[mapping['eind_tijd']] if mapping['eind_tijd'] < len(row) else ""
-    
-    # Valideer verplichte velden
-    if not patient_id:
-        errors.append("Patient ID ontbreekt")
-    
-    if not voornaam:
-        errors.append("Voornaam ontbreekt")
-    
-    if not achternaam:
-        errors.append("Achternaam ontbreekt")
-    
-    if not adres_volledig:
-        errors.append("Adres ontbreekt")
-    
-    if not plaats:
-        errors.append("Plaats ontbreekt")
-    
-    if not postcode:
-        errors.append("Postcode ontbreekt")
-    
-    # Valideer datum (verschillende formaten)
-    if afspraak_datum:
-        try:
-            # Probeer verschillende datum formaten
-            if '-' in afspraak_datum:
-                dag, maand, jaar = afspraak_datum.split('-')
-            elif '.' in afspraak_datum:
-                dag, maand, jaar = afspraak_datum.split('.')
-            elif '/' in afspraak_datum:
-                dag, maand, jaar = afspraak_datum.split('/')
-            else:
-                errors.append("Ongeldig datum formaat")
-        except ValueError:
-            errors.append("Ongeldige datum")
-    else:
-        errors.append("Afspraak datum ontbreekt")
-    
-    # Valideer tijden (verschillende formaten)
-    if eerste_behandeling_tijd:
-        tijd_str = str(eerste_behandeling_tijd).strip()
-        # Accepteer HH:MM, HHMM, H:MM formaten
-        if ':' in tijd_str:
-            tijd_str = tijd_str.replace(':', '')
-        if len(tijd_str) < 3 or len(tijd_str) > 4:
-            errors.append("Ongeldige eerste behandeling tijd (verwacht: HHMM formaat)")
-        elif not tijd_str.isdigit():
-            errors.append("Eerste behandeling tijd moet numeriek zijn")
-    
-    if laatste_behandeling_tijd:
-        tijd_str = str(laatste_behandeling_tijd).strip()
-        # Accepteer HH:MM, HHMM, H:MM formaten
-        if ':' in tijd_str:
-            tijd_str = tijd_str.replace(':', '')
-        if len(tijd_str) < 3 or len(tijd_str) > 4:
-            errors.append("Ongeldige laatste behandeling tijd (verwacht: HHMM formaat)")
-        elif not tijd_str.isdigit():
-            errors.append("Laatste behandeling tijd moet numeriek zijn")
-    
-    # Valideer telefoon (minimaal één moet aanwezig zijn)
-    if not telefoon1 and not telefoon2:
-        errors.append("Telefoonnummer ontbreekt")
-    
-    if errors:
-        return {'status': 'error', 'errors': errors}
-    else:
-        return {'status': 'ok'}
-
-
-def validate_csv_row(row, row_number):
-    """
-    Valideer een CSV rij voor patiënt data (backward compatibility)
-    """
-    return validate_csv_row_flexible(row, row_number, 'routemeister')
-
-
 # Oude planning functie verwijderd - vervangen door wizard
 
 
@@ -2140,7 +1436,8 @@ def planning_step3(request):
     """
     Stap 3: Planner keuze (Snel/Routemeister) + Timer voor OptaPlanner
     """
-    planning_data = request.session.get('planning_data')
+    state = WizardState.for_request(request)
+    planning_data = state.get('planning_data')
     if not planning_data:
         messages.error(request, 'Geen planning data gevonden. Start opnieuw.')
         return redirect('planning_overview')
@@ -2149,8 +1446,7 @@ def planning_step3(request):
         planner_type = request.POST.get('planner_type')
         if planner_type in ['simple', 'routemeister']:
             # Update planning data
-            planning_data['planner_type'] = planner_type
-            request.session['planning_data'] = planning_data
+            planning_data = state.update('planning_data', planner_type=planner_type)
             
             # Start planning proces
             if planner_type == 'routemeister':
@@ -2207,7 +1503,7 @@ def planning_step3(request):
                         serializable_routes = convert_decimals(routes)
                         
                         # Store results in session
-                        request.session['planned_routes'] = serializable_routes
+                        WizardState.for_request(request)['planned_routes'] = serializable_routes
                         request.session['route_planner_type'] = 'simple'
                         messages.success(request, f'🎉 {len(routes)} routes gegenereerd met Simple Router!')
                         return redirect('planning_results')
@@ -2225,79 +1521,15 @@ def planning_step3(request):
 def assign_timeslots_to_patients(patients):
     """
     Wijs automatisch tijdblokken toe aan patiënten - alleen geselecteerde tijdblokken
+    Halen: starttijd groter dan blok [x] en kleiner dan (volgend) blok [y] → blok [x]
+    Brengen: eerste blok na de eind behandeling (anders het laatste blok)
     """
-    from .models import TimeSlot
-    
-    # Haal alleen geselecteerde tijdblokken op
-    selected_timeslots = TimeSlot.objects.filter(actief=True, default_selected=True).order_by('aankomst_tijd')
+    from .services.timeslot_index import TimeslotIndex
     
-    assigned_count = 0
-    
-    for patient in patients:
-        # Skip als al toegewezen
-        if patient.halen_tijdblok and patient.bringen_tijdblok:
-            continue
-        
-        # Zoek halen tijdblok (eerste afspraak tijd)
-        halen_timeslot = None
-        if patient.ophaal_tijd:
-            first_appointment_time = patient.ophaal_tijd.time()
-            
-            # CORRECTE HALEN LOGICA: 
-            # Starttijd groter dan blok [x] en kleiner dan (volgend) blok [y] → plaats patiënt in blok [x]
-            for i, ts in enumerate(selected_timeslots):
-                # Check of dit een Halen tijdblok is
-                if not ts.naam.startswith('Holen'):
-                    continue
-                
-                current_block_start = ts.aankomst_tijd
-                
-                # Zoek volgende Halen tijdblok
-                next_block_start = None
-                for j in range(i + 1, len(selected_timeslots)):
-                    next_ts = selected_timeslots[j]
-                    if next_ts.tijdblok_type == 'halen':
-                        next_block_start = next_ts.aankomst_tijd
-                        break
-                
-                # Als er geen volgende Halen tijdblok is, gebruik dan 90 minuten na huidige tijd
-                if next_block_start is None:
-                    from datetime import timedelta
-                    next_block_start = (datetime.combine(datetime.today(), ts.aankomst_tijd) + timedelta(minutes=90)).time()
-                
-                # Check of patiënt tijd valt tussen huidige blok start en volgende blok start
-                if current_block_start <= first_appointment_time < next_block_start:
-                    halen_timeslot = ts
-                    break
-        
-        # Zoek brengen tijdblok (eind tijd)
-        brengen_timeslot = None
-        if patient.eind_behandel_tijd:
-            end_time = patient.eind_behandel_tijd.time()
-            
-            # Zoek eerste tijdblok waar eind tijd >= aankomst_tijd
-            for ts in selected_timeslots:
-                if ts.tijdblok_type == 'brengen' and end_time >= ts.aankomst_tijd:
-                    brengen_timeslot = ts
-                    break
-            
-            # Fallback: zoek laatste beschikbare tijdblok als geen match
-            if not brengen_timeslot:
-                for ts in reversed(list(selected_timeslots)):
-                    if ts.tijdblok_type == 'brengen':
-                        brengen_timeslot = ts
-                        break
-        
-        # Update patiënt
-        if halen_timeslot:
-            patient.halen_tijdblok = halen_timeslot
-        
-        if brengen_timeslot:
-            patient.bringen_tijdblok = brengen_timeslot
-        
-        if halen_timeslot or brengen_timeslot:
-            patient.save()
-            assigned_count += 1
+    # Index over de geselecteerde tijdblokken, één keer per run
+    index = TimeslotIndex.for_selected()
+    assignments = index.assign(patients)
+    assigned_count = index.save(assignments)
     
     print(f"✅ {assigned_count} patiënten toegewezen aan tijdblokken")
     return assigned_count
@@ -2307,7 +1539,7 @@ def planning_processing(request):
     """
     OptaPlanner processing pagina met timer
     """
-    planning_data = request.session.get('planning_data')
+    planning_data = WizardState.for_request(request).get('planning_data')
     if not planning_data:
         messages.error(request, 'Geen planning data gevonden. Start opnieuw.')
         return redirect('planning_overview')
@@ -2582,10 +1814,37 @@ def get_default_coordinates(plaats):
 
 
 
+def _find_vehicle(reference):
+    """Voertuig op id, referentie of kenteken (None als niet gevonden)"""
+    if reference in (None, ''):
+        return None
+    query = models.Q(referentie=reference) | models.Q(kenteken=reference)
+    if str(reference).isdigit():
+        query |= models.Q(id=int(reference))
+    return Vehicle.objects.filter(query).first()
+
+
+def _route_editor_for(patient, assignment_type, timeslot_id=None):
+    """RouteEditor voor het tijdblok van de patiënt (of het opgegeven tijdblok)"""
+    from .services.route_editor import RouteEditor
+    route_type = 'HALEN' if str(assignment_type).lower() == 'halen' else 'BRINGEN'
+    timeslot = None
+    if timeslot_id:
+        timeslot = TimeSlot.objects.filter(id=timeslot_id).first()
+    if timeslot is None:
+        timeslot = patient.halen_tijdblok if route_type == 'HALEN' else patient.bringen_tijdblok
+    if timeslot is None:
+        return None
+    day = timezone.localdate(patient.ophaal_tijd) if patient.ophaal_tijd else timezone.localdate()
+    return RouteEditor(timeslot, route_type, day)
+
+
 @csrf_exempt
 def api_update_patient_assignment(request):
     """
     API endpoint voor het bijwerken van patiënt toewijzingen via drag & drop
+    Slaat de toewijzing op en geeft de herberekende bron- en doelroute terug
+    (volgorde, ETA's, afstand, kosten en constraint schendingen).
     """
     if request.method == 'POST':
         try:
@@ -2598,26 +1857,38 @@ def api_update_patient_assignment(request):
             
             # Get patient
             try:
-                patient = Patient.objects.get(id=patient_id)
+                patient = Patient.objects.select_related(
+                    'toegewezen_voertuig', 'halen_tijdblok', 'bringen_tijdblok'
+                ).get(id=patient_id)
             except Patient.DoesNotExist:
                 return JsonResponse({'success': False, 'error': 'Patiënt niet gevonden'})
             
-            # Get vehicle by reference or kenteken
-            try:
-                vehicle = Vehicle.objects.get(
-                    models.Q(referentie=vehicle_reference) | 
-                    models.Q(kenteken=vehicle_reference)
-                )
-            except Vehicle.DoesNotExist:
+            # Get vehicle by id, reference or kenteken (leeg = toewijzing verwijderen)
+            vehicle = _find_vehicle(vehicle_reference)
+            if vehicle is None and vehicle_reference not in (None, ''):
                 return JsonResponse({'success': False, 'error': 'Voertuig niet gevonden'})
             
             # Update patient assignment
+            previous_vehicle = patient.toegewezen_voertuig
             patient.toegewezen_voertuig = vehicle
             patient.save()
+
+            routes = None
+            editor = _route_editor_for(patient, assignment_type, data.get('timeslot_id'))
+            if editor is not None:
+                routes = editor.move(
+                    patient, previous_vehicle, vehicle,
+                    source_order=data.get('source_order'), target_order=data.get('target_order'),
+                )
             
+            if vehicle:
+                message = f'Patiënt {patient.naam} toegewezen aan {vehicle.referentie or vehicle.kenteken}'
+            else:
+                message = f'Toewijzing van patiënt {patient.naam} verwijderd'
             return JsonResponse({
                 'success': True,
-                'message': f'Patiënt {patient.naam} toegewezen aan {vehicle.referentie or vehicle.kenteken}'
+                'message': message,
+                'routes': routes,
             })
             
         except json.JSONDecodeError:
@@ -2652,8 +1923,8 @@ def concept_planning(request):
         messages.warning(request, 'Er zijn geen patiënten in de database. Upload eerst een CSV bestand via "Nieuwe Planning".')
         return redirect('new_planning')
     
-    # Get planning data from session
-    planning_data = request.session.get('planning_data', {})
+    # Get planning data from the state store
+    planning_data = WizardState.for_request(request).get('planning_data', {})
     
     # Determine the date to use - from CSV or today
     planning_date = date.today()
@@ -3034,96 +2305,63 @@ def api_log_planning_action(request):
 @csrf_exempt
 def api_export_planning_csv(request):
     """
-    API endpoint om planning te exporteren naar CSV
+    API endpoint om planning te exporteren als CSV, XLSX of chauffeurs manifest
+    De export wordt gestreamd (zie planning/services/exports.py)
+    
+    POST: {"assignments": [...], "format": "csv"} - de concept planning van de client
+    GET:  ?start=YYYY-MM-DD&end=YYYY-MM-DD&format=xlsx - historie uit de database
     """
+    from .services.exports import EXPORT_FORMATS, PlanningExport
+    
     if request.method == 'POST':
         try:
-            import json
-            from datetime import date
-            import csv
-            from io import StringIO
-            
             data = json.loads(request.body)
-            assignments = data.get('assignments', [])
-            
-            output = StringIO()
-            writer = csv.writer(output)
-            
-            writer.writerow([
-                'Patient ID', 'Patient Naam', 'Tijdblok', 'Voertuig', 
-                'Volgorde', 'Ophaal Tijd', 'Eind Behandel Tijd', 
-                'Adres', 'Plaats', 'Rolstoel'
-            ])
-            
-            for assignment in assignments:
-                try:
-                    patient = Patient.objects.get(id=assignment['patient_id'])
-                    timeslot_name = "Niet toegewezen"
-                    vehicle_name = "Niet toegewezen"
-                    
-                    if assignment.get('timeslot_id'):
-                        try:
-                            timeslot = TimeSlot.objects.get(id=assignment['timeslot_id'])
-                            timeslot_name = timeslot.naam
-                        except TimeSlot.DoesNotExist:
-                            pass
-                    
-                    if assignment.get('vehicle_id'):
-                        try:
-                            vehicle = Vehicle.objects.get(id=assignment['vehicle_id'])
-                            vehicle_name = f"{vehicle.referentie} - {vehicle.kenteken}"
-                        except Vehicle.DoesNotExist:
-                            pass
-                    
-                    writer.writerow([
-                        patient.id,
-                        patient.naam,
-                        timeslot_name,
-                        vehicle_name,
-                        assignment.get('position', 0) + 1,
-                        patient.ophaal_tijd.strftime('%H:%M') if patient.ophaal_tijd else '',
-                        patient.eind_behandel_tijd.strftime('%H:%M') if patient.eind_behandel_tijd else '',
-                        patient.straat,
-                        patient.plaats,
-                        'Ja' if patient.rolstoel else 'Nee'
-                    ])
-                    
-                except Patient.DoesNotExist:
-                    continue
-            
-            csv_content = output.getvalue()
-            output.close()
-            
-            today = date.today()
-            try:
-                planning_session = PlanningSession.objects.get(
-                    planning_date=today,
-                    created_by=request.user
-                )
-                
-                PlanningAction.objects.create(
-                    planning_session=planning_session,
-                    user=request.user,
-                    action_type='export_csv',
-                    description=f'Planning geëxporteerd naar CSV - {len(assignments)} patiënten',
-                    details={'export_count': len(assignments)}
-                )
-            except PlanningSession.DoesNotExist:
-                pass
-            
-            return JsonResponse({
-                'success': True,
-                'csv_content': csv_content,
-                'filename': f'planning_{today.strftime("%Y%m%d")}.csv'
-            })
-            
-        except Exception as e:
-            return JsonResponse({
-                'success': False,
-                'error': str(e)
-            })
+        except ValueError:
+            return JsonResponse({'success': False, 'error': 'Ongeldige JSON'})
+        assignments = data.get('assignments', [])
+        export_format = data.get('format', 'csv')
+        if export_format not in EXPORT_FORMATS:
+            return JsonResponse({'success': False, 'error': f'Onbekend formaat: {export_format}'})
+        export = PlanningExport.for_assignments(assignments, export_format)
+        description = f'Planning geëxporteerd naar {export_format.upper()} - {len(assignments)} patiënten'
+        details = {'export_count': len(assignments), 'format': export_format}
+    elif request.method == 'GET':
+        try:
+            start = date.fromisoformat(request.GET['start'])
+            end = date.fromisoformat(request.GET.get('end') or request.GET['start'])
+        except (KeyError, ValueError):
+            return JsonResponse({'success': False, 'error': 'Geef start (en end) op als YYYY-MM-DD'})
+        if end < start:
+            return JsonResponse({'success': False, 'error': 'end ligt voor start'})
+        if (end - start).days > 366:
+            return JsonResponse({'success': False, 'error': 'Maximaal één jaar per export'})
+        export_format = request.GET.get('format', 'csv')
+        if export_format not in EXPORT_FORMATS:
+            return JsonResponse({'success': False, 'error': f'Onbekend formaat: {export_format}'})
+        export = PlanningExport.for_history(start, end, export_format)
+        description = f'Planning historie geëxporteerd naar {export_format.upper()} - {start} t/m {end}'
+        details = {'start': start.isoformat(), 'end': end.isoformat(), 'format': export_format}
+    else:
+        return JsonResponse({'success': False, 'error': 'Invalid request method'})
     
-    return JsonResponse({'success': False, 'error': 'Invalid request method'})
+    if request.user.is_authenticated:
+        from .models_extended import PlanningSession, PlanningAction
+        planning_session = PlanningSession.objects.filter(
+            planning_date=date.today(), created_by=request.user
+        ).first()
+        if planning_session:
+            PlanningAction.objects.create(
+                planning_session=planning_session,
+                user=request.user,
+                action_type='export_csv',
+                description=description,
+                details=details
+            )
+    
+    response = StreamingHttpResponse(export.stream(), content_type=export.content_type)
+    response['Content-Disposition'] = f'attachment; filename="{export.filename}"'
+    response['X-Accel-Buffering'] = 'no'
+    return response
 
 
 @csrf_exempt
@@ -3284,6 +2522,15 @@ def statistics_view(request):
     
     return render(request, 'planning/statistics.html', context)
 
+def _planning_stats_rollup(start_date, end_date):
+    """
+    Rollup rijen in de periode; gewijzigde dagen worden eerst bijgewerkt
+    """
+    from .models import DailyPlanningStats
+    
+    DailyPlanningStats.refresh_dirty()
+    return DailyPlanningStats.objects.filter(date__range=[start_date, end_date])
+
 def calculate_daily_stats(planning_sessions):
     """Calculate daily statistics based on patient ophaal_tijd"""
     daily_stats = []
@@ -3312,24 +2559,21 @@ def calculate_daily_stats(planning_sessions):
         end_date = date.today()
         start_date = end_date - timedelta(days=30)
     
-    # Get all patients in date range
-    patients = Patient.objects.filter(
-        ophaal_tijd__date__range=[start_date, end_date]
-    ).order_by('ophaal_tijd__date')
-    
-    # Group patients by date
-    from collections import defaultdict
-    patients_by_date = defaultdict(list)
-    for patient in patients:
-        patients_by_date[patient.ophaal_tijd.date()].append(patient)
+    # Aggregeer per dag over de rollup tabel (database-side Sum)
+    days = _planning_stats_rollup(start_date, end_date).values('date').annotate(
+        patients=Sum('patient_count'),
+        wheelchairs=Sum('wheelchair_count'),
+        failed=Sum('failed_geocoding_count'),
+    ).order_by('date')
     
     # Calculate stats for each date
-    for date_obj in sorted(patients_by_date.keys()):
-        day_patients = patients_by_date[date_obj]
-        
-        patient_count = len(day_patients)
-        wheelchair_count = sum(1 for p in day_patients if p.rolstoel)
-        failed_geocoding_count = sum(1 for p in day_patients if p.geocoding_status == 'failed')
+    for day in days:
+        date_obj = day['date']
+        patient_count = day['patients']
+        wheelchair_count = day['wheelchairs']
+        failed_geocoding_count = day['failed']
+        if not patient_count:
+            continue
         
         estimated_routes = max(1, patient_count // 8)
         estimated_distance = patient_count * 15
@@ -3418,31 +2662,26 @@ def calculate_monthly_stats(planning_sessions):
         end_date = date.today()
         start_date = end_date - timedelta(days=365)
     
-    # Get all patients in date range
-    patients = Patient.objects.filter(
-        ophaal_tijd__date__range=[start_date, end_date]
-    ).order_by('ophaal_tijd__date')
-    
-    # Group patients by month
-    for patient in patients:
-        month_key = patient.ophaal_tijd.strftime('%Y-%m')
-        
-        wheelchair_count = 1 if patient.rolstoel else 0
-        failed_geocoding_count = 1 if patient.geocoding_status == 'failed' else 0
-        
-        estimated_routes = 1  # Each patient contributes to route count
-        estimated_distance = 15  # Estimated distance per patient
-        estimated_time = 18  # Estimated time per patient
-        estimated_cost = 7.5  # Estimated cost per patient
-        
-        monthly_stats[month_key]['patient_count'] += 1
-        monthly_stats[month_key]['wheelchair_count'] += wheelchair_count
-        monthly_stats[month_key]['failed_geocoding'] += failed_geocoding_count
-        monthly_stats[month_key]['estimated_routes'] += estimated_routes
-        monthly_stats[month_key]['estimated_distance'] += estimated_distance
-        monthly_stats[month_key]['estimated_time'] += estimated_time
-        monthly_stats[month_key]['estimated_cost'] += estimated_cost
-        monthly_stats[month_key]['days_count'] += 1  # Count each patient as a day
+    # Aggregeer per maand over de rollup tabel (database-side Sum)
+    months = _planning_stats_rollup(start_date, end_date).annotate(month=TruncMonth('date')).values('month').annotate(
+        patients=Sum('patient_count'),
+        wheelchairs=Sum('wheelchair_count'),
+        failed=Sum('failed_geocoding_count'),
+    ).order_by('month')
+    
+    for month in months:
+        month_key = month['month'].strftime('%Y-%m')
+        patient_count = month['patients'] or 0
+        
+        # Schattingen per patiënt: 15 km, 18 minuten, €7.50
+        monthly_stats[month_key]['patient_count'] = patient_count
+        monthly_stats[month_key]['wheelchair_count'] = month['wheelchairs'] or 0
+        monthly_stats[month_key]['failed_geocoding'] = month['failed'] or 0
+        monthly_stats[month_key]['estimated_routes'] = patient_count  # Each patient contributes to route count
+        monthly_stats[month_key]['estimated_distance'] = patient_count * 15
+        monthly_stats[month_key]['estimated_time'] = patient_count * 18
+        monthly_stats[month_key]['estimated_cost'] = patient_count * 7.5
+        monthly_stats[month_key]['days_count'] = patient_count  # Count each patient as a day
     
     # Convert to list and add calculated fields
     monthly_list = []
@@ -3518,35 +2757,30 @@ def calculate_yearly_stats(planning_sessions):
         end_date = date.today()
         start_date = end_date - timedelta(days=1095)  # 3 years
     
-    # Get all patients in date range
-    patients = Patient.objects.filter(
-        ophaal_tijd__date__range=[start_date, end_date]
-    ).order_by('ophaal_tijd__date')
-    
-    # Group patients by year
-    for patient in patients:
-        year_key = patient.ophaal_tijd.year
-        month_key = patient.ophaal_tijd.strftime('%Y-%m')
-        
-        wheelchair_count = 1 if patient.rolstoel else 0
-        failed_geocoding_count = 1 if patient.geocoding_status == 'failed' else 0
-        
-        estimated_routes = 1  # Each patient contributes to route count
-        estimated_distance = 15  # Estimated distance per patient
-        estimated_time = 18  # Estimated time per patient
-        estimated_cost = 7.5  # Estimated cost per patient
-        
-        yearly_stats[year_key]['patient_count'] += 1
-        yearly_stats[year_key]['wheelchair_count'] += wheelchair_count
-        yearly_stats[year_key]['failed_geocoding'] += failed_geocoding_count
-        yearly_stats[year_key]['estimated_routes'] += estimated_routes
-        yearly_stats[year_key]['estimated_distance'] += estimated_distance
-        yearly_stats[year_key]['estimated_time'] += estimated_time
-        yearly_stats[year_key]['estimated_cost'] += estimated_cost
-        
-        # Track unique months
-        yearly_stats[year_key]['_months'].add(month_key)
-        yearly_stats[year_key]['months_count'] = len(yearly_stats[year_key]['_months'])
+    # Aggregeer per jaar over de rollup tabel: het aantal rijen is begrensd door
+    # dagen x voertuigen, niet door het aantal patiënten in de historie
+    years = _planning_stats_rollup(start_date, end_date).filter(patient_count__gt=0).annotate(
+        year=ExtractYear('date')
+    ).values('year').annotate(
+        patients=Sum('patient_count'),
+        wheelchairs=Sum('wheelchair_count'),
+        failed=Sum('failed_geocoding_count'),
+        months=Count(TruncMonth('date'), distinct=True),
+    ).order_by('year')
+    
+    for year in years:
+        year_key = year['year']
+        patient_count = year['patients'] or 0
+        
+        # Schattingen per patiënt: 15 km, 18 minuten, €7.50
+        yearly_stats[year_key]['patient_count'] = patient_count
+        yearly_stats[year_key]['wheelchair_count'] = year['wheelchairs'] or 0
+        yearly_stats[year_key]['failed_geocoding'] = year['failed'] or 0
+        yearly_stats[year_key]['estimated_routes'] = patient_count  # Each patient contributes to route count
+        yearly_stats[year_key]['estimated_distance'] = patient_count * 15
+        yearly_stats[year_key]['estimated_time'] = patient_count * 18
+        yearly_stats[year_key]['estimated_cost'] = patient_count * 7.5
+        yearly_stats[year_key]['months_count'] = year['months']
     
     # Convert to list and add calculated fields
     yearly_list = []
@@ -3626,28 +2860,27 @@ def calculate_vehicle_stats(planning_sessions, all_vehicles):
         end_date = date.today()
         start_date = end_date - timedelta(days=30)
     
-    # Get all patients in date range that are assigned to vehicles
-    patients = Patient.objects.filter(
-        ophaal_tijd__date__range=[start_date, end_date],
-        toegewezen_voertuig__isnull=False
-    ).order_by('ophaal_tijd__date')
+    # Aggregeer per voertuig over de rollup tabel (database-side Sum)
+    vehicle_rows = _planning_stats_rollup(start_date, end_date).filter(vehicle__isnull=False).values('vehicle').annotate(
+        patients=Sum('patient_count'),
+        wheelchairs=Sum('wheelchair_count'),
+    )
     
     # Calculate vehicle usage from actual patient assignments
-    for patient in patients:
-        vehicle = patient.toegewezen_voertuig
-        if vehicle and vehicle.id in vehicle_stats:
-            wheelchair_count = 1 if patient.rolstoel else 0
-            estimated_distance = 15  # Estimated distance per patient
-            estimated_time = 18  # Estimated time per patient
-            estimated_cost = 7.5  # Estimated cost per patient
-            
-            vehicle_stats[vehicle.id]['total_patients'] += 1
-            vehicle_stats[vehicle.id]['total_routes'] += 1  # Each patient is a route
-            vehicle_stats[vehicle.id]['total_distance'] += estimated_distance
-            vehicle_stats[vehicle.id]['total_time'] += estimated_time
-            vehicle_stats[vehicle.id]['total_cost'] += estimated_cost
-            vehicle_stats[vehicle.id]['wheelchair_patients'] += wheelchair_count
-            vehicle_stats[vehicle.id]['days_used'] += 1  # Count each patient as a day
+    for row in vehicle_rows:
+        stats = vehicle_stats.get(row['vehicle'])
+        if stats is None or not row['patients']:
+            continue
+        patient_count = row['patients']
+        
+        # Schattingen per patiënt: 15 km, 18 minuten, €7.50
+        stats['total_patients'] = patient_count
+        stats['total_routes'] = patient_count  # Each patient is a route
+        stats['total_distance'] = patient_count * 15
+        stats['total_time'] = patient_count * 18
+        stats['total_cost'] = patient_count * 7.5
+        stats['wheelchair_patients'] = row['wheelchairs'] or 0
+        stats['days_used'] = patient_count  # Count each patient as a day
     
     # Calculate averages and utilization
     for vehicle_id, stats in vehicle_stats.items():
@@ -3700,7 +2933,7 @@ def planning_wizard_preview(request):
     Preview pagina na upload
     """
     # Haal upload data op uit session
-    upload_data = request.session.get('wizard_upload_data', {})
+    upload_data = WizardState.for_request(request).get('wizard_upload_data', {})
     
     if not upload_data:
         return redirect('planning_wizard_upload')
@@ -3737,7 +2970,7 @@ def planning_wizard_preview(request):
     Stap 1.5: Preview van geüploade data
     """
     # Haal upload data op uit session
-    upload_data = request.session.get('wizard_upload_data', {})
+    upload_data = WizardState.for_request(request).get('wizard_upload_data', {})
     if not upload_data:
         messages.error(request, 'Geen upload data gevonden. Start opnieuw.')
         return redirect('planning_wizard_start')
@@ -3761,8 +2994,9 @@ def planning_wizard_assignment(request):
     """
     Stap 3: Auto-Assignment & Route Generatie
     """
-    # Haal upload data op uit session
-    upload_data = request.session.get('wizard_upload_data', {})
+    # Haal upload data op uit de wizard state
+    state = WizardState.for_request(request)
+    upload_data = state.get('wizard_upload_data', {})
     
     # Voor test doeleinden, maak dummy data als er geen upload data is
     if not upload_data:
@@ -3772,7 +3006,7 @@ def planning_wizard_assignment(request):
             'detection_result': {'detected_format': 'CSV', 'confidence': 95},
             'validation_result': {'valid_rows': 10, 'errors': [], 'warnings': []}
         }
-        request.session['wizard_upload_data'] = upload_data
+        state['wizard_upload_data'] = upload_data
     
     # Haal beschikbare voertuigen en tijdblokken op
     available_vehicles = Vehicle.objects.filter(status='beschikbaar')
@@ -3996,7 +3230,7 @@ def planning_wizard_assignment(request):
             } for ts in active_timeslots
         ]
     }
-    request.session['wizard_assignment_data'] = assignment_data
+    WizardState.for_request(request)['wizard_assignment_data'] = assignment_data
     
     context = {
         'page_title': 'Auto-Assignment & Routes - Planning',
@@ -4018,14 +3252,12 @@ def planning_wizard_routes(request):
     """
     Route optimalisatie pagina met drag & drop interface - PER TIJDSBLOK zoals in screenshot
     """
-    # Haal upload data op uit session
-    upload_data = request.session.get('wizard_upload_data', {})
-    
-    # Haal assignment data op uit session
-    assignment_data = request.session.get('wizard_assignment_data', {})
-    
-    # Haal route data op uit session
-    route_data = request.session.get('wizard_route_data', {})
+    # Haal upload, assignment en route data op uit de wizard state (één query)
+    state = WizardState.for_request(request)
+    state.load('wizard_upload_data', 'wizard_assignment_data', 'wizard_route_data')
+    upload_data = state.get('wizard_upload_data', {})
+    assignment_data = state.get('wizard_assignment_data', {})
+    route_data = state.get('wizard_route_data', {})
     
     # Haal patiënten data op uit database (voor vandaag)
     from datetime import date
@@ -4195,10 +3427,12 @@ def api_generate_routes(request):
             import json
             from datetime import date
             
-            # Haal data op uit session
-            assignment_data = request.session.get('wizard_assignment_data', {})
+            # Haal data op uit de wizard state
+            state = WizardState.for_request(request)
+            state.load('wizard_assignment_data', 'wizard_upload_data')
+            assignment_data = state.get('wizard_assignment_data', {})
             patients_data = []
-            csv_data = request.session.get('wizard_upload_data', {}).get('csv_data', [])
+            csv_data = state.get('wizard_upload_data', {}).get('csv_data', [])
             parser_config = request.session.get('parser_config', {})
             
             if csv_data and parser_config:
@@ -4314,7 +3548,7 @@ def api_generate_routes(request):
             route_result = generate_routes_with_google_maps(planning_data)
             
             # Sla route data op in session
-            request.session['wizard_route_data'] = route_result
+            WizardState.for_request(request)['wizard_route_data'] = route_result
             
             return JsonResponse({
                 'success': True,
@@ -4347,41 +3581,22 @@ def api_wizard_upload(request):
                     'error': 'Geen bestand geüpload'
                 })
             
-            # Detecteer bestandstype en parse
-            file_extension = uploaded_file.name.split('.')[-1].lower()
-            
-            if file_extension == 'slk':
-                # Parse SLK bestand
-                csv_data = convert_slk_to_csv_simple(uploaded_file)
-            else:
-                # Parse CSV bestand
-                csv_data = parse_csv_file_simple(uploaded_file)
-            
-            # Auto-detect mapping
-            detection_result = auto_detect_csv_mapping_simple(csv_data, uploaded_file.name)
-            
-            # Valideer data
-            validation_result = validate_csv_data_simple(csv_data, detection_result)
-            
-            # Debug: Tel en log alle rijen
-            logger.info(f"🔍 CSV data analyse:")
-            logger.info(f"  Totaal aantal rijen: {len(csv_data)}")
-            
-            for i, row in enumerate(csv_data):
-                logger.info(f"  Rij {i}: type={row.get('type', 'unknown')}, data={row.get('data', [])[:3]}...")
-            
-            # Tel alleen data rijen (geen headers)
-            data_rows = [row for row in csv_data if row.get('type') == 'data']
-            logger.info(f"  Data rijen: {len(data_rows)}")
+            # Eén doorgang: decoderen, parsen (CSV/SLK), formaat detectie en validatie
+            result = IngestPipeline(uploaded_file).run()
+            detection_result = result.detection
+            validation_result = result.validation_result()
+            csv_data = result.rows
+            logger.info(f"Wizard upload {result.timing_report()}")
             
             # Sla data op in session
             upload_data = {
                 'filename': uploaded_file.name,
                 'file_size': uploaded_file.size,
-                'patient_count': len(data_rows),  # Alleen data rijen tellen
+                'patient_count': result.row_count,  # Alleen data rijen tellen
                 'detection_result': detection_result,
                 'validation_result': validation_result,
-                'csv_data': csv_data[:10],  # Alleen eerste 10 rijen voor preview
+                'csv_data': csv_data,  # Alleen eerste 10 rijen voor preview
+                'import_timings': result.timings,
                 'uploaded_at': datetime.now().isoformat()
             }
             
@@ -4407,7 +3622,7 @@ def api_wizard_upload(request):
             else:
                 upload_data['parser_config'] = None
             
-            request.session['wizard_upload_data'] = upload_data
+            WizardState.for_request(request)['wizard_upload_data'] = upload_data
             
             return JsonResponse({
                 'success': True,
@@ -4429,18 +3644,16 @@ def api_wizard_save_upload_data(request):
     """
     if request.method == 'POST':
         try:
-            # Check if upload data exists in session
-            upload_data = request.session.get('wizard_upload_data', {})
-            if not upload_data:
+            # Check if upload data exists in the wizard state
+            state = WizardState.for_request(request)
+            if not state.get('wizard_upload_data'):
                 return JsonResponse({
                     'success': False,
                     'error': 'Geen upload data gevonden in session'
                 })
             
             # Mark upload data as confirmed
-            upload_data['confirmed'] = True
-            upload_data['confirmed_at'] = datetime.now().isoformat()
-            request.session['wizard_upload_data'] = upload_data
+            upload_data = state.update('wizard_upload_data', confirmed=True, confirmed_at=datetime.now().isoformat())
             
             return JsonResponse({
                 'success': True,
@@ -4500,7 +3713,7 @@ def api_wizard_auto_assign(request):
     if request.method == 'POST':
         try:
             # Haal upload data op
-            upload_data = request.session.get('wizard_upload_data', {})
+            upload_data = WizardState.for_request(request).get('wizard_upload_data', {})
             if not upload_data:
                 return JsonResponse({
                     'success': False,
@@ -4514,7 +3727,7 @@ def api_wizard_auto_assign(request):
             assignment_result = perform_auto_assignment(upload_data, constraints)
             
             # Sla resultaat op in session
-            request.session['wizard_planning_data'] = assignment_result
+            WizardState.for_request(request)['wizard_planning_data'] = assignment_result
             
             return JsonResponse({
                 'success': True,
@@ -4530,14 +3743,15 @@ def api_wizard_auto_assign(request):
     return JsonResponse({'success': False, 'error': 'Invalid request method'})
 
 
+@planning_job('wizard_routes')
 def api_wizard_generate_routes(request):
     """
-    API endpoint voor route generatie
+    API endpoint voor route generatie (async=1: als achtergrond job)
     """
     if request.method == 'POST':
         try:
             # Haal planning data op
-            planning_data = request.session.get('wizard_planning_data', {})
+            planning_data = WizardState.for_request(request).get('wizard_planning_data', {})
             if not planning_data:
                 return JsonResponse({
                     'success': False,
@@ -4548,7 +3762,7 @@ def api_wizard_generate_routes(request):
             route_result = generate_routes_with_google_maps(planning_data)
             
             # Sla resultaat op in session
-            request.session['wizard_route_data'] = route_result
+            WizardState.for_request(request)['wizard_route_data'] = route_result
             
             return JsonResponse({
                 'success': True,
@@ -4570,10 +3784,12 @@ def api_wizard_save_planning(request):
     """
     if request.method == 'POST':
         try:
-            # Haal alle wizard data op
-            upload_data = request.session.get('wizard_upload_data', {})
-            planning_data = request.session.get('wizard_planning_data', {})
-            route_data = request.session.get('wizard_route_data', {})
+            # Haal alle wizard data op (één query)
+            state = WizardState.for_request(request)
+            state.load('wizard_upload_data', 'wizard_planning_data', 'wizard_route_data')
+            upload_data = state.get('wizard_upload_data', {})
+            planning_data = state.get('wizard_planning_data', {})
+            route_data = state.get('wizard_route_data', {})
             
             if not all([upload_data, planning_data, route_data]):
                 return JsonResponse({
@@ -4603,10 +3819,8 @@ def api_wizard_save_planning(request):
             # Sla routes op
             save_routes_from_wizard(route_data, session)
             
-            # Clear wizard session data
-            for key in ['wizard_upload_data', 'wizard_planning_data', 'wizard_route_data']:
-                if key in request.session:
-                    del request.session[key]
+            # Clear wizard data
+            state.delete('wizard_upload_data', 'wizard_planning_data', 'wizard_route_data')
             
             return JsonResponse({
                 'success': True,
@@ -4627,424 +3841,13 @@ def api_wizard_save_planning(request):
 # HELPER FUNCTIES VOOR WIZARD
 # ============================================================================
 
-def parse_csv_file_simple(uploaded_file):
-    """
-    Eenvoudige CSV parser die ook bestanden zonder headers ondersteunt
-    """
-    import csv
-    from io import StringIO
-    
-    try:
-        # Decode het bestand
-        content = uploaded_file.read().decode('utf-8')
-        uploaded_file.seek(0)  # Reset file pointer
-        
-        # Detecteer delimiter (komma of puntkomma)
-        first_line = content.split('\n')[0] if content else ''
-        comma_count = first_line.count(',')
-        semicolon_count = first_line.count(';')
-        
-        delimiter = ';' if semicolon_count > comma_count else ','
-        print(f"🔍 Delimiter gedetecteerd: '{delimiter}' (komma's: {comma_count}, puntkomma's: {semicolon_count})")
-        
-        # Parse CSV met gedetecteerde delimiter
-        csv_reader = csv.reader(StringIO(content), delimiter=delimiter)
-        all_rows = list(csv_reader)
-        
-        # Filter lege rijen
-        non_empty_rows = [row for row in all_rows if any(cell.strip() for cell in row)]
-        
-        # Als er geen duidelijke headers zijn (geen kolom namen), behandel alle rijen als data
-        has_headers = False
-        if non_empty_rows:
-            first_row = non_empty_rows[0]
-            # Check of de eerste rij headers bevat (bevat woorden zoals 'patient', 'naam', etc.)
-            if any('patient' in str(cell).lower() or 'naam' in str(cell).lower() or 'voornaam' in str(cell).lower() or 'adres' in str(cell).lower() for cell in first_row):
-                has_headers = True
-                print(f"✅ Headers gevonden in eerste rij: {first_row}")
-            else:
-                print(f"⚠️ Geen headers gevonden, alle rijen worden als data behandeld")
-        
-        # Bouw de CSV data op
-        rows = []
-        for i, row in enumerate(non_empty_rows):
-            if has_headers and i == 0:
-                # Dit is de header rij
-                rows.append({
-                    'type': 'header',
-                    'data': row,
-                    'line_number': i + 1
-                })
-            else:
-                # Dit is een data rij
-                rows.append({
-                    'type': 'data',
-                    'data': row,
-                    'line_number': i + 1
-                })
-        
-        print(f"📊 CSV geparsed: {len(rows)} rijen, headers: {has_headers}")
-        return rows
-        
-    except UnicodeDecodeError:
-        # Probeer andere encoding
-        uploaded_file.seek(0)
-        content = uploaded_file.read().decode('latin-1')
-        uploaded_file.seek(0)
-        
-        # Detecteer delimiter (komma of puntkomma)
-        first_line = content.split('\n')[0] if content else ''
-        comma_count = first_line.count(',')
-        semicolon_count = first_line.count(';')
-        
-        delimiter = ';' if semicolon_count > comma_count else ','
-        print(f"🔍 Delimiter gedetecteerd (latin-1): '{delimiter}' (komma's: {comma_count}, puntkomma's: {semicolon_count})")
-        
-        # Parse CSV met gedetecteerde delimiter
-        csv_reader = csv.reader(StringIO(content), delimiter=delimiter)
-        all_rows = list(csv_reader)
-        
-        # Filter lege rijen
-        non_empty_rows = [row for row in all_rows if any(cell.strip() for cell in row)]
-        
-        # Als er geen duidelijke headers zijn, behandel alle rijen als data
-        has_headers = False
-        if non_empty_rows:
-            first_row = non_empty_rows[0]
-            # Check of de eerste rij headers bevat
-            if any('patient' in str(cell).lower() or 'naam' in str(cell).lower() or 'voornaam' in str(cell).lower() or 'adres' in str(cell).lower() for cell in first_row):
-                has_headers = True
-                print(f"✅ Headers gevonden in eerste rij (latin-1): {first_row}")
-            else:
-                print(f"⚠️ Geen headers gevonden (latin-1), alle rijen worden als data behandeld")
-        
-        # Bouw de CSV data op
-        rows = []
-        for i, row in enumerate(non_empty_rows):
-            if has_headers and i == 0:
-                # Dit is de header rij
-                rows.append({
-                    'type': 'header',
-                    'data': row,
-                    'line_number': i + 1
-                })
-            else:
-                # Dit is een data rij
-                rows.append({
-                    'type': 'data',
-                    'data': row,
-                    'line_number': i + 1
-                })
-        
-        print(f"📊 CSV geparsed (latin-1): {len(rows)} rijen, headers: {has_headers}")
-        return rows
-
-
-def convert_slk_to_csv_simple(uploaded_file):
-    """
-    Eenvoudige SLK naar CSV converter
-    """
-    try:
-        # Decode het bestand
-        content = uploaded_file.read().decode('utf-8')
-        uploaded_file.seek(0)  # Reset file pointer
-        
-        lines = content.split('\n')
-        rows = []
-        
-        for i, line in enumerate(lines):
-            if not line.strip():
-                continue
-                
-            # Eenvoudige SLK parsing - zoek naar C (cell) records
-            if line.startswith('C'):
-                parts = line.split(';')
-                if len(parts) >= 3:
-                    # Extract cell data
-                    cell_data = parts[2].strip('"') if len(parts) > 2 else ''
-                    if cell_data:
-                        rows.append({
-                            'type': 'data',
-                            'data': [cell_data],
-                            'line_number': i + 1
-                        })
-        
-        # Als we geen data hebben, probeer eenvoudigere parsing
-        if not rows:
-            for i, line in enumerate(lines):
-                if line.strip() and not line.startswith('ID'):
-                    # Split op tabs of semicolons
-                    parts = line.replace('\t', ';').split(';')
-                    if len(parts) > 1:
-                        rows.append({
-                            'type': 'data',
-                            'data': [part.strip() for part in parts],
-                            'line_number': i + 1
-                        })
-        
-        return rows
-        
-    except UnicodeDecodeError:
-        # Probeer andere encoding
-        uploaded_file.seek(0)
-        content = uploaded_file.read().decode('latin-1')
-        uploaded_file.seek(0)
-        
-        lines = content.split('\n')
-        rows = []
-        
-        for i, line in enumerate(lines):
-            if line.strip() and not line.startswith('ID'):
-                parts = line.replace('\t', ';').split(';')
-                if len(parts) > 1:
-                    rows.append({
-                        'type': 'data',
-                        'data': [part.strip() for part in parts],
-                        'line_number': i + 1
-                    })
-        
-        return rows
-
-
-def auto_detect_csv_mapping_simple(csv_data, filename):
-    """
-    Auto-detectie van CSV mapping met Django admin configuratie
-    """
-    if not csv_data or len(csv_data) < 1:
-        return {
-            'detected_format': 'Unknown',
-            'confidence': 0,
-            'warnings': ['Geen geldige data gevonden'],
-            'suggestions': [],
-            'config_id': None,
-            'mappings': {}
-        }
-    
-    # Haal header op (kan None zijn als er geen headers zijn)
-    header_row = None
-    for row in csv_data:
-        if isinstance(row, dict) and row.get('type') == 'header':
-            header_row = row.get('data', [])
-            break
-    
-    print(f"🔍 CSV data: {len(csv_data)} rijen, header: {header_row is not None}")
-    
-    # Probeer eerst Django admin configuratie te gebruiken
-    try:
-        from .models import CSVParserConfig
-        
-        # Zoek naar actieve configuraties
-        configs = CSVParserConfig.objects.filter(actief=True).order_by('-prioriteit')
-        
-        for config in configs:
-            print(f"🔍 Test config '{config.naam}'...")
-            
-            # Test bestandsnaam patroon
-            if config.bestandsnaam_patroon:
-                import re
-                if re.search(config.bestandsnaam_patroon, filename, re.IGNORECASE):
-                    print(f"✅ Bestandsnaam match voor '{config.naam}'")
-                    
-                    # Gebruik de admin configuratie
-                    mappings = config.get_kolom_mapping()
-                    confidence = 90  # Hoge confidence voor admin configuratie
-                    
-                    print(f"📊 Admin configuratie gebruikt: {mappings}")
-                    
-                    # Controleer of we de minimale kolommen hebben
-                    warnings = []
-                    if 'patient_id' not in mappings:
-                        warnings.append('Patient ID kolom niet geconfigureerd')
-                    if 'naam' not in mappings and 'achternaam' not in mappings:
-                        warnings.append('Naam kolom niet geconfigureerd')
-                    if 'start_tijd' not in mappings and 'ophaal_tijd' not in mappings:
-                        warnings.append('Tijd kolom niet geconfigureerd')
-                    
-                    return {
-                        'detected_format': config.naam,
-                        'confidence': confidence,
-                        'warnings': warnings,
-                        'suggestions': [],
-                        'config_id': config.id,
-                        'mappings': mappings
-                    }
-        
-        print("⚠️ Geen admin configuratie gevonden, gebruik fallback detectie")
-        
-    except Exception as e:
-        print(f"❌ Fout bij admin configuratie: {e}")
-    
-    # Fallback naar eenvoudige detectie als admin configuratie niet werkt
-    mappings = {}
-    confidence = 0
-    warnings = []
-    suggestions = []
-    
-    # Als er geen header is, gebruik standaard mapping gebaseerd op kolom positie
-    if not header_row:
-        print("📋 Geen header gevonden, gebruik standaard mapping")
-        # Standaard mapping voor CSV zonder headers
-        mappings = {
-            'patient_id': 0,
-            'naam': 1, 
-            'voornaam': 2,
-            'adres': 3,
-            'plaats': 4,
-            'postcode': 5,
-            'telefoon1': 7,
-            'telefoon2': 8,
-            'datum': 9,
-            'start_tijd': 10,
-            'eind_tijd': 11
-        }
-        confidence = 70
-        warnings.append('Geen headers gevonden, gebruik standaard kolom mapping')
-    else:
-        # Zoek naar bekende kolommen in header
-        for i, column in enumerate(header_row):
-            column_lower = str(column).lower().strip()
-            print(f"🔍 Kolom {i}: '{column}' -> '{column_lower}'")
-            
-            # Patiënt ID kolommen
-            if any(keyword in column_lower for keyword in ['patient', 'id', 'nummer', 'nr', 'kunde']):
-                mappings['patient_id'] = i
-                confidence += 20
-                print(f"✅ Patient ID gevonden in kolom {i}")
-            
-            # Naam kolommen
-            if any(keyword in column_lower for keyword in ['naam', 'name', 'patient', 'persoon', 'nachname', 'vorname']):
-                mappings['naam'] = i
-                confidence += 20
-                print(f"✅ Naam gevonden in kolom {i}")
-            
-            # Tijd kolommen
-            if any(keyword in column_lower for keyword in ['tijd', 'time', 'ophaal', 'pickup', 'uur', 'zeit', 'termin']):
-                mappings['ophaal_tijd'] = i
-                confidence += 20
-                print(f"✅ Ophaal tijd gevonden in kolom {i}")
-            
-            # Adres kolommen
-            if any(keyword in column_lower for keyword in ['adres', 'address', 'straat', 'street', 'plaats', 'city', 'straße']):
-                mappings['adres'] = i
-                confidence += 15
-                print(f"✅ Adres gevonden in kolom {i}")
-            
-            # Telefoon kolommen
-            if any(keyword in column_lower for keyword in ['tel', 'phone', 'telefoon', 'nummer', 'telefon']):
-                mappings['telefoon'] = i
-                confidence += 10
-                print(f"✅ Telefoon gevonden in kolom {i}")
-    
-    # Bepaal formaat op basis van filename
-    detected_format = 'Generic CSV'
-    if 'fahrdlist' in filename.lower():
-        detected_format = 'Fahrdlist'
-        confidence += 30
-    elif 'routemeister' in filename.lower():
-        detected_format = 'Routemeister'
-        confidence += 30
-    
-    print(f"📊 Fallback detectie resultaat: {mappings}")
-    
-    # Controleer of we de minimale kolommen hebben
-    if 'patient_id' in mappings and ('naam' in mappings or 'achternaam' in mappings):
-        confidence += 20
-    else:
-        warnings.append('Minimale kolommen (patient_id, naam) niet gevonden')
-    
-    if 'start_tijd' in mappings or 'ophaal_tijd' in mappings:
-        confidence += 10
-    else:
-        warnings.append('Tijd kolom niet gevonden')
-    
-    # Cap confidence op 100
-    confidence = min(confidence, 100)
-    
-    return {
-        'detected_format': detected_format,
-        'confidence': confidence,
-        'warnings': warnings,
-        'suggestions': suggestions,
-        'config_id': None,
-        'mappings': mappings
-    }
-
-
-def validate_csv_data_simple(csv_data, detection_result):
-    """
-    Eenvoudige validatie van CSV data
-    """
-    errors = []
-    warnings = []
-    
-    if not csv_data:
-        errors.append("Geen data gevonden in bestand")
-        return {'errors': errors, 'warnings': warnings}
-    
-    # Controleer of we de benodigde kolommen hebben
-    mappings = detection_result.get('mappings', {})
-    
-    # Controleer patient_id
-    if 'patient_id' not in mappings:
-        errors.append("Vereiste kolom 'patient_id' niet gevonden")
-    
-    # Controleer naam (achternaam of naam)
-    if 'achternaam' not in mappings and 'naam' not in mappings:
-        errors.append("Vereiste kolom 'achternaam' of 'naam' niet gevonden")
-    
-    # Controleer tijd (start_tijd of ophaal_tijd)
-    if 'start_tijd' not in mappings and 'ophaal_tijd' not in mappings:
-        errors.append("Vereiste kolom 'start_tijd' of 'ophaal_tijd' niet gevonden")
-    
-    # Controleer data kwaliteit
-    for i, row in enumerate(csv_data[:10]):  # Alleen eerste 10 rijen
-        if not row.get('data'):
-            continue
-            
-        data = row['data']
-        
-        # Controleer patiënt ID
-        if 'patient_id' in mappings:
-            patient_id = data[mappings['patient_id']] if len(data) > mappings['patient_id'] else ''
-            if not patient_id or patient_id.strip() == '':
-                warnings.append(f"Rij {i+1}: Leeg patiënt ID")
-        
-        # Controleer naam (achternaam of naam)
-        if 'achternaam' in mappings:
-            achternaam = data[mappings['achternaam']] if len(data) > mappings['achternaam'] else ''
-            if not achternaam or achternaam.strip() == '':
-                warnings.append(f"Rij {i+1}: Lege achternaam")
-        elif 'naam' in mappings:
-            naam = data[mappings['naam']] if len(data) > mappings['naam'] else ''
-            if not naam or naam.strip() == '':
-                warnings.append(f"Rij {i+1}: Lege naam")
-        
-        # Controleer tijd (start_tijd of ophaal_tijd)
-        if 'start_tijd' in mappings:
-            start_tijd = data[mappings['start_tijd']] if len(data) > mappings['start_tijd'] else ''
-            if not start_tijd or start_tijd.strip() == '':
-                warnings.append(f"Rij {i+1}: Lege start tijd")
-        elif 'ophaal_tijd' in mappings:
-            ophaal_tijd = data[mappings['ophaal_tijd']] if len(data) > mappings['ophaal_tijd'] else ''
-            if not ophaal_tijd or ophaal_tijd.strip() == '':
-                warnings.append(f"Rij {i+1}: Lege ophaal tijd")
-    
-    # Tel geldige rijen (alle data rijen, geen headers)
-    valid_rows = len([row for row in csv_data if row.get('type') == 'data'])
-    
-    return {
-        'errors': errors,
-        'warnings': warnings,
-        'total_rows': len(csv_data),
-        'valid_rows': valid_rows
-    }
-
 def perform_auto_assignment(upload_data, constraints):
     """
     Voer tijdblok-toewijzing uit voor patiënten
     """
     from datetime import datetime, time
     from .models import TimeSlot, Vehicle
+    from .services.timeslot_index import TimeslotIndex
     
     print("🚀 Start tijdblok-toewijzing...")
     
@@ -5061,8 +3864,9 @@ def perform_auto_assignment(upload_data, constraints):
         }
     
     # Haal beschikbare tijdblokken op
-    available_timeslots = TimeSlot.objects.filter(actief=True).order_by('aankomst_tijd')
-    print(f"📅 Beschikbare tijdblokken: {available_timeslots.count()}")
+    available_timeslots = list(TimeSlot.objects.filter(actief=True).order_by('aankomst_tijd'))
+    timeslot_index = TimeslotIndex(available_timeslots)
+    print(f"📅 Beschikbare tijdblokken: {len(available_timeslots)}")
     
     # Bereken totale capaciteit per tijdblok op basis van beschikbare voertuigen
     available_vehicles = Vehicle.objects.filter(status='beschikbaar')
@@ -5167,42 +3971,14 @@ def perform_auto_assignment(upload_data, constraints):
         # Zoek het beste tijdblok voor deze patiënt
         best_halen_timeslot = None
         best_brengen_timeslot = None
-        min_halen_difference = float('inf')
-        min_brengen_difference = float('inf')
         
-        for timeslot in available_timeslots:
-            try:
-                # HALEN tijdblokken (start_tijd)
-                if patient['start_time'] and timeslot.tijdblok_type == 'halen':
-                    patient_start_time = time.fromisoformat(patient['start_time'])
-                    if patient_start_time >= timeslot.aankomst_tijd:
-                        # Bereken verschil (hoe dicht bij behandelingstijd)
-                        from datetime import datetime, timedelta
-                        patient_dt = datetime.combine(datetime.today(), patient_start_time)
-                        timeslot_dt = datetime.combine(datetime.today(), timeslot.aankomst_tijd)
-                        difference = (patient_dt - timeslot_dt).total_seconds() / 60  # in minuten
-                        
-                        if difference < min_halen_difference:
-                            min_halen_difference = difference
-                            best_halen_timeslot = timeslot
-                
-                # BRENGEN tijdblokken (eind_tijd)
-                if patient['end_time'] and timeslot.tijdblok_type == 'brengen':
-                    patient_end_time = time.fromisoformat(patient['end_time'])
-                    if patient_end_time <= timeslot.aankomst_tijd:
-                        # Bereken verschil (hoe dicht bij behandelingstijd)
-                        from datetime import datetime, timedelta
-                        patient_dt = datetime.combine(datetime.today(), patient_end_time)
-                        timeslot_dt = datetime.combine(datetime.today(), timeslot.aankomst_tijd)
-                        difference = (timeslot_dt - patient_dt).total_seconds() / 60  # in minuten
-                        
-                        if difference < min_brengen_difference:
-                            min_brengen_difference = difference
-                            best_brengen_timeslot = timeslot
-                            
-            except ValueError as e:
-                print(f"⚠️ Kon tijd niet parsen voor patiënt {patient['voornaam']} {patient['achternaam']}: {e}")
-                continue
+        try:
+            # HALEN: dichtstbijzijnde blok op of voor de behandelingstijd
+            best_halen_timeslot = timeslot_index.halen_block(patient['start_time'], bounded=False)
+            # BRENGEN: dichtstbijzijnde blok op of na de eind tijd
+            best_brengen_timeslot = timeslot_index.brengen_block(patient['end_time'])
+        except ValueError as e:
+            print(f"⚠️ Kon tijd niet parsen voor patiënt {patient['voornaam']} {patient['achternaam']}: {e}")
         
         # Wijs toe aan beste tijdblokken
         if best_halen_timeslot:
@@ -5493,18 +4269,18 @@ def parser_configurator(request):
                 uploaded_file = request.FILES['file']
                 
                 # Parse het bestand
-                if uploaded_file.name.endswith('.csv'):
-                    csv_data = parse_csv_file_simple(uploaded_file)
+                if uploaded_file.name.lower().endswith(('.csv', '.slk')):
+                    csv_data = IngestPipeline(uploaded_file, keep_rows=None).run().rows
                 elif uploaded_file.name.endswith(('.xlsx', '.xls')):
                     csv_data = parse_excel_file_simple(uploaded_file)
                 else:
-                    return JsonResponse({'error': 'Ondersteunde bestandsformaten: CSV, Excel (.xlsx, .xls)'})
+                    return JsonResponse({'error': 'Ondersteunde bestandsformaten: CSV, SLK, Excel (.xlsx, .xls)'})
                 
                 if not csv_data:
                     return JsonResponse({'error': 'Kon het bestand niet parsen. Controleer of het bestand geldig is.'})
                 
                 # Sla de data op in de session voor de configurator
-                request.session['configurator_data'] = {
+                WizardState.for_request(request)['configurator_data'] = {
                     'filename': uploaded_file.name,
                     'csv_data': csv_data,
                     'upload_time': datetime.now().isoformat()
@@ -5552,7 +4328,7 @@ def parser_configurator(request):
     # GET request
     if request.GET.get('get_data') == 'true':
         # Return session data as JSON
-        configurator_data = request.session.get('configurator_data', {})
+        configurator_data = WizardState.for_request(request).get('configurator_data', {})
         if configurator_data:
             return JsonResponse({
                 'success': True,
@@ -5602,9 +4378,10 @@ def parse_excel_file_simple(uploaded_file):
         print(f"❌ Fout bij Excel parsing: {e}")
         return []
 
+@planning_job('google_maps_routes')
 def api_wizard_google_maps_routes(request):
     """
-    API endpoint voor Google Maps route optimalisatie
+    API endpoint voor Google Maps route optimalisatie (async: true in de body: als achtergrond job)
     """
     if request.method != 'POST':
         return JsonResponse({'error': 'Alleen POST requests toegestaan'}, status=405)
@@ -5629,7 +4406,7 @@ def api_wizard_google_maps_routes(request):
                 })
         
         # Haal data op uit session of request body
-        wizard_data = request.session.get('wizard_planning_data', {})
+        wizard_data = WizardState.for_request(request).get('wizard_planning_data', {})
         if not wizard_data:
             # Probeer data uit request body
             if request.body:
@@ -5717,7 +4494,7 @@ def api_wizard_google_maps_routes(request):
         saved_patients = []
         
         # Haal upload data op voor patiënt informatie
-        upload_data = request.session.get('wizard_upload_data', {})
+        upload_data = WizardState.for_request(request).get('wizard_upload_data', {})
         csv_data = upload_data.get('csv_data', [])
         detection_result = upload_data.get('detection_result', {})
         mappings = detection_result.get('mappings', {})
@@ -5878,7 +4655,7 @@ def api_wizard_google_maps_routes(request):
         
         logger.info(f"💾 {len(saved_patients)} patiënten opgeslagen in database")
         
-        request.session['google_maps_routes'] = {
+        WizardState.for_request(request)['google_maps_routes'] = {
             'optimized_routes': session_routes,
             'statistics': {
                 'total_distance': total_distance,
@@ -5920,7 +4697,7 @@ def api_wizard_geocode_patients(request):
     
     try:
         # Haal upload data op uit session
-        upload_data = request.session.get('wizard_upload_data', {})
+        upload_data = WizardState.for_request(request).get('wizard_upload_data', {})
         if not upload_data:
             return JsonResponse({'error': 'Geen upload data gevonden'}, status=400)
         
@@ -5931,25 +4708,19 @@ def api_wizard_geocode_patients(request):
         if not csv_data:
             return JsonResponse({'error': 'Geen CSV data gevonden'}, status=400)
         
-        # Import Google Maps service
+        # Import geocoding services
         from .services.google_maps import google_maps_service
-        
-        # Check of Google Maps API beschikbaar is
-        use_fallback = not google_maps_service.is_enabled()
-        
-        if not use_fallback:
-            # Test API toegang
-            test_response = google_maps_service._make_api_call('geocode/json', {
-            'address': 'Bonn, Germany',
-            'key': google_maps_service.api_key
-        })
-        
-        if not test_response or test_response.get('status') == 'REQUEST_DENIED':
-                use_fallback = True
-                logger.warning("Google Maps API test gefaald, gebruik fallback geocoding")
-        
-        if use_fallback:
-            logger.info("🔄 Gebruik fallback geocoding (Google Maps API niet beschikbaar)")
+        from .services.geocoding import geocoding_service
+        from .services.bulk_geocoding import BulkGeocoder, default_providers
+        from .models import GeocodeCacheEntry
+        
+        # Google alleen als de API beschikbaar is, anders Nominatim + cache
+        google_enabled = google_maps_service.is_enabled()
+        providers = default_providers(google_maps_service.api_key if google_enabled else None)
+        if google_enabled:
+            providers.reverse()  # Google eerst: hogere QPS en parallel
+        else:
+            logger.info("🔄 Google Maps API niet beschikbaar, gebruik Nominatim + geocoding cache")
         
         logger.info("🚀 Start geocoding van patiënt adressen...")
         
@@ -5957,10 +4728,12 @@ def api_wizard_geocode_patients(request):
         geocoded_patients = []
         success_count = 0
         error_count = 0
+        fallback_count = 0
         
         logger.info(f"🔍 Start geocoding voor {len(csv_data)} rijen")
         logger.info(f"📋 Mappings: {mappings}")
         
+        # 1. Patiënt informatie uit alle rijen halen
         for i, row in enumerate(csv_data):
             if not row.get('data'):
                 logger.warning(f"Rij {i}: Geen data gevonden")
@@ -5969,110 +4742,68 @@ def api_wizard_geocode_patients(request):
             data = row['data']
             patient_info = {}
             
-            logger.info(f"🔍 Verwerk rij {i}: {data}")
-            
-            # Extraheer patiënt informatie
-            if 'patient_id' in mappings and len(data) > mappings['patient_id']:
-                patient_info['patient_id'] = data[mappings['patient_id']]
-                logger.info(f"  Patient ID: {patient_info['patient_id']}")
+            for field in ('patient_id', 'achternaam', 'voornaam', 'adres', 'plaats', 'postcode'):
+                if field in mappings and len(data) > mappings[field]:
+                    patient_info[field] = data[mappings[field]]
             
-            if 'achternaam' in mappings and len(data) > mappings['achternaam']:
-                patient_info['achternaam'] = data[mappings['achternaam']]
-                logger.info(f"  Achternaam: {patient_info['achternaam']}")
-            
-            if 'voornaam' in mappings and len(data) > mappings['voornaam']:
-                patient_info['voornaam'] = data[mappings['voornaam']]
-                logger.info(f"  Voornaam: {patient_info['voornaam']}")
-            
-            # Extraheer adresgegevens
-            if 'adres' in mappings and len(data) > mappings['adres']:
-                patient_info['adres'] = data[mappings['adres']]
-                logger.info(f"  Adres: {patient_info['adres']}")
-            
-            if 'plaats' in mappings and len(data) > mappings['plaats']:
-                patient_info['plaats'] = data[mappings['plaats']]
-                logger.info(f"  Plaats: {patient_info['plaats']}")
-            
-            if 'postcode' in mappings and len(data) > mappings['postcode']:
-                patient_info['postcode'] = data[mappings['postcode']]
-                logger.info(f"  Postcode: {patient_info['postcode']}")
-            
-            # Bouw adres op voor geocoding
-            address_parts = []
-            if patient_info.get('adres'):
-                address_parts.append(patient_info['adres'])
-            if patient_info.get('postcode'):
-                address_parts.append(patient_info['postcode'])
-            if patient_info.get('plaats'):
-                address_parts.append(patient_info['plaats'])
-            
-            logger.info(f"  Adres delen: {address_parts}")
-            
-            if address_parts:
-                full_address = ', '.join(address_parts) + ', Germany'
-                logger.info(f"  Volledig adres: {full_address}")
-                
-                if use_fallback:
-                    # Gebruik fallback coördinaten
-                    import random
-                    base_lat = 50.7467  # Bonn centrum
-                    base_lng = 7.1516
-                    
-                    # Voeg wat variatie toe per patiënt
-                    lat_variation = (i * 0.01) + (random.random() * 0.005)
-                    lng_variation = (i * 0.01) + (random.random() * 0.005)
-                    
-                    patient_info['latitude'] = base_lat + lat_variation
-                    patient_info['longitude'] = base_lng + lng_variation
-                    patient_info['geocoded'] = True
-                    patient_info['fallback_used'] = True
-                    success_count += 1
-                    logger.info(f"✅ Fallback geocoded: {patient_info.get('achternaam', 'Onbekend')} - {full_address}")
-                else:
-                    # Gebruik Google Maps API
-                    coords = google_maps_service.geocode_address(full_address)
-                if coords:
-                    patient_info['latitude'] = coords[0]
-                    patient_info['longitude'] = coords[1]
-                    patient_info['geocoded'] = True
-                    patient_info['fallback_used'] = False
-                    success_count += 1
-                    logger.info(f"✅ Google Maps geocoded: {patient_info.get('achternaam', 'Onbekend')} - {full_address}")
-                else:
-                    patient_info['geocoded'] = False
-                    error_count += 1
-                    logger.warning(f"❌ Geocoding failed: {patient_info.get('achternaam', 'Onbekend')} - {full_address}")
-            else:
+            logger.debug(f"Rij {i}: {patient_info}")
+            geocoded_patients.append(patient_info)
+        
+        # 2. Alle unieke adressen in één keer geocoden (cache, rate limits, parallel)
+        geocoder = BulkGeocoder(providers=providers, time_budget=150)
+        results = geocoder.geocode_many(
+            (info.get('adres'), info.get('postcode'), info.get('plaats'))
+            for info in geocoded_patients
+        )
+        
+        # 3. Resultaten terugzetten
+        for patient_info in geocoded_patients:
+            name = patient_info.get('achternaam', 'Onbekend')
+            if not (patient_info.get('adres') or patient_info.get('plaats')):
                 patient_info['geocoded'] = False
                 error_count += 1
-                logger.warning(f"❌ Geen adresgegevens: {patient_info.get('achternaam', 'Onbekend')}")
-                logger.warning(f"  Beschikbare velden: {list(patient_info.keys())}")
+                logger.warning(f"❌ Geen adresgegevens: {name}")
+                continue
             
-            geocoded_patients.append(patient_info)
+            key = GeocodeCacheEntry.make_key(patient_info.get('adres'), patient_info.get('postcode'), patient_info.get('plaats'))
+            result = results.get(key) or {}
+            coords = result.get('coordinates')
+            if coords:
+                patient_info['latitude'] = coords[0]
+                patient_info['longitude'] = coords[1]
+                patient_info['geocoded'] = True
+                patient_info['fallback_used'] = False
+                success_count += 1
+            else:
+                # Standaard locatie van de plaats, zodat de planning door kan
+                default_lat, default_lng = geocoding_service.get_default_coordinates(patient_info.get('plaats'))
+                patient_info['latitude'] = default_lat
+                patient_info['longitude'] = default_lng
+                patient_info['geocoded'] = True
+                patient_info['fallback_used'] = True
+                fallback_count += 1
+                logger.warning(f"⚠️ Standaard locatie gebruikt ({result.get('source', 'onbekend')}): {name}")
         
-        # Sla geocoded data op in session
-        upload_data['geocoded_patients'] = geocoded_patients
-        request.session['wizard_upload_data'] = upload_data
+        # Sla geocoded data op in de wizard state
+        upload_data = WizardState.for_request(request).update('wizard_upload_data', geocoded_patients=geocoded_patients)
         
-        logger.info(f"🎯 Geocoding voltooid: {success_count} succesvol, {error_count} gefaald")
+        logger.info(f"🎯 Geocoding voltooid: {success_count} succesvol, {fallback_count} standaard locatie, {error_count} gefaald")
         
         response_data = {
             'success': True,
             'statistics': {
                 'total_patients': len(geocoded_patients),
                 'success_count': success_count,
+                'fallback_count': fallback_count,
                 'error_count': error_count,
-                'success_rate': round((success_count / len(geocoded_patients)) * 100, 1) if geocoded_patients else 0
-            }
+                'success_rate': round((success_count / len(geocoded_patients)) * 100, 1) if geocoded_patients else 0,
+                'geocoder': geocoder.stats,
+            },
+            'fallback_used': fallback_count > 0,
+            'message': f'Geocoding voltooid! {success_count} adressen gevonden, '
+                       f'{fallback_count} met standaard locatie, {error_count} gefaald'
         }
         
-        if use_fallback:
-            response_data['message'] = f'Fallback geocoding voltooid! {success_count} adressen verwerkt, {error_count} gefaald'
-            response_data['fallback_used'] = True
-        else:
-            response_data['message'] = f'Google Maps geocoding voltooid! {success_count} adressen gevonden, {error_count} gefaald'
-            response_data['fallback_used'] = False
-        
         return JsonResponse(response_data)
         
     except Exception as e:
@@ -6102,35 +4833,38 @@ def api_wizard_real_time_update(request):
         from .models import Vehicle, Patient
         try:
             vehicle = Vehicle.objects.get(id=new_vehicle_id)
-            patient = Patient.objects.get(id=patient_id)
+            patient = Patient.objects.select_related(
+                'toegewezen_voertuig', 'halen_tijdblok', 'bringen_tijdblok'
+            ).get(id=patient_id)
         except (Vehicle.DoesNotExist, Patient.DoesNotExist):
             return JsonResponse({'error': 'Voertuig of patiënt niet gevonden'}, status=404)
         
-        # Import Google Maps service
-        from .services.google_maps import google_maps_service
-        
-        if not google_maps_service.is_enabled():
-            return JsonResponse({
-                'error': 'Google Maps API is niet beschikbaar',
-                'fallback_available': True
-            }, status=400)
+        # Alleen de twee betrokken routes herberekenen, zonder op te slaan
+        editor = _route_editor_for(patient, data.get('type', 'halen'), timeslot_id)
+        if editor is None:
+            return JsonResponse({'error': 'Tijdblok niet gevonden'}, status=404)
+        routes = editor.move(
+            patient, patient.toegewezen_voertuig, vehicle,
+            source_order=data.get('source_order'), target_order=data.get('target_order'),
+        )
+        target = routes['target']
         
-        # Bereken nieuwe route voor dit voertuig
-        # Dit is een vereenvoudigde versie - in productie zou je de volledige route herberekenen
         route_update = {
             'vehicle_id': vehicle.id,
             'vehicle_name': vehicle.kenteken,
             'patient_id': patient.id,
             'patient_name': patient.naam,
-            'estimated_distance': 15.5,  # Placeholder - zou Google Maps gebruiken
-            'estimated_time': 25,  # Placeholder
-            'estimated_cost': 15.5 * float(vehicle.km_kosten_per_km)
+            'estimated_distance': target['total_distance_km'],
+            'estimated_time': target['total_time_minutes'],
+            'estimated_cost': target['total_cost'],
+            'hard_constraints_valid': target['constraints']['hard_constraints_valid'],
         }
         
         return JsonResponse({
             'success': True,
             'route_update': route_update,
-            'message': f'Route bijgewerkt voor {patient.voornaam} {patient.achternaam}'
+            'routes': routes,
+            'message': f'Route bijgewerkt voor {patient.naam}'
         })
         
     except json.JSONDecodeError:
@@ -6140,4 +4874,48 @@ def api_wizard_real_time_update(request):
         return JsonResponse({
             'error': f'Fout bij route update: {str(e)}',
             'fallback_available': True
-        }, status=500)
\ No newline at end of file
+        }, status=500)
+
+def instrumentation_overview(request):
+    """
+    Overzicht van de request instrumentatie (zie planning/instrumentation.py)
+    Alleen voor staff: per view de gemiddelde/p95 tijd en queries en de laatste requests.
+    """
+    from .instrumentation import request_log, get_config
+    
+    if not request.user.is_authenticated or not request.user.is_staff:
+        messages.error(request, 'Geen toegang tot instrumentatie. Alleen admins hebben toegang.')
+        return redirect('home')
+    
+    view = request.GET.get('view') or None
+    context = {
+        'summary': request_log.summary(),
+        'entries': request_log.entries(view=view, limit=100),
+        'selected_view': view,
+        'budgets': get_config()['budgets'],
+    }
+    return render(request, 'planning/instrumentation.html', context)
+
+
+def api_instrumentation(request):
+    """
+    JSON versie van de instrumentatie: ?view=<url naam>&limit=<n>
+    POST met action=clear leegt de buffer.
+    """
+    from .instrumentation import request_log
+    
+    if not request.user.is_authenticated or not request.user.is_staff:
+        return JsonResponse({'error': 'Geen toegang'}, status=403)
+    
+    if request.method == 'POST' and request.POST.get('action') == 'clear':
+        request_log.clear()
+        return JsonResponse({'success': True})
+    
+    try:
+        limit = int(request.GET.get('limit', 100))
+    except ValueError:
+        limit = 100
+    return JsonResponse({
+        'summary': request_log.summary(),
+        'entries': request_log.entries(view=request.GET.get('view') or None, limit=limit),
+    })
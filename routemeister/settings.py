@@ -42,6 +42,7 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'planning.instrumentation.InstrumentationMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -80,6 +81,17 @@ DATABASES = {
     }
 }
 
+# Gedeelde cache voor alle processen (web en run_planning_worker): de versie nummers
+# van SettingsCache en DashboardSnapshot en het reistijd profiel moeten elk proces
+# bereiken, wat de standaard LocMemCache (per proces) niet doet. De tabel wordt
+# door migratie 0027 aangemaakt; met Redis kan de backend hier vervangen worden.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'routemeister_cache',
+    }
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -134,3 +146,61 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 OPTAPLANNER_URL = 'http://localhost:8080'  # Development
 # OPTAPLANNER_URL = 'https://opta01.myidbv.com'  # Production
 OPTAPLANNER_ENABLED = True
+
+# Bulk geocoding (rate limits per provider, URLs overschrijfbaar voor een lokale stub server)
+GEOCODING_NOMINATIM_RATE = 1.0   # Nominatim usage policy: max 1 request per seconde
+GEOCODING_GOOGLE_RATE = 25.0
+GEOCODING_GOOGLE_CONCURRENCY = 8
+
+# Route planner: 'savings' plant alle tijdblokken parallel in een process pool met
+# alle voertuigen, 'simple' is de oude sequentiële planning (één voertuig per tijdblok)
+ROUTE_SOLVER_MODE = 'savings'
+
+# Reistijd cache voor Google Distance Matrix/Directions (zie planning/services/travel_time_cache.py)
+TRAVEL_TIME_CACHE = {
+    'precision': 3,        # Coördinaten afronden op ~100 meter
+    'bucket_hours': 1,     # Reistijd per vertrek uur
+    'ttl_days': 30,
+    'max_entries': 100000, # Daarboven LRU eviction
+}
+
+# Reistijd profiel per vertrek uur en wegklasse (zie planning/services/travel_profile.py),
+# geleerd uit de reistijd cache hierboven
+TRAVEL_PROFILE = {
+    'min_samples': 5,           # Ritten per uur en wegklasse voor een geleerde snelheid
+    'road_class_km': (3, 15),   # Stad < 3 km, regionaal < 15 km, daarboven snelweg
+    'refresh_seconds': 3600,    # Profiel hooguit elk uur opnieuw leren
+}
+
+# Dashboard snapshot cache (zie planning/services/dashboard.py); wijzigingen via
+# signals maken de cache direct ongeldig, de TTL begrenst wijzigingen uit andere processen
+DASHBOARD_CACHE_TTL = 60
+
+# Achtergrond planning jobs (zie planning/services/planning_jobs.py en run_planning_worker)
+PLANNING_JOBS = {
+    'concurrency': 2,       # Parallelle jobs per worker proces
+    'poll_interval': 1.0,   # Seconden tussen wachtrij checks
+    'stale_after': 300,     # Running jobs zonder heartbeat worden opnieuw ingepland
+    # Server-Sent Events voor de voortgang; alleen aanzetten onder ASGI. Onder WSGI
+    # houdt elke open stream een web worker bezet, dus dan pollt de frontend.
+    'event_stream': False,
+}
+
+# Proces cache voor Configuration, home Location en GoogleMapsConfig (zie
+# planning/services/settings_cache.py): andere processen zien wijzigingen binnen
+# zoveel seconden via een versie nummer in de cache (None: niet controleren)
+SETTINGS_CACHE_VERSION_CHECK = 5
+
+# Request instrumentatie (zie planning/instrumentation.py, overzicht op /instrumentatie/)
+# Budgetten per url naam; overschrijding wordt als warning gelogd
+INSTRUMENTATION = {
+    'enabled': True,
+    'buffer_size': 500,
+    'duplicate_threshold': 5,
+    'budgets': {
+        '*': {'queries': 100, 'ms': 2000},
+        'dashboard': {'queries': 20, 'ms': 500},
+        'planning_wizard_assignment': {'queries': 30, 'ms': 1000},
+        'api_planning_job_status': {'queries': 10, 'ms': 200},
+    },
+}